@@ -28,6 +28,8 @@ from aws_cdk import (
     aws_logs as logs,
     aws_dynamodb as dynamodb,
     aws_cognito as cognito,
+    aws_events as events,
+    aws_events_targets as targets,
 )
 from constructs import Construct
 
@@ -76,6 +78,9 @@ class MarketplaceStack(Stack):
         # Create API Gateway resources
         self._create_api_routes()
 
+        # Schedule offline maintenance jobs
+        self._create_maintenance_schedules()
+
         # Create stack outputs
         self._create_outputs()
 
@@ -460,6 +465,41 @@ class MarketplaceStack(Stack):
 
         logger.info("Created marketplace API routes")
 
+    def _create_maintenance_schedules(self):
+        """Scheduled maintenance invocations (kept off the request path)"""
+
+        # Nightly listing index rebuild at 02:00 IST (20:30 UTC): backfills legacy
+        # templates and resets drifted views with one table scan
+        listing_rebuild_rule = events.Rule(
+            self, f"MarketplaceListingRebuild{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("listing-index-rebuild"),
+            description="Rebuild the marketplace listing index outside market hours",
+            schedule=events.Schedule.cron(minute="30", hour="20", month="*", year="*", week_day="*")
+        )
+        listing_rebuild_rule.add_target(
+            targets.LambdaFunction(
+                self.lambda_functions['marketplace-manager'],
+                event=events.RuleTargetInput.from_object({"action": "rebuild_marketplace_index"})
+            )
+        )
+
+        # Fold subscriber counter shards back into the templates every 5 minutes and
+        # refresh the listing entries of the templates whose counts changed
+        counter_compaction_rule = events.Rule(
+            self, f"MarketplaceCounterCompaction{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("counter-compaction"),
+            description="Compact sharded subscriber counters and refresh their listings",
+            schedule=events.Schedule.rate(Duration.minutes(5))
+        )
+        counter_compaction_rule.add_target(
+            targets.LambdaFunction(
+                self.lambda_functions['subscription-manager'],
+                event=events.RuleTargetInput.from_object({"action": "compact_counters"})
+            )
+        )
+
+        logger.info("Created marketplace maintenance schedules")
+
     def _create_outputs(self):
         """Create stack outputs for cross-stack references"""
 
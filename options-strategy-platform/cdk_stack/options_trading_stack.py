@@ -8,12 +8,15 @@ from aws_cdk import (
     aws_iam as iam,
     aws_events as events,
     aws_events_targets as targets,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_sqs as sqs,
     aws_logs as logs,
     aws_apigatewayv2 as apigatewayv2,
     aws_apigatewayv2_integrations as integrations,
     aws_cloudwatch as cloudwatch,
     aws_cognito as cognito,
     aws_stepfunctions as stepfunctions,
+    aws_applicationautoscaling as appscaling,
     Duration,
     RemovalPolicy,
     CfnOutput,
@@ -47,6 +50,12 @@ class OptionsTradeStack(Stack):
         # Create Lambda layers
         self._create_lambda_layers()
 
+        # Create the delayed retry queue for failed strategy legs
+        self._create_retry_queue()
+
+        # Priority lanes for exit executions (protective exits vs routine work)
+        self._create_execution_lane_queues()
+
         # Create Lambda functions
         self._create_lambda_functions()
 
@@ -247,6 +256,7 @@ class OptionsTradeStack(Stack):
             removal_policy=removal_policy,
             point_in_time_recovery=self.env_config.get('enable_point_in_time_recovery', False),
             stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
+            time_to_live_attribute="ttl",  # Expires released retry index entries
         )
 
         # GSI1: Executions by Strategy (for strategy-specific analytics)
@@ -302,6 +312,54 @@ class OptionsTradeStack(Stack):
             removal_policy=self.get_removal_policy(),
         )
 
+    def _create_retry_queue(self):
+        """
+        Standard SQS queue for backed-off retries of failed strategy legs.
+
+        Retries use per-message DelaySeconds (up to 15 minutes); longer delays sit
+        in the RETRY_INDEX# buckets of execution history until the sweep releases
+        them. Standard rather than FIFO because FIFO queues ignore per-message delays.
+        """
+        self.retry_dead_letter_queue = sqs.Queue(
+            self, f"StrategyRetryDLQ{self.deploy_env.title()}",
+            queue_name=self.get_resource_name("strategy-retry-dlq"),
+            retention_period=Duration.days(4),
+        )
+
+        self.retry_queue = sqs.Queue(
+            self, f"StrategyRetryQueue{self.deploy_env.title()}",
+            queue_name=self.get_resource_name("strategy-retry"),
+            visibility_timeout=Duration.seconds(360),  # 6x the re-execute handler timeout
+            retention_period=Duration.days(1),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=self.retry_dead_letter_queue),
+        )
+
+    def _create_execution_lane_queues(self):
+        """
+        FIFO queues for the two execution lanes (see execution_lanes.py).
+
+        HIGH carries stop loss / target profit / trailing SL exits, NORMAL routine
+        exits. Each lane has its own consumer Lambda, so a backlog of routine work
+        never delays a protective exit. FIFO keeps a user's exits in order
+        (MessageGroupId = user_id).
+        """
+        self.execution_lane_queues = {}
+        for lane in ("HIGH", "NORMAL"):
+            dead_letter_queue = sqs.Queue(
+                self, f"ExecutionLane{lane.title()}DLQ{self.deploy_env.title()}",
+                queue_name=self.get_resource_name(f"execution-lane-{lane.lower()}-dlq.fifo"),
+                fifo=True,
+                retention_period=Duration.days(4),
+            )
+            self.execution_lane_queues[lane] = sqs.Queue(
+                self, f"ExecutionLane{lane.title()}Queue{self.deploy_env.title()}",
+                queue_name=self.get_resource_name(f"execution-lane-{lane.lower()}.fifo"),
+                fifo=True,
+                visibility_timeout=Duration.seconds(360),  # 6x the lane consumer timeout
+                retention_period=Duration.days(1),
+                dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=dead_letter_queue),
+            )
+
     def _create_lambda_functions(self):
         """Create all Lambda functions for options trading"""
 
@@ -353,7 +411,11 @@ class OptionsTradeStack(Stack):
             # 🚀 Parallel Execution Engine (NEW)
             ('user-strategy-executor', '🚀 Execute strategies for single user in parallel - ZERO queries!'),
             ('single-strategy-executor', '🚀 Execute individual strategy with ultimate parallelization - ZERO queries!'),
+            ('template-fanout-executor', '🚀 Execute a marketplace template strategy once for all subscribers'),
             ('strategy-scheduler', '🕐 SQS-to-Express Step Function launcher for time-based strategy execution'),
+
+            # Broker order-status postbacks
+            ('order-postback-handler', '📬 Verify broker postbacks and apply order status changes'),
         ]
 
         # Functions that need trading dependencies layer (requests for broker API calls)
@@ -363,6 +425,7 @@ class OptionsTradeStack(Stack):
             'strategy-executor',
             'single-strategy-executor',
             'user-strategy-executor',
+            'template-fanout-executor',
         ]
 
         # Create Lambda functions with logRetention (avoids redeploy LogGroup errors)
@@ -422,6 +485,119 @@ class OptionsTradeStack(Stack):
                 )
             )
 
+        # Failed legs are scheduled onto the retry queue by the executor
+        self.lambda_functions['single-strategy-executor'].add_environment(
+            "RETRY_QUEUE_URL", self.retry_queue.queue_url
+        )
+        self.retry_queue.grant_send_messages(self.lambda_functions['single-strategy-executor'])
+
+        # Strategy executions go through the "live" alias; its provisioned concurrency is
+        # scaled up for the opening window (09:00-09:45 IST) and released afterwards
+        self.single_strategy_executor_alias = _lambda.Alias(
+            self, f"SingleStrategyExecutorLiveAlias{self.deploy_env.title()}",
+            alias_name="live",
+            version=self.lambda_functions['single-strategy-executor'].current_version,
+        )
+
+        warm_concurrency = self.options_config.get('executor_warm_concurrency', 0)
+        if warm_concurrency:
+            executor_scaling = self.single_strategy_executor_alias.add_auto_scaling(
+                min_capacity=0, max_capacity=warm_concurrency
+            )
+            executor_scaling.scale_on_schedule(
+                "ScaleUpForMarketOpen",
+                schedule=appscaling.Schedule.cron(minute="30", hour="3", week_day="MON-FRI"),
+                min_capacity=warm_concurrency,
+                max_capacity=warm_concurrency,
+            )
+            executor_scaling.scale_on_schedule(
+                "ScaleDownAfterMarketOpen",
+                schedule=appscaling.Schedule.cron(minute="15", hour="4", week_day="MON-FRI"),
+                min_capacity=0,
+                max_capacity=0,
+            )
+
+        # Postback status changes are published as Order.Status.Changed events (no consumer rule yet)
+        self.lambda_functions['order-postback-handler'].add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["events:PutEvents"],
+                resources=[f"arn:aws:events:{self.region}:{self.account}:event-bus/default"]
+            )
+        )
+
+        # Scheduled strategies are launched in per-minute batches (Wait + distributed Map)
+        self._create_batch_strategy_executor_step_function()
+
+    def _create_batch_strategy_executor_step_function(self):
+        """
+        Create the batch strategy executor: one Standard execution per execution minute
+        that waits for the 0-second boundary, then fans out over a distributed Map state
+        (Express child executions) invoking the single strategy executor per strategy.
+
+        Replaces one Express execution per strategy, which at busy minutes (09:20)
+        meant thousands of throttled StartExecution calls.
+        """
+        import json
+        import os
+
+        state_machine_name = self.get_resource_name("batch-strategy-executor")
+        state_machine_arn = f"arn:aws:states:{self.region}:{self.account}:stateMachine:{state_machine_name}"
+
+        step_function_role = iam.Role(
+            self, f"BatchStrategyExecutorRole{self.deploy_env.title()}",
+            role_name=self.get_resource_name("batch-strategy-executor-role"),
+            assumed_by=iam.ServicePrincipal("states.amazonaws.com"),
+        )
+        self.single_strategy_executor_alias.grant_invoke(step_function_role)
+
+        # Distributed Map runs its items as child executions of this state machine
+        step_function_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=["states:StartExecution", "states:DescribeExecution", "states:StopExecution"],
+                resources=[state_machine_arn, f"arn:aws:states:{self.region}:{self.account}:execution:{state_machine_name}/*"]
+            )
+        )
+
+        definition_path = os.path.join(
+            os.path.dirname(__file__),
+            "..",
+            "step_functions",
+            "batch_strategy_executor_definition.json"
+        )
+
+        with open(definition_path, 'r') as f:
+            definition_json = f.read()
+
+        definition_json = definition_json.replace(
+            "${SingleStrategyExecutorArn}",
+            self.single_strategy_executor_alias.function_arn
+        )
+
+        self.batch_strategy_executor = stepfunctions.StateMachine(
+            self, f"BatchStrategyExecutor{self.deploy_env.title()}",
+            state_machine_name=state_machine_name,
+            definition_body=stepfunctions.DefinitionBody.from_string(json.dumps(json.loads(definition_json))),
+            role=step_function_role,
+            state_machine_type=stepfunctions.StateMachineType.STANDARD,  # Distributed Map needs a Standard parent
+            logs=stepfunctions.LogOptions(
+                destination=logs.LogGroup(
+                    self, f"BatchStrategyExecutorLogs{self.deploy_env.title()}",
+                    log_group_name=f"/aws/stepfunctions/{state_machine_name}",
+                    retention=logs.RetentionDays.ONE_WEEK,
+                    removal_policy=RemovalPolicy.DESTROY
+                ),
+                level=stepfunctions.LogLevel.ERROR,
+                include_execution_data=False
+            ),
+        )
+
+        scheduler = self.lambda_functions['strategy-scheduler']
+        scheduler.add_environment("BATCH_STRATEGY_STEP_FUNCTION_ARN", self.batch_strategy_executor.state_machine_arn)
+        scheduler.add_environment(
+            "BATCH_MAP_MAX_CONCURRENCY", str(self.options_config.get('max_concurrent_executions', 50))
+        )
+        self.batch_strategy_executor.grant_start_execution(scheduler)
+
     # NOTE: _create_parallel_execution_infrastructure() REMOVED
     # Replaced by direct EventBridge → Lambda architecture (Strategy.Execution.Triggered events)
 
@@ -709,6 +885,17 @@ class OptionsTradeStack(Stack):
                                                 authorizer=authorizer
                                                 )
 
+        # --- Broker Postbacks ---
+        # Called by the broker, not the app: no Cognito, each postback carries a checksum
+        # verified against the client's API secret
+        postback_resource = options_resource.add_resource("postbacks") \
+            .add_resource("{broker}").add_resource("{user_id}").add_resource("{client_id}")
+
+        # POST /options/postbacks/{broker}/{user_id}/{client_id} - Order status postback
+        postback_resource.add_method("POST",
+                                     apigateway.LambdaIntegration(self.lambda_functions['order-postback-handler'])
+                                     )
+
         # --- Today's Executions Timeline ---
         today_resource = trading_resource.add_resource("today")
 
@@ -844,6 +1031,19 @@ class OptionsTradeStack(Stack):
         # Store WebSocket URL in environment for broadcaster Lambda
         self.websocket_endpoint = f"https://{self.websocket_api.api_id}.execute-api.{self.region}.amazonaws.com/{self.deploy_env}"
 
+        # The postback handler pushes order status changes to connected clients
+        postback_handler = self.lambda_functions['order-postback-handler']
+        postback_handler.add_environment("WEBSOCKET_ENDPOINT_URL", self.websocket_endpoint)
+        self.websocket_connections_table.grant_read_write_data(postback_handler)
+        postback_handler.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["execute-api:ManageConnections"],
+                resources=[
+                    f"arn:aws:execute-api:{self.region}:{self.account}:{self.websocket_api.api_id}/{self.deploy_env}/*"
+                ]
+            )
+        )
+
     def _create_event_driven_execution_architecture(self):
         """
         Create sophisticated event-driven execution architecture
@@ -941,7 +1141,7 @@ class OptionsTradeStack(Stack):
     # - _create_strategy_execution_eventbridge_rule() - strategy-execution-trigger
     # - _create_individual_strategy_execution_state_machine() - individual-strategy-execution
     # - _create_individual_strategy_execution_eventbridge_rule()
-    # - _create_batch_strategy_executor_step_function() - batch-strategy-executor
+    # - _create_batch_strategy_executor_step_function() - batch-strategy-executor (since re-added with a distributed Map)
     # - _create_individual_strategy_eventbridge_role()
     # - _grant_individual_strategy_execution_permissions()
     # - _create_eventbridge_step_function_role()
@@ -965,13 +1165,23 @@ class OptionsTradeStack(Stack):
             ("strategy-exit-handler", "Handle strategy exit triggers"),
             ("stop-loss-handler", "Handle stop loss monitoring and exits"),
             ("target-profit-handler", "Handle target profit monitoring and exits"),
+            ("strategy-mtm-handler", "Handle strategy / basket MTM stop loss and target exits"),
             ("trailing-sl-handler", "Handle trailing stop loss adjustments"),
             ("duplicate-order-handler", "Handle duplicate order detection"),
             ("re-entry-handler", "Handle strategy re-entry conditions"),
-            ("re-execute-handler", "Handle failed execution retries"),
-            ("position-sync-handler", "Handle position sync across brokers")
+            ("re-execute-handler", "Dispatch due retries of failed strategy legs"),
+            ("position-sync-handler", "Handle position sync across brokers"),
+            ("portfolio-var-handler", "Handle portfolio VaR / Expected Shortfall runs"),
+            ("portfolio-greeks-handler", "Stream changed portfolio Greeks to WebSocket dashboards"),
+            ("order-status-poll-handler", "Poll broker order books for accounts without postbacks"),
+            ("premarket-warmup-handler", "Validate broker sessions and prefetch opening-window strategies"),
+            ("market-data-refresher", "Build intraday candles and fire range breakout entries")
         ]
 
+        # Event handlers that revalue option books with NumPy or call broker APIs
+        event_handlers_needing_trading_layer = ['portfolio-var-handler', 'portfolio-greeks-handler',
+                                                'order-status-poll-handler', 'premarket-warmup-handler']
+
         self.event_handlers = {}
 
         for handler_name, description in event_handler_configs:
@@ -996,6 +1206,7 @@ class OptionsTradeStack(Stack):
                 environment=handler_env,
                 timeout=Duration.seconds(60),
                 memory_size=512,
+                layers=[self.trading_dependencies_layer] if handler_name in event_handlers_needing_trading_layer else [],
                 log_retention=logs.RetentionDays.ONE_WEEK if self.env_config['log_retention_days'] == 7
                 else logs.RetentionDays.ONE_MONTH if self.env_config['log_retention_days'] == 30
                 else logs.RetentionDays.THREE_MONTHS,
@@ -1032,9 +1243,172 @@ class OptionsTradeStack(Stack):
 
             self.event_handlers[handler_name] = handler_lambda
 
+        # Order status poller and pre-market warm-up read broker credentials
+        for handler_name in ['order-status-poll-handler', 'premarket-warmup-handler']:
+            self.event_handlers[handler_name].add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=[
+                        "secretsmanager:GetSecretValue",
+                        "secretsmanager:DescribeSecret",
+                    ],
+                    resources=[f"arn:aws:secretsmanager:{self.region}:{self.account}:secret:{self.company_prefix}-*"]
+                )
+            )
+
+        # Pre-market warm-up discovers active users the same way as the event emitter
+        premarket_warmup_handler = self.event_handlers['premarket-warmup-handler']
+        premarket_warmup_handler.add_environment("USER_PROFILES_TABLE", self.user_profiles_table_name)
+        premarket_warmup_handler.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=[
+                    "dynamodb:Query",
+                    "dynamodb:GetItem"
+                ],
+                resources=[
+                    f"arn:aws:dynamodb:{self.region}:{self.account}:table/{self.user_profiles_table_name}",
+                    f"arn:aws:dynamodb:{self.region}:{self.account}:table/{self.user_profiles_table_name}/index/ActiveUsersIndex"
+                ]
+            )
+        )
+
+        # Greeks stream pushes changed Greeks to WebSocket clients (when WebSockets are deployed)
+        if hasattr(self, 'websocket_api'):
+            greeks_handler = self.event_handlers['portfolio-greeks-handler']
+            greeks_handler.add_environment("WEBSOCKET_ENDPOINT_URL", self.websocket_endpoint)
+            greeks_handler.add_environment("WEBSOCKET_CONNECTIONS_TABLE", self.websocket_connections_table.table_name)
+            self.websocket_connections_table.grant_read_write_data(greeks_handler)
+            greeks_handler.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["execute-api:ManageConnections"],
+                    resources=[
+                        f"arn:aws:execute-api:{self.region}:{self.account}:{self.websocket_api.api_id}/{self.deploy_env}/*"
+                    ]
+                )
+            )
+
+        # Re-execute handler consumes due retries; max concurrency bounds retry pressure on brokers
+        re_execute_handler = self.event_handlers['re-execute-handler']
+        re_execute_handler.add_environment("RETRY_QUEUE_URL", self.retry_queue.queue_url)
+        self.retry_queue.grant_send_messages(re_execute_handler)
+        re_execute_handler.add_event_source(
+            lambda_event_sources.SqsEventSource(
+                self.retry_queue,
+                batch_size=10,
+                max_batching_window=Duration.seconds(1),
+                max_concurrency=2,
+            )
+        )
+
+        # Exit producers queue onto the execution lanes; one consumer Lambda per lane
+        self._create_execution_lane_consumers()
+
         # Create EventBridge rules for event handlers
         self._create_event_handler_rules()
 
+    def _create_execution_lane_consumers(self):
+        """
+        One consumer Lambda per execution lane, each with its own reserved concurrency
+        and share of the broker order-rate budget (execution_lanes in the environment config).
+        """
+        lane_config = self.options_config.get('execution_lanes', {})
+        lane_env = {
+            "ENVIRONMENT": self.deploy_env,
+            "COMPANY_PREFIX": self.company_prefix,
+            "REGION": self.region,
+            "TRADING_CONFIGURATIONS_TABLE": self.trading_configurations_table.table_name,
+            "EXECUTION_HISTORY_TABLE": self.execution_history_table.table_name,
+            "BROKER_ACCOUNTS_TABLE": self.broker_accounts_table_name,
+        }
+
+        self.execution_lane_consumers = {}
+        for lane, queue in self.execution_lane_queues.items():
+            config = lane_config.get(lane.lower(), {})
+            consumer = _lambda.Function(
+                self, f"ExecutionLane{lane.title()}Consumer{self.deploy_env.title()}",
+                function_name=self.get_resource_name(f"options-execution-lane-{lane.lower()}"),
+                runtime=_lambda.Runtime.PYTHON_3_11,
+                code=_lambda.Code.from_asset("lambda_functions"),
+                handler="option_baskets.execution_lane_consumer.lambda_handler",
+                environment=dict(
+                    lane_env,
+                    EXECUTION_LANE=lane,
+                    BROKER_RATE_BUDGET_SHARE=str(config.get('broker_rate_share', 1)),
+                ),
+                timeout=Duration.seconds(60),
+                memory_size=512,
+                reserved_concurrent_executions=config.get('reserved_concurrency'),
+                layers=[self.trading_dependencies_layer],
+                log_retention=logs.RetentionDays.ONE_WEEK if self.env_config['log_retention_days'] == 7
+                else logs.RetentionDays.ONE_MONTH if self.env_config['log_retention_days'] == 30
+                else logs.RetentionDays.THREE_MONTHS,
+                description=f"Execute queued exits from the {lane} priority execution lane"
+            )
+
+            for table in [self.trading_configurations_table, self.execution_history_table]:
+                table.grant_read_write_data(consumer)
+            consumer.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["secretsmanager:GetSecretValue", "secretsmanager:DescribeSecret"],
+                    resources=[f"arn:aws:secretsmanager:{self.region}:{self.account}:secret:{self.company_prefix}-*"]
+                )
+            )
+            consumer.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["sqs:SendMessage"],
+                    resources=[self.retry_queue.queue_arn]
+                )
+            )
+            consumer.add_environment("RETRY_QUEUE_URL", self.retry_queue.queue_url)
+            consumer.add_event_source(
+                lambda_event_sources.SqsEventSource(
+                    queue,
+                    batch_size=10,
+                    report_batch_item_failures=True,
+                )
+            )
+            self.execution_lane_consumers[lane] = consumer
+
+        # Exit producers route each message to its lane's queue
+        for handler_name in ['strategy-exit-handler', 'stop-loss-handler', 'target-profit-handler',
+                             'trailing-sl-handler', 'strategy-mtm-handler']:
+            handler = self.event_handlers[handler_name]
+            handler.add_environment("HIGH_PRIORITY_EXIT_QUEUE_URL", self.execution_lane_queues["HIGH"].queue_url)
+            handler.add_environment("NORMAL_EXECUTION_QUEUE_URL", self.execution_lane_queues["NORMAL"].queue_url)
+            for queue in self.execution_lane_queues.values():
+                queue.grant_send_messages(handler)
+
+        # The high lane's guarantee: protective exits start within seconds even at peak minutes
+        cloudwatch.Alarm(
+            self, f"ExecutionLaneHighQueueAgeAlarm{self.deploy_env.title()}",
+            alarm_name=self.get_resource_name("execution-lane-high-queue-age"),
+            alarm_description="Protective exits are waiting in the HIGH execution lane",
+            metric=self.execution_lane_queues["HIGH"].metric_approximate_age_of_oldest_message(
+                period=Duration.minutes(1), statistic="Maximum"
+            ),
+            threshold=lane_config.get('high', {}).get('max_queue_age_seconds', 5),
+            evaluation_periods=1,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+
+        # Position exits the executor could not tie to a leg are acknowledged, not retried;
+        # each one leaves a position open that needs closing by hand
+        cloudwatch.Alarm(
+            self, f"UnresolvedPositionExitAlarm{self.deploy_env.title()}",
+            alarm_name=self.get_resource_name("unresolved-position-exit"),
+            alarm_description="A stop loss / target / trailing exit could not be tied to a strategy leg",
+            metric=cloudwatch.Metric(
+                namespace="OptionsTrading/ExecutionLanes",
+                metric_name="UnresolvedPositionExits",
+                dimensions_map={"Lane": "HIGH"},
+                statistic="Sum",
+                period=Duration.minutes(1),
+            ),
+            threshold=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            evaluation_periods=1,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+
     def _create_event_handler_rules(self):
         """Create EventBridge rules to trigger event handlers"""
 
@@ -1123,6 +1497,21 @@ class OptionsTradeStack(Stack):
             targets.LambdaFunction(self.event_handlers['target-profit-handler'])
         )
 
+        # Strategy MTM Check - From active_user_event_handler
+        strategy_mtm_rule = events.Rule(
+            self, f"StrategyMtmCheckRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("strategy-mtm-check"),
+            description="Handle strategy / basket MTM limit sub-events",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Risk.StrategyMTM.Check"]
+            )
+        )
+
+        strategy_mtm_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['strategy-mtm-handler'])
+        )
+
         # Trailing Stop Loss Check - From active_user_event_handler
         trailing_sl_rule = events.Rule(
             self, f"TrailingSlCheckRule{self.deploy_env.title()}",
@@ -1168,14 +1557,14 @@ class OptionsTradeStack(Stack):
             targets.LambdaFunction(self.event_handlers['re-entry-handler'])
         )
 
-        # Re-Execute Check - From active_user_event_handler
+        # Retry Index Sweep - Global event from event_emitter every 10 minutes
         re_execute_rule = events.Rule(
             self, f"ReExecuteCheckRule{self.deploy_env.title()}",
             rule_name=self.get_resource_name("re-execute-check"),
-            description="Handle re-execution sub-events for failed orders",
+            description="Release long-delay strategy retries onto the retry queue",
             event_pattern=events.EventPattern(
                 source=["qlalgo.options.trading"],
-                detail_type=["Strategy.ReExecute.Check"]
+                detail_type=["Retry.Index.Sweep"]
             )
         )
 
@@ -1198,6 +1587,82 @@ class OptionsTradeStack(Stack):
             targets.LambdaFunction(self.event_handlers['position-sync-handler'])
         )
 
+        # Portfolio Greeks Stream - From active_user_event_handler
+        portfolio_greeks_rule = events.Rule(
+            self, f"PortfolioGreeksStreamRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("portfolio-greeks-stream"),
+            description="Handle portfolio Greeks stream sub-events",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Risk.PortfolioGreeks.Stream"]
+            )
+        )
+
+        portfolio_greeks_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['portfolio-greeks-handler'])
+        )
+
+        # Portfolio VaR Check - From active_user_event_handler
+        portfolio_var_rule = events.Rule(
+            self, f"PortfolioVarCheckRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("portfolio-var-check"),
+            description="Handle portfolio VaR sub-events",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Risk.PortfolioVaR.Check"]
+            )
+        )
+
+        portfolio_var_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['portfolio-var-handler'])
+        )
+
+        # Order Status Poll - From active_user_event_handler (one event per broker account)
+        order_status_poll_rule = events.Rule(
+            self, f"OrderStatusPollRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("order-status-poll"),
+            description="Handle coalesced order status poll sub-events",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Sync.OrderStatus.Poll"]
+            )
+        )
+
+        order_status_poll_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['order-status-poll-handler'])
+        )
+
+        # Pre-market Warm-up - Global event from event_emitter (once at 09:05 IST),
+        # fanned out by the handler as one Warmup.User.Triggered event per user
+        premarket_warmup_rule = events.Rule(
+            self, f"PremarketWarmupRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("premarket-warmup"),
+            description="Validate broker sessions and prefetch opening-window strategies before the open",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Warmup.PreMarket.Triggered", "Warmup.User.Triggered"]
+            )
+        )
+
+        premarket_warmup_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['premarket-warmup-handler'])
+        )
+
+        # Market Data Refresh - Global event from event_emitter every minute
+        market_data_refresh_rule = events.Rule(
+            self, f"MarketDataRefreshRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("market-data-refresh"),
+            description="Fold underlying ticks into candles and evaluate range breakout entries",
+            event_pattern=events.EventPattern(
+                source=["options.trading.market"],
+                detail_type=["Refresh Market Data"]
+            )
+        )
+
+        market_data_refresh_rule.add_target(
+            targets.LambdaFunction(self.event_handlers['market-data-refresher'])
+        )
+
         # ============================================================================
         # STRATEGY EXECUTION EVENT - From strategy_entry_handler / strategy_exit_handler
         # Routes execution events directly to single-strategy-executor Lambda
@@ -1214,7 +1679,33 @@ class OptionsTradeStack(Stack):
         )
 
         strategy_execution_rule.add_target(
-            targets.LambdaFunction(self.lambda_functions['single-strategy-executor'])
+            targets.LambdaFunction(self.single_strategy_executor_alias)
+        )
+
+        # ============================================================================
+        # TEMPLATE EXECUTION EVENT - From strategy_entry_handler / strategy_exit_handler (one per template schedule)
+        # Routes to template-fanout-executor, which loads the template strategy once and
+        # dispatches it to every subscriber allocation (re-emits itself to continue)
+        # ============================================================================
+        template_execution_rule = events.Rule(
+            self, f"TemplateExecutionRule{self.deploy_env.title()}",
+            rule_name=self.get_resource_name("template-execution-triggered"),
+            description="Fan out marketplace template executions to subscriber allocations",
+            event_pattern=events.EventPattern(
+                source=["qlalgo.options.trading"],
+                detail_type=["Template.Execution.Triggered"]
+            )
+        )
+
+        template_execution_rule.add_target(
+            targets.LambdaFunction(self.lambda_functions['template-fanout-executor'])
+        )
+
+        self.lambda_functions['template-fanout-executor'].add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["events:PutEvents"],
+                resources=[f"arn:aws:events:{self.region}:{self.account}:event-bus/default"]
+            )
         )
 
     def _create_master_precision_timer_step_function(self):
@@ -1374,6 +1865,32 @@ class OptionsTradeStack(Stack):
         # Add widgets for Lambda functions, DynamoDB tables, API Gateway, etc.
         # This would be expanded with specific metrics widgets
 
+        # Queue age per execution lane (QueueAgeSeconds is emitted by execution_lane_consumer)
+        if hasattr(self, 'execution_lane_queues'):
+            self.dashboard.add_widgets(
+                cloudwatch.GraphWidget(
+                    title="Execution lane queue age (p99, seconds)",
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="OptionsTrading/ExecutionLanes",
+                            metric_name="QueueAgeSeconds",
+                            dimensions_map={"Lane": lane},
+                            statistic="p99",
+                            period=Duration.minutes(1),
+                            label=lane,
+                        )
+                        for lane in self.execution_lane_queues
+                    ],
+                ),
+                cloudwatch.GraphWidget(
+                    title="Execution lane oldest message age (seconds)",
+                    left=[
+                        queue.metric_approximate_age_of_oldest_message(period=Duration.minutes(1), label=lane)
+                        for lane, queue in self.execution_lane_queues.items()
+                    ],
+                ),
+            )
+
     def _create_outputs(self):
         """Create CloudFormation outputs"""
 
@@ -16,11 +16,15 @@ Sub-Events Handled:
 - strategy_exit: Discover and execute strategy exits
 - stop_loss_check: Monitor positions for stop loss triggers
 - target_profit_check: Monitor positions for target profit triggers
+- strategy_mtm_check: Strategy / basket MTM stop loss and target across all legs
 - trailing_sl_check: Adjust trailing stop losses
 - duplicate_order_check: Validate for duplicate orders
 - re_entry_check: Check re-entry conditions
 - re_execute_check: Retry failed executions
 - position_sync: Sync positions across brokers
+- portfolio_var_check: Value the open option book at risk
+- portfolio_greeks_stream: Stream changed portfolio Greeks to WebSocket dashboards
+- order_status_poll: Coalesced order status poll for the broker account
 """
 
 import json
@@ -41,6 +45,10 @@ logger = setup_logger(__name__)
 eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+# Sub-events that value the user's whole book rather than one broker account;
+# they are emitted with the first active broker only
+USER_SCOPED_SUB_EVENTS = {'portfolio_var_check', 'portfolio_greeks_stream'}
+
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
@@ -85,7 +93,7 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         all_results = []
         total_events_emitted = 0
 
-        for broker in active_brokers:
+        for broker_index, broker in enumerate(active_brokers):
             broker_id = broker.get('broker_id')
             client_id = broker.get('client_id')
             broker_name = broker.get('broker_name', broker_id)
@@ -93,6 +101,9 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             logger.info(f"📤 Emitting sub-events for broker: {broker_name} (broker_id: {broker_id}, client_id: {client_id})")
 
             for sub_event in sub_events:
+                if broker_index > 0 and sub_event.get('event_type') in USER_SCOPED_SUB_EVENTS:
+                    continue
+
                 result = process_sub_event_for_broker(
                     user_id=user_id,
                     broker=broker,
@@ -241,11 +252,15 @@ def create_sub_event_detail_with_broker(user_id: str, broker: Dict, event_type:
         'strategy_exit': 'Strategy.Exit.Triggered',
         'stop_loss_check': 'Risk.StopLoss.Check',
         'target_profit_check': 'Risk.TargetProfit.Check',
+        'strategy_mtm_check': 'Risk.StrategyMTM.Check',
         'trailing_sl_check': 'Risk.TrailingSL.Check',
         'duplicate_order_check': 'Validation.DuplicateOrder.Check',
         're_entry_check': 'Strategy.ReEntry.Check',
         're_execute_check': 'Strategy.ReExecute.Check',
-        'position_sync': 'Sync.Position.Triggered'
+        'position_sync': 'Sync.Position.Triggered',
+        'portfolio_var_check': 'Risk.PortfolioVaR.Check',
+        'portfolio_greeks_stream': 'Risk.PortfolioGreeks.Stream',
+        'order_status_poll': 'Sync.OrderStatus.Poll'
     }
 
     detail_type = detail_type_mapping.get(event_type, f'Unknown.{event_type}')
@@ -269,7 +284,8 @@ def create_sub_event_detail_with_broker(user_id: str, broker: Dict, event_type:
         'broker_config': {
             'api_key_secret_arn': broker.get('api_key_secret_arn'),
             'is_authenticated': broker.get('is_authenticated', False),
-            'oauth_status': broker.get('oauth_status', 'not_configured')
+            'oauth_status': broker.get('oauth_status', 'not_configured'),
+            'postbacks_enabled': broker.get('postbacks_enabled', False)
         }
     }
 
@@ -24,6 +24,7 @@ sys.path.append('/var/task/option_baskets')  # Add option_baskets directory to p
 
 # Import shared logger directly
 from shared_utils.logger import setup_logger, log_lambda_event, log_user_action, log_api_response
+from execution_bundle import invalidate_execution_bundles
 logger = setup_logger(__name__)
 
 
@@ -118,6 +119,14 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         }
 
 
+def invalidate_user_execution_bundles(user_id: str, table) -> None:
+    """Make the executor reload allocations instead of using prefetched execution bundles"""
+    try:
+        invalidate_execution_bundles(table, user_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to invalidate execution bundles for user {user_id}: {str(e)}")
+
+
 def handle_create_basket_allocation(event, user_id, basket_id, table):
     """
     ✅ INDUSTRY BEST PRACTICE: Create basket-level broker allocation
@@ -289,6 +298,9 @@ def handle_create_basket_allocation(event, user_id, basket_id, table):
             logger.info(f"✅ Basket allocation created: {basket_id} → {broker_name} ({lot_multiplier}x multiplier)")
             logger.info(f"📊 ALL {len(basket_strategies)} strategies inherit this allocation")
         
+        # Bundles already hydrated for upcoming runs still carry the old allocations
+        invalidate_user_execution_bundles(user_id, table)
+
         # Log user action
         log_user_action(logger, user_id, "basket_broker_allocation_created", {
             "basket_id": basket_id,
@@ -611,6 +623,7 @@ def handle_update_basket_allocation(event, user_id, basket_id, allocation_id, ta
                 update_params['ExpressionAttributeNames'] = expression_attribute_names
 
             table.update_item(**update_params)
+            invalidate_user_execution_bundles(user_id, table)
         
         log_user_action(logger, user_id, "basket_allocation_updated", {
             "allocation_id": allocation_id,
@@ -692,6 +705,7 @@ def handle_delete_basket_allocation(event, user_id, basket_id, allocation_id, ta
                 'sort_key': f'BASKET_ALLOCATION#{allocation_id}'
             }
         )
+        invalidate_user_execution_bundles(user_id, table)
         
         log_user_action(logger, user_id, "basket_allocation_deleted", {
             "allocation_id": allocation_id,
@@ -429,7 +429,8 @@ def handle_update_basket(event, user_id, basket_id, table):
         expression_attribute_names = {}
 
         # Only allow updates to specific fields
-        updatable_fields = ['basket_name', 'description', 'status']
+        updatable_fields = ['basket_name', 'description', 'status',
+                            'mtm_stop_loss', 'target_profit']  # Basket-level MTM limits {type, value}
 
         # Check for basket_name uniqueness if it's being updated
         if 'basket_name' in body:
@@ -472,7 +473,11 @@ def handle_update_basket(event, user_id, basket_id, table):
                     field_name = field
 
                 update_expression_parts.append(f'{field_name} = :{field}')
-                expression_attribute_values[f':{field}'] = body[field]
+                if field in ('mtm_stop_loss', 'target_profit'):
+                    # DynamoDB needs Decimal for fractional limit values
+                    expression_attribute_values[f':{field}'] = json.loads(json.dumps(body[field]), parse_float=Decimal)
+                else:
+                    expression_attribute_values[f':{field}'] = body[field]
 
         # Always update the updated_at timestamp and increment version
         update_expression_parts.extend(['updated_at = :updated_at', 'version = version + :one'])
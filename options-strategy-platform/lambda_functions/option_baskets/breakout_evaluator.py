@@ -0,0 +1,255 @@
+"""
+Breakout Evaluator
+Conditional (range breakout) strategy entries driven by market data ticks
+
+A strategy with range_breakout enabled does not enter at its entry time. The
+entry handler registers a breakout condition instead: the range is the high / low
+of the underlying between the entry time and range_breakout_time, and the entry
+fires on the first tick after range_breakout_time that trades outside it.
+
+Conditions are stored per underlying and trading day, so a tick only looks at
+the conditions of its own instrument:
+- user_id: BREAKOUT#{UNDERLYING}#{YYYY-MM-DD}
+- sort_key: {user_id}#{strategy_id}#{client_id}
+
+Each condition fires once: the PENDING -> TRIGGERED transition is a conditional
+write, and only the invocation that wins it emits the strategy entry.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from candle_store import CandleStore, range_of
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+BREAKOUT_PREFIX = 'BREAKOUT#'
+BREAKOUT_TTL_SECONDS = 2 * 24 * 60 * 60
+
+PENDING = 'PENDING'
+TRIGGERED = 'TRIGGERED'
+EXPIRED = 'EXPIRED'
+
+# No breakout entries after this time (HH:MM IST)
+BREAKOUT_ENTRY_CUTOFF = os.environ.get('BREAKOUT_ENTRY_CUTOFF', '15:00')
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def breakout_partition(underlying: str, trading_date: str) -> str:
+    return f"{BREAKOUT_PREFIX}{underlying.upper()}#{trading_date}"
+
+
+def register_breakout_condition(
+    table,
+    user_id: str,
+    schedule: Dict[str, Any],
+    underlying: str,
+    range_end: str,
+    weekday: str,
+    broker_context: Dict[str, Any],
+    allocation: Optional[Dict[str, Any]],
+    current_ist: datetime
+) -> bool:
+    """
+    Register a strategy's breakout entry for today.
+
+    Args:
+        schedule: Due ENTRY schedule; its execution_time starts the range
+        range_end: range_breakout_time (HH:MM) closing the range
+
+    Returns:
+        True if registered, False if already registered for this account today
+    """
+    strategy_id = schedule.get('strategy_id')
+    client_id = broker_context.get('client_id')
+
+    try:
+        table.put_item(
+            Item={
+                'user_id': breakout_partition(underlying, current_ist.strftime('%Y-%m-%d')),
+                'sort_key': f"{user_id}#{strategy_id}#{client_id}",
+                'entity_type': 'BREAKOUT_CONDITION',
+                'condition_status': PENDING,
+                'owner_user_id': user_id,
+                'strategy_id': strategy_id,
+                'basket_id': schedule.get('basket_id'),
+                'execution_time': schedule.get('execution_time'),
+                'underlying': underlying.upper(),
+                'range_start': schedule.get('execution_time'),
+                'range_end': range_end,
+                'weekday': weekday,
+                'broker_context': broker_context,
+                'allocation': _to_dynamodb(allocation),
+                'registered_at': datetime.now(timezone.utc).isoformat(),
+                'ttl': int(datetime.now(timezone.utc).timestamp()) + BREAKOUT_TTL_SECONDS,
+            },
+            ConditionExpression='attribute_not_exists(sort_key)'
+        )
+        logger.info(f"Registered {underlying} breakout entry for strategy {strategy_id} "
+                    f"(range {schedule.get('execution_time')}-{range_end})")
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+class BreakoutEvaluator:
+    """
+    Evaluates the pending breakout conditions of one instrument against its ticks.
+
+    trigger(condition, breakout) is called once per fired condition, after the
+    condition has been claimed.
+    """
+
+    def __init__(self, table, candle_store: CandleStore,
+                 trigger: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]):
+        self.table = table
+        self.candle_store = candle_store
+        self.trigger = trigger
+
+    def pending_conditions(self, underlying: str, trading_date: str) -> List[Dict[str, Any]]:
+        """PENDING conditions of one instrument for the day (one partition query)."""
+        items: List[Dict[str, Any]] = []
+        query = {
+            'KeyConditionExpression': 'user_id = :partition',
+            'FilterExpression': 'condition_status = :pending',
+            'ExpressionAttributeValues': {
+                ':partition': breakout_partition(underlying, trading_date),
+                ':pending': PENDING,
+            },
+        }
+        while True:
+            response = self.table.query(**query)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def evaluate(self, underlying: str, ticks: List[Tuple[datetime, float]]) -> List[Dict[str, Any]]:
+        """
+        Run an instrument's ticks (oldest first) against its pending conditions.
+
+        Returns:
+            Trigger results of the conditions that fired
+        """
+        if not ticks:
+            return []
+
+        first_moment = ticks[0][0].astimezone(IST)
+        conditions = self.pending_conditions(underlying, first_moment.strftime('%Y-%m-%d'))
+        if not conditions:
+            return []
+
+        fired = []
+        for moment, price in ticks:
+            clock = moment.astimezone(IST).strftime('%H:%M')
+            still_pending = []
+
+            for condition in conditions:
+                if clock < condition['range_end']:
+                    still_pending.append(condition)
+                    continue
+                if clock > BREAKOUT_ENTRY_CUTOFF:
+                    self._transition(condition, EXPIRED, {})
+                    continue
+
+                bounds = self._range(condition, moment)
+                if bounds is None:
+                    still_pending.append(condition)
+                    continue
+
+                range_high, range_low = bounds
+                direction = 'UP' if price > range_high else 'DOWN' if price < range_low else None
+                if direction is None:
+                    still_pending.append(condition)
+                    continue
+
+                breakout = {
+                    'direction': direction,
+                    'price': price,
+                    'range_high': range_high,
+                    'range_low': range_low,
+                    'breakout_time': moment.astimezone(IST).isoformat(),
+                }
+                if self._transition(condition, TRIGGERED, breakout):
+                    logger.info(f"📈 {underlying} broke {direction} ({price} vs {range_low}-{range_high}) "
+                                f"for strategy {condition['strategy_id']}")
+                    fired.append(self.trigger(condition, breakout))
+
+            conditions = still_pending
+            if not conditions:
+                break
+
+        return fired
+
+    def _range(self, condition: Dict[str, Any], moment: datetime) -> Optional[Tuple[float, float]]:
+        """Range of a condition, computed once from 1m candles and kept on the condition."""
+        if condition.get('range_high') is not None:
+            return float(condition['range_high']), float(condition['range_low'])
+
+        day = moment.astimezone(IST)
+        start = day.replace(hour=int(condition['range_start'][:2]), minute=int(condition['range_start'][3:5]),
+                            second=0, microsecond=0)
+        end = day.replace(hour=int(condition['range_end'][:2]), minute=int(condition['range_end'][3:5]),
+                          second=0, microsecond=0)
+        bounds = range_of(self.candle_store.get_candles(condition['underlying'], 1, start, end))
+        if bounds is None:
+            logger.warning(f"No candles for the {condition['underlying']} range "
+                           f"{condition['range_start']}-{condition['range_end']}")
+            return None
+
+        condition['range_high'], condition['range_low'] = bounds
+        try:
+            self.table.update_item(
+                Key={'user_id': condition['user_id'], 'sort_key': condition['sort_key']},
+                UpdateExpression='SET range_high = :high, range_low = :low',
+                ExpressionAttributeValues={':high': Decimal(str(bounds[0])), ':low': Decimal(str(bounds[1]))}
+            )
+        except Exception as e:
+            logger.warning(f"Could not store range of {condition['sort_key']}: {e}")
+        return bounds
+
+    def _transition(self, condition: Dict[str, Any], status: str, breakout: Dict[str, Any]) -> bool:
+        """Move a PENDING condition to status; False when another invocation got there first."""
+        try:
+            self.table.update_item(
+                Key={'user_id': condition['user_id'], 'sort_key': condition['sort_key']},
+                UpdateExpression='SET condition_status = :status, breakout = :breakout, resolved_at = :now',
+                ConditionExpression='condition_status = :pending',
+                ExpressionAttributeValues={
+                    ':status': status,
+                    ':pending': PENDING,
+                    ':breakout': _to_dynamodb(breakout),
+                    ':now': datetime.now(timezone.utc).isoformat(),
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+def _to_dynamodb(value: Any) -> Any:
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb(v) for v in value]
+    return value
@@ -0,0 +1,216 @@
+"""
+Candle Store
+Intraday OHLC candles of the traded underlyings
+
+Ticks fed by the market data refresher are folded into 1, 3, 5 and 15 minute
+candles. The open candles of each interval are kept in memory per container and
+written through to the trading table, so any Lambda can read the candles of the
+session and a cold container continues a candle instead of restarting it.
+
+Storage (trading configurations table):
+- user_id: CANDLE#{UNDERLYING}#{interval}m
+- sort_key: {YYYY-MM-DD}T{HH:MM} (IST start of the candle)
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+CANDLE_PREFIX = 'CANDLE#'
+CANDLE_INTERVALS = (1, 3, 5, 15)
+CANDLE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# NSE session open; candle buckets are aligned to it (09:15, 09:18, 09:21, ...)
+SESSION_OPEN_MINUTES = 9 * 60 + 15
+
+
+def candle_partition(underlying: str, interval: int) -> str:
+    return f"{CANDLE_PREFIX}{underlying.upper()}#{interval}m"
+
+
+def candle_start(moment: datetime, interval: int) -> datetime:
+    """IST start of the interval-minute candle containing moment, aligned to the session open."""
+    moment = moment.astimezone(IST)
+    minutes = moment.hour * 60 + moment.minute
+    aligned = minutes - (minutes - SESSION_OPEN_MINUTES) % interval
+    return moment.replace(hour=aligned // 60, minute=aligned % 60, second=0, microsecond=0)
+
+
+def candle_sort_key(start: datetime) -> str:
+    return start.strftime('%Y-%m-%dT%H:%M')
+
+
+class CandleStore:
+    """
+    Candle aggregator with write-through to the trading table.
+
+    Without a table candles live in memory only (backtests and tests).
+    """
+
+    def __init__(self, table=None, intervals: Iterable[int] = CANDLE_INTERVALS):
+        self.table = table
+        self.intervals = tuple(intervals)
+        self._open: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_tick(self, underlying: str, price: float, moment: datetime) -> List[Dict[str, Any]]:
+        """
+        Fold one tick into the open candle of every interval.
+
+        Returns:
+            The updated candles (one per interval)
+        """
+        underlying = underlying.upper()
+        price = float(price)
+        updated = []
+
+        with self._lock:
+            for interval in self.intervals:
+                start = candle_start(moment, interval)
+                key = (underlying, interval)
+                candle = self._open.get(key)
+
+                if candle is None or candle['start'] != start:
+                    # Continue a candle another container already started
+                    candle = self._load(underlying, interval, start) or {
+                        'underlying': underlying, 'interval': interval, 'start': start,
+                        'open': price, 'high': price, 'low': price, 'close': price, 'ticks': 0,
+                    }
+                    self._open[key] = candle
+
+                candle['high'] = max(candle['high'], price)
+                candle['low'] = min(candle['low'], price)
+                candle['close'] = price
+                candle['ticks'] += 1
+                updated.append(dict(candle))
+
+        return updated
+
+    def flush(self, candles: Iterable[Dict[str, Any]]) -> int:
+        """Write candles through to the table; returns the number written."""
+        if not self.table:
+            return 0
+
+        count = 0
+        with self.table.batch_writer(overwrite_by_pkeys=['user_id', 'sort_key']) as batch:
+            for candle in candles:
+                batch.put_item(Item=_to_item(candle))
+                count += 1
+        return count
+
+    def get_candles(self, underlying: str, interval: int, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Candles of an interval starting in [start, end), oldest first.
+
+        Reads the table when there is one, otherwise the in-memory open candles.
+        """
+        start_key, end_key = candle_sort_key(start.astimezone(IST)), candle_sort_key(end.astimezone(IST))
+        if not self.table:
+            candle = self._open.get((underlying.upper(), interval))
+            return [dict(candle)] if candle and start_key <= candle_sort_key(candle['start']) < end_key else []
+
+        items: List[Dict[str, Any]] = []
+        query = {
+            'KeyConditionExpression': 'user_id = :partition AND sort_key BETWEEN :start AND :end',
+            'ExpressionAttributeValues': {
+                ':partition': candle_partition(underlying, interval),
+                ':start': start_key,
+                ':end': end_key,
+            },
+        }
+        while True:
+            response = self.table.query(**query)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return [_from_item(item) for item in items if item['sort_key'] < end_key]
+
+    def last_close(self, underlying: str, as_of: datetime) -> Optional[float]:
+        """
+        Close of the latest candle of as_of's session, from the shortest interval.
+
+        Returns:
+            The last traded price folded into the candles, or None before the first tick
+        """
+        interval = min(self.intervals)
+        as_of = as_of.astimezone(IST)
+        if not self.table:
+            candle = self._open.get((underlying.upper(), interval))
+            return candle['close'] if candle and candle['start'].date() == as_of.date() else None
+
+        response = self.table.query(
+            KeyConditionExpression='user_id = :partition AND sort_key BETWEEN :start AND :end',
+            ExpressionAttributeValues={
+                ':partition': candle_partition(underlying, interval),
+                ':start': as_of.strftime('%Y-%m-%dT00:00'),
+                ':end': candle_sort_key(as_of),
+            },
+            ScanIndexForward=False,
+            Limit=1
+        )
+        items = response.get('Items', [])
+        return float(items[0]['close']) if items else None
+
+    def _load(self, underlying: str, interval: int, start: datetime) -> Optional[Dict[str, Any]]:
+        if not self.table:
+            return None
+        try:
+            item = self.table.get_item(
+                Key={'user_id': candle_partition(underlying, interval), 'sort_key': candle_sort_key(start)}
+            ).get('Item')
+        except Exception as e:
+            logger.warning(f"Could not load {interval}m candle of {underlying} at {start:%H:%M}: {e}")
+            return None
+        return _from_item(item) if item else None
+
+
+def range_of(candles: Iterable[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    """(high, low) over candles, or None when there are none."""
+    candles = list(candles)
+    if not candles:
+        return None
+    return max(c['high'] for c in candles), min(c['low'] for c in candles)
+
+
+def _to_item(candle: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'user_id': candle_partition(candle['underlying'], candle['interval']),
+        'sort_key': candle_sort_key(candle['start']),
+        'entity_type': 'CANDLE',
+        'underlying': candle['underlying'],
+        'interval': candle['interval'],
+        'open': Decimal(str(candle['open'])),
+        'high': Decimal(str(candle['high'])),
+        'low': Decimal(str(candle['low'])),
+        'close': Decimal(str(candle['close'])),
+        'ticks': candle['ticks'],
+        'ttl': int(candle['start'].timestamp()) + CANDLE_TTL_SECONDS,
+    }
+
+
+def _from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'underlying': item['underlying'],
+        'interval': int(item['interval']),
+        'start': datetime.strptime(item['sort_key'], '%Y-%m-%dT%H:%M').replace(tzinfo=IST),
+        'open': float(item['open']),
+        'high': float(item['high']),
+        'low': float(item['low']),
+        'close': float(item['close']),
+        'ticks': int(item.get('ticks', 0)),
+    }
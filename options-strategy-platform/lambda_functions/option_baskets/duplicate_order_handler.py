@@ -2,7 +2,11 @@
 🚀 DUPLICATE ORDER HANDLER
 
 Handles Duplicate Order Check sub-events from Active User Event Handler.
-Validates recent orders to prevent duplicate order placement.
+Audits the session's orders for duplicates once after the close.
+
+Duplicate placement itself is prevented up front: TradingExecutionBridge
+reserves an idempotency key per scheduled leg before calling the broker, so
+this scan is a reconciliation backstop rather than the primary guard.
 
 Responsibilities:
 - Query recent orders within lookback window
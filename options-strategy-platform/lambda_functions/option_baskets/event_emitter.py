@@ -14,12 +14,16 @@ sys.path.append('/var/task/option_baskets')  # Add option_baskets directory to p
 
 # Import shared logger directly
 from shared_utils.logger import setup_logger, log_lambda_event, log_user_action, log_api_response
+from shared_utils.trading_calendar import is_trading_day as is_exchange_trading_day
 logger = setup_logger(__name__)
 
 # Initialize AWS clients
 eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+# Pre-market warm-up runs once, ten minutes before the 09:15 open
+PREMARKET_WARMUP_TIME = os.environ.get('PREMARKET_WARMUP_TIME', '09:05')
+
 def query_active_users_for_execution_time(user_profiles_table, execution_time: str, weekday: str) -> List[str]:
     """
     Query active users from user_profiles table using efficient ActiveUsersIndex GSI
@@ -59,11 +63,14 @@ def create_active_user_event(user_id: str, current_ist: datetime,
     - strategy_exit: Schedule and execute strategy exits
     - stop_loss_check: Real-time stop loss monitoring
     - target_profit_check: Target profit monitoring
+    - strategy_mtm_check: Strategy / basket MTM limits across all legs
     - trailing_sl_check: Trailing stop loss adjustments
-    - duplicate_order_check: Order deduplication validation
+    - duplicate_order_check: End-of-session duplicate order audit
     - re_entry_check: Re-entry condition monitoring
-    - re_execute_check: Re-execution condition monitoring
     - position_sync: Sync positions across brokers
+    - portfolio_var_check: Monte Carlo VaR of the open option book
+    - portfolio_greeks_stream: Changed portfolio Greeks pushed to WebSocket dashboards
+    - order_status_poll: Coalesced order book poll for accounts without postbacks
 
     The downstream handler processes all sub-events for the user in a single invocation.
     """
@@ -114,6 +121,16 @@ def create_active_user_event(user_id: str, current_ist: datetime,
             'monitoring_scope': 'ALL_ACTIVE_POSITIONS'
         })
 
+    # 4b. STRATEGY MTM CHECK - Every minute; one pass over all open strategies
+    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
+        sub_events.append({
+            'event_type': 'strategy_mtm_check',
+            'enabled': True,
+            'check_frequency': 'EVERY_MINUTE',
+            'priority': 'CRITICAL' if market_phase == 'PRE_CLOSE' else 'HIGH',
+            'monitoring_scope': 'ALL_OPEN_STRATEGIES'
+        })
+
     # 5. TRAILING STOP LOSS CHECK - Every minute during active trading
     if market_phase in ['ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
         sub_events.append({
@@ -124,12 +141,13 @@ def create_active_user_event(user_id: str, current_ist: datetime,
             'adjustment_enabled': True
         })
 
-    # 6. DUPLICATE ORDER CHECK - Every minute during active periods
-    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
+    # 6. DUPLICATE ORDER CHECK - Once after the close as a reconciliation audit.
+    # Duplicates are prevented at placement by the bridge's idempotency keys.
+    if current_time_str == '15:35':
         sub_events.append({
             'event_type': 'duplicate_order_check',
             'enabled': True,
-            'lookback_minutes': 5,
+            'lookback_minutes': 380,  # Whole session from 09:15
             'priority': 'NORMAL',
             'dedup_strategy': 'TIME_AND_SYMBOL_BASED'
         })
@@ -144,16 +162,8 @@ def create_active_user_event(user_id: str, current_ist: datetime,
             'conditions': ['STOP_LOSS_HIT', 'POSITION_CLOSED']
         })
 
-    # 8. RE-EXECUTE CHECK - Every minute for failed executions
-    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
-        sub_events.append({
-            'event_type': 're_execute_check',
-            'enabled': True,
-            'check_frequency': 'EVERY_MINUTE',
-            'priority': 'HIGH',
-            'max_retries': 3,
-            'conditions': ['EXECUTION_FAILED', 'ORDER_REJECTED']
-        })
+    # 8. RE-EXECUTE - No per-user polling: failed legs are scheduled onto the retry
+    # queue by the executor, and the global Retry.Index.Sweep releases long delays
 
     # 9. POSITION SYNC - Every 10 minutes to sync broker positions
     if current_minute % 10 == 0:
@@ -165,6 +175,38 @@ def create_active_user_event(user_id: str, current_ist: datetime,
             'sync_scope': 'ALL_BROKERS'
         })
 
+    # 10. PORTFOLIO VAR CHECK - Every 5 minutes during active trading
+    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE'] and current_minute % 5 == 0:
+        sub_events.append({
+            'event_type': 'portfolio_var_check',
+            'enabled': True,
+            'check_frequency': 'EVERY_5_MINUTES',
+            'priority': 'NORMAL',
+            'var_paths': 10000,
+            'horizon_days': 1
+        })
+
+    # 11. PORTFOLIO GREEKS STREAM - Every minute during market hours; only Greeks
+    # that moved beyond their threshold reach the WebSocket clients
+    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
+        sub_events.append({
+            'event_type': 'portfolio_greeks_stream',
+            'enabled': True,
+            'check_frequency': 'EVERY_MINUTE',
+            'priority': 'LOW'
+        })
+
+    # 12. ORDER STATUS POLL - Every minute during market hours; one order book
+    # fetch per broker account, skipped for accounts receiving postbacks
+    if market_phase in ['MARKET_OPEN', 'EARLY_TRADING', 'ACTIVE_TRADING', 'AFTERNOON_TRADING', 'PRE_CLOSE']:
+        sub_events.append({
+            'event_type': 'order_status_poll',
+            'enabled': True,
+            'check_frequency': 'EVERY_MINUTE',
+            'priority': 'HIGH',
+            'monitoring_scope': 'PENDING_ORDERS'
+        })
+
     return {
         'source': 'options.trading.active_user',
         'detail_type': 'Active User Event',
@@ -191,7 +233,7 @@ def emit_active_user_events(user_profiles_table, current_ist: datetime, market_p
     - strategy_entry, strategy_exit
     - stop_loss_check, target_profit_check, trailing_sl_check
     - duplicate_order_check
-    - re_entry_check, re_execute_check
+    - re_entry_check
     - position_sync
 
     Sub-events are dynamically included based on:
@@ -305,13 +347,15 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
        - stop_loss_check (every minute)
        - target_profit_check (every minute)
        - trailing_sl_check (every minute)
-       - duplicate_order_check (every minute)
+       - duplicate_order_check (once at 15:35)
        - re_entry_check (every 5 min)
-       - re_execute_check (every 5 min)
        - position_sync (every 10 min)
+       - order_status_poll (every minute)
 
     2. GLOBAL EVENTS - System-wide events:
        - refresh_market_data (every minute)
+       - retry_index_sweep (every 10 min)
+       - premarket_warmup (once at 09:05, PRE_MARKET phase)
     """
 
     # Log the incoming Lambda event (sanitized)
@@ -365,6 +409,14 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         # Market Data Refresh - every minute throughout operational hours
         global_events_to_emit.append(create_market_data_event(current_ist, market_phase))
 
+        # Retry Index Sweep - every 10 minutes, releases long-delay retries onto the retry queue
+        if current_minute % 10 == 0:
+            global_events_to_emit.append(create_retry_index_sweep_event(current_ist, market_phase))
+
+        # Pre-market Warm-up - once before the open: sessions, strategies and allocations for 09:15-09:30
+        if market_phase == 'PRE_MARKET' and current_time_str == PREMARKET_WARMUP_TIME:
+            global_events_to_emit.append(create_premarket_warmup_event(current_ist, market_phase))
+
         # Emit global events to EventBridge
         global_emission_results = []
         for event_detail in global_events_to_emit:
@@ -429,7 +481,9 @@ def get_market_phase(current_ist: datetime) -> str:
     current_time = current_ist.time()
     
     # Market phases based on IST times
-    if current_time >= time(9, 15) and current_time < time(9, 30):
+    if current_time >= time(9, 0) and current_time < time(9, 15):
+        return 'PRE_MARKET'  # Pre-open session - warm-up before the open
+    elif current_time >= time(9, 15) and current_time < time(9, 30):
         return 'MARKET_OPEN'  # Opening phase - high activity
     elif current_time >= time(9, 30) and current_time < time(10, 30):
         return 'EARLY_TRADING'  # Early trading - strategy entries
@@ -530,6 +584,36 @@ def create_market_data_event(current_ist: datetime, market_phase: str) -> Dict[s
     }
 
 
+def create_retry_index_sweep_event(current_ist: datetime, market_phase: str) -> Dict[str, Any]:
+    """Create retry index sweep event (retries due within the next 15 minutes move to the retry queue)"""
+
+    return {
+        'source': 'qlalgo.options.trading',
+        'detail_type': 'Retry.Index.Sweep',
+        'detail': {
+            'event_id': str(uuid.uuid4()),
+            'trigger_time_ist': current_ist.isoformat(),
+            'market_phase': market_phase
+        }
+    }
+
+
+def create_premarket_warmup_event(current_ist: datetime, market_phase: str) -> Dict[str, Any]:
+    """Create pre-market warm-up event (validate broker sessions, prefetch opening-window strategies)"""
+
+    return {
+        'source': 'qlalgo.options.trading',
+        'detail_type': 'Warmup.PreMarket.Triggered',
+        'detail': {
+            'event_id': str(uuid.uuid4()),
+            'trigger_time_ist': current_ist.isoformat(),
+            'market_phase': market_phase,
+            'market_open_time': '09:15',
+            'warm_window_minutes': 15
+        }
+    }
+
+
 def emit_event_to_eventbridge(event_detail: Dict[str, Any]) -> Dict[str, Any]:
     """Emit event to EventBridge for processing by event handlers"""
     
@@ -578,6 +662,7 @@ def get_expected_volume(market_phase: str) -> str:
     """Get expected strategy execution volume based on market phase"""
     
     volume_map = {
+        'PRE_MARKET': 'NONE',        # 9:00-9:15 - Warm-up only
         'MARKET_OPEN': 'VERY_HIGH',  # 9:15-9:30 - Most strategies execute
         'EARLY_TRADING': 'HIGH',     # 9:30-10:30 - Entry strategies
         'ACTIVE_TRADING': 'MEDIUM',   # 10:30-13:00 - Normal operations
@@ -594,6 +679,7 @@ def get_volatility_context(market_phase: str) -> str:
     """Get market volatility context for risk management"""
     
     volatility_map = {
+        'PRE_MARKET': 'NO_TRADING',          # Pre-open session
         'MARKET_OPEN': 'HIGH_VOLATILITY',    # Opening price discovery
         'EARLY_TRADING': 'MEDIUM_VOLATILITY', # Settling after open
         'ACTIVE_TRADING': 'NORMAL_VOLATILITY', # Stable mid-day
@@ -609,20 +695,9 @@ def get_volatility_context(market_phase: str) -> str:
 def is_trading_day(current_ist: datetime) -> bool:
     """
     Check if current day is a trading day
-    Basic weekday check - can be enhanced with NSE holiday calendar
+    Weekdays outside the exchange holiday calendar (see shared_utils/trading_calendar.py)
     """
-    
-    weekday = current_ist.weekday()  # 0=Monday, 6=Sunday
-    
-    # Basic check - weekdays only (Monday to Friday)
-    if weekday >= 5:  # Saturday (5) or Sunday (6)
-        return False
-    
-    # TODO: Add NSE holiday calendar integration
-    # This would check against official NSE holiday list
-    # For now, assume all weekdays are trading days
-    
-    return True
+    return is_exchange_trading_day(current_ist.date())
 
 
 def is_within_operational_hours(current_ist: datetime) -> bool:
@@ -0,0 +1,118 @@
+"""
+Execution Bundle
+Prefetched, version-stamped execution data for scheduled strategy runs
+
+Storage (trading configurations table, user partition):
+- EXECUTION_BUNDLE#{strategy_id}#{HH:MM}#{type}: the strategy (with legs) and its
+  active basket allocations, resolved for one scheduled execution
+- EXECUTION_BUNDLE_VERSION: the user's bundle version; bumped whenever a strategy
+  or basket allocation changes
+
+The strategy scheduler hydrates a bundle when it launches the Express Step
+Function, minutes ahead of the execution. At execution the single strategy
+executor reads the bundle and the version item in one BatchGetItem and uses the
+bundle only when it was stamped with the current version; otherwise it resolves
+everything just in time as before.
+
+The version is read before the bundle is resolved, so a change landing while a
+bundle is being hydrated always leaves that bundle stale.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+BUNDLE_PREFIX = 'EXECUTION_BUNDLE#'
+BUNDLE_VERSION_SORT_KEY = 'EXECUTION_BUNDLE_VERSION'
+
+# Bundles outlive the (at most 5 minute) Express wait only for inspection
+BUNDLE_TTL_SECONDS = 60 * 60
+
+
+def bundle_sort_key(strategy_id: str, execution_time: str, execution_type: str) -> str:
+    return f'{BUNDLE_PREFIX}{strategy_id}#{execution_time}#{execution_type}'
+
+
+def current_bundle_version(table, user_id: str) -> int:
+    item = table.get_item(
+        Key={'user_id': user_id, 'sort_key': BUNDLE_VERSION_SORT_KEY},
+        ConsistentRead=True
+    ).get('Item')
+    return int((item or {}).get('version', 0))
+
+
+def put_execution_bundle(table, user_id: str, strategy: Dict, allocations: List[Dict],
+                         execution_time: str, execution_type: str, version: int) -> Dict[str, Any]:
+    """Store a resolved strategy and its allocations stamped with the version they were read at."""
+    now = datetime.now(timezone.utc)
+    item = {
+        'user_id': user_id,
+        'sort_key': bundle_sort_key(strategy['strategy_id'], execution_time, execution_type),
+        'entity_type': 'EXECUTION_BUNDLE',
+        'strategy_id': strategy['strategy_id'],
+        'basket_id': strategy.get('basket_id'),
+        'execution_time': execution_time,
+        'execution_type': execution_type,
+        'strategy': strategy,
+        'allocations': allocations,
+        'version': version,
+        'hydrated_at': now.isoformat(),
+        'ttl': int(now.timestamp()) + BUNDLE_TTL_SECONDS,
+    }
+    table.put_item(Item=item)
+    return item
+
+
+def invalidate_execution_bundles(table, user_id: str) -> None:
+    """Mark every hydrated bundle of a user stale after a strategy or allocation change."""
+    table.update_item(
+        Key={'user_id': user_id, 'sort_key': BUNDLE_VERSION_SORT_KEY},
+        UpdateExpression='ADD version :one SET entity_type = :entity_type, updated_at = :now',
+        ExpressionAttributeValues={
+            ':one': 1,
+            ':entity_type': 'EXECUTION_BUNDLE_VERSION',
+            ':now': datetime.now(timezone.utc).isoformat(),
+        }
+    )
+
+
+def get_execution_bundle(table, user_id: str, strategy_id: str, execution_time: str,
+                         execution_type: str) -> Optional[Dict[str, Any]]:
+    """
+    The hydrated bundle of a scheduled execution, if it is still current.
+
+    Reads the bundle and the version item in one round trip. Returns None when
+    no bundle was hydrated or a strategy/allocation changed since.
+    """
+    sort_key = bundle_sort_key(strategy_id, execution_time, execution_type)
+    response = table.meta.client.batch_get_item(RequestItems={
+        table.name: {
+            'Keys': [
+                {'user_id': user_id, 'sort_key': sort_key},
+                {'user_id': user_id, 'sort_key': BUNDLE_VERSION_SORT_KEY},
+            ],
+            # A read right after an invalidation must see the new version
+            'ConsistentRead': True
+        }
+    })
+    items = {item['sort_key']: item for item in response.get('Responses', {}).get(table.name, [])}
+
+    bundle = items.get(sort_key)
+    if not bundle:
+        return None
+
+    version = int(items.get(BUNDLE_VERSION_SORT_KEY, {}).get('version', 0))
+    if int(bundle.get('version', -1)) != version:
+        logger.info(f"Execution bundle for strategy {strategy_id} at {execution_time} is stale "
+                    f"(version {bundle.get('version')}, current {version})")
+        return None
+    return bundle
@@ -0,0 +1,113 @@
+"""
+🚦 EXECUTION LANE CONSUMER
+
+Consumes one execution lane queue (see execution_lanes.py) and runs each queued
+exit through the single strategy executor in-process.
+
+The same handler is deployed once per lane. Each deployment has its own reserved
+concurrency and BROKER_RATE_BUDGET_SHARE, so stop loss / target / trailing exits
+on the HIGH lane never compete with routine exits or entry fan-out for Lambda
+concurrency or broker order rate.
+
+Responsibilities:
+- Report the queue age of every consumed message per lane (QueueAgeSeconds)
+- Map queued exits (STOP_LOSS_EXIT, TARGET_PROFIT_EXIT, ...) onto executor events
+- Return partial batch failures; on a FIFO queue everything after the first
+  failure is returned too so per-user ordering holds on redelivery
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import NORMAL_LANE, PROTECTIVE_EXIT_TYPES, queue_age_seconds, emit_queue_age_metrics
+from single_strategy_executor import lambda_handler as execute_strategy
+
+logger = setup_logger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+EXECUTION_LANE = os.environ.get('EXECUTION_LANE', NORMAL_LANE)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Execute a batch of queued exits from this function's lane.
+    """
+    log_lambda_event(logger, event, context)
+
+    records = event.get('Records', [])
+    now_ms = int(time.time() * 1000)
+    emit_queue_age_metrics(EXECUTION_LANE, [queue_age_seconds(record, now_ms) for record in records])
+
+    failed_ids: List[str] = []
+    for record in records:
+        if failed_ids:
+            # FIFO: later messages may belong to the same user; redeliver them in order
+            failed_ids.append(record['messageId'])
+            continue
+
+        try:
+            message = json.loads(record['body'])
+            result = execute_strategy(build_executor_event(message), context)
+            if result.get('statusCode', 500) >= 500:
+                raise RuntimeError(result.get('body', {}).get('message', 'executor error'))
+        except Exception as e:
+            logger.error(f"❌ {EXECUTION_LANE} lane execution failed for message {record.get('messageId')}: {str(e)}")
+            failed_ids.append(record['messageId'])
+
+    logger.info(f"🚦 {EXECUTION_LANE} lane processed {len(records) - len(failed_ids)}/{len(records)} executions")
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+
+def build_executor_event(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Executor event (direct format) for a queued exit.
+
+    Protective exits run as EXIT with the original type kept as exit_reason;
+    exits raised for one position are scoped to it (exit_scope POSITION), and
+    execution_time and weekday come from the trigger time.
+    """
+    trigger = _trigger_moment(message.get('trigger_time'))
+    execution_type = message.get('execution_type', 'EXIT')
+
+    executor_event = {
+        'user_id': message.get('user_id'),
+        'strategy_id': message.get('strategy_id'),
+        'execution_type': 'EXIT' if execution_type in PROTECTIVE_EXIT_TYPES else execution_type,
+        'execution_time': message.get('execution_time') or trigger.strftime('%H:%M'),
+        'weekday': message.get('weekday') or trigger.strftime('%a').upper(),
+        'lane': message.get('lane', EXECUTION_LANE),
+        'trigger_source': f"{message.get('source', 'execution_lane')}_{EXECUTION_LANE.lower()}_lane",
+    }
+    if execution_type in PROTECTIVE_EXIT_TYPES:
+        executor_event['exit_reason'] = execution_type
+    for field in ('position_id', 'trigger_reason', 'basket_id', 'exit_scope'):
+        if message.get(field) is not None:
+            executor_event[field] = message[field]
+    # Stop loss / target / trailing exits of one position leave the strategy's other legs open
+    if message.get('position_id') and 'exit_scope' not in executor_event:
+        executor_event['exit_scope'] = 'POSITION'
+    return executor_event
+
+
+def _trigger_moment(trigger_time: Optional[str]) -> datetime:
+    """IST moment of a trigger given as an ISO timestamp or HH:MM (defaults to now)."""
+    now = datetime.now(timezone.utc).astimezone(IST)
+    try:
+        if trigger_time and 'T' in trigger_time:
+            return datetime.fromisoformat(trigger_time).astimezone(IST)
+        if trigger_time:
+            hour, minute = trigger_time.split(':')[:2]
+            return now.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+    except ValueError:
+        logger.warning(f"⚠️ Unparseable trigger_time {trigger_time!r}; using current time")
+    return now
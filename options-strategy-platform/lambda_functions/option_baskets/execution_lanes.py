@@ -0,0 +1,141 @@
+"""
+Execution Lanes
+Priority routing of exit executions onto separate SQS queues
+
+Two lanes, each a FIFO queue consumed by its own execution-lane Lambda with its
+own reserved concurrency and share of the broker order-rate budget:
+
+- HIGH: protective exits (stop loss, target profit, trailing stop loss and
+  strategy-level MTM limits); never
+  waits behind routine work
+- NORMAL: scheduled exits and other routine executions
+
+Messages are stamped with their lane and enqueue time; the consumer reports the
+queue age of every message it takes as a per-lane CloudWatch metric (embedded
+metric format) so the high lane's latency guarantee can be watched under load.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, Iterable, Optional
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+HIGH_PRIORITY_LANE = 'HIGH'
+NORMAL_LANE = 'NORMAL'
+
+# Execution types that protect an open position (or a whole strategy's MTM)
+PROTECTIVE_EXIT_TYPES = {'STOP_LOSS_EXIT', 'TARGET_PROFIT_EXIT', 'TRAILING_SL_EXIT',
+                         'MTM_STOP_LOSS_EXIT', 'MTM_TARGET_EXIT'}
+
+LANE_QUEUE_URL_ENV = {
+    HIGH_PRIORITY_LANE: 'HIGH_PRIORITY_EXIT_QUEUE_URL',
+    NORMAL_LANE: 'NORMAL_EXECUTION_QUEUE_URL',
+}
+
+METRICS_NAMESPACE = os.environ.get('EXECUTION_LANE_METRICS_NAMESPACE', 'OptionsTrading/ExecutionLanes')
+
+
+def lane_for_execution_type(execution_type: Optional[str]) -> str:
+    return HIGH_PRIORITY_LANE if execution_type in PROTECTIVE_EXIT_TYPES else NORMAL_LANE
+
+
+def get_lane_queue_url(lane: str) -> Optional[str]:
+    """Queue of a lane; the shared SINGLE_STRATEGY_QUEUE_URL is the fallback for unsplit deployments."""
+    return os.environ.get(LANE_QUEUE_URL_ENV[lane]) or os.environ.get('SINGLE_STRATEGY_QUEUE_URL')
+
+
+def send_to_lane(sqs_client, message: Dict[str, Any], group_id: str, deduplication_id: str,
+                 encoder=None) -> Dict[str, Any]:
+    """
+    Queue an execution on the lane of its execution_type.
+
+    Raises:
+        ValueError: when no queue is configured for the lane
+    """
+    lane = lane_for_execution_type(message.get('execution_type'))
+    queue_url = get_lane_queue_url(lane)
+    if not queue_url:
+        raise ValueError(f"No queue configured for {lane} execution lane")
+
+    message = dict(message, lane=lane, enqueued_at_ms=int(time.time() * 1000))
+    response = sqs_client.send_message(
+        QueueUrl=queue_url,
+        MessageBody=json.dumps(message, cls=encoder),
+        MessageGroupId=group_id,
+        MessageDeduplicationId=deduplication_id
+    )
+    logger.info(f"Queued {message.get('execution_type')} on {lane} lane for strategy {message.get('strategy_id')}")
+    return response
+
+
+def queue_age_seconds(record: Dict[str, Any], now_ms: Optional[int] = None) -> float:
+    """Seconds an SQS record spent queued, from its SentTimestamp attribute."""
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    sent_ms = int(record.get('attributes', {}).get('SentTimestamp', now_ms))
+    return max(0.0, (now_ms - sent_ms) / 1000.0)
+
+
+def emit_queue_age_metrics(lane: str, ages: Iterable[float]) -> Optional[Dict[str, Any]]:
+    """
+    Log the queue ages of one consumed batch as an embedded-metric-format record.
+
+    CloudWatch extracts QueueAgeSeconds (one value per message) and MessagesDispatched
+    per Lane dimension from the Lambda log stream.
+    """
+    ages = [round(age, 3) for age in ages]
+    if not ages:
+        return None
+
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Lane']],
+                'Metrics': [
+                    {'Name': 'QueueAgeSeconds', 'Unit': 'Seconds'},
+                    {'Name': 'MessagesDispatched', 'Unit': 'Count'},
+                ]
+            }]
+        },
+        'Lane': lane,
+        'QueueAgeSeconds': ages,
+        'MessagesDispatched': len(ages),
+    }
+    # EMF records must be written as raw JSON lines
+    print(json.dumps(record))
+    return record
+
+
+def emit_unresolved_exit_metric(lane: str, exit_reason: Optional[str]) -> Dict[str, Any]:
+    """
+    Log one position exit that could not be tied to a leg as an embedded-metric-format record.
+
+    The exit is acknowledged rather than redelivered, so UnresolvedPositionExits
+    (per Lane) is what alerts an operator to close the position by hand.
+    """
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Lane']],
+                'Metrics': [{'Name': 'UnresolvedPositionExits', 'Unit': 'Count'}]
+            }]
+        },
+        'Lane': lane,
+        'ExitReason': exit_reason,
+        'UnresolvedPositionExits': 1,
+    }
+    print(json.dumps(record))
+    return record
@@ -0,0 +1,169 @@
+"""
+Greeks Publisher
+Change-driven publishing of portfolio Greeks to WebSocket dashboards
+
+Each user's last published Greeks (per scope: USER, STRATEGY#{id},
+BASKET#{id}) are kept in memory per container. A fresh aggregate is compared
+against them and only scopes where a Greek moved beyond its threshold are sent;
+scopes below the threshold keep their published value, so small drifts add up
+until they are worth a message. Publishes per user are spaced by at least
+MIN_PUBLISH_SECONDS - a user with several broker accounts gets one Greeks
+sub-event per account each minute, and only the first of them publishes.
+
+The published snapshot is written to the trading table on every publish, so a
+cold container restores it with one read and a client subscribing to the
+greeks channel starts from the same values the deltas apply to.
+
+Snapshot (trading configurations table):
+- user_id: {user_id}
+- sort_key: GREEKS#SNAPSHOT
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+SNAPSHOT_SORT_KEY = 'GREEKS#SNAPSHOT'
+SNAPSHOT_TTL_SECONDS = 2 * 24 * 60 * 60
+
+USER_SCOPE = 'USER'
+
+# Smallest move worth a message, in book units (delta / gamma in underlying
+# units, theta in INR per day, vega in INR per volatility point)
+GREEK_THRESHOLDS = {'delta': 5.0, 'gamma': 0.05, 'theta': 100.0, 'vega': 50.0}
+# ... or this fraction of the published value, whichever is larger
+RELATIVE_THRESHOLD = 0.05
+
+MIN_PUBLISH_SECONDS = int(os.environ.get('GREEKS_MIN_PUBLISH_SECONDS', '20'))
+
+
+def scope_snapshot(aggregate: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Flatten a GreeksEngine aggregate into {scope_key: greeks}."""
+    scopes = {USER_SCOPE: aggregate['user']}
+    scopes.update({f"STRATEGY#{sid}": greeks for sid, greeks in aggregate.get('strategies', {}).items()})
+    scopes.update({f"BASKET#{bid}": greeks for bid, greeks in aggregate.get('baskets', {}).items()})
+    return scopes
+
+
+def greeks_moved(published: Dict[str, float], current: Dict[str, float],
+                 thresholds: Dict[str, float] = GREEK_THRESHOLDS,
+                 relative: float = RELATIVE_THRESHOLD) -> bool:
+    """Whether any Greek moved beyond max(absolute threshold, relative * published value)."""
+    for greek, threshold in thresholds.items():
+        before = float(published.get(greek, 0))
+        if abs(float(current.get(greek, 0)) - before) >= max(threshold, relative * abs(before)):
+            return True
+    return False
+
+
+def diff_snapshots(published: Dict[str, Dict[str, float]], current: Dict[str, Dict[str, float]],
+                   thresholds: Dict[str, float] = GREEK_THRESHOLDS,
+                   relative: float = RELATIVE_THRESHOLD) -> Dict[str, Any]:
+    """
+    Scopes worth publishing.
+
+    Returns:
+        {'changed': {scope_key: greeks}, 'removed': [scope_key]}; new scopes count as changed,
+        scopes no longer in the book (closed strategies) as removed
+    """
+    changed = {
+        scope: greeks for scope, greeks in current.items()
+        if scope not in published or greeks_moved(published[scope], greeks, thresholds, relative)
+    }
+    removed = sorted(scope for scope in published if scope not in current)
+    return {'changed': changed, 'removed': removed}
+
+
+class GreeksPublisher:
+    """Per-container published Greeks and publish times of each user."""
+
+    def __init__(self, min_publish_seconds: int = MIN_PUBLISH_SECONDS):
+        self.min_publish_seconds = min_publish_seconds
+        self._published: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._published_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def restore(self, table, user_id: str) -> bool:
+        """Load a user's published snapshot once per container; returns whether one was loaded."""
+        with self._lock:
+            if user_id in self._published:
+                return False
+
+        item = table.get_item(Key={'user_id': user_id, 'sort_key': SNAPSHOT_SORT_KEY}).get('Item')
+        with self._lock:
+            if user_id in self._published:
+                return False
+            self._published[user_id] = json.loads(json.dumps(item.get('scopes', {}), default=float)) if item else {}
+            self._published_at[user_id] = float(item.get('published_epoch', 0)) if item else 0.0
+        return bool(item)
+
+    def pending_update(self, user_id: str, current: Dict[str, Dict[str, float]],
+                       now: Optional[float] = None,
+                       thresholds: Dict[str, float] = GREEK_THRESHOLDS,
+                       relative: float = RELATIVE_THRESHOLD) -> Optional[Dict[str, Any]]:
+        """
+        The update to publish for a fresh snapshot, or None when throttled or unchanged.
+
+        The update's 'snapshot' is what clients hold once it is applied; pass the
+        update to mark_published after sending it.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._published_at.get(user_id, 0.0) < self.min_publish_seconds:
+                return None
+            published = dict(self._published.get(user_id, {}))
+
+        update = diff_snapshots(published, current, thresholds, relative)
+        if not update['changed'] and not update['removed']:
+            return None
+
+        for scope in update['removed']:
+            published.pop(scope)
+        published.update(update['changed'])
+        update['snapshot'] = published
+        return update
+
+    def mark_published(self, table, user_id: str, update: Dict[str, Any], now: Optional[float] = None) -> None:
+        """Adopt a sent update as the user's published snapshot and persist it."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._published[user_id] = update['snapshot']
+            self._published_at[user_id] = now
+
+        table.put_item(Item=json.loads(json.dumps({
+            'user_id': user_id,
+            'sort_key': SNAPSHOT_SORT_KEY,
+            'scopes': update['snapshot'],
+            'published_epoch': int(now),
+            'published_at': datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            'ttl': int(now) + SNAPSHOT_TTL_SECONDS
+        }), parse_float=Decimal))
+
+    def published(self, user_id: str) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return dict(self._published.get(user_id, {}))
+
+
+_publisher: Optional[GreeksPublisher] = None
+
+
+def get_greeks_publisher() -> GreeksPublisher:
+    """Container-wide publisher, kept across warm invocations."""
+    global _publisher
+    if _publisher is None:
+        _publisher = GreeksPublisher()
+    return _publisher
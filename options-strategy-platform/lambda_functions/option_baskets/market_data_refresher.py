@@ -3,7 +3,7 @@ import boto3
 import os
 import sys
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 # Add paths for imports
 sys.path.append('/opt/python')
@@ -12,8 +12,24 @@ sys.path.append('/var/task/option_baskets')  # Add option_baskets directory to p
 
 # Import shared logger directly
 from shared_utils.logger import setup_logger, log_lambda_event, log_user_action, log_api_response
+from candle_store import CandleStore, IST
+from breakout_evaluator import BreakoutEvaluator
+from strategy_entry_handler import emit_strategy_execution_event
 logger = setup_logger(__name__)
 
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+# Open candles persist across warm invocations (write-through to the trading table)
+_candle_store = None
+
+
+def get_candle_store() -> CandleStore:
+    """Container-wide candle store over the trading table."""
+    global _candle_store
+    if _candle_store is None:
+        _candle_store = CandleStore(dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE']))
+    return _candle_store
+
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     Market Data Refresher Handler
@@ -62,20 +78,81 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
 
 def refresh_market_data(event_detail: Dict[str, Any]) -> Dict[str, Any]:
-    """Refresh market data based on event details"""
+    """
+    Refresh market data based on event details.
+
+    Ticks of the traded underlyings come in the event, either as ticks
+    ([{underlying, last_price, timestamp}]) or as quotes ({underlying: last_price},
+    stamped with trigger_time_ist). They are folded into the intraday candles and
+    evaluated against the pending breakout entries of their instrument.
+    """
     
     market_phase = event_detail.get('market_phase')
     data_sources = event_detail.get('data_sources', ['NSE'])
     indices = event_detail.get('indices', ['NIFTY', 'BANKNIFTY'])
+
+    ticks_by_underlying = collect_ticks(event_detail)
+    candles_written = 0
+    breakout_entries = []
+
+    if ticks_by_underlying:
+        store = get_candle_store()
+        evaluator = BreakoutEvaluator(store.table, store, trigger_breakout_entry)
+
+        for underlying, ticks in ticks_by_underlying.items():
+            # Final state of every candle the ticks touched
+            touched = {}
+            for moment, price in ticks:
+                for candle in store.on_tick(underlying, price, moment):
+                    touched[(candle['interval'], candle['start'])] = candle
+            candles_written += store.flush(touched.values())
+            breakout_entries.extend(evaluator.evaluate(underlying, ticks))
     
     refresh_result = {
         'market_phase': market_phase,
         'data_sources_checked': data_sources,
         'indices_updated': indices,
+        'ticks_processed': sum(len(ticks) for ticks in ticks_by_underlying.values()),
+        'candles_written': candles_written,
+        'breakout_entries': len(breakout_entries),
         'refresh_timestamp': datetime.now(timezone.utc).isoformat(),
         'status': 'SUCCESS'
     }
     
     logger.info("Market data refresh completed", extra=refresh_result)
     
-    return refresh_result
\ No newline at end of file
+    return refresh_result
+
+
+def collect_ticks(event_detail: Dict[str, Any]) -> Dict[str, List[Tuple[datetime, float]]]:
+    """Ticks of the event per underlying, oldest first."""
+    default_time = event_detail.get('trigger_time_ist')
+    default_moment = datetime.fromisoformat(default_time) if default_time else datetime.now(IST)
+
+    ticks: Dict[str, List[Tuple[datetime, float]]] = {}
+    for tick in event_detail.get('ticks', []):
+        moment = datetime.fromisoformat(tick['timestamp']) if tick.get('timestamp') else default_moment
+        ticks.setdefault(tick['underlying'].upper(), []).append((moment, float(tick['last_price'])))
+    for underlying, price in event_detail.get('quotes', {}).items():
+        ticks.setdefault(underlying.upper(), []).append((default_moment, float(price)))
+
+    for underlying_ticks in ticks.values():
+        underlying_ticks.sort(key=lambda tick: tick[0])
+    return ticks
+
+
+def trigger_breakout_entry(condition: Dict[str, Any], breakout: Dict[str, Any]) -> Dict[str, Any]:
+    """Fire the strategy entry of a claimed breakout condition."""
+    result = emit_strategy_execution_event(
+        user_id=condition['owner_user_id'],
+        strategy={
+            'strategy_id': condition['strategy_id'],
+            'basket_id': condition.get('basket_id'),
+            'execution_time': condition.get('execution_time'),
+        },
+        execution_type='ENTRY',
+        weekday=condition.get('weekday'),
+        broker_context=condition.get('broker_context', {}),
+        allocation=condition.get('allocation')
+    )
+    return dict(result, breakout=breakout)
@@ -0,0 +1,486 @@
+"""
+Marketplace Listing Index
+Precomputed, pre-sorted marketplace template listings for fast browsing
+
+Storage (trading configurations table):
+- MARKETPLACE_LISTING / TEMPLATE#{template_id}: compact listing entry per template
+- MARKETPLACE_VIEW / VIEW#{category}#{difficulty}#{bucket}: sorted listing per filter combination
+- MARKETPLACE_VIEW / INDEX_META: marker written once the index has been fully built
+
+Views are maintained incrementally whenever a template is published, updated or its
+subscriber count changes, and are cached in the warm container with an ETag so the
+browse endpoint can answer conditional GETs without touching DynamoDB.
+
+rebuild_marketplace_index() scans the table and runs only as the scheduled
+maintenance job (action=rebuild_marketplace_index), never inside a browse request.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+LISTING_PARTITION = 'MARKETPLACE_LISTING'
+VIEW_PARTITION = 'MARKETPLACE_VIEW'
+ALL = 'ALL'
+
+# total_return thresholds for performance bucket views
+PERFORMANCE_BUCKETS = (0, 5, 10, 20, 50)
+
+# Templates kept per view (browse returns at most 50)
+MAX_VIEW_SIZE = int(os.environ.get('MARKETPLACE_MAX_VIEW_SIZE', '100'))
+BROWSE_CACHE_TTL_SECONDS = int(os.environ.get('MARKETPLACE_BROWSE_CACHE_TTL_SECONDS', '30'))
+
+# Warm-container caches: key -> (expires_at, value)
+_VIEW_CACHE: Dict[str, Tuple[float, Dict]] = {}
+_TEMPLATE_DETAIL_CACHE: Dict[str, Tuple[float, Dict]] = {}
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+
+def compute_etag(payload: Any) -> str:
+    """Strong ETag for a JSON-serialisable payload"""
+    digest = hashlib.sha1(json.dumps(payload, cls=DecimalEncoder, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def performance_bucket_for(min_performance: Optional[Any]) -> str:
+    """Map a min_performance filter to the tightest precomputed bucket that still covers it"""
+
+    if min_performance in (None, ''):
+        return ALL
+
+    min_perf = float(min_performance)
+    eligible = [threshold for threshold in PERFORMANCE_BUCKETS if threshold <= min_perf]
+    return f'PERF_{eligible[-1]}' if eligible else ALL
+
+
+def view_key(category: str, difficulty: str, bucket: str) -> str:
+    return f'VIEW#{category}#{difficulty}#{bucket}'
+
+
+def build_listing_entry(basket: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the compact listing entry for a marketplace-enabled basket"""
+
+    marketplace_config = basket.get('marketplace_config', {})
+    performance_metrics = basket.get('performance_metrics', {})
+
+    summary = {
+        'template_id': basket.get('basket_id'),
+        'name': basket.get('name'),
+        'description': basket.get('description'),
+        'category': basket.get('category'),
+        'difficulty_level': marketplace_config.get('difficulty_level'),
+        'pricing': marketplace_config.get('pricing'),
+        'subscriber_count': basket.get('subscriber_count', 0),
+        'tags': marketplace_config.get('tags', []),
+        'performance_metrics': performance_metrics,
+        'created_at': basket.get('published_at')
+    }
+
+    return {
+        'user_id': LISTING_PARTITION,
+        'sort_key': f"TEMPLATE#{basket.get('basket_id')}",
+        'entity_type': 'MARKETPLACE_LISTING',
+        'template_id': basket.get('basket_id'),
+        'template_owner_id': basket.get('user_id'),
+        'visibility': marketplace_config.get('visibility', 'PRIVATE'),
+        'index_category': basket.get('category', 'GENERAL').upper(),
+        'index_difficulty': (marketplace_config.get('difficulty_level') or 'INTERMEDIATE').upper(),
+        'total_return': Decimal(str(performance_metrics.get('total_return', 0))),
+        'summary': summary,
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def view_keys_for_entry(entry: Dict[str, Any]) -> List[str]:
+    """All view keys a listing entry belongs to (regardless of visibility)"""
+
+    buckets = [ALL] + [
+        f'PERF_{threshold}' for threshold in PERFORMANCE_BUCKETS
+        if float(entry['total_return']) >= threshold
+    ]
+
+    return [
+        view_key(category, difficulty, bucket)
+        for category in (entry['index_category'], ALL)
+        for difficulty in (entry['index_difficulty'], ALL)
+        for bucket in buckets
+    ]
+
+
+def _listing_sort_key(summary: Dict[str, Any]):
+    # Most subscribed first, template_id keeps the order deterministic
+    return (-float(summary.get('subscriber_count') or 0), summary.get('template_id') or '')
+
+
+def _empty_view(key: str) -> Dict[str, Any]:
+    return {
+        'user_id': VIEW_PARTITION,
+        'sort_key': key,
+        'templates': [],
+        'truncated': False,
+        'stale': False,
+        'version': 0
+    }
+
+
+def _finalise_view(view: Dict[str, Any]) -> Dict[str, Any]:
+    view['etag'] = compute_etag(view['templates'])
+    view['updated_at'] = datetime.now(timezone.utc).isoformat()
+    return view
+
+
+def _merge_entry_into_view(view: Dict[str, Any], template_id: str,
+                           summary: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Merge one template's summary into a view (summary=None removes it)
+
+    Returns the updated view, or None if the view is unchanged.
+    """
+
+    previous = view.get('templates', [])
+    templates = [t for t in previous if t.get('template_id') != template_id]
+    was_listed = len(templates) != len(previous)
+
+    if summary is not None:
+        templates.append(summary)
+        templates.sort(key=_listing_sort_key)
+
+    truncated = bool(view.get('truncated')) or len(templates) > MAX_VIEW_SIZE
+    stale = bool(view.get('stale'))
+
+    # A truncated view cannot backfill the slot a template leaves behind
+    if was_listed and truncated:
+        ranked_last = summary is not None and templates[-1].get('template_id') == template_id
+        if summary is None or (ranked_last and len(templates) >= MAX_VIEW_SIZE):
+            stale = True
+
+    templates = templates[:MAX_VIEW_SIZE]
+
+    if templates == previous and truncated == bool(view.get('truncated')) and stale == bool(view.get('stale')):
+        return None
+
+    updated = dict(view)
+    updated.update({'templates': templates, 'truncated': truncated, 'stale': stale})
+    return _finalise_view(updated)
+
+
+def _batch_get_views(table, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch several view items in one round trip"""
+
+    # The resource's client applies the same attribute (de)serialisation as Table
+    client = table.meta.client
+    views = {}
+    request = {
+        table.name: {
+            'Keys': [{'user_id': VIEW_PARTITION, 'sort_key': key} for key in keys]
+        }
+    }
+
+    while request:
+        response = client.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(table.name, []):
+            views[item['sort_key']] = item
+        request = response.get('UnprocessedKeys') or None
+
+    return views
+
+
+def _put_view(table, view: Dict[str, Any], expected_version: int) -> bool:
+    """Write a view with optimistic locking; marks it stale on a lost race"""
+
+    view['version'] = int(expected_version) + 1
+
+    try:
+        table.put_item(
+            Item=view,
+            ConditionExpression='attribute_not_exists(sort_key) OR version = :version',
+            ExpressionAttributeValues={':version': int(expected_version)}
+        )
+        _VIEW_CACHE.pop(view['sort_key'], None)
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+        # A concurrent writer got there first; the next read rebuilds the view
+        table.update_item(
+            Key={'user_id': VIEW_PARTITION, 'sort_key': view['sort_key']},
+            UpdateExpression='SET stale = :stale',
+            ExpressionAttributeValues={':stale': True}
+        )
+        _VIEW_CACHE.pop(view['sort_key'], None)
+        return False
+
+
+def upsert_template_listing(basket: Dict[str, Any], table) -> int:
+    """
+    Refresh a template's listing entry and every precomputed view it affects
+
+    Call after publish, marketplace config updates and subscriber count changes
+    with the full, post-update basket item.
+
+    Returns:
+        Number of views rewritten
+    """
+
+    template_id = basket.get('basket_id')
+    if not template_id or 'marketplace_config' not in basket:
+        return 0
+
+    entry = build_listing_entry(basket)
+
+    previous = table.get_item(
+        Key={'user_id': LISTING_PARTITION, 'sort_key': entry['sort_key']}
+    ).get('Item')
+
+    table.put_item(Item=entry)
+
+    is_public = entry['visibility'] == 'PUBLIC'
+    target_keys = set(view_keys_for_entry(entry)) if is_public else set()
+    affected_keys = set(target_keys)
+    if previous:
+        affected_keys.update(view_keys_for_entry(previous))
+    if not affected_keys:
+        return 0
+
+    existing_views = _batch_get_views(table, sorted(affected_keys))
+    rewritten = 0
+
+    for key in sorted(affected_keys):
+        view = existing_views.get(key)
+        expected_version = view.get('version') if view else 0
+        merged = _merge_entry_into_view(
+            view or _empty_view(key),
+            template_id,
+            entry['summary'] if key in target_keys else None
+        )
+        if merged is not None and _put_view(table, merged, expected_version):
+            rewritten += 1
+
+    _TEMPLATE_DETAIL_CACHE.pop(template_id, None)
+
+    logger.info("Marketplace listing refreshed", extra={
+        "template_id": template_id,
+        "visibility": entry['visibility'],
+        "views_rewritten": rewritten
+    })
+
+    return rewritten
+
+
+def get_template_listing(template_id: str, table) -> Optional[Dict[str, Any]]:
+    """Fetch a template's listing entry (owner lookup without scanning)"""
+
+    return table.get_item(
+        Key={'user_id': LISTING_PARTITION, 'sort_key': f'TEMPLATE#{template_id}'}
+    ).get('Item')
+
+
+def _query_listing_entries(table, min_total_return: Optional[float] = None) -> List[Dict[str, Any]]:
+    entries = []
+    query_kwargs = {
+        'KeyConditionExpression': 'user_id = :pk AND begins_with(sort_key, :prefix)',
+        'ExpressionAttributeValues': {':pk': LISTING_PARTITION, ':prefix': 'TEMPLATE#'}
+    }
+    if min_total_return is not None:
+        query_kwargs['FilterExpression'] = 'total_return >= :min_total_return'
+        query_kwargs['ExpressionAttributeValues'][':min_total_return'] = Decimal(str(min_total_return))
+
+    while True:
+        response = table.query(**query_kwargs)
+        entries.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return entries
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _build_views(entries: List[Dict[str, Any]], only_key: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Compute sorted views from listing entries in a single pass"""
+
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        if entry.get('visibility') != 'PUBLIC':
+            continue
+        for key in view_keys_for_entry(entry):
+            if only_key is None or key == only_key:
+                grouped.setdefault(key, []).append(entry['summary'])
+
+    views = {}
+    for key, summaries in grouped.items():
+        summaries.sort(key=_listing_sort_key)
+        view = _empty_view(key)
+        view['templates'] = summaries[:MAX_VIEW_SIZE]
+        view['truncated'] = len(summaries) > MAX_VIEW_SIZE
+        views[key] = _finalise_view(view)
+
+    if only_key is not None and only_key not in views:
+        views[only_key] = _finalise_view(_empty_view(only_key))
+
+    return views
+
+
+def rebuild_marketplace_index(table) -> Dict[str, Any]:
+    """
+    Backfill listing entries from marketplace baskets and rebuild every view
+
+    Needed once for templates published before the index existed; safe to re-run.
+    """
+
+    started = time.monotonic()
+    entries = []
+    scan_kwargs = {'FilterExpression': 'attribute_exists(marketplace_config) AND begins_with(sort_key, :prefix)',
+                   'ExpressionAttributeValues': {':prefix': 'BASKET#'}}
+
+    with table.batch_writer() as batch:
+        while True:
+            response = table.scan(**scan_kwargs)
+            for basket in response.get('Items', []):
+                entry = build_listing_entry(basket)
+                entries.append(entry)
+                batch.put_item(Item=entry)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    views = _build_views(entries)
+
+    existing_keys = set()
+    query_kwargs = {
+        'KeyConditionExpression': 'user_id = :pk AND begins_with(sort_key, :prefix)',
+        'ExpressionAttributeValues': {':pk': VIEW_PARTITION, ':prefix': 'VIEW#'},
+        'ProjectionExpression': 'sort_key'
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        existing_keys.update(item['sort_key'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # Views that no longer match any template are reset to empty
+    for key in existing_keys - set(views):
+        views[key] = _finalise_view(_empty_view(key))
+
+    with table.batch_writer() as batch:
+        for view in views.values():
+            batch.put_item(Item=view)
+        batch.put_item(Item={
+            'user_id': VIEW_PARTITION,
+            'sort_key': 'INDEX_META',
+            'template_count': len(entries),
+            'view_count': len(views),
+            'built_at': datetime.now(timezone.utc).isoformat()
+        })
+
+    _VIEW_CACHE.clear()
+    _TEMPLATE_DETAIL_CACHE.clear()
+
+    result = {
+        'template_count': len(entries),
+        'view_count': len(views),
+        'duration_ms': round((time.monotonic() - started) * 1000, 2)
+    }
+    logger.info("Marketplace listing index rebuilt", extra=result)
+    return result
+
+
+def get_listing_view(table, category: str, difficulty: str, bucket: str) -> Dict[str, Any]:
+    """
+    Serve a precomputed view, from the warm-container cache when possible
+
+    Missing or stale views are rebuilt from the listing entries (one partition
+    query) and written back.
+    """
+
+    key = view_key(category, difficulty, bucket)
+    now = time.monotonic()
+
+    cached = _VIEW_CACHE.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    views = _batch_get_views(table, [key, 'INDEX_META'])
+
+    if 'INDEX_META' not in views:
+        # Legacy templates are backfilled by the scheduled rebuild, not by this request
+        logger.warning("Marketplace listing index has not been built yet; serving indexed templates only")
+
+    view = views.get(key)
+    if view is None or view.get('stale'):
+        previous_version = int(view.get('version', 0)) if view else 0
+        view = _build_views(_query_listing_entries(table), only_key=key)[key]
+        view['version'] = previous_version + 1
+        table.put_item(Item=view)
+
+    _VIEW_CACHE[key] = (now + BROWSE_CACHE_TTL_SECONDS, view)
+    return view
+
+
+def get_threshold_view(table, category: str, difficulty: str, min_performance: Optional[Any],
+                       limit: int) -> Dict[str, Any]:
+    """
+    Serve templates at or above an exact min_performance threshold
+
+    The precomputed bucket view holds the bucket's top MAX_VIEW_SIZE templates;
+    filtering it to the exact threshold is complete when the view is not truncated
+    or still fills the page. Otherwise the page is refilled from the listing
+    entries filtered on total_return, and cached like a view.
+    """
+
+    bucket = performance_bucket_for(min_performance)
+    view = get_listing_view(table, category, difficulty, bucket)
+    if min_performance in (None, ''):
+        return view
+
+    min_perf = float(min_performance)
+    templates = [
+        t for t in view.get('templates', [])
+        if float(t.get('performance_metrics', {}).get('total_return', 0)) >= min_perf
+    ]
+    if len(templates) >= limit or not view.get('truncated'):
+        return dict(view, templates=templates)
+
+    key = f"{view_key(category, difficulty, bucket)}#MIN#{min_perf}"
+    now = time.monotonic()
+    cached = _VIEW_CACHE.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    exact = _build_views(_query_listing_entries(table, min_total_return=min_perf),
+                         only_key=view['sort_key'])[view['sort_key']]
+    _VIEW_CACHE[key] = (now + BROWSE_CACHE_TTL_SECONDS, exact)
+    return exact
+
+
+def get_cached_template_details(template_id: str) -> Optional[Dict[str, Any]]:
+    cached = _TEMPLATE_DETAIL_CACHE.get(template_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def cache_template_details(template_id: str, details: Dict[str, Any]):
+    _TEMPLATE_DETAIL_CACHE[template_id] = (time.monotonic() + BROWSE_CACHE_TTL_SECONDS, details)
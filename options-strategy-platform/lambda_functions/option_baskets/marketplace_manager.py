@@ -25,6 +25,16 @@ sys.path.append('/var/task/option_baskets')
 from shared_utils.logger import setup_logger, log_lambda_event, log_user_action
 logger = setup_logger(__name__)
 
+# Import precomputed marketplace listing index
+from marketplace_listing_index import (
+    upsert_template_listing, rebuild_marketplace_index, get_threshold_view,
+    get_template_listing, compute_etag,
+    get_cached_template_details, cache_template_details, ALL, BROWSE_CACHE_TTL_SECONDS
+)
+
+# Subscriber counts are sharded; pending shard values are added on read
+from sharded_counters import read_counter_total, template_subscriber_counter
+
 
 # Custom JSON encoder to handle Decimal types
 class DecimalEncoder(json.JSONEncoder):
@@ -43,6 +53,15 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     log_lambda_event(logger, event, context)
 
     try:
+        # Scheduled/manual maintenance: backfill and rebuild the listing index
+        if event.get('action') == 'rebuild_marketplace_index':
+            dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+            trading_configurations_table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+            return {
+                'statusCode': 200,
+                'body': json.dumps(rebuild_marketplace_index(trading_configurations_table))
+            }
+
         # Get HTTP method and path
         http_method = event['httpMethod']
         path = event.get('path', '')
@@ -137,13 +156,15 @@ def handle_public_marketplace_request(event, table):
     path_parameters = event.get('pathParameters') or {}
     query_params = event.get('queryStringParameters') or {}
     template_id = path_parameters.get('template_id')
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    if_none_match = headers.get('if-none-match')
 
     if http_method == 'GET' and not template_id:
         # Browse marketplace templates
-        return browse_marketplace_templates(query_params, table)
+        return browse_marketplace_templates(query_params, table, if_none_match)
     elif http_method == 'GET' and template_id:
         # Get template details
-        return get_template_details(template_id, table)
+        return get_template_details(template_id, table, if_none_match)
     else:
         return {
             'statusCode': 405,
@@ -177,6 +198,39 @@ def verify_admin_access(event) -> tuple:
     return user_id, is_admin
 
 
+def cacheable_response(payload: Dict[str, Any], etag: str, if_none_match: str = None) -> Dict[str, Any]:
+    """Build a GET response carrying an ETag, answering 304 when the client copy is current"""
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'ETag': etag,
+        'Cache-Control': f'private, max-age={BROWSE_CACHE_TTL_SECONDS}'
+    }
+
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(payload, cls=DecimalEncoder)
+    }
+
+
+def refresh_marketplace_listing(basket: Dict[str, Any], table):
+    """Keep the listing index in step with a template change (never fails the request)"""
+
+    try:
+        upsert_template_listing(basket, table)
+    except Exception as e:
+        logger.warning("Failed to refresh marketplace listing", extra={
+            "error": str(e),
+            "basket_id": basket.get('basket_id')
+        })
+
+
 def enable_marketplace_for_basket(admin_user_id, basket_id, event, table):
     """
     Enable marketplace for an admin's basket
@@ -284,6 +338,7 @@ def enable_marketplace_for_basket(admin_user_id, basket_id, event, table):
         )
 
         updated_basket = response['Attributes']
+        refresh_marketplace_listing(updated_basket, table)
 
         logger.info("Marketplace enabled for basket", extra={
             "admin_user_id": admin_user_id,
@@ -384,6 +439,7 @@ def update_marketplace_config(admin_user_id, basket_id, event, table):
         )
 
         updated_basket = response['Attributes']
+        refresh_marketplace_listing(updated_basket, table)
 
         logger.info("Marketplace config updated", extra={
             "admin_user_id": admin_user_id,
@@ -438,6 +494,8 @@ def disable_marketplace_for_basket(admin_user_id, basket_id, table):
             ReturnValues='ALL_NEW'
         )
 
+        refresh_marketplace_listing(response['Attributes'], table)
+
         logger.info("Marketplace disabled for basket", extra={
             "admin_user_id": admin_user_id,
             "basket_id": basket_id
@@ -520,89 +578,37 @@ def list_admin_templates(admin_user_id, table):
         }
 
 
-def browse_marketplace_templates(query_params, table):
+def browse_marketplace_templates(query_params, table, if_none_match: str = None):
     """
     Browse public marketplace templates
     Supports filtering by category, difficulty, performance
+
+    Served from precomputed, pre-sorted listing views (see marketplace_listing_index)
+    so filters are applied before the limit and no table scan is needed.
     """
 
     try:
         # Extract query parameters
-        category = query_params.get('category')
-        difficulty = query_params.get('difficulty')
+        category = (query_params.get('category') or ALL).upper()
+        difficulty = (query_params.get('difficulty') or ALL).upper()
         min_performance = query_params.get('min_performance')
         limit = min(int(query_params.get('limit', 50)), 50)  # Max 50
 
-        # Query GSI3: MarketplaceDiscovery
-        if category:
-            # Category-specific query
-            marketplace_category = f"MARKETPLACE#{category.upper()}"
-
-            response = table.query(
-                IndexName='MarketplaceDiscovery',
-                KeyConditionExpression='marketplace_category = :cat',
-                FilterExpression='marketplace_config.visibility = :visibility',
-                ExpressionAttributeValues={
-                    ':cat': marketplace_category,
-                    ':visibility': 'PUBLIC'
-                },
-                ScanIndexForward=False,  # Highest subscriber_count first
-                Limit=limit
-            )
-        else:
-            # Scan all categories (less efficient, use sparingly)
-            response = table.scan(
-                FilterExpression='attribute_exists(marketplace_config) AND marketplace_config.visibility = :visibility',
-                ExpressionAttributeValues={
-                    ':visibility': 'PUBLIC'
-                },
-                Limit=limit
-            )
+        # Exact min_performance threshold, refilled past the coarse bucket's cap when needed
+        view = get_threshold_view(table, category, difficulty, min_performance, limit)
 
-        templates = response.get('Items', [])
+        templates = view.get('templates', [])[:limit]
 
-        # Apply additional filters
-        if difficulty:
-            templates = [
-                t for t in templates
-                if t.get('marketplace_config', {}).get('difficulty_level') == difficulty.upper()
-            ]
-
-        if min_performance:
-            min_perf = float(min_performance)
-            templates = [
-                t for t in templates
-                if t.get('performance_metrics', {}).get('total_return', 0) >= min_perf
-            ]
-
-        # Sanitize templates (remove sensitive admin data)
-        sanitized_templates = []
-        for template in templates:
-            sanitized = {
-                'template_id': template.get('basket_id'),
-                'name': template.get('name'),
-                'description': template.get('description'),
-                'category': template.get('category'),
-                'difficulty_level': template.get('marketplace_config', {}).get('difficulty_level'),
-                'pricing': template.get('marketplace_config', {}).get('pricing'),
-                'subscriber_count': template.get('subscriber_count', 0),
-                'tags': template.get('marketplace_config', {}).get('tags', []),
-                'performance_metrics': template.get('performance_metrics', {}),
-                'created_at': template.get('published_at')
-            }
-            sanitized_templates.append(sanitized)
+        etag = compute_etag({
+            'view_etag': view.get('etag'),
+            'min_performance': min_performance,
+            'limit': limit
+        })
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'templates': sanitized_templates,
-                'count': len(sanitized_templates)
-            }, cls=DecimalEncoder)
-        }
+        return cacheable_response({
+            'templates': templates,
+            'count': len(templates)
+        }, etag, if_none_match)
 
     except Exception as e:
         logger.error("Failed to browse marketplace", extra={"error": str(e)})
@@ -619,24 +625,38 @@ def browse_marketplace_templates(query_params, table):
         }
 
 
-def get_template_details(template_id, table):
+def get_template_details(template_id, table, if_none_match: str = None):
     """Get detailed information about a marketplace template"""
 
     try:
-        # We need to find the template by basket_id
-        # Since we don't know the user_id (admin), we need to scan or use GSI
-        # For now, scan with filter (can be optimized with additional GSI if needed)
-
-        response = table.scan(
-            FilterExpression='basket_id = :basket_id AND attribute_exists(marketplace_config) AND marketplace_config.visibility = :visibility',
-            ExpressionAttributeValues={
-                ':basket_id': template_id,
-                ':visibility': 'PUBLIC'
-            },
-            Limit=1
-        )
+        cached = get_cached_template_details(template_id)
+        if cached:
+            return cacheable_response(cached['data'], cached['etag'], if_none_match)
+
+        # Resolve the template owner through the listing index instead of scanning
+        items = []
+        listing = get_template_listing(template_id, table)
+        if listing and listing.get('visibility') == 'PUBLIC':
+            basket = table.get_item(
+                Key={
+                    'user_id': listing['template_owner_id'],
+                    'sort_key': f'BASKET#{template_id}'
+                }
+            ).get('Item')
+            if basket and basket.get('marketplace_config', {}).get('visibility') == 'PUBLIC':
+                items = [basket]
+        elif listing is None:
+            # Template not indexed yet (published before the listing index existed)
+            response = table.scan(
+                FilterExpression='basket_id = :basket_id AND attribute_exists(marketplace_config) AND marketplace_config.visibility = :visibility',
+                ExpressionAttributeValues={
+                    ':basket_id': template_id,
+                    ':visibility': 'PUBLIC'
+                },
+                Limit=1
+            )
+            items = response.get('Items', [])
 
-        items = response.get('Items', [])
         if not items:
             return {
                 'statusCode': 404,
@@ -671,7 +691,10 @@ def get_template_details(template_id, table):
             'description': template.get('description'),
             'category': template.get('category'),
             'marketplace_config': template.get('marketplace_config'),
-            'subscriber_count': template.get('subscriber_count', 0),
+            'subscriber_count': read_counter_total(
+                table, template_subscriber_counter(template_id, admin_user_id)[0],
+                'subscriber_count', template.get('subscriber_count', 0)
+            ),
             'performance_metrics': template.get('performance_metrics', {}),
             'strategies': [
                 {
@@ -689,14 +712,10 @@ def get_template_details(template_id, table):
             'published_at': template.get('published_at')
         }
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(response_data, cls=DecimalEncoder)
-        }
+        etag = compute_etag(response_data)
+        cache_template_details(template_id, {'data': response_data, 'etag': etag})
+
+        return cacheable_response(response_data, etag, if_none_match)
 
     except Exception as e:
         logger.error("Failed to get template details", extra={
@@ -0,0 +1,201 @@
+"""
+📬 ORDER POSTBACK HANDLER
+
+Receives broker order-status postbacks so fills and rejections reach the
+platform without polling get_orders.
+
+Endpoint:
+  POST /options/postbacks/{broker}/{user_id}/{client_id}
+
+Each client registers this URL (with its own ids) as the postback URL of its
+broker app. The request is not Cognito-authorised; instead every postback is
+verified against the client's API secret:
+
+- Kite: checksum field, SHA-256(order_id + order_timestamp + api_secret)
+- Zebu: X-Postback-Signature header, HMAC-SHA256 of the raw body
+
+Verified postbacks are normalised into OrderStatus, folded into the ORDER#
+record, and status changes are fanned out to the user's WebSocket connections
+and published as Order.Status.Changed events. No rule in this stack consumes
+those events yet; the stop-loss and target handlers still run on their
+minute schedule.
+"""
+
+import base64
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from trading.order_postback import (
+    OrderPostbackProcessor, ZEBU_SIGNATURE_HEADER,
+    normalise_kite_postback, normalise_zebu_postback,
+    verify_kite_checksum, verify_zebu_signature,
+)
+
+try:
+    from websocket.broadcaster import get_broadcaster
+    BROADCASTER_AVAILABLE = True
+except ImportError:
+    BROADCASTER_AVAILABLE = False
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+secrets_client = boto3.client('secretsmanager', region_name=os.environ.get('REGION', 'ap-south-1'))
+eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+SUPPORTED_BROKERS = ('zerodha', 'zebu')
+
+# Missing credentials are cached briefly, so unverifiable postbacks to this
+# unauthenticated endpoint do not each cost a Secrets Manager call
+API_SECRET_MISS_CACHE_SECONDS = int(os.environ.get('POSTBACK_SECRET_MISS_CACHE_SECONDS', '60'))
+
+# API secrets per (broker, user, client) -> (expires_at monotonic, secret);
+# found secrets are kept for the life of the container
+_api_secrets: Dict[tuple, Tuple[float, Optional[str]]] = {}
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Verify, apply and fan out one broker postback.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        path_parameters = event.get('pathParameters') or {}
+        broker_name = (path_parameters.get('broker') or '').lower()
+        user_id = path_parameters.get('user_id')
+        client_id = path_parameters.get('client_id')
+
+        if broker_name not in SUPPORTED_BROKERS or not user_id or not client_id:
+            return create_response(400, {'error': 'Unsupported postback route'})
+
+        raw_body = event.get('body') or ''
+        if event.get('isBase64Encoded'):
+            raw_body = base64.b64decode(raw_body).decode('utf-8')
+
+        payload = parse_postback_body(raw_body)
+        if payload is None:
+            return create_response(400, {'error': 'Malformed postback body'})
+
+        api_secret = get_api_secret(broker_name, user_id, client_id)
+        headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+
+        if broker_name == 'zerodha':
+            verified = verify_kite_checksum(payload, api_secret)
+            update = normalise_kite_postback(payload) if verified else None
+        else:
+            verified = verify_zebu_signature(raw_body, headers.get(ZEBU_SIGNATURE_HEADER), api_secret)
+            update = normalise_zebu_postback(payload) if verified else None
+
+        if not verified:
+            logger.warning(f"Rejected {broker_name} postback for {user_id}/{client_id}: bad checksum")
+            return create_response(401, {'error': 'Invalid checksum'})
+
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        order = OrderPostbackProcessor(table).apply(user_id, broker_name, update)
+
+        if order is None:
+            return create_response(200, {'success': True, 'applied': False})
+
+        logger.info(f"Order {order['order_id']} {order['previous_status']} -> {order['status']} "
+                    f"from {broker_name} postback {update.broker_order_id}")
+        fan_out_status_change(user_id, order)
+        return create_response(200, {'success': True, 'applied': True,
+                                     'order_id': order['order_id'], 'status': order['status']})
+
+    except Exception as e:
+        logger.error(f"Error in Order Postback Handler: {str(e)}")
+        return create_response(500, {'error': str(e)})
+
+
+def parse_postback_body(raw_body: str) -> Optional[Dict[str, Any]]:
+    """Kite posts JSON; Noren-style brokers post jData=<json> form bodies."""
+    try:
+        if raw_body.lstrip().startswith('{'):
+            return json.loads(raw_body)
+        form = parse_qs(raw_body)
+        if 'jData' in form:
+            return json.loads(form['jData'][0])
+    except ValueError:
+        pass
+    return None
+
+
+def get_api_secret(broker_name: str, user_id: str, client_id: str) -> Optional[str]:
+    """API secret of a client's broker app from Secrets Manager."""
+    cache_key = (broker_name, user_id, client_id)
+    cached = _api_secrets.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    env = os.environ.get('ENVIRONMENT', 'dev')
+    secret_name = f"ql-{broker_name}-api-credentials-{env}-{user_id}-{client_id}"
+    try:
+        response = secrets_client.get_secret_value(SecretId=secret_name)
+        api_secret = json.loads(response['SecretString']).get('api_secret')
+    except ClientError as e:
+        logger.warning(f"No API credentials for {broker_name} client {client_id}: {e}")
+        api_secret = None
+
+    ttl = API_SECRET_MISS_CACHE_SECONDS if api_secret is None else float('inf')
+    _api_secrets[cache_key] = (time.monotonic() + ttl, api_secret)
+    return api_secret
+
+
+def fan_out_status_change(user_id: str, order: Dict[str, Any]) -> None:
+    """Push the changed order to WebSocket clients and EventBridge."""
+    if BROADCASTER_AVAILABLE and os.environ.get('WEBSOCKET_ENDPOINT_URL'):
+        try:
+            get_broadcaster().broadcast_order_update(user_id, json.loads(json.dumps(order, cls=DecimalEncoder)))
+        except Exception as e:
+            logger.warning(f"Failed to broadcast order update: {e}")
+
+    try:
+        eventbridge_client.put_events(Entries=[{
+            'Source': 'qlalgo.options.trading',
+            'DetailType': 'Order.Status.Changed',
+            'Detail': json.dumps({
+                'user_id': user_id,
+                'order_id': order.get('order_id'),
+                'strategy_id': order.get('strategy_id'),
+                'basket_id': order.get('basket_id'),
+                'leg_id': order.get('leg_id'),
+                'execution_type': order.get('execution_type'),
+                'previous_status': order.get('previous_status'),
+                'status': order.get('status'),
+                'filled_quantity': order.get('filled_quantity'),
+                'fill_price': order.get('fill_price'),
+                'emitted_at': datetime.now(timezone.utc).isoformat()
+            }, cls=DecimalEncoder)
+        }])
+    except Exception as e:
+        logger.warning(f"Failed to emit Order.Status.Changed for {order.get('order_id')}: {e}")
+
+
+def create_response(status_code: int, body: Dict) -> Dict:
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
@@ -0,0 +1,225 @@
+"""
+🔄 ORDER STATUS POLL HANDLER
+
+Handles Order Status Poll sub-events from Active User Event Handler for broker
+accounts that do not receive postbacks.
+
+Active User Event Handler already fans out one sub-event per broker account, so
+each invocation covers exactly one account. Instead of calling get_order_status
+per order, the handler:
+
+- Queries the account's pending ORDER# records (OrdersByStatus GSI, today only)
+- Fetches the broker's order book once per round
+- Diffs the book against the stored slices and writes only the orders that moved
+- Repeats within the invocation while orders are pending, backing off when a
+  round shows no change and stopping as soon as nothing is pending
+
+An account with nothing pending costs a few GSI queries and no broker calls.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from decimal import Decimal
+
+import boto3
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from trading import OrderStatus, TradingMode, get_trading_strategy
+from trading.order_postback import OrderPostbackProcessor
+from single_strategy_executor import get_broker_credentials
+from order_postback_handler import fan_out_status_change
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+# Statuses that can still change at the broker
+PENDING_STATUSES = [
+    OrderStatus.PENDING.value,
+    OrderStatus.PLACED.value,
+    OrderStatus.OPEN.value,
+    OrderStatus.PARTIALLY_FILLED.value,
+]
+
+# Order book rounds within one invocation: start fast, double while nothing changes
+POLL_WINDOW_SECONDS = float(os.environ.get('ORDER_POLL_WINDOW_SECONDS', '45'))
+MIN_POLL_INTERVAL_SECONDS = float(os.environ.get('ORDER_POLL_MIN_INTERVAL_SECONDS', '2'))
+MAX_POLL_INTERVAL_SECONDS = float(os.environ.get('ORDER_POLL_MAX_INTERVAL_SECONDS', '16'))
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Handle Order Status Poll events for one broker account.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', {})
+        user_id = detail.get('user_id')
+        sub_event_id = detail.get('sub_event_id')
+        client_id = detail.get('client_id')
+        broker_name = detail.get('broker_name') or detail.get('broker_id')
+
+        if not user_id or not client_id or not broker_name:
+            logger.error("Missing user_id, client_id or broker in Order Status Poll event")
+            return create_error_response("Missing user_id, client_id or broker")
+
+        if (detail.get('broker_config') or {}).get('postbacks_enabled'):
+            logger.info(f"Postbacks enabled for {broker_name} client {client_id}; skipping poll")
+            return create_success_response(user_id, sub_event_id, {'rounds': 0, 'skipped': 'POSTBACKS_ENABLED'})
+
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        pending = get_pending_orders(table, user_id, broker_name, client_id)
+        if not pending:
+            return create_success_response(user_id, sub_event_id, {'rounds': 0, 'pending': 0})
+
+        credentials = get_broker_credentials(user_id, client_id, broker_name)
+        strategy = get_trading_strategy(broker_name, TradingMode.LIVE)
+        if not credentials or not strategy.connect(credentials):
+            logger.warning(f"Could not connect to {broker_name} for client {client_id}; "
+                           f"{len(pending)} orders left pending")
+            return create_error_response(f"Broker connection failed for {client_id}")
+
+        processor = OrderPostbackProcessor(table)
+
+        def poll_round(orders: List[Dict]) -> Tuple[int, List[Dict]]:
+            return poll_order_book(processor, strategy, user_id, orders)
+
+        result = run_poll_window(pending, poll_round, lambda: get_pending_orders(
+            table, user_id, broker_name, client_id))
+        logger.info(f"Order status poll for {broker_name} client {client_id}: {result}")
+        return create_success_response(user_id, sub_event_id, result)
+
+    except Exception as e:
+        logger.error(f"Error in Order Status Poll Handler: {str(e)}")
+        return create_error_response(str(e))
+
+
+def get_pending_orders(table, user_id: str, broker_name: str, client_id: str,
+                       trading_date: Optional[str] = None) -> List[Dict]:
+    """Today's live orders of one broker account that have not reached a final status."""
+    trading_date = trading_date or datetime.now(timezone.utc).date().isoformat()
+    orders = []
+
+    for status in PENDING_STATUSES:
+        query_kwargs = {
+            'IndexName': 'OrdersByStatus',
+            'KeyConditionExpression': 'user_id = :user_id AND begins_with(order_status_key, :prefix)',
+            'FilterExpression': 'broker_id = :broker_id AND client_id = :client_id AND trading_mode = :live',
+            'ExpressionAttributeValues': {
+                ':user_id': user_id,
+                ':prefix': f'{status}#{trading_date}',
+                ':broker_id': broker_name,
+                ':client_id': client_id,
+                ':live': TradingMode.LIVE.value,
+            },
+        }
+        while True:
+            response = table.query(**query_kwargs)
+            orders.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return orders
+
+
+def poll_order_book(processor: OrderPostbackProcessor, strategy, user_id: str,
+                    pending: List[Dict]) -> Tuple[int, List[Dict]]:
+    """
+    Fetch the order book once and apply it to every pending order.
+
+    Returns:
+        Tuple of (orders changed, orders still pending)
+    """
+    book = [o for o in strategy.get_orders() if o.broker_order_id]
+    changed = 0
+    still_pending = []
+
+    for order in pending:
+        # Only the book entries matching the order's slices are folded in
+        result = processor.apply_to_order(user_id, order['order_id'], book) if book else None
+        if result:
+            changed += 1
+            fan_out_status_change(user_id, result)
+        status = result['status'] if result else order.get('status')
+        if status in PENDING_STATUSES:
+            still_pending.append(order)
+
+    return changed, still_pending
+
+
+def run_poll_window(pending: List[Dict],
+                    poll_round: Callable[[List[Dict]], Tuple[int, List[Dict]]],
+                    refresh_pending: Callable[[], List[Dict]],
+                    window_seconds: float = POLL_WINDOW_SECONDS,
+                    sleep: Callable[[float], None] = time.sleep,
+                    clock: Callable[[], float] = time.monotonic) -> Dict[str, Any]:
+    """
+    Poll the order book in rounds until nothing is pending or the window closes.
+
+    The interval doubles after every round without a change (up to
+    MAX_POLL_INTERVAL_SECONDS) and drops back to the minimum when one moves.
+    Pending orders are re-read from the GSI after a round that changed
+    something, which also picks up orders placed in the meantime.
+    """
+    deadline = clock() + window_seconds
+    interval = MIN_POLL_INTERVAL_SECONDS
+    rounds = 0
+    total_changed = 0
+
+    while pending:
+        changed, pending = poll_round(pending)
+        rounds += 1
+        total_changed += changed
+        if not pending:
+            break
+
+        if changed:
+            interval = MIN_POLL_INTERVAL_SECONDS
+            pending = refresh_pending()
+
+        if not pending or clock() + interval >= deadline:
+            break
+        sleep(interval)
+        if not changed:
+            interval = min(interval * 2, MAX_POLL_INTERVAL_SECONDS)
+
+    return {'rounds': rounds, 'changed': total_changed, 'pending': len(pending)}
+
+
+def create_success_response(user_id: str, sub_event_id: str, result: Dict) -> Dict:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'success': True,
+            'user_id': user_id,
+            'sub_event_id': sub_event_id,
+            'result': result
+        }, cls=DecimalEncoder)
+    }
+
+
+def create_error_response(error: str) -> Dict:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'success': False,
+            'error': error
+        })
+    }
@@ -25,6 +25,9 @@ sys.path.append('/var/task/option_baskets')
 from shared_utils.logger import setup_logger, log_lambda_event, log_user_action, log_api_response
 logger = setup_logger(__name__)
 
+# Import hashed API key lookup helper shared with the auth middleware
+from partner_auth_middleware import api_key_lookup_item, backfill_api_key_lookups
+
 
 # Custom JSON encoder to handle Decimal types
 class DecimalEncoder(json.JSONEncoder):
@@ -292,6 +295,9 @@ def handle_create_partner_api_key(event, admin_user_id, table):
             ConditionExpression='attribute_not_exists(user_id) AND attribute_not_exists(sort_key)'
         )
 
+        # Store hashed-key lookup so partner authentication is a direct get_item
+        table.put_item(Item=api_key_lookup_item(api_key, api_key_id))
+
         logger.info("Partner API key created", extra={
             "admin_user_id": admin_user_id,
             "partner_id": partner_id,
@@ -354,6 +360,9 @@ def handle_list_partner_api_keys(event, admin_user_id, table):
 
         partners = response.get('Items', [])
 
+        # Keys that predate hashed lookup items cannot authenticate until backfilled
+        backfill_api_key_lookups(table, partners)
+
         # Remove sensitive data (api_secret_hash)
         for partner in partners:
             if 'api_secret_hash' in partner:
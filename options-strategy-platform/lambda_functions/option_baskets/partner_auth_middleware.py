@@ -5,6 +5,9 @@ Validates partner API keys and enforces rate limiting for B2B2C integrations
 
 import boto3
 import bcrypt
+import hashlib
+import time
+from botocore.exceptions import ClientError
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Optional, Tuple
 import os
@@ -20,6 +23,62 @@ except ImportError:
     logger.setLevel(logging.INFO)
 
 
+# Warm-container state (module level so it survives across invocations)
+# Partner records keyed by hashed API key -> (expires_at, partner); None caches an unknown key
+_PARTNER_CACHE: Dict[str, Tuple[float, Optional[Dict]]] = {}
+# Local token buckets keyed by (api_key_id, counter_type) -> {'window', 'tokens', 'counter'}
+_LOCAL_TOKEN_BUCKETS: Dict[Tuple[str, str], Dict[str, Any]] = {}
+# Last time this container persisted last_used_at per api_key_id (monotonic seconds)
+_LAST_USED_FLUSHED_AT: Dict[str, float] = {}
+
+PARTNER_CACHE_TTL_SECONDS = int(os.environ.get('PARTNER_CACHE_TTL_SECONDS', '30'))
+PARTNER_MISS_CACHE_TTL_SECONDS = int(os.environ.get('PARTNER_MISS_CACHE_TTL_SECONDS', '5'))
+RATE_LIMIT_LEASE_SIZE = int(os.environ.get('RATE_LIMIT_LEASE_SIZE', '10'))
+LAST_USED_FLUSH_INTERVAL_SECONDS = int(os.environ.get('LAST_USED_FLUSH_INTERVAL_SECONDS', '60'))
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 digest of a partner API key, used as the direct lookup key"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def api_key_lookup_item(api_key: str, api_key_id: str) -> Dict[str, Any]:
+    """Build the lookup item that maps a hashed API key to its api_key_id"""
+    return {
+        'user_id': 'PARTNER',
+        'sort_key': f'API_KEY_LOOKUP#{hash_api_key(api_key)}',
+        'entity_type': 'PARTNER_API_KEY_LOOKUP',
+        'api_key_id': api_key_id
+    }
+
+
+def backfill_api_key_lookups(table, partners) -> int:
+    """
+    Create the hashed lookup item of partner keys that predate lookup items
+
+    Authentication resolves keys only through lookup items, so keys created
+    before they existed authenticate once an admin listing has backfilled them.
+
+    Returns:
+        Number of lookup items created
+    """
+
+    created = 0
+    for partner in partners:
+        if not partner.get('api_key') or not partner.get('api_key_id'):
+            continue
+        try:
+            table.put_item(
+                Item=api_key_lookup_item(partner['api_key'], partner['api_key_id']),
+                ConditionExpression='attribute_not_exists(sort_key)'
+            )
+            created += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.warning("Failed to backfill API key lookup", extra={"error": str(e)})
+    return created
+
+
 class PartnerAuthMiddleware:
     """
     Middleware for authenticating and rate limiting partner API requests
@@ -101,7 +160,7 @@ class PartnerAuthMiddleware:
                 logger.warning("Invalid API secret", extra={"partner_id": partner.get('partner_id')})
                 return False, None, 'Invalid API secret'
 
-            # Update last_used_at timestamp (async, don't wait)
+            # Update last_used_at timestamp (coalesced per warm container)
             self._update_last_used_timestamp(partner.get('api_key_id'))
 
             # Return partner context (remove sensitive data)
@@ -149,9 +208,11 @@ class PartnerAuthMiddleware:
 
             # Check minute limit
             minute_limit = rate_limits.get('requests_per_minute', 100)
-            minute_count = self._increment_rate_counter(api_key_id, 'minute', current_minute, ttl=60)
+            minute_allowed, minute_count = self._consume_rate_token(
+                api_key_id, 'minute', current_minute, minute_limit, ttl=60
+            )
 
-            if minute_count > minute_limit:
+            if not minute_allowed:
                 logger.warning("Partner exceeded minute rate limit", extra={
                     "partner_id": partner_context['partner_id'],
                     "current_count": minute_count,
@@ -161,9 +222,11 @@ class PartnerAuthMiddleware:
 
             # Check daily limit
             day_limit = rate_limits.get('requests_per_day', 10000)
-            day_count = self._increment_rate_counter(api_key_id, 'day', current_day, ttl=86400)
+            day_allowed, day_count = self._consume_rate_token(
+                api_key_id, 'day', current_day, day_limit, ttl=86400
+            )
 
-            if day_count > day_limit:
+            if not day_allowed:
                 logger.warning("Partner exceeded daily rate limit", extra={
                     "partner_id": partner_context['partner_id'],
                     "current_count": day_count,
@@ -205,28 +268,160 @@ class PartnerAuthMiddleware:
         return False, f"Missing permission: {required_permission}"
 
     def _get_partner_by_api_key(self, api_key: str) -> Optional[Dict]:
-        """Fetch partner configuration by API key"""
+        """
+        Fetch partner configuration by API key
+
+        Resolves the key through its hashed lookup item with direct get_item calls
+        and caches the result for PARTNER_CACHE_TTL_SECONDS in the warm container;
+        unknown keys are cached for PARTNER_MISS_CACHE_TTL_SECONDS. A cached
+        partner's status is re-read on every hit, so a revoked or suspended key
+        stops authenticating at once in every container.
+        """
+
+        key_hash = hash_api_key(api_key)
+        now = time.monotonic()
+
+        cached = _PARTNER_CACHE.get(key_hash)
+        if cached and cached[0] > now:
+            if cached[1] is None:
+                return None
+            return self._with_current_status(cached[1])
 
         try:
-            # Query DynamoDB for partner with matching API key
-            response = self.table.query(
-                KeyConditionExpression='user_id = :user_id AND begins_with(sort_key, :prefix)',
-                FilterExpression='api_key = :api_key',
-                ExpressionAttributeValues={
-                    ':user_id': 'PARTNER',
-                    ':prefix': 'PARTNER_API_KEY#',
-                    ':api_key': api_key
+            partner = None
+
+            lookup = self.table.get_item(
+                Key={
+                    'user_id': 'PARTNER',
+                    'sort_key': f'API_KEY_LOOKUP#{key_hash}'
                 }
+            ).get('Item')
+
+            if lookup:
+                partner = self.table.get_item(
+                    Key={
+                        'user_id': 'PARTNER',
+                        'sort_key': f"PARTNER_API_KEY#{lookup['api_key_id']}"
+                    }
+                ).get('Item')
+
+            # Guard against hash collisions or a rotated key behind a stale lookup item
+            if partner and partner.get('api_key') != api_key:
+                partner = None
+
+            if partner:
+                _PARTNER_CACHE[key_hash] = (now + PARTNER_CACHE_TTL_SECONDS, partner)
+            else:
+                _PARTNER_CACHE[key_hash] = (now + PARTNER_MISS_CACHE_TTL_SECONDS, None)
+
+            return partner
+
+        except Exception as e:
+            logger.error("Failed to fetch partner by API key", extra={"error": str(e)})
+            return None
+
+    def _with_current_status(self, partner: Dict) -> Optional[Dict]:
+        """A cached partner with its status re-read from DynamoDB"""
+
+        item = self.table.get_item(
+            Key={
+                'user_id': 'PARTNER',
+                'sort_key': f"PARTNER_API_KEY#{partner.get('api_key_id')}"
+            },
+            ProjectionExpression='#status',
+            ExpressionAttributeNames={'#status': 'status'}
+        ).get('Item')
+
+        if not item:
+            return None
+        return {**partner, 'status': item.get('status')}
+
+    def _consume_rate_token(self, api_key_id: str, counter_type: str, time_window: str,
+                            limit: int, ttl: int) -> Tuple[bool, int]:
+        """
+        Take one request token from the local bucket, leasing more from DynamoDB when empty
+
+        Each warm container reserves a block of requests from the shared window
+        counter and serves them locally, so most requests skip DynamoDB entirely.
+        Leases are granted only while the whole block fits under the limit; near
+        the limit we fall back to single-request increments, which is exactly the
+        original counting behaviour. Once a window is known to be over the limit,
+        further requests in it are rejected without another write.
+
+        Returns:
+            Tuple of (is_allowed, shared counter value seen at the last reservation)
+        """
+
+        bucket_key = (api_key_id, counter_type)
+        bucket = _LOCAL_TOKEN_BUCKETS.get(bucket_key)
+
+        if bucket and bucket['window'] == time_window:
+            if bucket['tokens'] > 0:
+                bucket['tokens'] -= 1
+                return True, bucket['counter']
+
+            # Window counters only grow, so an exhausted window stays exhausted
+            if bucket['counter'] > limit:
+                return False, bucket['counter']
+
+        lease_size = max(1, min(RATE_LIMIT_LEASE_SIZE, int(limit) // 20))
+        counter = None
+
+        if lease_size > 1:
+            counter = self._reserve_rate_lease(api_key_id, counter_type, time_window, ttl, lease_size, limit)
+
+        if counter is None:
+            lease_size = 1
+            counter = self._increment_rate_counter(api_key_id, counter_type, time_window, ttl)
+
+        if counter > limit:
+            _LOCAL_TOKEN_BUCKETS[bucket_key] = {'window': time_window, 'tokens': 0, 'counter': counter}
+            return False, counter
+
+        _LOCAL_TOKEN_BUCKETS[bucket_key] = {
+            'window': time_window,
+            'tokens': lease_size - 1,
+            'counter': counter
+        }
+        return True, counter
+
+    def _reserve_rate_lease(self, api_key_id: str, counter_type: str, time_window: str,
+                            ttl: int, lease_size: int, limit: int) -> Optional[int]:
+        """
+        Atomically reserve lease_size requests from the shared window counter
+
+        Returns:
+            Counter value after the reservation, or None if the lease does not fit
+        """
+
+        try:
+            ttl_timestamp = int((datetime.now(timezone.utc) + timedelta(seconds=ttl)).timestamp())
+
+            response = self.table.update_item(
+                Key={
+                    'user_id': f"RATE#{api_key_id}",
+                    'sort_key': f"RATE_LIMIT#{counter_type.upper()}#{time_window}"
+                },
+                UpdateExpression='ADD request_count :lease SET #ttl = :ttl',
+                ConditionExpression='attribute_not_exists(request_count) OR request_count <= :ceiling',
+                ExpressionAttributeNames={'#ttl': 'ttl'},
+                ExpressionAttributeValues={
+                    ':lease': lease_size,
+                    ':ttl': ttl_timestamp,
+                    ':ceiling': int(limit) - lease_size
+                },
+                ReturnValues='UPDATED_NEW'
             )
 
-            items = response.get('Items', [])
-            if items:
-                return items[0]
+            return int(response['Attributes'].get('request_count', lease_size))
 
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error("Failed to reserve rate limit lease", extra={"error": str(e)})
             return None
 
         except Exception as e:
-            logger.error("Failed to fetch partner by API key", extra={"error": str(e)})
+            logger.error("Failed to reserve rate limit lease", extra={"error": str(e)})
             return None
 
     def _increment_rate_counter(self, api_key_id: str, counter_type: str, time_window: str, ttl: int) -> int:
@@ -255,7 +450,8 @@ class PartnerAuthMiddleware:
                     'user_id': f"RATE#{api_key_id}",
                     'sort_key': sort_key
                 },
-                UpdateExpression='ADD request_count :inc SET ttl = :ttl',
+                UpdateExpression='ADD request_count :inc SET #ttl = :ttl',
+                ExpressionAttributeNames={'#ttl': 'ttl'},
                 ExpressionAttributeValues={
                     ':inc': 1,
                     ':ttl': ttl_timestamp
@@ -272,7 +468,19 @@ class PartnerAuthMiddleware:
             return 0
 
     def _update_last_used_timestamp(self, api_key_id: str):
-        """Update partner API key last_used_at timestamp (fire and forget)"""
+        """
+        Update partner API key last_used_at timestamp (fire and forget)
+
+        Writes are coalesced: a warm container persists last_used_at at most once
+        per LAST_USED_FLUSH_INTERVAL_SECONDS for each key.
+        """
+
+        now = time.monotonic()
+        last_flushed = _LAST_USED_FLUSHED_AT.get(api_key_id)
+        if last_flushed is not None and now - last_flushed < LAST_USED_FLUSH_INTERVAL_SECONDS:
+            return
+
+        _LAST_USED_FLUSHED_AT[api_key_id] = now
 
         try:
             self.table.update_item(
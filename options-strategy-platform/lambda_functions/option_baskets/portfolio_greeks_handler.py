@@ -0,0 +1,165 @@
+"""
+🚀 PORTFOLIO GREEKS HANDLER
+
+Handles Portfolio Greeks Stream sub-events from Active User Event Handler.
+Streams delta / gamma / theta / vega of the user's open book to WebSocket
+dashboards, per strategy, basket and user.
+
+Responsibilities:
+- Query today's open positions for the user
+- Build the market snapshot (event detail, then the latest 1 minute candle close,
+  then position quotes; see portfolio_var_handler.load_market_snapshot)
+- Value every leg in one vectorized pass (shared_utils.greeks_engine)
+- Diff against the last published Greeks and push only the scopes that moved
+  beyond their threshold on the greeks channel (see greeks_publisher.py)
+"""
+
+import json
+import os
+import sys
+import boto3
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional
+from decimal import Decimal
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from shared_utils.greeks_engine import GreeksEngine
+from greeks_publisher import get_greeks_publisher, scope_snapshot, GREEK_THRESHOLDS, RELATIVE_THRESHOLD
+from portfolio_var_handler import build_var_inputs, load_market_snapshot, query_active_positions
+
+try:
+    from websocket.broadcaster import get_broadcaster
+    BROADCASTER_AVAILABLE = True
+except ImportError:
+    BROADCASTER_AVAILABLE = False
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Handle Portfolio Greeks Stream events.
+
+    Optional detail fields: market ({underlying: {spot, volatility}}),
+    thresholds ({greek: absolute move}) and relative_threshold.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', {})
+        user_id = detail.get('user_id')
+        sub_event_id = detail.get('sub_event_id')
+
+        if not user_id:
+            logger.error("Missing user_id in Portfolio Greeks Stream event")
+            return create_error_response("Missing user_id")
+
+        current_ist = datetime.now(timezone.utc).astimezone(timezone(timedelta(hours=5, minutes=30)))
+
+        positions = query_active_positions(user_id, current_ist)
+        market = load_market_snapshot(positions, detail.get('market', {}), current_ist)
+        greek_positions, market, skipped = build_var_inputs(positions, market)
+
+        aggregate = GreeksEngine().aggregate(greek_positions, market, as_of=current_ist)
+
+        result = publish_greeks(
+            user_id, scope_snapshot(aggregate), current_ist,
+            thresholds={**GREEK_THRESHOLDS, **{g: float(v) for g, v in detail.get('thresholds', {}).items()}},
+            relative=float(detail.get('relative_threshold', RELATIVE_THRESHOLD))
+        )
+
+        logger.info(f"Greeks for {user_id}: {aggregate['legs']} legs in {aggregate['elapsed_ms']}ms, "
+                    f"{result['scopes_published']} scopes published")
+
+        return create_success_response(user_id, sub_event_id, aggregate, result, skipped)
+
+    except Exception as e:
+        logger.error(f"Error in Portfolio Greeks Handler: {str(e)}")
+        return create_error_response(str(e))
+
+
+def publish_greeks(user_id: str, scopes: Dict[str, Dict[str, float]], current_ist: datetime,
+                   thresholds: Dict[str, float] = GREEK_THRESHOLDS,
+                   relative: float = RELATIVE_THRESHOLD) -> Dict[str, Any]:
+    """Send the scopes that moved since the last publish; nothing is sent or written otherwise."""
+    table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+    publisher = get_greeks_publisher()
+
+    try:
+        publisher.restore(table, user_id)
+    except Exception as e:
+        logger.warning(f"Could not restore published Greeks: {str(e)}")
+
+    now = current_ist.timestamp()
+    update = publisher.pending_update(user_id, scopes, now=now, thresholds=thresholds, relative=relative)
+    if update is None:
+        return {'scopes_published': 0, 'scopes_removed': 0, 'connections': 0}
+
+    connections = broadcast_greeks(user_id, {
+        'changed': update['changed'],
+        'removed': update['removed'],
+        'as_of': current_ist.isoformat()
+    })
+    publisher.mark_published(table, user_id, update, now=now)
+
+    return {
+        'scopes_published': len(update['changed']),
+        'scopes_removed': len(update['removed']),
+        'connections': connections
+    }
+
+
+def broadcast_greeks(user_id: str, data: Dict[str, Any]) -> int:
+    """Push a Greeks update to the user's greeks subscribers; returns the connections reached."""
+    broadcaster = get_greeks_broadcaster()
+    if broadcaster is None:
+        return 0
+    try:
+        return broadcaster.broadcast_greeks_update(user_id, data)
+    except Exception as e:
+        logger.warning(f"Failed to broadcast Greeks update: {e}")
+        return 0
+
+
+def get_greeks_broadcaster() -> Optional[Any]:
+    """The container's WebSocket broadcaster, or None when WebSockets are not deployed."""
+    if BROADCASTER_AVAILABLE and os.environ.get('WEBSOCKET_ENDPOINT_URL'):
+        return get_broadcaster()
+    return None
+
+
+def create_success_response(user_id: str, sub_event_id: str, aggregate: Dict, result: Dict, skipped: int) -> Dict:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'success': True,
+            'user_id': user_id,
+            'sub_event_id': sub_event_id,
+            'positions_skipped': skipped,
+            'greeks': aggregate,
+            **result
+        }, cls=DecimalEncoder)
+    }
+
+
+def create_error_response(error: str) -> Dict:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'success': False,
+            'error': error
+        })
+    }
@@ -0,0 +1,225 @@
+"""
+🚀 PORTFOLIO VAR HANDLER
+
+Handles Portfolio VaR Check sub-events from Active User Event Handler.
+Revalues the user's open option book under correlated index shocks and records
+VaR / Expected Shortfall in execution history for risk dashboards.
+
+Responsibilities:
+- Query today's open positions for the user
+- Build the market snapshot (event detail, then the latest 1 minute candle close
+  the market data refresher wrote, then position quotes)
+- Run Monte Carlo VaR over the netted book
+- Write the result as a RISK#VAR record in execution history
+"""
+
+import json
+import os
+import sys
+import boto3
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Tuple
+from decimal import Decimal
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from shared_utils.var_engine import VaREngine
+from candle_store import CandleStore
+from positional_schedule import open_positions
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+DEFAULT_VAR_PATHS = int(os.environ.get('VAR_PATHS', '10000'))
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Handle Portfolio VaR Check events.
+
+    Optional detail fields: market ({underlying: {spot, volatility}}), var_paths,
+    horizon_days and seed.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', {})
+        user_id = detail.get('user_id')
+        sub_event_id = detail.get('sub_event_id')
+
+        if not user_id:
+            logger.error("Missing user_id in Portfolio VaR Check event")
+            return create_error_response("Missing user_id")
+
+        current_ist = datetime.now(timezone.utc).astimezone(IST)
+
+        positions = query_active_positions(user_id, current_ist)
+        market = load_market_snapshot(positions, detail.get('market', {}), current_ist)
+        var_positions, market, skipped = build_var_inputs(positions, market)
+
+        if not var_positions:
+            logger.info(f"No option positions to value for user {user_id}")
+            return create_success_response(user_id, sub_event_id, None, skipped)
+
+        result = VaREngine().monte_carlo_var(
+            var_positions, market,
+            paths=int(detail.get('var_paths', DEFAULT_VAR_PATHS)),
+            horizon_days=int(detail.get('horizon_days', 1)),
+            seed=detail.get('seed'),
+            as_of=current_ist.date()
+        )
+
+        logger.info(f"VaR for {user_id}: 95% ₹{result['var_95']}, 99% ₹{result['var_99']} "
+                    f"over {result['paths']} paths, {result['instruments']} instruments in {result['elapsed_ms']}ms")
+
+        write_var_record(user_id, result, current_ist, sub_event_id)
+
+        return create_success_response(user_id, sub_event_id, result, skipped)
+
+    except Exception as e:
+        logger.error(f"Error in Portfolio VaR Handler: {str(e)}")
+        return create_error_response(str(e))
+
+
+def query_active_positions(user_id: str, current_ist: datetime) -> List[Dict]:
+    """Query the user's open positions of today's trading day from execution history."""
+    try:
+        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        return open_positions(table, user_id, current_ist.date())
+
+    except Exception as e:
+        logger.error(f"Error querying active positions: {str(e)}")
+        return []
+
+
+def load_market_snapshot(positions: List[Dict], market: Dict[str, Dict], current_ist: datetime) -> Dict[str, Dict]:
+    """
+    Spot of every underlying held, keyed by underlying.
+
+    Quotes in the event win; the others are the close of the latest 1 minute
+    candle of the session (candle_store.py). Underlyings with neither fall back
+    to the position's underlying_price in build_var_inputs.
+    """
+    snapshot = {u.upper(): dict(q) for u, q in market.items()}
+    underlyings = {str(p.get('underlying', p.get('index', ''))).upper() for p in positions} - set(snapshot) - {''}
+    if not underlyings:
+        return snapshot
+
+    store = CandleStore(dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE']))
+    for underlying in sorted(underlyings):
+        try:
+            spot = store.last_close(underlying, current_ist)
+        except Exception as e:
+            logger.warning(f"Could not read the latest {underlying} candle: {str(e)}")
+            continue
+        if spot is not None:
+            snapshot[underlying] = {'spot': spot}
+
+    return snapshot
+
+
+def build_var_inputs(positions: List[Dict], market: Dict[str, Dict]) -> Tuple[List[Dict], Dict[str, Dict], int]:
+    """
+    Convert position records to VaR engine positions.
+
+    Spot comes from the market snapshot (load_market_snapshot), else from the
+    position's underlying_price. Positions without strike, option type or a spot are skipped.
+    strategy_id, basket_id and implied_volatility are carried for the Greeks stream.
+
+    Returns:
+        (engine positions, market snapshot, skipped count)
+    """
+    snapshot = {u.upper(): dict(q) for u, q in market.items()}
+    var_positions = []
+    skipped = 0
+
+    for position in positions:
+        underlying = str(position.get('underlying', position.get('index', ''))).upper()
+        strike = position.get('strike', position.get('strike_price'))
+        option_type = str(position.get('option_type', '')).upper()
+        expiry = position.get('expiry', position.get('expiry_date'))
+        quantity = abs(int(position.get('quantity', 0)))
+
+        if underlying not in snapshot and position.get('underlying_price'):
+            snapshot[underlying] = {'spot': float(position['underlying_price'])}
+            if position.get('implied_volatility'):
+                snapshot[underlying]['volatility'] = float(position['implied_volatility'])
+
+        if (not underlying or underlying not in snapshot or option_type not in ['CE', 'PE', 'CALL', 'PUT']
+                or not strike or not expiry or quantity == 0):
+            skipped += 1
+            continue
+
+        side = position.get('transaction_type') or position.get('action')
+        if not side:
+            side = 'SELL' if position.get('position_type') == 'SHORT' else 'BUY'
+
+        var_positions.append({
+            'underlying': underlying,
+            'strike': float(strike),
+            'option_type': 'CE' if option_type in ['CE', 'CALL'] else 'PE',
+            'expiry': str(expiry),
+            'transaction_type': side.upper(),
+            'quantity': quantity,
+            'strategy_id': position.get('strategy_id'),
+            'basket_id': position.get('basket_id'),
+            'implied_volatility': position.get('implied_volatility')
+        })
+
+    return var_positions, snapshot, skipped
+
+
+def write_var_record(user_id: str, result: Dict, current_ist: datetime, sub_event_id: str = None) -> None:
+    """Record the VaR run in execution history (ExecutionsByDate serves the dashboards)."""
+    try:
+        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        record = json.loads(json.dumps({
+            'user_id': user_id,
+            'execution_key': f"RISK#VAR#{current_ist.isoformat()}",
+            'record_type': 'PORTFOLIO_VAR',
+            'execution_timestamp': current_ist.isoformat(),
+            'execution_date': current_ist.strftime('%Y-%m-%d'),
+            'sub_event_id': sub_event_id,
+            'var_result': result
+        }), parse_float=Decimal)
+
+        table.put_item(Item=record)
+
+    except Exception as e:
+        logger.error(f"Error writing VaR record: {str(e)}")
+
+
+def create_success_response(user_id: str, sub_event_id: str, result: Dict, skipped: int) -> Dict:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'success': True,
+            'user_id': user_id,
+            'sub_event_id': sub_event_id,
+            'positions_skipped': skipped,
+            'var_result': result
+        }, cls=DecimalEncoder)
+    }
+
+
+def create_error_response(error: str) -> Dict:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'success': False,
+            'error': error
+        })
+    }
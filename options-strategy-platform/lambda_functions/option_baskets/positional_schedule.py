@@ -0,0 +1,306 @@
+"""
+Positional Schedule
+Expiry-relative entry / exit dates of positional strategies
+
+A positional strategy enters entry_trading_days_before_expiry trading days
+before an expiry of its underlying and exits exit_trading_days_before_expiry
+trading days before the same expiry (0 is expiry day), holding the position
+overnight in between. Instead of re-evaluating these strategies every day, the
+concrete dates are resolved against the trading calendar and written into the
+schedule index as dated schedules under the weekday of their date:
+
+- sort_key / schedule_key: SCHEDULE#{WEEKDAY}#{HH:MM}#{ENTRY|EXIT}#{strategy_id}#{YYYY-MM-DD}
+- schedule_date: the date the schedule is due on (expires two days later)
+
+The daily schedule plan compile reads them with the weekday schedules and keeps
+the ones dated today, so the minute path costs the same however many
+positional strategies exist.
+
+Dates are materialised for a rolling horizon. Each positional strategy keeps a
+POSITIONAL#{strategy_id} item recording how far its dates reach; the pre-market
+warm-up extends the ones running short.
+
+Open positions of positional strategies are carried into the next trading day
+by the overnight reconciliation (carry_forward_positions).
+"""
+
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Any, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from shared_utils.trading_calendar import expiry_dates, previous_trading_day, trading_days_before
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+POSITIONAL_PREFIX = 'POSITIONAL#'
+
+# Days of dated schedules kept ahead; extended once less than a third is left
+POSITIONAL_HORIZON_DAYS = int(os.environ.get('POSITIONAL_HORIZON_DAYS', '45'))
+
+# Strategy fields the dates are resolved from
+POSITIONAL_FIELDS = ('entry_trading_days_before_expiry', 'exit_trading_days_before_expiry',
+                     'entry_time', 'exit_time', 'underlying', 'expiry_type')
+
+CARRIED_FORWARD = 'CARRIED_FORWARD'
+EXPIRED = 'EXPIRED'
+
+_WEEKDAY_NAMES = ('MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY')
+
+
+def is_positional(strategy: Dict[str, Any]) -> bool:
+    return strategy.get('entry_trading_days_before_expiry') is not None
+
+
+def dated_schedule_key(day: date, execution_time: str, execution_type: str, strategy_id: str) -> str:
+    """The weekday schedule key of the date's weekday, suffixed with the date."""
+    return (f"SCHEDULE#{_WEEKDAY_NAMES[day.weekday()][:3]}#{execution_time}#"
+            f"{execution_type.upper()}#{strategy_id}#{day.isoformat()}")
+
+
+def positional_cycles(strategy: Dict[str, Any], start: date, end: date) -> List[Dict[str, date]]:
+    """
+    Entry / exit dates of the expiry cycles whose entry falls in [start, end].
+
+    Returns:
+        [{'expiry_date', 'entry_date', 'exit_date'}, ...] oldest first
+    """
+    entry_days = int(strategy['entry_trading_days_before_expiry'])
+    exit_days = int(strategy.get('exit_trading_days_before_expiry') or 0)
+    if exit_days > entry_days:
+        logger.warning(f"Strategy {strategy.get('strategy_id')} exits {exit_days} trading days before expiry, "
+                       f"before its entry at {entry_days}; no dates resolved")
+        return []
+
+    # Entries up to end belong to expiries up to entry_days trading days later
+    lookahead = end + timedelta(days=2 * entry_days + 14)
+    cycles = []
+    for expiry in expiry_dates(strategy.get('underlying', 'NIFTY'), strategy.get('expiry_type'), start, lookahead):
+        entry_date = trading_days_before(expiry, entry_days)
+        if start <= entry_date <= end:
+            cycles.append({
+                'expiry_date': expiry,
+                'entry_date': entry_date,
+                'exit_date': trading_days_before(expiry, exit_days),
+            })
+    return cycles
+
+
+def materialise_positional_schedules(table, user_id: str, strategy: Dict[str, Any], from_date: date,
+                                     horizon_days: int = POSITIONAL_HORIZON_DAYS) -> int:
+    """
+    Write the dated ENTRY / EXIT schedules of a positional strategy for the horizon.
+
+    Puts are idempotent, so extending an already materialised range rewrites the
+    same items.
+
+    Returns:
+        Number of dated schedules written
+    """
+    strategy_id = strategy['strategy_id']
+    until = from_date + timedelta(days=horizon_days)
+    cycles = positional_cycles(strategy, from_date, until)
+    now = datetime.now(timezone.utc).isoformat()
+
+    written = 0
+    with table.batch_writer(overwrite_by_pkeys=['user_id', 'sort_key']) as batch:
+        for cycle in cycles:
+            for execution_type, day, execution_time in (
+                ('ENTRY', cycle['entry_date'], strategy.get('entry_time')),
+                ('EXIT', cycle['exit_date'], strategy.get('exit_time')),
+            ):
+                key = dated_schedule_key(day, execution_time, execution_type, strategy_id)
+                batch.put_item(Item={
+                    'user_id': user_id,
+                    'sort_key': key,
+                    'strategy_id': strategy_id,
+                    'basket_id': strategy.get('basket_id'),
+                    'execution_time': execution_time,
+                    'weekday': _WEEKDAY_NAMES[day.weekday()],
+                    'execution_type': execution_type,
+                    'schedule_date': day.isoformat(),
+                    'expiry_date': cycle['expiry_date'].isoformat(),
+                    'status': 'ACTIVE',
+                    'entity_type': 'SCHEDULE',
+                    'created_at': now,
+                    'updated_at': now,
+                    'schedule_key': key,
+                    'ttl': int(datetime.combine(day + timedelta(days=2), time(), timezone.utc).timestamp()),
+                })
+                written += 1
+
+        batch.put_item(Item={
+            'user_id': user_id,
+            'sort_key': f"{POSITIONAL_PREFIX}{strategy_id}",
+            'entity_type': 'POSITIONAL_INDEX',
+            'strategy_id': strategy_id,
+            'basket_id': strategy.get('basket_id'),
+            'underlying': strategy.get('underlying'),
+            'expiry_type': strategy.get('expiry_type'),
+            'materialised_from': from_date.isoformat(),
+            'materialised_until': until.isoformat(),
+            'next_expiry': cycles[0]['expiry_date'].isoformat() if cycles else None,
+            'updated_at': now,
+        })
+
+    logger.info(f"Materialised {len(cycles)} expiry cycles ({written} dated schedules) "
+                f"for positional strategy {strategy_id} until {until.isoformat()}")
+    return written
+
+
+def remove_positional_schedules(table, user_id: str, strategy_id: str) -> int:
+    """Delete a strategy's dated schedules (weekday schedules are left alone)."""
+    query = {
+        'KeyConditionExpression': 'user_id = :user_id AND begins_with(sort_key, :prefix)',
+        'FilterExpression': 'strategy_id = :strategy_id AND attribute_exists(schedule_date)',
+        'ExpressionAttributeValues': {':user_id': user_id, ':prefix': 'SCHEDULE#', ':strategy_id': strategy_id},
+        'ProjectionExpression': 'user_id, sort_key',
+    }
+    keys = []
+    while True:
+        response = table.query(**query)
+        keys.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key={'user_id': key['user_id'], 'sort_key': key['sort_key']})
+    return len(keys)
+
+
+def query_positional_index(table, user_id: str) -> List[Dict[str, Any]]:
+    """POSITIONAL# items of a user (one per positional strategy)."""
+    query = {
+        'KeyConditionExpression': 'user_id = :user_id AND begins_with(sort_key, :prefix)',
+        'ExpressionAttributeValues': {':user_id': user_id, ':prefix': POSITIONAL_PREFIX},
+    }
+    items = []
+    while True:
+        response = table.query(**query)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def extend_positional_horizons(table, user_id: str, trading_date: date,
+                               horizon_days: int = POSITIONAL_HORIZON_DAYS,
+                               index: Optional[List[Dict[str, Any]]] = None) -> int:
+    """
+    Re-materialise the positional strategies whose dated schedules run short.
+
+    Args:
+        index: The user's POSITIONAL# items when already read
+
+    Returns:
+        Number of strategies extended
+    """
+    threshold = (trading_date + timedelta(days=horizon_days // 3)).isoformat()
+    extended = 0
+
+    for entry in query_positional_index(table, user_id) if index is None else index:
+        if (entry.get('materialised_until') or '') >= threshold:
+            continue
+
+        strategy = table.get_item(
+            Key={'user_id': user_id, 'sort_key': f"STRATEGY#{entry['strategy_id']}"}
+        ).get('Item')
+        if not strategy or not is_positional(strategy) or strategy.get('status', 'ACTIVE') != 'ACTIVE':
+            continue
+
+        materialise_positional_schedules(table, user_id, strategy, trading_date, horizon_days)
+        extended += 1
+
+    return extended
+
+
+def carry_forward_positions(history_table, user_id: str, trading_date: date,
+                            positional_strategy_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Overnight reconciliation: move the previous trading day's open positional
+    positions into today's position rows.
+
+    Position rows are keyed {YYYY-MM-DD}#... in execution history, so the risk
+    handlers only see a day's rows. For each OPEN row of the previous trading day:
+    - positional strategy, contract not yet expired: copied to today's key
+      (carried_from, carry_count, previous_close) and marked CARRIED_FORWARD
+    - contract expired: marked EXPIRED (settled by the exchange, nothing to carry)
+    - intraday strategy: left as is and counted as unreconciled
+
+    Returns:
+        Counts of carried, expired and unreconciled rows
+    """
+    positional = set(positional_strategy_ids)
+    previous_day = previous_trading_day(trading_date)
+    today = trading_date.isoformat()
+    counts = {'carried': 0, 'expired': 0, 'unreconciled': 0}
+
+    for row in open_positions(history_table, user_id, previous_day):
+        if row.get('strategy_id') not in positional:
+            counts['unreconciled'] += 1
+            logger.warning(f"Intraday position {row['execution_key']} of user {user_id} still OPEN overnight")
+            continue
+
+        expiry = row.get('expiry_date') or row.get('expiry')
+        if expiry and str(expiry) < today:
+            _mark(history_table, row, EXPIRED, None)
+            counts['expired'] += 1
+            continue
+
+        carried_key = f"{today}#{row['execution_key'].split('#', 1)[1]}"
+        carried = dict(row, execution_key=carried_key, carried_from=previous_day.isoformat(),
+                       carry_count=int(row.get('carry_count', 0)) + 1,
+                       previous_close=row.get('current_price', row.get('entry_price')))
+        try:
+            history_table.put_item(Item=carried, ConditionExpression='attribute_not_exists(execution_key)')
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Already carried by an earlier run
+        _mark(history_table, row, CARRIED_FORWARD, carried_key)
+        counts['carried'] += 1
+
+    if any(counts.values()):
+        logger.info(f"Overnight reconciliation for user {user_id} ({previous_day.isoformat()} -> {today}): {counts}")
+    return counts
+
+
+def open_positions(history_table, user_id: str, day: date) -> List[Dict[str, Any]]:
+    """OPEN position rows of a user's trading day in execution history (execution_key {YYYY-MM-DD}#...)."""
+    query = {
+        'KeyConditionExpression': 'user_id = :user_id AND begins_with(execution_key, :prefix)',
+        'FilterExpression': '#status = :open',
+        'ExpressionAttributeNames': {'#status': 'position_status'},
+        'ExpressionAttributeValues': {':user_id': user_id, ':prefix': f"{day.isoformat()}#", ':open': 'OPEN'},
+    }
+    rows = []
+    while True:
+        response = history_table.query(**query)
+        rows.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return rows
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _mark(history_table, row: Dict[str, Any], status: str, carried_to: Optional[str]) -> None:
+    history_table.update_item(
+        Key={'user_id': row['user_id'], 'execution_key': row['execution_key']},
+        UpdateExpression='SET #status = :status, carried_to = :carried_to, reconciled_at = :now',
+        ExpressionAttributeNames={'#status': 'position_status'},
+        ExpressionAttributeValues={
+            ':status': status,
+            ':carried_to': carried_to,
+            ':now': datetime.now(timezone.utc).isoformat(),
+        }
+    )
@@ -0,0 +1,303 @@
+"""
+🔥 PRE-MARKET WARM-UP HANDLER
+
+Handles the Warmup.PreMarket.Triggered global event, emitted once by the
+event emitter during the PRE_MARKET phase (09:05 IST), by fanning out one
+Warmup.User.Triggered event per active user back to this handler, so users
+are warmed in parallel invocations rather than one after another.
+
+The first minutes after the 09:15 open are when every executor loads its
+strategy, allocations and broker credentials at the same moment. Ahead of
+that, for each user the handler:
+
+- Extends the dated schedules of positional strategies and carries their open
+  positions over from the previous session (positional_schedule.py)
+- Compiles today's schedule plan (schedule_plan.py) and reads the ENTRY
+  schedules of the opening window (09:15-09:30) from it
+- Loads each strategy and its active basket allocations once and stores them
+  as a WARM_STRATEGY#<strategy_id> snapshot, which the single strategy
+  executor uses instead of its own queries until the window closes
+- Validates the broker session of every allocated account (credentials in
+  Secrets Manager plus a broker connect) and records the outcome as a
+  BROKER_SESSION#<broker>#<client_id> item, so expired tokens surface
+  before the open rather than as fallbacks to paper trading at 09:15
+
+Strategy updates and deletes drop the snapshot (see strategy_manager_phase1).
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List
+from decimal import Decimal
+
+import boto3
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from trading import TradingMode, get_trading_strategy
+from event_emitter import query_active_users_for_execution_time
+from strategy_entry_handler import query_due_entry_schedules, get_weekday_abbr
+from schedule_plan import compile_schedule_plan
+from positional_schedule import carry_forward_positions, extend_positional_horizons, query_positional_index
+from single_strategy_executor import (
+    WARM_STRATEGY_PREFIX, get_broker_credentials, get_complete_strategy_data,
+    query_basket_broker_allocations,
+)
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Opening window whose entries are prefetched
+MARKET_OPEN_TIME = os.environ.get('MARKET_OPEN_TIME', '09:15')
+WARM_WINDOW_MINUTES = int(os.environ.get('WARM_WINDOW_MINUTES', '15'))
+
+# Snapshots and session records are kept a day past the window for inspection
+WARMUP_TTL_SECONDS = 24 * 60 * 60
+
+BROKER_SESSION_PREFIX = 'BROKER_SESSION#'
+
+USER_WARMUP_DETAIL_TYPE = 'Warmup.User.Triggered'
+
+# EventBridge accepts at most 10 entries per PutEvents call
+EVENTS_BATCH_SIZE = 10
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Fan the pre-market warm-up out per active user, or warm up one user.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', {})
+        current_ist = datetime.now(timezone.utc).astimezone(IST)
+        market_open_time = detail.get('market_open_time', MARKET_OPEN_TIME)
+        market_open = get_market_open(current_ist, market_open_time)
+        window_minutes = int(detail.get('warm_window_minutes', WARM_WINDOW_MINUTES))
+
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+
+        if event.get('detail-type') == USER_WARMUP_DETAIL_TYPE:
+            result = warm_up_user(table, detail['user_id'], market_open, window_minutes)
+            return create_success_response({'user_id': detail['user_id'], **result})
+
+        user_profiles_table = dynamodb.Table(os.environ['USER_PROFILES_TABLE'])
+        user_ids = query_active_users_for_execution_time(
+            user_profiles_table, market_open.strftime('%H:%M'), get_weekday_abbr(market_open)
+        )
+
+        summary = emit_user_warmup_events(table, user_ids, market_open, market_open_time, window_minutes)
+        logger.info(f"🔥 Pre-market warm-up fanned out: {summary}")
+        return create_success_response(summary)
+
+    except Exception as e:
+        logger.error(f"Error in Pre-market Warm-up Handler: {str(e)}")
+        return create_error_response(str(e))
+
+
+def emit_user_warmup_events(table, user_ids: List[str], market_open: datetime, market_open_time: str,
+                            window_minutes: int) -> Dict[str, Any]:
+    """
+    Emit one Warmup.User.Triggered event per user.
+
+    Users whose event EventBridge did not accept are warmed up in this
+    invocation instead, so nobody misses the opening window.
+
+    Returns:
+        Dict with users, events_emitted and warmed_inline counts
+    """
+    failed_user_ids = []
+    emitted = 0
+
+    for start in range(0, len(user_ids), EVENTS_BATCH_SIZE):
+        batch = user_ids[start:start + EVENTS_BATCH_SIZE]
+        entries = [{
+            'Source': 'qlalgo.options.trading',
+            'DetailType': USER_WARMUP_DETAIL_TYPE,
+            'Detail': json.dumps({
+                'user_id': user_id,
+                'market_open_time': market_open_time,
+                'warm_window_minutes': window_minutes,
+            }),
+            'Time': datetime.now(timezone.utc)
+        } for user_id in batch]
+
+        try:
+            response = eventbridge_client.put_events(Entries=entries)
+            results = response.get('Entries') or [{}] * len(batch)
+            failed = [user_id for user_id, entry in zip(batch, results) if entry.get('ErrorCode')]
+        except Exception as e:
+            logger.error(f"❌ Error emitting warm-up events: {str(e)}")
+            failed = batch
+
+        emitted += len(batch) - len(failed)
+        failed_user_ids.extend(failed)
+
+    for user_id in failed_user_ids:
+        try:
+            warm_up_user(table, user_id, market_open, window_minutes)
+        except Exception as e:
+            logger.error(f"❌ Inline warm-up failed for user {user_id}: {str(e)}")
+
+    return {'users': len(user_ids), 'events_emitted': emitted, 'warmed_inline': len(failed_user_ids)}
+
+
+def get_market_open(current_ist: datetime, market_open_time: str) -> datetime:
+    """Today's market open as an IST datetime."""
+    hour, minute = (int(part) for part in market_open_time.split(':'))
+    return current_ist.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def warm_up_user(table, user_id: str, market_open: datetime, window_minutes: int) -> Dict[str, Any]:
+    """
+    Snapshot a user's opening-window strategies and validate their broker sessions.
+
+    Returns:
+        Dict with strategies_warmed and sessions ({"broker#client": status})
+    """
+    valid_until = market_open + timedelta(minutes=window_minutes)
+
+    prepare_positional_day(table, user_id, market_open.date())
+
+    # Daily compile of the minute plan; the opening window is then read from it
+    compile_schedule_plan(table, user_id, market_open.date())
+    schedules = query_due_entry_schedules(user_id, market_open, window_minutes)
+
+    warmed = 0
+    accounts = set()
+    for strategy_id in dict.fromkeys(s.get('strategy_id') for s in schedules if s.get('strategy_id')):
+        strategy = get_complete_strategy_data(table, user_id, strategy_id)
+        if not strategy or not strategy.get('basket_id'):
+            continue
+
+        allocations = query_basket_broker_allocations(table, strategy['basket_id'])
+        put_warm_strategy_snapshot(table, user_id, strategy, allocations, valid_until)
+        warmed += 1
+
+        accounts.update(
+            (a.get('broker_name'), a.get('client_id')) for a in allocations
+            if a.get('broker_name') and a.get('broker_name') != 'paper' and a.get('client_id')
+        )
+
+    sessions = {}
+    for broker_name, client_id in sorted(accounts):
+        status = validate_broker_session(user_id, broker_name, client_id)
+        put_broker_session_status(table, user_id, broker_name, client_id, status, market_open)
+        sessions[f'{broker_name}#{client_id}'] = status
+
+    logger.info(f"🔥 Warmed {warmed} strategies and {len(sessions)} broker sessions for user {user_id}")
+    return {'strategies_warmed': warmed, 'sessions': sessions}
+
+
+def prepare_positional_day(table, user_id: str, trading_date) -> Dict[str, int]:
+    """
+    Extend the dated schedules of the user's positional strategies and carry
+    their open positions into today (overnight reconciliation).
+    """
+    try:
+        index = query_positional_index(table, user_id)
+        if not index:
+            return {}
+
+        extend_positional_horizons(table, user_id, trading_date, index=index)
+        history_table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        return carry_forward_positions(history_table, user_id, trading_date,
+                                       [entry['strategy_id'] for entry in index])
+
+    except Exception as e:
+        logger.warning(f"Positional preparation failed for user {user_id}: {str(e)}")
+        return {}
+
+
+def put_warm_strategy_snapshot(table, user_id: str, strategy: Dict, allocations: List[Dict],
+                               valid_until: datetime) -> None:
+    """Store a strategy with its basket allocations for the executor's opening-window runs."""
+    now = datetime.now(timezone.utc)
+    table.put_item(Item={
+        'user_id': user_id,
+        'sort_key': f"{WARM_STRATEGY_PREFIX}{strategy['strategy_id']}",
+        'entity_type': 'WARM_STRATEGY',
+        'strategy_id': strategy['strategy_id'],
+        'basket_id': strategy['basket_id'],
+        'strategy': strategy,
+        'allocations': allocations,
+        'warmed_at': now.isoformat(),
+        'valid_until': valid_until.astimezone(timezone.utc).isoformat(),
+        'ttl': int(valid_until.timestamp()) + WARMUP_TTL_SECONDS,
+    })
+
+
+def validate_broker_session(user_id: str, broker_name: str, client_id: str) -> str:
+    """
+    Check that a broker account can trade today.
+
+    Returns:
+        VALID, INVALID (credentials rejected by the broker) or MISSING (no credentials)
+    """
+    credentials = get_broker_credentials(user_id, client_id, broker_name)
+    if not credentials:
+        logger.warning(f"⚠️ No {broker_name} credentials for client {client_id} (user {user_id})")
+        return 'MISSING'
+
+    try:
+        connected = get_trading_strategy(broker_name, TradingMode.LIVE).connect(credentials)
+    except Exception as e:
+        logger.warning(f"⚠️ {broker_name} connect failed for client {client_id}: {str(e)}")
+        connected = False
+
+    if not connected:
+        logger.warning(f"⚠️ {broker_name} session for client {client_id} (user {user_id}) is not valid")
+        return 'INVALID'
+    return 'VALID'
+
+
+def put_broker_session_status(table, user_id: str, broker_name: str, client_id: str,
+                              status: str, market_open: datetime) -> None:
+    """Record the pre-market session check of a broker account."""
+    table.put_item(Item={
+        'user_id': user_id,
+        'sort_key': f'{BROKER_SESSION_PREFIX}{broker_name}#{client_id}',
+        'entity_type': 'BROKER_SESSION',
+        'broker_name': broker_name,
+        'client_id': client_id,
+        'session_status': status,
+        'trading_date': market_open.date().isoformat(),
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+        'ttl': int(market_open.timestamp()) + WARMUP_TTL_SECONDS,
+    })
+
+
+def create_success_response(summary: Dict) -> Dict:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'success': True,
+            'result': summary
+        }, cls=DecimalEncoder)
+    }
+
+
+def create_error_response(error: str) -> Dict:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'success': False,
+            'error': error
+        })
+    }
@@ -0,0 +1,265 @@
+"""
+🔁 RETRY SCHEDULER
+
+Schedules retries of failed strategy legs so they are only touched when due.
+
+- Delays up to 15 minutes ride on the retry queue's per-message DelaySeconds
+- Longer delays go into a time-bucketed retry index in execution history
+  (RETRY_INDEX#<bucket>), swept into the queue shortly before they come due
+- Due retries are re-emitted as Strategy.Execution.Triggered events, at most
+  BROKER_RETRY_CONCURRENCY per broker per batch; the overflow is deferred
+
+A retry re-runs the scheduled execution with the original execution_time for
+the retryable failed legs only (failed_leg_ids); legs that filled or failed for
+good are left alone, and the bridge's idempotency keys answer any repeat.
+"""
+
+import json
+import os
+import sys
+import uuid
+import boto3
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional
+from decimal import Decimal
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+
+from shared_utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
+eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+MAX_RETRY_ATTEMPTS = int(os.environ.get('MAX_RETRY_ATTEMPTS', '3'))
+RETRY_BASE_DELAY_SECONDS = int(os.environ.get('RETRY_BASE_DELAY_SECONDS', '60'))
+
+# SQS caps per-message DelaySeconds at 15 minutes
+MAX_QUEUE_DELAY_SECONDS = 900
+
+# Retry index partitions; the sweep reads at most four buckets per run
+RETRY_INDEX_BUCKET_MINUTES = 10
+RETRY_INDEX_TTL_SECONDS = 2 * 24 * 60 * 60
+
+# Retries released per broker per batch; the rest wait RETRY_DEFER_SECONDS
+BROKER_RETRY_CONCURRENCY = {
+    'zerodha': 5,
+    'zebu': 5,
+}
+DEFAULT_BROKER_RETRY_CONCURRENCY = int(os.environ.get('BROKER_RETRY_CONCURRENCY', '5'))
+RETRY_DEFER_SECONDS = 30
+
+# Failures a retry cannot fix
+NON_RETRYABLE_REASONS = ['INSUFFICIENT_FUNDS', 'INVALID_SYMBOL', 'MARKET_CLOSED', 'INVALID_QUANTITY']
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def retry_delay_seconds(retry_number: int) -> int:
+    """Exponential backoff: 1, 2, 4, ... minutes for retry 1, 2, 3, ..."""
+    return RETRY_BASE_DELAY_SECONDS * 2 ** max(retry_number - 1, 0)
+
+
+def is_retryable(failure_reason: Optional[str]) -> bool:
+    reason = (failure_reason or '').upper()
+    return not any(non_retryable in reason for non_retryable in NON_RETRYABLE_REASONS)
+
+
+def retry_bucket(due_at: datetime) -> str:
+    """Retry index partition for a due time (UTC, floored to the bucket size)."""
+    due_utc = due_at.astimezone(timezone.utc)
+    floored = due_utc.replace(minute=due_utc.minute - due_utc.minute % RETRY_INDEX_BUCKET_MINUTES,
+                              second=0, microsecond=0)
+    return floored.strftime('%Y-%m-%dT%H:%M')
+
+
+def schedule_retry(retry: Dict[str, Any], now: Optional[datetime] = None,
+                   delay_seconds: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Schedule one retry of a strategy execution.
+
+    Args:
+        retry: Strategy.Execution.Triggered detail plus retry_number and failure_reason
+        now: Current time (default now, UTC)
+        delay_seconds: Override the backoff delay (used when deferring)
+
+    Returns:
+        Dict with mechanism (SQS_DELAY or RETRY_INDEX), due_at and delay_seconds
+    """
+    now = now or datetime.now(timezone.utc)
+    if delay_seconds is None:
+        delay_seconds = retry_delay_seconds(int(retry.get('retry_number', 1)))
+    due_at = now + timedelta(seconds=delay_seconds)
+    retry = {**retry, 'retry_id': retry.get('retry_id') or str(uuid.uuid4()), 'due_at': due_at.isoformat()}
+
+    if delay_seconds <= MAX_QUEUE_DELAY_SECONDS:
+        send_to_retry_queue(retry, delay_seconds)
+        mechanism = 'SQS_DELAY'
+    else:
+        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        table.put_item(Item=json.loads(json.dumps({
+            'user_id': f'RETRY_INDEX#{retry_bucket(due_at)}',
+            'execution_key': f"{_index_time(due_at)}#{retry['retry_id']}",
+            'record_type': 'RETRY_INDEX',
+            'retry': retry,
+            'ttl': int(due_at.timestamp()) + RETRY_INDEX_TTL_SECONDS
+        }, cls=DecimalEncoder), parse_float=Decimal))
+        mechanism = 'RETRY_INDEX'
+
+    logger.info(f"Scheduled retry #{retry.get('retry_number')} of {retry.get('strategy_id')} "
+                f"for {retry.get('user_id')} via {mechanism}, due {due_at.isoformat()}")
+    return {'retry_id': retry['retry_id'], 'mechanism': mechanism,
+            'due_at': due_at.isoformat(), 'delay_seconds': delay_seconds}
+
+
+def send_to_retry_queue(retry: Dict[str, Any], delay_seconds: int) -> None:
+    sqs_client.send_message(
+        QueueUrl=os.environ['RETRY_QUEUE_URL'],
+        MessageBody=json.dumps(retry, cls=DecimalEncoder),
+        DelaySeconds=max(0, min(int(delay_seconds), MAX_QUEUE_DELAY_SECONDS))
+    )
+
+
+def release_due_retries(now: Optional[datetime] = None) -> int:
+    """
+    Move retry index entries due within the queue's delay range onto the queue.
+
+    Reads only the buckets between the previous one and the queue horizon. Each
+    entry is deleted before it is queued, so overlapping sweeps cannot release
+    it twice.
+
+    Returns:
+        Number of retries released
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = (now + timedelta(seconds=MAX_QUEUE_DELAY_SECONDS)).astimezone(timezone.utc)
+    table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+    # One bucket back catches entries a missed sweep left behind
+    buckets = []
+    cursor = now - timedelta(minutes=RETRY_INDEX_BUCKET_MINUTES)
+    while retry_bucket(cursor) <= retry_bucket(horizon):
+        buckets.append(retry_bucket(cursor))
+        cursor += timedelta(minutes=RETRY_INDEX_BUCKET_MINUTES)
+
+    released = 0
+    for bucket in buckets:
+        for item in _bucket_entries(table, bucket, horizon):
+            deleted = table.delete_item(
+                Key={'user_id': item['user_id'], 'execution_key': item['execution_key']},
+                ReturnValues='ALL_OLD'
+            )
+            if 'Attributes' not in deleted:
+                continue
+
+            retry = json.loads(json.dumps(item['retry'], cls=DecimalEncoder))
+            due_at = datetime.fromisoformat(retry['due_at'])
+            send_to_retry_queue(retry, int((due_at - now).total_seconds()))
+            released += 1
+
+    if released:
+        logger.info(f"Released {released} retries from buckets {', '.join(buckets)}")
+    return released
+
+
+def _bucket_entries(table, bucket: str, horizon: datetime) -> List[Dict[str, Any]]:
+    """Retry index entries of a bucket due by horizon, across result pages."""
+    query = {
+        'KeyConditionExpression': 'user_id = :bucket AND execution_key <= :horizon',
+        'ExpressionAttributeValues': {':bucket': f'RETRY_INDEX#{bucket}', ':horizon': _index_time(horizon)},
+    }
+    items = []
+    while True:
+        response = table.query(**query)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def dispatch_due_retries(retries: List[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Re-emit due retries as strategy execution events, bounded per broker.
+
+    Returns:
+        Dict with dispatched and deferred counts
+    """
+    now = now or datetime.now(timezone.utc)
+    released_per_broker: Dict[str, int] = {}
+    dispatched = []
+    deferred = 0
+
+    for retry in retries:
+        broker = (retry.get('broker_name') or 'paper').lower()
+        limit = BROKER_RETRY_CONCURRENCY.get(broker, DEFAULT_BROKER_RETRY_CONCURRENCY)
+        if released_per_broker.get(broker, 0) >= limit:
+            schedule_retry(retry, now, delay_seconds=RETRY_DEFER_SECONDS)
+            deferred += 1
+            continue
+
+        released_per_broker[broker] = released_per_broker.get(broker, 0) + 1
+        dispatched.append({
+            'Source': 'qlalgo.options.trading',
+            'DetailType': 'Strategy.Execution.Triggered',
+            'Detail': json.dumps({
+                **retry,
+                'execution_event_id': str(uuid.uuid4()),
+                'source': 'retry_scheduler',
+                'emitted_at': now.isoformat()
+            }, cls=DecimalEncoder),
+            'Time': now
+        })
+
+    # PutEvents accepts up to 10 entries per call
+    for start in range(0, len(dispatched), 10):
+        eventbridge_client.put_events(Entries=dispatched[start:start + 10])
+
+    if deferred:
+        logger.info(f"Deferred {deferred} retries by {RETRY_DEFER_SECONDS}s (per-broker limits {released_per_broker})")
+    return {'dispatched': len(dispatched), 'deferred': deferred}
+
+
+def _index_time(moment: datetime) -> str:
+    """Fixed-width UTC timestamp so retry index keys sort by due time."""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def schedule_failed_execution_retry(execution_detail: Dict[str, Any], failed_legs: List[Dict[str, Any]],
+                                    now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Schedule the next retry of an execution whose legs failed.
+
+    Only the retryable legs are retried; the retry carries their ids as
+    failed_leg_ids and single_strategy_executor runs just those legs.
+
+    Args:
+        execution_detail: The Strategy.Execution.Triggered detail that ran
+        failed_legs: Leg results that were rejected or errored (leg_id, message)
+
+    Returns:
+        schedule_retry result, or None if retries are exhausted or no failure is retryable
+    """
+    retry_number = int(execution_detail.get('retry_number', 0)) + 1
+    if retry_number > MAX_RETRY_ATTEMPTS:
+        logger.warning(f"Retries exhausted for {execution_detail.get('strategy_id')} "
+                       f"({MAX_RETRY_ATTEMPTS} attempts)")
+        return None
+
+    retryable = [leg for leg in failed_legs if is_retryable(leg.get('message'))]
+    if not retryable:
+        logger.info(f"No retryable leg failures for {execution_detail.get('strategy_id')}")
+        return None
+
+    return schedule_retry({
+        **{k: v for k, v in execution_detail.items() if k not in ('retry_id', 'due_at')},
+        'retry_number': retry_number,
+        'failure_reason': '; '.join(str(leg.get('message')) for leg in retryable)[:500],
+        'failed_leg_ids': sorted({leg.get('leg_id') for leg in retryable if leg.get('leg_id')})
+    }, now)
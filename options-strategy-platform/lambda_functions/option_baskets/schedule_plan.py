@@ -0,0 +1,271 @@
+"""
+Schedule Plan
+Precompiled per-day execution plan replacing per-minute schedule discovery
+
+Storage (trading configurations table, user partition):
+- SCHEDULE_PLAN#{date}#{HH}: the user's ACTIVE schedules for one hour of the day,
+  keyed by execution minute ("09:20" -> [schedule, ...])
+- SCHEDULE_PLAN#{date}#META: plan generation; bumped whenever a schedule changes
+
+A plan is compiled once per user per day (by the pre-market warm-up, or lazily
+on the first read that finds it missing) from a single UserScheduleDiscovery
+query for the weekday. Dated schedules of positional strategies share the
+weekday prefix (see positional_schedule.py) and are kept only on their date. The minute path then reads the META item and the hour
+shard(s) covering its window in one BatchGetItem instead of re-querying the GSI.
+
+ENTRY schedules of range breakout strategies also carry the strategy's
+underlying and range_breakout_time, read from the STRATEGY# items in the same
+compile, so the entry path never reads strategy items per minute. Strategy
+updates touching those fields invalidate the plan.
+
+Shards carry the generation they were compiled from. Invalidation only bumps
+the META generation, so a plan compiled before a schedule change (even one
+still being written) is never served afterwards; the next read recompiles.
+"""
+
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+PLAN_PREFIX = 'SCHEDULE_PLAN#'
+META_SHARD = 'META'
+PLAN_TTL_SECONDS = 2 * 24 * 60 * 60
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Schedule fields carried into the plan (same as the discovery projections)
+PLAN_FIELDS = ('strategy_id', 'basket_id', 'execution_time', 'execution_type', 'weekday',
+               'sort_key', 'schedule_key', 'schedule_date', 'expiry_date')
+
+# Strategy fields carried on ENTRY schedules of range breakout strategies
+BREAKOUT_FIELDS = ('underlying', 'range_breakout_time')
+
+_WEEKDAY_ABBR = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
+
+
+def plan_sort_key(trading_date: date, shard: str) -> str:
+    """Sort key of a plan item; shard is a two-digit hour or META."""
+    return f'{PLAN_PREFIX}{trading_date.isoformat()}#{shard}'
+
+
+def ist_today() -> date:
+    return datetime.now(timezone.utc).astimezone(IST).date()
+
+
+def _window_shards(start: datetime, end: datetime) -> List[Tuple[date, str]]:
+    """(date, hour) shards covering every minute from start to end inclusive."""
+    shards = []
+    moment = start.replace(second=0, microsecond=0)
+    while moment <= end:
+        shard = (moment.date(), moment.strftime('%H'))
+        if shard not in shards:
+            shards.append(shard)
+        moment = (moment + timedelta(hours=1)).replace(minute=0)
+    return shards
+
+
+def _query_day_schedules(table, user_id: str, weekday: str) -> List[Dict[str, Any]]:
+    """All ACTIVE schedules of a user for one weekday from UserScheduleDiscovery."""
+    query_kwargs = {
+        'IndexName': 'UserScheduleDiscovery',
+        'KeyConditionExpression': 'user_id = :user_id AND begins_with(schedule_key, :prefix)',
+        'FilterExpression': '#status = :active',
+        'ExpressionAttributeValues': {
+            ':user_id': user_id,
+            ':prefix': f'SCHEDULE#{weekday}#',
+            ':active': 'ACTIVE'
+        },
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ProjectionExpression': ', '.join(PLAN_FIELDS),
+    }
+
+    schedules = []
+    while True:
+        response = table.query(**query_kwargs)
+        schedules.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return schedules
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _range_breakout_settings(table, user_id: str, strategy_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Breakout fields of the strategies with range_breakout enabled, in batched reads."""
+    client = table.meta.client
+    settings = {}
+    for start in range(0, len(strategy_ids), 100):
+        request = {table.name: {
+            'Keys': [{'user_id': user_id, 'sort_key': f'STRATEGY#{sid}'} for sid in strategy_ids[start:start + 100]],
+            'ProjectionExpression': 'strategy_id, range_breakout, ' + ', '.join(BREAKOUT_FIELDS),
+        }}
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table.name, []):
+                if item.get('range_breakout') and item.get('range_breakout_time'):
+                    settings[item['strategy_id']] = {field: item.get(field) for field in BREAKOUT_FIELDS}
+            request = response.get('UnprocessedKeys') or None
+    return settings
+
+
+def _schedule_date(schedule: Dict[str, Any]) -> Optional[str]:
+    """
+    Date a dated schedule is due on, None for weekly schedules.
+
+    The discovery GSI does not project schedule_date, so the date suffix of the
+    schedule key (see positional_schedule.dated_schedule_key) is used without it.
+    """
+    if schedule.get('schedule_date'):
+        return schedule['schedule_date']
+    parts = (schedule.get('schedule_key') or '').split('#')
+    if len(parts) <= 5:
+        return None
+    try:
+        return date.fromisoformat(parts[-1]).isoformat()
+    except ValueError:
+        return None
+
+
+def _plan_generation(table, user_id: str, trading_date: date) -> int:
+    meta = table.get_item(
+        Key={'user_id': user_id, 'sort_key': plan_sort_key(trading_date, META_SHARD)},
+        ConsistentRead=True
+    ).get('Item')
+    return int((meta or {}).get('generation', 0))
+
+
+def compile_schedule_plan(table, user_id: str, trading_date: date) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    Materialise a user's execution plan for one trading day.
+
+    Writes all 24 hour shards (empty ones included, so a quiet hour is not
+    recompiled on every read), stamped with the current plan generation.
+
+    Returns:
+        Hour shard -> {execution minute -> [schedule, ...]}
+    """
+    generation = _plan_generation(table, user_id, trading_date)
+    weekday = _WEEKDAY_ABBR[trading_date.weekday()]
+    schedules = _query_day_schedules(table, user_id, weekday)
+    breakouts = _range_breakout_settings(table, user_id, sorted({
+        s['strategy_id'] for s in schedules if s.get('execution_type') == 'ENTRY' and s.get('strategy_id')
+    }))
+
+    shards: Dict[str, Dict[str, List[Dict]]] = {f'{hour:02d}': {} for hour in range(24)}
+    for schedule in schedules:
+        execution_time = schedule.get('execution_time') or ''
+        if execution_time[:2] not in shards:
+            continue
+        schedule_date = _schedule_date(schedule)
+        if schedule_date not in (None, trading_date.isoformat()):
+            continue
+        entry = {field: schedule[field] for field in PLAN_FIELDS if schedule.get(field) is not None}
+        if schedule_date:
+            entry['schedule_date'] = schedule_date
+        if entry.get('execution_type') == 'ENTRY':
+            entry.update(breakouts.get(entry.get('strategy_id'), {}))
+        shards[execution_time[:2]].setdefault(execution_time, []).append(entry)
+
+    compiled_at = datetime.now(timezone.utc)
+    with table.batch_writer() as batch:
+        for hour, minutes in shards.items():
+            batch.put_item(Item={
+                'user_id': user_id,
+                'sort_key': plan_sort_key(trading_date, hour),
+                'entity_type': 'SCHEDULE_PLAN',
+                'trading_date': trading_date.isoformat(),
+                'generation': generation,
+                'minutes': minutes,
+                'entry_count': sum(len(entries) for entries in minutes.values()),
+                'compiled_at': compiled_at.isoformat(),
+                'ttl': int(compiled_at.timestamp()) + PLAN_TTL_SECONDS,
+            })
+
+    logger.info(f"Compiled schedule plan for user {user_id} on {trading_date.isoformat()}: "
+                f"{len(schedules)} schedules (generation {generation})")
+    return shards
+
+
+def invalidate_schedule_plan(table, user_id: str, trading_date: Optional[date] = None) -> None:
+    """Mark a user's plan stale after a schedule change; the next read recompiles it."""
+    trading_date = trading_date or ist_today()
+    table.update_item(
+        Key={'user_id': user_id, 'sort_key': plan_sort_key(trading_date, META_SHARD)},
+        UpdateExpression='ADD generation :one SET entity_type = :entity_type, #ttl = :ttl',
+        ExpressionAttributeNames={'#ttl': 'ttl'},
+        ExpressionAttributeValues={
+            ':one': 1,
+            ':entity_type': 'SCHEDULE_PLAN',
+            ':ttl': int(datetime.now(timezone.utc).timestamp()) + PLAN_TTL_SECONDS,
+        }
+    )
+
+
+def _read_shards(table, user_id: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch plan items in one round trip."""
+    client = table.meta.client
+    items = {}
+    request = {
+        table.name: {
+            'Keys': [{'user_id': user_id, 'sort_key': key} for key in keys],
+            # A read right after an invalidation must see the new generation
+            'ConsistentRead': True
+        }
+    }
+
+    while request:
+        response = client.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(table.name, []):
+            items[item['sort_key']] = item
+        request = response.get('UnprocessedKeys') or None
+
+    return items
+
+
+def get_planned_schedules(table, user_id: str, start: datetime, end: datetime,
+                          execution_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Schedules due between start and end (IST, HH:MM inclusive) from the plan.
+
+    Reads the META item and covering shards in one BatchGetItem; a missing or
+    stale shard recompiles that day's plan.
+    """
+    shards = _window_shards(start, end)
+    keys = [plan_sort_key(day, hour) for day, hour in shards]
+    keys += [plan_sort_key(day, META_SHARD) for day in dict.fromkeys(day for day, _ in shards)]
+    items = _read_shards(table, user_id, keys)
+
+    compiled: Dict[date, Dict[str, Dict[str, List[Dict]]]] = {}
+    window_start, window_end = start.strftime('%H:%M'), end.strftime('%H:%M')
+    schedules = []
+
+    for day, hour in shards:
+        meta = items.get(plan_sort_key(day, META_SHARD)) or {}
+        shard = items.get(plan_sort_key(day, hour))
+
+        if shard is not None and int(shard.get('generation', 0)) == int(meta.get('generation', 0)):
+            minutes = shard.get('minutes') or {}
+        else:
+            if day not in compiled:
+                compiled[day] = compile_schedule_plan(table, user_id, day)
+            minutes = compiled[day][hour]
+
+        for minute, entries in minutes.items():
+            same_day_start = window_start if day == start.date() else '00:00'
+            same_day_end = window_end if day == end.date() else '23:59'
+            if not same_day_start <= minute <= same_day_end:
+                continue
+            schedules.extend(
+                entry for entry in entries
+                if execution_type is None or entry.get('execution_type') == execution_type
+            )
+
+    schedules.sort(key=lambda entry: (entry.get('execution_time', ''), entry.get('strategy_id', '')))
+    return schedules
@@ -2,7 +2,7 @@ import json
 import os
 import sys
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 import boto3
 
@@ -16,11 +16,22 @@ from shared_utils.logger import setup_logger, log_lambda_event
 
 logger = setup_logger(__name__)
 
+# Import precompiled schedule plan (falls back to per-minute GSI discovery)
+try:
+    from schedule_plan import get_planned_schedules
+    SCHEDULE_PLAN_AVAILABLE = True
+except ImportError:
+    logger.warning("Schedule plan not available - using per-minute GSI discovery")
+    SCHEDULE_PLAN_AVAILABLE = False
+
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
 sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+# Strategies per minute message; keeps the identifier list far below the 256 KB SQS limit
+STRATEGIES_PER_MESSAGE = 500
+
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
@@ -30,8 +41,9 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     1. Receives user-specific EventBridge event from event_emitter (every 3 minutes)
     2. Extracts user_id, weekday, trigger_time from event details
     3. Calculates 3-minute lookahead window (current+1, current+2, current+3)
-    4. For each minute: Uses ultra-fast GSI4 QUERY with user_id for strategies
-    5. Sends individual strategy messages to SQS for single strategy executor
+    4. Reads the window from the precompiled schedule plan (one keyed read);
+       falls back to a GSI4 QUERY per minute if the plan is unavailable
+    5. Sends one SQS message per execution minute (strategy ids and types) to the strategy scheduler
     6. Covers entire 3-minute window in single invocation
     
     PERFORMANCE: User-specific QUERY (not SCAN) = 100x faster discovery
@@ -75,21 +87,25 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
         logger.info(f"🕐 3-minute lookahead window: {execution_times} for user {user_id}")
 
-        # Discover strategies for all execution times in the 3-minute window
-        all_strategies = []
-        for execution_time_str in execution_times:
-            user_strategies = discover_user_strategies_for_schedule(
-                trading_table, user_id, execution_time_str, weekday
-            )
+        # Discover strategies for the whole window from the precompiled schedule plan
+        all_strategies = discover_planned_strategies(trading_table, user_id, trigger_time, lookahead_minutes)
+
+        # Plan unreadable: fall back to one GSI query per execution time
+        if all_strategies is None:
+            all_strategies = []
+            for execution_time_str in execution_times:
+                user_strategies = discover_user_strategies_for_schedule(
+                    trading_table, user_id, execution_time_str, weekday
+                )
 
-            # Add execution_time to each strategy for SQS message
-            for strategy in user_strategies:
-                strategy['scheduled_execution_time'] = execution_time_str
+                # Add execution_time to each strategy for SQS message
+                for strategy in user_strategies:
+                    strategy['scheduled_execution_time'] = execution_time_str
 
-            all_strategies.extend(user_strategies)
+                all_strategies.extend(user_strategies)
 
-            if user_strategies:
-                logger.info(f"📋 Found {len(user_strategies)} strategies for user {user_id} at {execution_time_str}")
+                if user_strategies:
+                    logger.info(f"📋 Found {len(user_strategies)} strategies for user {user_id} at {execution_time_str}")
 
         if not all_strategies:
             logger.info(f"📭 No strategies found for user {user_id} in 3-minute window {execution_times}")
@@ -119,84 +135,80 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
                 })
             }
 
-        # Send individual SQS message for each strategy across all execution times
-        for strategy in all_strategies:
-            try:
-                # Use the scheduled execution time for this specific strategy
-                scheduled_time = strategy.get('scheduled_execution_time', strategy['execution_time'])
-
-                # 🎯 LIGHTWEIGHT: Create minimal strategy message (60-80% smaller)
-                strategy_message = {
-                    'user_id': user_id,                    # ✅ Essential for strategy lookup
-                    'strategy_id': strategy['strategy_id'], # ✅ Essential for strategy lookup
-                    'execution_time': scheduled_time,       # ✅ Essential for timing
-                    'weekday': weekday,                     # ✅ Essential for validation
-                    'execution_type': strategy['execution_type'], # ✅ Entry vs Exit
-                    'market_phase': market_phase,           # ✅ Essential for execution priority
-                    'trigger_source': 'user_specific_3min_lookahead_discovery', # ✅ Tracing
-                    'timestamp': datetime.now(timezone.utc).isoformat(),        # ✅ Tracing
-                    'event_id': event_id,                   # ✅ Event correlation
-                    'lookahead_window': execution_times,    # ✅ Window information
-                    
-                    # ❌ REMOVED HEAVY DATA (loaded just-in-time at execution):
-                    # - strategy_data (contains legs, underlying, product) -> 60-80% size reduction
-                    # - strategy_name (available via strategy query)
-                }
-
-                # Send message to SQS for single strategy execution
-                response = sqs_client.send_message(
-                    QueueUrl=sqs_queue_url,
-                    MessageBody=json.dumps(strategy_message, default=str),
-                    MessageAttributes={
-                        'UserId': {
-                            'StringValue': user_id,
-                            'DataType': 'String'
-                        },
-                        'StrategyId': {
-                            'StringValue': strategy['strategy_id'],
-                            'DataType': 'String'
-                        },
-                        'ExecutionTime': {
-                            'StringValue': scheduled_time,
-                            'DataType': 'String'
-                        },
-                        'Weekday': {
-                            'StringValue': weekday,
-                            'DataType': 'String'
-                        },
-                        'ExecutionType': {
-                            'StringValue': strategy['execution_type'],
-                            'DataType': 'String'
-                        },
-                        'MarketPhase': {
-                            'StringValue': market_phase,
-                            'DataType': 'String'
-                        },
-                        'LookaheadWindow': {
-                            'StringValue': ','.join(execution_times),
-                            'DataType': 'String'
-                        }
+        # One SQS message per execution minute: the scheduler launches a whole minute as
+        # one Map batch no matter how its event source batches records
+        for scheduled_time, minute_strategies in group_by_execution_minute(all_strategies).items():
+            strategy_entries = [
+                {'strategy_id': strategy['strategy_id'], 'execution_type': strategy['execution_type']}
+                for strategy in minute_strategies
+            ]
+
+            for start in range(0, len(strategy_entries), STRATEGIES_PER_MESSAGE):
+                chunk = strategy_entries[start:start + STRATEGIES_PER_MESSAGE]
+                try:
+                    # 🎯 LIGHTWEIGHT: identifiers only, strategy data is loaded just-in-time
+                    minute_message = {
+                        'user_id': user_id,                    # ✅ Essential for strategy lookup
+                        'execution_time': scheduled_time,       # ✅ Essential for timing
+                        'weekday': weekday,                     # ✅ Essential for validation
+                        'market_phase': market_phase,           # ✅ Essential for execution priority
+                        'trigger_source': 'user_specific_3min_lookahead_discovery', # ✅ Tracing
+                        'timestamp': datetime.now(timezone.utc).isoformat(),        # ✅ Tracing
+                        'event_id': event_id,                   # ✅ Event correlation
+                        'lookahead_window': execution_times,    # ✅ Window information
+                        'strategies': chunk                     # ✅ strategy_id + execution_type per strategy
                     }
-                )
 
-                message_id = response.get('MessageId')
-                sqs_results.append({
-                    'strategy_id': strategy['strategy_id'],
-                    'scheduled_execution_time': scheduled_time,
-                    'status': 'success',
-                    'message_id': message_id,
-                    'execution_type': strategy['execution_type']
-                })
-
-                logger.info(f"✅ Strategy message sent to SQS: Strategy (ID: {strategy['strategy_id']}) scheduled for {scheduled_time}")
-
-            except Exception as e:
-                logger.error(f"❌ Error sending SQS message for strategy {strategy['strategy_id']}: {str(e)}")
-                sqs_results.append({
-                    'strategy_id': strategy['strategy_id'],
-                    'status': 'error',
-                    'error': str(e)
-                })
+                    response = sqs_client.send_message(
+                        QueueUrl=sqs_queue_url,
+                        MessageBody=json.dumps(minute_message, default=str),
+                        MessageAttributes={
+                            'UserId': {
+                                'StringValue': user_id,
+                                'DataType': 'String'
+                            },
+                            'ExecutionTime': {
+                                'StringValue': scheduled_time,
+                                'DataType': 'String'
+                            },
+                            'Weekday': {
+                                'StringValue': weekday,
+                                'DataType': 'String'
+                            },
+                            'MarketPhase': {
+                                'StringValue': market_phase,
+                                'DataType': 'String'
+                            },
+                            'StrategyCount': {
+                                'StringValue': str(len(chunk)),
+                                'DataType': 'Number'
+                            },
+                            'LookaheadWindow': {
+                                'StringValue': ','.join(execution_times),
+                                'DataType': 'String'
+                            }
+                        }
+                    )
+
+                    message_id = response.get('MessageId')
+                    sqs_results.extend({
+                        'strategy_id': entry['strategy_id'],
+                        'scheduled_execution_time': scheduled_time,
+                        'status': 'success',
+                        'message_id': message_id,
+                        'execution_type': entry['execution_type']
+                    } for entry in chunk)
+
+                    logger.info(f"✅ {len(chunk)} strategies sent to SQS for {scheduled_time}")
+
+                except Exception as e:
+                    logger.error(f"❌ Error sending SQS message for {scheduled_time}: {str(e)}")
+                    sqs_results.extend({
+                        'strategy_id': entry['strategy_id'],
+                        'scheduled_execution_time': scheduled_time,
+                        'status': 'error',
+                        'error': str(e)
+                    } for entry in chunk)
 
         # Calculate success metrics
         successful_messages = sum(1 for result in sqs_results if result.get('status') == 'success')
@@ -232,6 +244,44 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         }
 
 
+def group_by_execution_minute(strategies: List[Dict]) -> Dict[str, List[Dict]]:
+    """Strategies keyed by scheduled execution time (HH:MM), in time order."""
+    groups: Dict[str, List[Dict]] = {}
+    for strategy in strategies:
+        scheduled_time = strategy.get('scheduled_execution_time', strategy['execution_time'])
+        groups.setdefault(scheduled_time, []).append(strategy)
+    return dict(sorted(groups.items()))
+
+
+def discover_planned_strategies(trading_table, user_id: str, trigger_time: datetime,
+                                lookahead_minutes: int) -> Optional[List[Dict]]:
+    """
+    Strategies scheduled in the lookahead window (trigger+1 .. trigger+lookahead)
+    from the precompiled schedule plan, or None if the plan cannot be read.
+    """
+    if not SCHEDULE_PLAN_AVAILABLE:
+        return None
+
+    try:
+        schedules = get_planned_schedules(
+            trading_table, user_id,
+            trigger_time + timedelta(minutes=1),
+            trigger_time + timedelta(minutes=lookahead_minutes)
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Schedule plan unavailable for user {user_id}, using GSI discovery: {str(e)}")
+        return None
+
+    return [{
+        'user_id': user_id,
+        'strategy_id': schedule['strategy_id'],
+        'execution_time': schedule['execution_time'],
+        'execution_type': schedule.get('execution_type'),
+        'weekday': schedule.get('weekday'),
+        'scheduled_execution_time': schedule['execution_time'],
+    } for schedule in schedules]
+
+
 def discover_user_strategies_for_schedule(trading_table, user_id: str,
                                           execution_time: str, weekday: str) -> List[Dict]:
     """
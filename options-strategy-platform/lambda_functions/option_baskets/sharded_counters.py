@@ -0,0 +1,308 @@
+"""
+Sharded Counters
+Write-spread counters for hot items such as template subscriber counts and partner metrics
+
+Storage (trading configurations table):
+- COUNTER_SHARD#{counter_id}#{shard} / COUNTER: one item per shard, each on its own
+  partition key so a subscription burst spreads across COUNTER_SHARD_COUNT partitions
+
+- COUNTER_DIRTY#{shard} / {counter_id}: dirty marker of a shard holding pending values,
+  spread over the same COUNTER_SHARD_COUNT partitions as the shards
+
+Each increment ADDs to a random shard instead of the counted item and bumps that shard's
+dirty marker. Reads add the pending shard values to the counted item's own attribute, and
+the totals are cached in the warm container. compact_counter_shards(), run on a schedule,
+folds the shard values back into the counted item so it stays the long-term source of
+truth; it finds the shards to fold by key queries on the dirty markers, never a scan.
+
+COUNTER_SHARD_COUNT must only ever be increased while shards still hold pending values;
+reads and compaction only look at shards below the configured count.
+"""
+
+import os
+import random
+import time
+from decimal import Decimal
+from typing import Dict, Any, List, Tuple
+
+from botocore.exceptions import ClientError
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+SHARD_PARTITION_PREFIX = 'COUNTER_SHARD'
+SHARD_SORT_KEY = 'COUNTER'
+SHARD_RECORD_TYPE = 'COUNTER_SHARD'
+DIRTY_PARTITION_PREFIX = 'COUNTER_DIRTY'
+
+COUNTER_SHARD_COUNT = int(os.environ.get('COUNTER_SHARD_COUNT', '10'))
+COUNTER_CACHE_TTL_SECONDS = int(os.environ.get('COUNTER_CACHE_TTL_SECONDS', '15'))
+
+# Warm-container cache: counter_id -> (expires_at, {field: pending shard total})
+_COUNTER_CACHE: Dict[str, Tuple[float, Dict[str, int]]] = {}
+
+
+def shard_attribute(field: str) -> str:
+    """Flat shard attribute name for a (possibly nested) counted attribute path"""
+    return field.replace('.', '__')
+
+
+def shard_key(counter_id: str, shard: int) -> Dict[str, str]:
+    return {
+        'user_id': f'{SHARD_PARTITION_PREFIX}#{counter_id}#{shard:02d}',
+        'sort_key': SHARD_SORT_KEY
+    }
+
+
+def dirty_key(counter_id: str, shard: int) -> Dict[str, str]:
+    return {
+        'user_id': f'{DIRTY_PARTITION_PREFIX}#{shard:02d}',
+        'sort_key': counter_id
+    }
+
+
+def template_subscriber_counter(template_id: str, template_owner_id: str) -> Tuple[str, Dict[str, str]]:
+    """Counter id and counted item key for a template's subscriber_count"""
+    return f'TEMPLATE#{template_id}', {'user_id': template_owner_id, 'sort_key': f'BASKET#{template_id}'}
+
+
+def partner_metrics_counter(api_key_id: str) -> Tuple[str, Dict[str, str]]:
+    """Counter id and counted item key for a partner API key's metrics"""
+    return f'PARTNER_API_KEY#{api_key_id}', {'user_id': 'PARTNER', 'sort_key': f'PARTNER_API_KEY#{api_key_id}'}
+
+
+def _path_expression(field: str, alias: str, names: Dict[str, str]) -> str:
+    """Build '#a0.#a1' for a dotted attribute path, registering the names"""
+
+    parts = []
+    for index, part in enumerate(field.split('.')):
+        placeholder = f'#{alias}_{index}'
+        names[placeholder] = part
+        parts.append(placeholder)
+    return '.'.join(parts)
+
+
+def increment_sharded_counter(table, counter_id: str, target_key: Dict[str, str],
+                              deltas: Dict[str, int]) -> int:
+    """
+    ADD deltas to a random shard of counter_id
+
+    target_key is the key of the counted item; it is recorded on the shard so that
+    compaction knows where to fold the values. Returns the shard that was written.
+    """
+
+    shard = random.randrange(COUNTER_SHARD_COUNT)
+    names = {'#target_key': 'target_key', '#counter_id': 'counter_id', '#record_type': 'record_type'}
+    values = {':target_key': target_key, ':counter_id': counter_id, ':record_type': SHARD_RECORD_TYPE}
+    add_clauses = []
+
+    for index, (field, delta) in enumerate(deltas.items()):
+        names[f'#f{index}'] = shard_attribute(field)
+        values[f':d{index}'] = delta
+        add_clauses.append(f'#f{index} :d{index}')
+
+    table.update_item(
+        Key=shard_key(counter_id, shard),
+        UpdateExpression=(
+            'SET #target_key = :target_key, #counter_id = :counter_id, #record_type = :record_type '
+            'ADD ' + ', '.join(add_clauses)
+        ),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+    # Written after the shard: a marker never exists without the values it points at
+    table.update_item(
+        Key=dirty_key(counter_id, shard),
+        UpdateExpression='ADD #writes :one',
+        ExpressionAttributeNames={'#writes': 'writes'},
+        ExpressionAttributeValues={':one': 1}
+    )
+
+    _COUNTER_CACHE.pop(counter_id, None)
+    return shard
+
+
+def get_pending_counts(table, counter_id: str, fields: List[str]) -> Dict[str, int]:
+    """Sum of not-yet-compacted shard values per field, cached briefly per container"""
+
+    cached = _COUNTER_CACHE.get(counter_id)
+    if cached and cached[0] > time.monotonic() and all(f in cached[1] for f in fields):
+        return cached[1]
+
+    # The resource's client applies the same attribute (de)serialisation as Table
+    client = table.meta.client
+    totals = {field: 0 for field in fields}
+    request = {
+        table.name: {'Keys': [shard_key(counter_id, shard) for shard in range(COUNTER_SHARD_COUNT)]}
+    }
+
+    while request:
+        response = client.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(table.name, []):
+            for field in fields:
+                totals[field] += int(item.get(shard_attribute(field), 0))
+        request = response.get('UnprocessedKeys') or None
+
+    _COUNTER_CACHE[counter_id] = (time.monotonic() + COUNTER_CACHE_TTL_SECONDS, totals)
+    return totals
+
+
+def read_counter_total(table, counter_id: str, field: str, compacted_value: Any = 0) -> int:
+    """
+    Current counter value: the counted item's compacted value plus pending shard values
+
+    compacted_value is the attribute as read from the counted item.
+    """
+
+    pending = get_pending_counts(table, counter_id, [field])
+    return int(compacted_value or 0) + pending[field]
+
+
+def _fold_shard(table, shard_item: Dict[str, Any], pending: Dict[str, int]) -> bool:
+    """
+    Move a shard's values onto its counted item in one transaction
+
+    The shard update is conditioned on the values read, so an increment landing
+    mid-compaction cancels the transaction and is picked up by the next run.
+    """
+
+    shard_names, shard_values = {}, {}
+    shard_adds, shard_conditions = [], []
+    target_names, target_values = {}, {}
+    target_adds = []
+
+    for index, (field, value) in enumerate(pending.items()):
+        shard_names[f'#f{index}'] = shard_attribute(field)
+        shard_values[f':neg{index}'] = -value
+        shard_values[f':cur{index}'] = value
+        shard_adds.append(f'#f{index} :neg{index}')
+        shard_conditions.append(f'#f{index} = :cur{index}')
+
+        path = _path_expression(field, f'p{index}', target_names)
+        target_values[f':d{index}'] = value
+        target_adds.append(f'{path} :d{index}')
+
+    try:
+        table.meta.client.transact_write_items(TransactItems=[
+            {
+                'Update': {
+                    'TableName': table.name,
+                    'Key': {'user_id': shard_item['user_id'], 'sort_key': shard_item['sort_key']},
+                    'UpdateExpression': 'ADD ' + ', '.join(shard_adds),
+                    'ConditionExpression': ' AND '.join(shard_conditions),
+                    'ExpressionAttributeNames': shard_names,
+                    'ExpressionAttributeValues': shard_values
+                }
+            },
+            {
+                'Update': {
+                    'TableName': table.name,
+                    'Key': dict(shard_item['target_key']),
+                    'UpdateExpression': 'ADD ' + ', '.join(target_adds),
+                    'ConditionExpression': 'attribute_exists(sort_key)',
+                    'ExpressionAttributeNames': target_names,
+                    'ExpressionAttributeValues': target_values
+                }
+            }
+        ])
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        logger.info("Counter shard changed or target missing during compaction, skipping", extra={
+            "counter_id": shard_item.get('counter_id'),
+            "shard": shard_item['user_id']
+        })
+        return False
+
+
+def _pending_values(shard_item: Dict[str, Any]) -> Dict[str, int]:
+    pending = {}
+    for attribute, value in shard_item.items():
+        if attribute in ('user_id', 'sort_key', 'target_key', 'counter_id', 'record_type'):
+            continue
+        if isinstance(value, Decimal) and value != 0:
+            pending[attribute.replace('__', '.')] = int(value)
+    return pending
+
+
+def _clear_dirty_marker(table, marker: Dict[str, Any]) -> None:
+    """Drop a dirty marker unless an increment touched its shard since it was read"""
+
+    try:
+        table.delete_item(
+            Key={'user_id': marker['user_id'], 'sort_key': marker['sort_key']},
+            ConditionExpression='#writes = :writes',
+            ExpressionAttributeNames={'#writes': 'writes'},
+            ExpressionAttributeValues={':writes': marker['writes']}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def compact_counter_shards(table) -> Dict[str, Any]:
+    """
+    Fold every dirty shard back into its counted item
+
+    Run by the scheduled maintenance invocation. Only shards with a dirty marker are
+    read, with one key query per shard number. Returns run statistics and the keys
+    of the counted items that changed, so callers can refresh derived data.
+    """
+
+    started = time.monotonic()
+    shards_folded = 0
+    shards_skipped = 0
+    updated_targets: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+    for shard in range(COUNTER_SHARD_COUNT):
+        query_kwargs = {
+            'KeyConditionExpression': 'user_id = :pk',
+            'ExpressionAttributeValues': {':pk': dirty_key('', shard)['user_id']}
+        }
+
+        while True:
+            response = table.query(**query_kwargs)
+
+            for marker in response.get('Items', []):
+                counter_id = marker['sort_key']
+                shard_item = table.get_item(Key=shard_key(counter_id, shard)).get('Item')
+                target_key = (shard_item or {}).get('target_key')
+                pending = _pending_values(shard_item) if target_key else {}
+
+                if pending:
+                    if not _fold_shard(table, shard_item, pending):
+                        # Keep the marker; the next run folds the newer values
+                        shards_skipped += 1
+                        continue
+                    shards_folded += 1
+                    _COUNTER_CACHE.pop(counter_id, None)
+                    updated_targets[(target_key['user_id'], target_key['sort_key'])] = dict(target_key)
+
+                _clear_dirty_marker(table, marker)
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    result = {
+        'shards_folded': shards_folded,
+        'shards_skipped': shards_skipped,
+        'targets_updated': list(updated_targets.values()),
+        'duration_ms': round((time.monotonic() - started) * 1000, 2)
+    }
+    logger.info("Counter shards compacted", extra={
+        'shards_folded': shards_folded,
+        'shards_skipped': shards_skipped,
+        'targets_updated': len(updated_targets)
+    })
+    return result
@@ -22,6 +22,7 @@ import os
 import sys
 import boto3
 import logging
+import time as time_module
 from datetime import datetime, timezone, timedelta, time
 from typing import Dict, List, Any, Optional
 from botocore.exceptions import ClientError
@@ -51,6 +52,30 @@ except ImportError:
     logger.warning("Trading module not available - will use simulation mode")
     TRADING_AVAILABLE = False
 
+# Import retry scheduler (failed legs are retried via the delay queue / retry index)
+try:
+    from retry_scheduler import schedule_failed_execution_retry
+    RETRY_SCHEDULER_AVAILABLE = True
+except ImportError:
+    logger.warning("Retry scheduler not available - failed legs will not be retried")
+    RETRY_SCHEDULER_AVAILABLE = False
+
+# Import execution lane metrics (unresolved position exits raise an alarm)
+try:
+    from execution_lanes import emit_unresolved_exit_metric
+    EXECUTION_LANES_AVAILABLE = True
+except ImportError:
+    logger.warning("Execution lanes not available - unresolved position exits will only be logged")
+    EXECUTION_LANES_AVAILABLE = False
+
+# Import execution bundles (prefetched by strategy_scheduler during the lookahead window)
+try:
+    from execution_bundle import get_execution_bundle
+    EXECUTION_BUNDLE_AVAILABLE = True
+except ImportError:
+    logger.warning("Execution bundle not available - strategies will be loaded at execution time")
+    EXECUTION_BUNDLE_AVAILABLE = False
+
 # ============================================================================
 # EXCHANGE-SPECIFIC MARKET HOURS CONFIGURATION
 # Used to validate trades based on exchange operating hours
@@ -65,6 +90,14 @@ EXCHANGE_MARKET_HOURS = {
     'NCDEX': {'start': time(10, 0), 'end': time(23, 30), 'name': 'National Commodity Exchange'},
 }
 
+# Broker credentials per (user, client, broker), reused by warm containers for a few
+# minutes so back-to-back executions at market open skip Secrets Manager
+CREDENTIALS_CACHE_TTL_SECONDS = int(os.environ.get('CREDENTIALS_CACHE_TTL_SECONDS', '300'))
+_credentials_cache: Dict[tuple, tuple] = {}
+
+# Pre-market warm-up snapshots (written by premarket_warmup_handler)
+WARM_STRATEGY_PREFIX = 'WARM_STRATEGY#'
+
 # ============================================================================
 # BROKER CREDENTIALS & TRADING BRIDGE
 # ============================================================================
@@ -74,7 +107,8 @@ def get_broker_credentials(user_id: str, client_id: str, broker_name: str) -> Op
     Get broker credentials from Secrets Manager for live trading.
 
     Attempts to fetch OAuth tokens first (for daily sessions),
-    then falls back to API credentials.
+    then falls back to API credentials. Found credentials are cached
+    for CREDENTIALS_CACHE_TTL_SECONDS.
 
     Args:
         user_id: User identifier
@@ -84,6 +118,19 @@ def get_broker_credentials(user_id: str, client_id: str, broker_name: str) -> Op
     Returns:
         Credentials dict with api_key, access_token/api_secret, or None if not found
     """
+    cache_key = (user_id, client_id, broker_name.lower())
+    cached = _credentials_cache.get(cache_key)
+    if cached and cached[0] > time_module.monotonic():
+        return cached[1]
+
+    credentials = _fetch_broker_credentials(user_id, client_id, broker_name)
+    if credentials:
+        _credentials_cache[cache_key] = (time_module.monotonic() + CREDENTIALS_CACHE_TTL_SECONDS, credentials)
+    return credentials
+
+
+def _fetch_broker_credentials(user_id: str, client_id: str, broker_name: str) -> Optional[Dict]:
+    """Read OAuth tokens, falling back to API credentials, from Secrets Manager."""
     try:
         env = os.environ.get('ENVIRONMENT', 'dev')
         broker_lower = broker_name.lower()
@@ -237,6 +284,28 @@ def get_complete_strategy_data(table, user_id: str, strategy_id: str) -> Optiona
         logger.error(f"❌ Error loading strategy data: {str(e)}")
         return None
 
+def get_warm_strategy_snapshot(table, user_id: str, strategy_id: str,
+                               now: Optional[datetime] = None) -> Optional[Dict]:
+    """
+    Strategy and basket allocations prefetched by the pre-market warm-up.
+
+    Snapshots are only used until their valid_until (the end of the opening
+    window); strategy updates and deletes remove them.
+    """
+    try:
+        item = table.get_item(
+            Key={'user_id': user_id, 'sort_key': f'{WARM_STRATEGY_PREFIX}{strategy_id}'}
+        ).get('Item')
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read warm snapshot for strategy {strategy_id}: {str(e)}")
+        return None
+
+    now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    if not item or item.get('valid_until', '') <= now.isoformat():
+        return None
+    return item
+
+
 def query_basket_broker_allocations(table, basket_id: str) -> List[Dict]:
     """
     ✅ INDUSTRY BEST PRACTICE: Query active basket-level broker allocations using GSI
@@ -272,6 +341,78 @@ def query_basket_broker_allocations(table, basket_id: str) -> List[Dict]:
         logger.error(f"❌ Error querying basket allocations for basket {basket_id}: {str(e)}")
         return []
 
+def scope_exit_to_position(table, user_id: str, position_id: str, strategy_data: Dict,
+                           broker_allocations: List[Dict]) -> Optional[tuple]:
+    """
+    🎯 Narrow a position-level exit (stop loss / target / trailing on one leg) to that leg
+
+    position_id is a POSITION# item of the trading table or, as raised by the
+    risk handlers, the execution_key of an execution history row. The leg is
+    the position's leg_id or, for rows written before leg_id was recorded, the
+    single strategy leg matching its contract. Returns (strategy_data with only
+    the position's leg, allocations of the position's account), or None when
+    the position cannot be tied to one leg and account.
+    """
+    position = table.get_item(Key={'user_id': user_id, 'sort_key': f'POSITION#{position_id}'}).get('Item')
+    if not position:
+        history_table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        position = history_table.get_item(Key={'user_id': user_id, 'execution_key': position_id}).get('Item')
+    if not position:
+        return None
+
+    legs = strategy_data.get('legs', [])
+    leg = next((leg for leg in legs if position.get('leg_id') and leg.get('leg_id') == position['leg_id']), None)
+    if leg is None and not position.get('leg_id'):
+        leg = match_leg_by_contract(position, legs)
+
+    allocations = [a for a in broker_allocations if a.get('client_id') == position.get('client_id')]
+    if not allocations and not position.get('client_id'):
+        broker_name = position.get('broker_name') or position.get('broker_id')
+        candidates = [a for a in broker_allocations if not broker_name or a.get('broker_name') == broker_name]
+        allocations = candidates if len(candidates) == 1 else []
+
+    if leg is None or not allocations:
+        return None
+    return {**strategy_data, 'legs': [leg]}, allocations
+
+
+_OPTION_TYPES = {'CE': 'CALL', 'CALL': 'CALL', 'PE': 'PUT', 'PUT': 'PUT'}
+_SIDES = {'BUY': 'BUY', 'LONG': 'BUY', 'SELL': 'SELL', 'SHORT': 'SELL'}
+
+
+def match_leg_by_contract(position: Dict, legs: List[Dict]) -> Optional[Dict]:
+    """
+    The one strategy leg whose option type, side, strike and expiry agree with a position.
+
+    Only fields present on both sides are compared; the option type falls back
+    to the trading symbol's CE/PE suffix and the side to the quantity's sign.
+    Returns None when no leg or more than one leg matches.
+    """
+    symbol = str(position.get('symbol') or '')
+    option_type = _OPTION_TYPES.get(str(position.get('option_type') or symbol[-2:]).upper())
+    if not option_type:
+        return None
+
+    side = _SIDES.get(str(position.get('transaction_type') or position.get('position_type') or '').upper())
+    if side is None and position.get('quantity'):
+        side = 'BUY' if float(position['quantity']) > 0 else 'SELL'
+
+    def agrees(leg: Dict) -> bool:
+        if _OPTION_TYPES.get(str(leg.get('option_type') or '').upper()) != option_type:
+            return False
+        leg_side = _SIDES.get(str(leg.get('action') or leg.get('transaction_type') or '').upper())
+        if side and leg_side and side != leg_side:
+            return False
+        strike, leg_strike = position.get('strike'), leg.get('strike', leg.get('strike_price'))
+        if strike is not None and leg_strike is not None and float(strike) != float(leg_strike):
+            return False
+        expiry, leg_expiry = position.get('expiry_date'), leg.get('expiry_date')
+        return not (expiry and leg_expiry and str(expiry) != str(leg_expiry))
+
+    matches = [leg for leg in legs if agrees(leg)]
+    return matches[0] if len(matches) == 1 else None
+
+
 def create_skip_response(user_id: str, strategy_id: str, strategy_name: str,
                         execution_time: str, reason: str) -> Dict:
     """
@@ -301,7 +442,8 @@ def lambda_handler(event, context):
        - Fetches only strategy details (legs, underlying)
 
     2. Legacy lightweight events (from strategy_scheduler)
-       - Fetches both strategy data and allocations
+       - Reads the execution bundle hydrated by the scheduler (bundle_version set)
+       - Otherwise fetches both strategy data and allocations
 
     EventBridge Event Structure (from strategy_entry_handler):
     {
@@ -378,8 +520,25 @@ def lambda_handler(event, context):
         # Get trading configurations table
         trading_configurations_table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
 
+        # 📦 Scheduled runs: use the execution bundle hydrated by strategy_scheduler when current;
+        # 🔥 opening window: otherwise the pre-market warm-up snapshot when one is current
+        prefetched = None
+        if event_data.get('bundle_version') is not None and EXECUTION_BUNDLE_AVAILABLE:
+            try:
+                prefetched = get_execution_bundle(
+                    trading_configurations_table, user_id, strategy_id, execution_time, execution_type
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read execution bundle for strategy {strategy_id}: {str(e)}")
+        if not prefetched:
+            prefetched = get_warm_strategy_snapshot(trading_configurations_table, user_id, strategy_id)
+
         # 🎯 JUST-IN-TIME: Load complete strategy data at execution time (always fetch - has legs)
-        strategy_data = get_complete_strategy_data(trading_configurations_table, user_id, strategy_id)
+        if prefetched:
+            strategy_data = prefetched['strategy']
+            logger.info(f"🔥 Using prefetched {prefetched.get('entity_type', 'WARM_STRATEGY')} for strategy {strategy_id}")
+        else:
+            strategy_data = get_complete_strategy_data(trading_configurations_table, user_id, strategy_id)
         if not strategy_data:
             logger.warning(f"⚠️ Strategy {strategy_id} not found or inactive - skipping execution")
             return create_skip_response(user_id, strategy_id, f'Strategy_{strategy_id}', execution_time, "Strategy not found or inactive")
@@ -401,6 +560,9 @@ def lambda_handler(event, context):
             broker_allocations = [preloaded_allocation]
             logger.info(f"✅ Using pre-loaded allocation for broker {broker_name} (client: {client_id})")
             logger.info(f"   Lot multiplier: {preloaded_allocation.get('lot_multiplier', 1)}, Priority: {preloaded_allocation.get('priority', 1)}")
+        elif prefetched and prefetched.get('basket_id') == basket_id:
+            broker_allocations = prefetched.get('allocations', [])
+            logger.info(f"🔥 Using {len(broker_allocations)} prefetched basket allocations")
         else:
             # Legacy path: Query all basket allocations
             broker_allocations = query_basket_broker_allocations(trading_configurations_table, basket_id)
@@ -410,6 +572,34 @@ def lambda_handler(event, context):
             logger.warning(f"⚠️ No active basket allocations found for basket {basket_id} (strategy {strategy_id}) - skipping execution")
             return create_skip_response(user_id, strategy_id, strategy_name, execution_time, "No basket allocations configured")
 
+        # 🎯 Position-level protective exits close only that position's leg, never the whole strategy
+        position_id = event_data.get('position_id')
+        if execution_type == 'EXIT' and position_id and event_data.get('exit_scope') == 'POSITION':
+            scoped = scope_exit_to_position(
+                trading_configurations_table, user_id, position_id, strategy_data, broker_allocations
+            )
+            if scoped is None:
+                # Redelivery cannot change the outcome and would hold the user's FIFO group;
+                # acknowledge, never widen to a strategy-wide exit, and alert for manual handling
+                logger.error(f"🚨 Cannot resolve the leg of position {position_id} (strategy {strategy_id}) - "
+                             f"position exit NOT placed, manual action required")
+                if EXECUTION_LANES_AVAILABLE:
+                    emit_unresolved_exit_metric(event_data.get('lane', 'HIGH'), event_data.get('exit_reason'))
+                return create_skip_response(user_id, strategy_id, strategy_name, execution_time,
+                                            f"Position {position_id} could not be tied to a leg and account")
+            strategy_data, broker_allocations = scoped
+            logger.info(f"🎯 Exit scoped to position {position_id} (leg {strategy_data['legs'][0].get('leg_id')})")
+
+        # 🔁 Retries run only the legs that failed retryably (retry_scheduler.schedule_failed_execution_retry)
+        failed_leg_ids = event_data.get('failed_leg_ids')
+        if failed_leg_ids:
+            retry_legs = [leg for leg in strategy_data.get('legs', []) if leg.get('leg_id') in failed_leg_ids]
+            if not retry_legs:
+                return create_skip_response(user_id, strategy_id, strategy_name, execution_time,
+                                            "Failed legs no longer in strategy")
+            strategy_data = {**strategy_data, 'legs': retry_legs}
+            logger.info(f"🔁 Retry #{event_data.get('retry_number')} limited to legs {failed_leg_ids}")
+
         # Get DynamoDB table using environment variable
         execution_log_table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
 
@@ -427,6 +617,15 @@ def lambda_handler(event, context):
             broker_config=broker_config
         )
 
+        # Schedule a backed-off retry for legs the broker rejected or errored
+        if execution_result.get('failed_legs') and RETRY_SCHEDULER_AVAILABLE:
+            try:
+                execution_result['retry'] = schedule_failed_execution_retry(
+                    event_data, execution_result['failed_legs']
+                )
+            except Exception as e:
+                logger.error(f"❌ Failed to schedule retry for strategy {strategy_id}: {str(e)}")
+
         # Add broker context to result
         execution_result['broker_id'] = broker_id
         execution_result['client_id'] = client_id
@@ -577,6 +776,7 @@ def execute_strategy_with_broker_allocation(
 
         # ✅ OPTIMIZED: Revolutionary multi-broker execution with dynamic lot calculation
         broker_executions = []
+        failed_legs = []
         total_lots_executed = 0
 
         for alloc_config in broker_allocations:
@@ -613,7 +813,18 @@ def execute_strategy_with_broker_allocation(
                 basket_id=actual_basket_id,
                 execution_type=execution_type,
                 trading_mode=trading_mode,
-                credentials=credentials
+                credentials=credentials,
+                execution_time=execution_time
+            )
+
+            failed_legs.extend(
+                {'leg_id': leg.get('leg_id'), 'broker_name': alloc_broker_name,
+                 'order_status': leg.get('order_status'), 'message': leg.get('message')}
+                for leg in leg_executions
+                # UNKNOWN legs are retried so the next attempt reconciles them with the order book;
+                # THROTTLED legs were never sent and are requeued once the account has budget again
+                if leg.get('order_status') in ('REJECTED', 'ERROR', 'UNKNOWN', 'THROTTLED')
+                or leg.get('execution_status') == 'error'
             )
 
             broker_executions.append({
@@ -654,6 +865,7 @@ def execute_strategy_with_broker_allocation(
             'total_lots_executed': total_lots_executed,
             'brokers_used': len([b for b in broker_executions if b['status'] == 'executed']),
             'execution_record_id': execution_record['execution_key'],
+            'failed_legs': failed_legs,
             'execution_level': 'individual_strategy',
             'ultimate_parallelization': True
         }
@@ -677,7 +889,8 @@ def execute_strategy_legs_for_broker(
     basket_id: str,
     execution_type: str = 'ENTRY',
     trading_mode: str = 'PAPER',
-    credentials: Optional[Dict] = None
+    credentials: Optional[Dict] = None,
+    execution_time: Optional[str] = None
 ) -> List[Dict]:
     """
     Execute all legs via broker trading API with dynamic lot calculation.
@@ -695,6 +908,7 @@ def execute_strategy_legs_for_broker(
         execution_type: ENTRY or EXIT
         trading_mode: PAPER or LIVE
         credentials: Broker credentials for live trading
+        execution_time: Scheduled time, keys each leg so redelivered events cannot re-place it
 
     Returns:
         List of leg execution results
@@ -752,7 +966,8 @@ def execute_strategy_legs_for_broker(
                     allocation = {
                         'broker_name': broker_name,
                         'client_id': client_id,
-                        'lot_multiplier': lot_multiplier
+                        'lot_multiplier': lot_multiplier,
+                        'max_lots_per_order': broker_config.get('max_lots_per_order')
                     }
 
                     # Execute via trading bridge (synchronous for Lambda)
@@ -764,7 +979,8 @@ def execute_strategy_legs_for_broker(
                         allocation=allocation,
                         trading_mode=mode,
                         execution_type=execution_type,
-                        credentials=credentials
+                        credentials=credentials,
+                        execution_time=execution_time
                     )
 
                     # Build execution result
@@ -790,6 +1006,9 @@ def execute_strategy_legs_for_broker(
                         'execution_time': result.get('execution_timestamp', datetime.now(timezone.utc).isoformat()),
                         'message': result.get('message', f'Order placed via {broker_name}'),
                         'symbol': result.get('symbol'),
+                        'slice_count': result.get('slice_count', 1),
+                        'duplicate': result.get('duplicate', False),
+                        'filled_quantity': result.get('filled_quantity'),
                         'individual_strategy_execution': True,
                         'lot_calculation': {
                             'base_lots': base_lots,
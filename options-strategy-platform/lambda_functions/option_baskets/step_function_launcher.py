@@ -11,6 +11,13 @@ Key Features:
 - Dynamic wait calculation for institutional-grade execution
 - Launches Step Functions with batch strategy processing
 - Error handling and comprehensive logging
+
+Batch executions (step_functions/batch_strategy_executor_definition.json) wait
+until the execution minute, then fan out over a distributed Map state with
+MaxConcurrency from the input. One execution is started per execution minute
+(split into chunks of MAX_STRATEGIES_PER_BATCH) instead of one per strategy,
+and items carry only identifiers - the executor loads or reads its prefetched
+bundle at run time.
 """
 
 import json
@@ -26,8 +33,20 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-stepfunctions = boto3.client('stepfunctions')
-dynamodb = boto3.resource('dynamodb')
+stepfunctions = boto3.client('stepfunctions', region_name=os.environ.get('REGION', 'ap-south-1'))
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+# Map state fan-out limit per batch execution (single strategy executor invocations in flight)
+BATCH_MAP_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAP_MAX_CONCURRENCY', '50'))
+
+# Strategies per batch execution; keeps the identifier-only input well under the 256 KB limit
+MAX_STRATEGIES_PER_BATCH = int(os.environ.get('MAX_STRATEGIES_PER_BATCH', '500'))
+
+# The only fields a Map item carries into single_strategy_executor
+STRATEGY_IDENTIFIER_FIELDS = (
+    'user_id', 'strategy_id', 'execution_time', 'weekday', 'execution_type',
+    'market_phase', 'trigger_source', 'event_id', 'bundle_version',
+)
 
 def lambda_handler(event, context):
     """
@@ -96,7 +115,8 @@ def lambda_handler(event, context):
                     strategies=strategies,
                     execution_time=execution_time,
                     wait_seconds=wait_seconds,
-                    market_phase=market_phase
+                    market_phase=market_phase,
+                    weekday=weekday
                 )
                 
                 if step_function_result['success']:
@@ -204,12 +224,77 @@ def calculate_dynamic_wait_seconds(execution_time: str) -> int:
         # Default to 60 seconds if calculation fails
         return 60
 
+def get_strategy_identifiers(strategy: Dict[str, Any], execution_time: str, weekday: str) -> Dict[str, Any]:
+    """Reduce a strategy message to the identifiers a Map item carries."""
+    identifiers = {field: strategy[field] for field in STRATEGY_IDENTIFIER_FIELDS if strategy.get(field) is not None}
+    identifiers.setdefault('execution_time', execution_time)
+    identifiers.setdefault('weekday', weekday)
+    identifiers.setdefault('execution_type', 'ENTRY')
+    return identifiers
+
+
+def group_strategies_by_execution_time(strategies: List[Dict[str, Any]]) -> Dict[str, List[List[Dict[str, Any]]]]:
+    """
+    Group strategies into batches: one per execution minute, split into chunks of
+    MAX_STRATEGIES_PER_BATCH.
+
+    Returns:
+        execution_time -> [batch, ...]
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for strategy in strategies:
+        groups.setdefault(strategy['execution_time'], []).append(strategy)
+
+    return {
+        execution_time: [group[i:i + MAX_STRATEGIES_PER_BATCH] for i in range(0, len(group), MAX_STRATEGIES_PER_BATCH)]
+        for execution_time, group in sorted(groups.items())
+    }
+
+
+def launch_strategy_batches(strategies: List[Dict[str, Any]], weekday: str, market_phase: str,
+                            batch_id_prefix: str) -> Dict[str, Any]:
+    """
+    🚀 Start one batch execution per execution minute (and chunk) for a set of strategies
+
+    Returns:
+        Dict with launched (strategy count), failed (strategy count) and batches (launch results)
+    """
+    launched = 0
+    failed = 0
+    batches = []
+
+    for execution_time, chunks in group_strategies_by_execution_time(strategies).items():
+        wait_seconds = calculate_dynamic_wait_seconds(execution_time)
+
+        for index, chunk in enumerate(chunks):
+            result = launch_batch_strategy_step_function(
+                batch_id=f"{batch_id_prefix}-{index}",
+                strategies=chunk,
+                execution_time=execution_time,
+                wait_seconds=wait_seconds,
+                market_phase=market_phase,
+                weekday=weekday
+            )
+            batches.append(result)
+            if result['success']:
+                launched += len(chunk)
+            else:
+                failed += len(chunk)
+
+    logger.info(f"🚀 Launched {len(batches)} batch executions for {launched} strategies ({failed} failed)")
+    return {'launched': launched, 'failed': failed, 'batches': batches}
+
+
 def launch_batch_strategy_step_function(batch_id: str, strategies: List[Dict], 
                                       execution_time: str, wait_seconds: int, 
-                                      market_phase: str) -> Dict[str, Any]:
+                                      market_phase: str, weekday: str,
+                                      max_concurrency: Optional[int] = None) -> Dict[str, Any]:
     """
     🚀 Launch Step Function for batch strategy processing with precise timing
     Maintains revolutionary Wait + Map State pattern for ultimate performance
+
+    Strategies are reduced to identifiers (STRATEGY_IDENTIFIER_FIELDS); the Map state
+    runs at most max_concurrency (default BATCH_MAP_MAX_CONCURRENCY) executors at once.
     """
     try:
         # Get Step Function ARN from environment variable
@@ -224,9 +309,10 @@ def launch_batch_strategy_step_function(batch_id: str, strategies: List[Dict],
         # Prepare Step Function input
         step_function_input = {
             'batch_id': batch_id,
-            'strategies': strategies,
+            'strategies': [get_strategy_identifiers(s, execution_time, weekday) for s in strategies],
             'execution_time': execution_time,
             'wait_seconds': wait_seconds,
+            'max_concurrency': max_concurrency or BATCH_MAP_MAX_CONCURRENCY,
             'market_phase': market_phase,
             'weekday': weekday,
             'batch_size': len(strategies),
@@ -242,12 +328,14 @@ def launch_batch_strategy_step_function(batch_id: str, strategies: List[Dict],
                 'zero_query_execution': True,
                 'user_centric_fanout': True,
                 'gsi4_weekday_filtering': True,
-                'preloaded_broker_allocation': True
+                'identifier_only_items': True,
+                'distributed_map_fanout': True
             }
         }
         
         # Generate unique execution name
-        execution_name = f"batch-{batch_id}-{execution_time}-{int(datetime.now().timestamp())}"
+        # (execution names only allow letters, digits, '-' and '_', up to 80 characters)
+        execution_name = f"batch-{batch_id}-{execution_time.replace(':', '')}-{int(datetime.now().timestamp())}"[-80:]
         
         logger.info(f"🚀 Starting Step Function execution: {execution_name}")
         logger.info(f"📊 Input: {len(strategies)} strategies, wait: {wait_seconds}s, phase: {market_phase}")
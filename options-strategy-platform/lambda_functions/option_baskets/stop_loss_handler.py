@@ -21,14 +21,19 @@ from decimal import Decimal
 
 sys.path.append('/opt/python')
 sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
 
 from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import send_to_lane
+from positional_schedule import open_positions
 
 logger = setup_logger(__name__)
 
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+IST = timezone(timedelta(hours=5, minutes=30))
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -94,27 +99,12 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
 
 def query_active_positions(user_id: str) -> List[Dict]:
-    """Query active positions for the user from execution history."""
+    """Query today's (IST) open positions for the user from execution history."""
     try:
         table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        today = datetime.now(timezone.utc).astimezone(IST).date()
 
-        # Query today's executions with OPEN status
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-
-        response = table.query(
-            KeyConditionExpression='user_id = :user_id AND begins_with(sort_key, :prefix)',
-            FilterExpression='#status = :open_status',
-            ExpressionAttributeValues={
-                ':user_id': user_id,
-                ':prefix': f'{today}#',
-                ':open_status': 'OPEN'
-            },
-            ExpressionAttributeNames={
-                '#status': 'position_status'
-            }
-        )
-
-        positions = response.get('Items', [])
+        positions = open_positions(table, user_id, today)
         logger.info(f"Found {len(positions)} active positions for user {user_id}")
         return positions
 
@@ -133,7 +123,7 @@ def check_stop_loss_for_position(position: Dict, current_ist: datetime) -> Dict:
     - ABSOLUTE: Stop at specific price level
     """
     try:
-        position_id = position.get('position_id', position.get('sort_key'))
+        position_id = position.get('position_id') or position.get('execution_key')
         strategy_id = position.get('strategy_id')
 
         # Get stop loss configuration from position
@@ -202,11 +192,6 @@ def queue_stop_loss_exit(user_id: str, position: Dict, trigger_result: Dict,
                           current_ist: datetime) -> None:
     """Queue immediate exit for stop loss triggered position."""
     try:
-        queue_url = os.environ.get('SINGLE_STRATEGY_QUEUE_URL')
-        if not queue_url:
-            logger.error("SINGLE_STRATEGY_QUEUE_URL not configured")
-            return
-
         message = {
             'user_id': user_id,
             'strategy_id': trigger_result.get('strategy_id'),
@@ -219,11 +204,11 @@ def queue_stop_loss_exit(user_id: str, position: Dict, trigger_result: Dict,
             'priority': 'CRITICAL'
         }
 
-        sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message, cls=DecimalEncoder),
-            MessageGroupId=user_id,
-            MessageDeduplicationId=f"SL_{trigger_result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}"
+        send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"SL_{trigger_result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}",
+            encoder=DecimalEncoder
         )
 
         logger.info(f"Queued STOP_LOSS_EXIT for position {trigger_result.get('position_id')}")
@@ -10,6 +10,12 @@ Key Features:
 - Uses AllocationsByBasket GSI for broker allocation validation
 - Respects basket-level broker inheritance
 - Emits Strategy Execution Events to EventBridge with pre-fetched allocation data
+- Emits one Template Execution Event per due marketplace template strategy so the
+  template fan-out executor serves all subscribers from a single strategy load
+- Registers range breakout strategies with the breakout evaluator instead of
+  entering them at the clock time (see breakout_evaluator.py), once
+  RANGE_BREAKOUT_ENTRIES_ENABLED says a tick feed drives Refresh Market Data;
+  until then they enter at the clock time
 
 Hybrid Approach (Option 2):
 - Passes allocation data already fetched (no re-query in executor)
@@ -28,8 +34,12 @@ from decimal import Decimal
 
 sys.path.append('/opt/python')
 sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
 
 from shared_utils.logger import setup_logger, log_lambda_event
+from schedule_plan import get_planned_schedules
+from breakout_evaluator import register_breakout_condition
+from template_fanout import emit_template_fanout_events
 
 logger = setup_logger(__name__)
 
@@ -39,6 +49,12 @@ eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION',
 # Cache for basket allocations to avoid duplicate queries within same invocation
 _allocation_cache: Dict[str, List[Dict]] = {}
 
+# Cache for template flags of baskets (basket_id -> is marketplace template)
+_template_basket_cache: Dict[str, bool] = {}
+
+# Breakouts fire on ticks of Refresh Market Data events; without a feed they would never enter
+RANGE_BREAKOUT_ENTRIES_ENABLED = os.environ.get('RANGE_BREAKOUT_ENTRIES_ENABLED', 'false').lower() == 'true'
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -57,9 +73,10 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     log_lambda_event(logger, event, context)
 
-    # Clear allocation cache at start of each invocation
-    global _allocation_cache
+    # Clear allocation and template caches at start of each invocation
+    global _allocation_cache, _template_basket_cache
     _allocation_cache = {}
+    _template_basket_cache = {}
 
     try:
         detail = event.get('detail', {})
@@ -103,14 +120,22 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         current_ist = current_utc.astimezone(ist_offset)
         current_weekday = get_weekday_abbr(current_ist)
 
-        # Query strategies due for entry filtered by broker allocation
-        strategies = query_strategies_for_entry(
+        # Query strategies due for entry in the lookahead window
+        due_schedules = query_due_entry_schedules(
             user_id=user_id,
-            client_id=client_id,
             current_ist=current_ist,
             lookahead_minutes=lookahead_minutes
         )
 
+        # Marketplace templates fan out to subscribers once per schedule, whichever broker claims it
+        emit_template_fanout_events(
+            dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE']), eventbridge_client,
+            user_id, due_schedules, 'ENTRY', current_ist, 'strategy_entry_handler', _template_basket_cache
+        )
+
+        # Filter by broker allocation for the admin's own execution
+        strategies = filter_schedules_by_broker_allocation(due_schedules, client_id)
+
         if not strategies:
             logger.info(f"No strategies due for entry for user {user_id} with broker {broker_name}")
             return create_success_response(
@@ -121,29 +146,42 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
         logger.info(f"📋 Found {len(strategies)} strategies due for entry with {broker_name} allocation")
 
+        # Range breakout strategies wait for the breakout instead of the clock
+        breakout_configs = get_range_breakout_configs(strategies)
+        broker_context = {
+            'broker_id': broker_id,
+            'client_id': client_id,
+            'broker_name': broker_name,
+            'broker_config': broker_config
+        }
+
         # Emit execution events for each strategy with pre-fetched allocation
         emitted_strategies = []
         for strategy in strategies:
             # Get the specific allocation for this broker (already cached from query phase)
             allocation = get_allocation_for_broker(strategy.get('basket_id'), client_id)
 
+            breakout_config = breakout_configs.get(strategy.get('strategy_id'))
+            if breakout_config:
+                emitted_strategies.append(register_breakout_entry(
+                    user_id, strategy, breakout_config, current_weekday, broker_context, allocation, current_ist
+                ))
+                continue
+
             result = emit_strategy_execution_event(
                 user_id=user_id,
                 strategy=strategy,
                 execution_type='ENTRY',
                 weekday=current_weekday,
-                broker_context={
-                    'broker_id': broker_id,
-                    'client_id': client_id,
-                    'broker_name': broker_name,
-                    'broker_config': broker_config
-                },
+                broker_context=broker_context,
                 allocation=allocation
             )
             emitted_strategies.append(result)
 
         success_count = sum(1 for s in emitted_strategies if s.get('status') == 'EMITTED')
-        logger.info(f"✅ Emitted {success_count}/{len(strategies)} strategy execution events")
+        registered_count = sum(1 for s in emitted_strategies if s.get('status') == 'BREAKOUT_REGISTERED')
+        logger.info(f"✅ Emitted {success_count}/{len(strategies)} strategy execution events, "
+                    f"registered {registered_count} breakout entries")
 
         return create_success_response(
             user_id, sub_event_id, success_count, emitted_strategies,
@@ -188,6 +226,26 @@ def query_strategies_for_entry(
     Returns:
         List of strategies due for entry that have allocation for the specified client_id
     """
+    schedules = query_due_entry_schedules(user_id, current_ist, lookahead_minutes)
+    return filter_schedules_by_broker_allocation(schedules, client_id)
+
+
+def query_due_entry_schedules(
+    user_id: str,
+    current_ist: datetime,
+    lookahead_minutes: int
+) -> List[Dict]:
+    """
+    Query ENTRY schedules of a user whose execution time falls in the lookahead window.
+
+    Args:
+        user_id: User identifier
+        current_ist: Current IST datetime
+        lookahead_minutes: Minutes to look ahead for strategy entries
+
+    Returns:
+        List of schedule items (from the precompiled schedule plan) due for entry
+    """
     try:
         table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
 
@@ -199,76 +257,129 @@ def query_strategies_for_entry(
 
         logger.info(f"🔍 Querying strategies for entry: {current_weekday} {current_time_str} to {future_time_str}")
 
-        # Phase 1: Query UserScheduleDiscovery GSI for ENTRY schedules on this weekday
-        # Schedule key format: SCHEDULE#{WEEKDAY}#{TIME}#{TYPE}#{STRATEGY_ID}
-        schedule_prefix = f"SCHEDULE#{current_weekday}#"
-
-        response = table.query(
-            IndexName='UserScheduleDiscovery',
-            KeyConditionExpression='user_id = :user_id AND begins_with(schedule_key, :pattern)',
-            FilterExpression='#status = :active AND execution_type = :entry',
-            ExpressionAttributeValues={
-                ':user_id': user_id,
-                ':pattern': schedule_prefix,
-                ':active': 'ACTIVE',
-                ':entry': 'ENTRY'
-            },
-            ExpressionAttributeNames={'#status': 'status'},
-            ProjectionExpression='strategy_id, basket_id, execution_time, execution_type, weekday, sort_key, schedule_key'
+        # Precompiled plan: one keyed read of the hour shard(s) covering the window,
+        # compiled from UserScheduleDiscovery on the first read of the day
+        time_matched_schedules = get_planned_schedules(
+            table, user_id, current_ist, future_time, execution_type='ENTRY'
         )
 
-        schedules = response.get('Items', [])
-        logger.info(f"📊 Found {len(schedules)} ENTRY schedules for {current_weekday}")
-
-        # Filter by time window
-        time_matched_schedules = []
-        for schedule in schedules:
-            execution_time = schedule.get('execution_time', '')
-            if is_time_in_window(execution_time, current_time_str, future_time_str):
-                time_matched_schedules.append(schedule)
-                logger.debug(f"  ✓ Strategy {schedule.get('strategy_id')} at {execution_time} within window")
-
         if not time_matched_schedules:
             logger.info(f"No strategies in time window {current_time_str}-{future_time_str}")
             return []
 
         logger.info(f"⏱️ {len(time_matched_schedules)} strategies within time window")
+        return time_matched_schedules
 
-        # Phase 2: Filter by broker allocation
-        # Get unique basket_ids and check which have allocation for this client_id
-        basket_ids = set(s.get('basket_id') for s in time_matched_schedules if s.get('basket_id'))
+    except Exception as e:
+        logger.error(f"Error querying strategies for entry: {str(e)}")
+        return []
 
-        if not basket_ids:
-            logger.warning("No basket_ids found in matched schedules")
-            return []
 
-        # Check allocations for each basket
-        allocated_baskets = set()
-        for basket_id in basket_ids:
-            if has_broker_allocation(basket_id, client_id):
-                allocated_baskets.add(basket_id)
-                logger.debug(f"  ✓ Basket {basket_id} has allocation for client {client_id}")
-            else:
-                logger.debug(f"  ✗ Basket {basket_id} has NO allocation for client {client_id}")
-
-        if not allocated_baskets:
-            logger.info(f"No baskets have allocation for client_id {client_id}")
-            return []
+def filter_schedules_by_broker_allocation(schedules: List[Dict], client_id: str) -> List[Dict]:
+    """
+    Keep only schedules whose basket has an active allocation for client_id.
 
-        # Filter strategies to only those with broker allocation
-        broker_strategies = [
-            s for s in time_matched_schedules
-            if s.get('basket_id') in allocated_baskets
-        ]
+    Args:
+        schedules: Schedule items due for execution
+        client_id: Broker client ID to filter by
 
-        logger.info(f"🏦 {len(broker_strategies)} strategies have allocation for client {client_id}")
+    Returns:
+        Schedules whose basket is allocated to the specified client_id
+    """
+    if not schedules:
+        return []
 
-        return broker_strategies
+    # Get unique basket_ids and check which have allocation for this client_id
+    basket_ids = set(s.get('basket_id') for s in schedules if s.get('basket_id'))
 
-    except Exception as e:
-        logger.error(f"Error querying strategies for entry: {str(e)}")
+    if not basket_ids:
+        logger.warning("No basket_ids found in matched schedules")
         return []
 
+    # Check allocations for each basket
+    allocated_baskets = set()
+    for basket_id in basket_ids:
+        if has_broker_allocation(basket_id, client_id):
+            allocated_baskets.add(basket_id)
+            logger.debug(f"  ✓ Basket {basket_id} has allocation for client {client_id}")
+        else:
+            logger.debug(f"  ✗ Basket {basket_id} has NO allocation for client {client_id}")
+
+    if not allocated_baskets:
+        logger.info(f"No baskets have allocation for client_id {client_id}")
+        return []
+
+    # Filter strategies to only those with broker allocation
+    broker_strategies = [
+        s for s in schedules
+        if s.get('basket_id') in allocated_baskets
+    ]
+
+    logger.info(f"🏦 {len(broker_strategies)} strategies have allocation for client {client_id}")
+
+    return broker_strategies
+
+
+def get_range_breakout_configs(schedules: List[Dict]) -> Dict[str, Dict]:
+    """
+    Range breakout settings of the due strategies, as carried by the schedule plan.
+
+    Returns:
+        strategy_id -> {underlying, range_breakout_time} for strategies with
+        range_breakout enabled and a range end after their entry time; empty
+        (clock-time entry) while RANGE_BREAKOUT_ENTRIES_ENABLED is off
+    """
+    configs = {}
+    for schedule in schedules:
+        strategy_id = schedule.get('strategy_id')
+        range_end = schedule.get('range_breakout_time')
+        if not range_end:
+            continue
+        if not RANGE_BREAKOUT_ENTRIES_ENABLED:
+            logger.warning(f"Strategy {strategy_id} uses range breakout but no tick feed populates Refresh Market "
+                           f"Data events (RANGE_BREAKOUT_ENTRIES_ENABLED is off); entering at the clock time")
+            continue
+        if range_end <= (schedule.get('execution_time') or ''):
+            logger.warning(f"Range end {range_end} of strategy {strategy_id} is not after "
+                           f"its entry time; entering at the clock time")
+            continue
+        configs[strategy_id] = {
+            'underlying': schedule.get('underlying'),
+            'range_breakout_time': range_end,
+        }
+
+    return configs
+
+
+def register_breakout_entry(
+    user_id: str,
+    strategy: Dict,
+    breakout_config: Dict,
+    weekday: str,
+    broker_context: Dict,
+    allocation: Optional[Dict],
+    current_ist: datetime
+) -> Dict:
+    """Register a range breakout strategy's entry with the breakout evaluator."""
+    strategy_id = strategy.get('strategy_id')
+    try:
+        registered = register_breakout_condition(
+            dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE']),
+            user_id, strategy, breakout_config['underlying'], breakout_config['range_breakout_time'],
+            weekday, broker_context, allocation, current_ist
+        )
+        return {
+            'strategy_id': strategy_id,
+            'basket_id': strategy.get('basket_id'),
+            'client_id': broker_context.get('client_id'),
+            'status': 'BREAKOUT_REGISTERED' if registered else 'BREAKOUT_ALREADY_REGISTERED',
+            'range_end': breakout_config['range_breakout_time']
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Error registering breakout entry for strategy {strategy_id}: {str(e)}")
+        return {'strategy_id': strategy_id, 'basket_id': strategy.get('basket_id'), 'status': 'ERROR', 'error': str(e)}
+
 
 def query_basket_allocations(basket_id: str) -> List[Dict]:
     """
@@ -366,36 +477,6 @@ def get_allocation_for_broker(basket_id: str, client_id: str) -> Optional[Dict]:
     return None
 
 
-def is_time_in_window(check_time: str, window_start: str, window_end: str) -> bool:
-    """
-    Check if a time string (HH:MM) is within the specified window.
-
-    Handles midnight crossing (e.g., 23:58 to 00:02).
-
-    Args:
-        check_time: Time to check in HH:MM format
-        window_start: Window start time in HH:MM format
-        window_end: Window end time in HH:MM format
-
-    Returns:
-        True if check_time is within the window
-    """
-    try:
-        if not check_time:
-            return False
-
-        # Handle normal case (no midnight crossing)
-        if window_start <= window_end:
-            return window_start <= check_time <= window_end
-
-        # Handle midnight crossing (e.g., 23:58 to 00:02)
-        # Time is valid if it's >= start OR <= end
-        return check_time >= window_start or check_time <= window_end
-
-    except Exception:
-        return False
-
-
 def emit_strategy_execution_event(
     user_id: str,
     strategy: Dict,
@@ -735,7 +735,8 @@ def execute_broker_allocation_from_preloaded_data(user_id, strategy, allocation,
                     allocation=allocation,
                     trading_mode=trading_mode,
                     execution_type='ENTRY',
-                    credentials=get_broker_credentials(user_id, broker_name, client_id)
+                    credentials=get_broker_credentials(user_id, broker_name, client_id),
+                    execution_time=execution_time
                 )
 
                 leg_executions.append(leg_result)
@@ -886,7 +887,8 @@ def execute_basket_allocation_for_strategy(user_id, strategy, allocation, execut
                     allocation=allocation,
                     trading_mode=trading_mode,
                     execution_type='ENTRY',
-                    credentials=get_broker_credentials(user_id, broker_name, client_id)
+                    credentials=get_broker_credentials(user_id, broker_name, client_id),
+                    execution_time=execution_time
                 )
 
                 # Enrich result with basket allocation info
@@ -6,6 +6,8 @@ Discovers strategies due for exit execution and triggers the exit pipeline.
 
 Responsibilities:
 - Query strategies with exit times in the lookahead window
+- Emit one Template Execution Event per due marketplace template strategy so
+  subscriber positions opened by the template fan-out are exited too
 - Query strategies with open positions needing exit
 - Validate exit conditions are met
 - Trigger strategy exit via SQS/Step Functions
@@ -21,13 +23,17 @@ from decimal import Decimal
 
 sys.path.append('/opt/python')
 sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
 
 from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import send_to_lane
+from template_fanout import emit_template_fanout_events
 
 logger = setup_logger(__name__)
 
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
+eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -72,6 +78,13 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             lookahead_minutes=lookahead_minutes
         )
 
+        # Marketplace templates exit their subscribers once per schedule, whichever broker claims it
+        emit_template_fanout_events(
+            dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE']), eventbridge_client, user_id,
+            [dict(strategy, execution_time=strategy.get('exit_time')) for strategy in strategies],
+            'EXIT', current_ist, 'strategy_exit_handler', {}
+        )
+
         if not strategies:
             logger.info(f"No strategies due for exit for user {user_id}")
             return create_success_response(user_id, sub_event_id, 0, [])
@@ -163,11 +176,6 @@ def is_time_in_window(check_time: str, window_start: str, window_end: str) -> bo
 def queue_strategy_for_exit(user_id: str, strategy: Dict, trigger_time: str) -> Dict:
     """Queue a strategy for exit execution via SQS."""
     try:
-        queue_url = os.environ.get('SINGLE_STRATEGY_QUEUE_URL')
-        if not queue_url:
-            logger.error("SINGLE_STRATEGY_QUEUE_URL not configured")
-            return {'strategy_id': strategy.get('strategy_id'), 'status': 'ERROR', 'error': 'Queue not configured'}
-
         message = {
             'user_id': user_id,
             'strategy_id': strategy.get('strategy_id'),
@@ -177,11 +185,11 @@ def queue_strategy_for_exit(user_id: str, strategy: Dict, trigger_time: str) ->
             'source': 'strategy_exit_handler'
         }
 
-        response = sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message, cls=DecimalEncoder),
-            MessageGroupId=user_id,
-            MessageDeduplicationId=f"{strategy.get('strategy_id')}_EXIT_{trigger_time}"
+        response = send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"{strategy.get('strategy_id')}_EXIT_{trigger_time}",
+            encoder=DecimalEncoder
         )
 
         logger.info(f"Queued strategy {strategy.get('strategy_id')} for EXIT")
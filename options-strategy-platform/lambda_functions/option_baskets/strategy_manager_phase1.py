@@ -29,6 +29,13 @@ from shared_utils.logger import (
     log_api_response,
 )
 
+from schedule_plan import BREAKOUT_FIELDS, invalidate_schedule_plan, ist_today
+from positional_schedule import (
+    POSITIONAL_FIELDS, POSITIONAL_PREFIX, is_positional, materialise_positional_schedules,
+    remove_positional_schedules,
+)
+from execution_bundle import invalidate_execution_bundles
+
 logger = setup_logger(__name__)
 
 
@@ -62,6 +69,38 @@ def generate_schedule_key(
     return f"SCHEDULE#{weekday.upper()}#{execution_time}#{execution_type.upper()}#{strategy_id}"
 
 
+def invalidate_user_schedule_plan(user_id: str, table) -> None:
+    """
+    Mark today's precompiled schedule plan of a user stale after schedules change.
+
+    The plan (SCHEDULE_PLAN# items, see schedule_plan.py) is recompiled by the
+    next minute's entry discovery.
+    """
+    try:
+        invalidate_schedule_plan(table, user_id)
+    except Exception as e:
+        logger.warning(
+            "Failed to invalidate schedule plan",
+            extra={"error": str(e), "user_id": user_id}
+        )
+
+
+def invalidate_user_execution_bundles(user_id: str, table) -> None:
+    """
+    Mark the execution bundles hydrated for a user's upcoming runs stale.
+
+    Bundles (EXECUTION_BUNDLE# items, see execution_bundle.py) hold a resolved copy
+    of the strategy; a stale one makes the executor reload it just in time.
+    """
+    try:
+        invalidate_execution_bundles(table, user_id)
+    except Exception as e:
+        logger.warning(
+            "Failed to invalidate execution bundles",
+            extra={"error": str(e), "user_id": user_id}
+        )
+
+
 def delete_strategy_schedules(user_id: str, strategy_id: str, table) -> dict:
     """
     🧹 Delete all schedule entries for a specific strategy to prevent orphaned records
@@ -118,6 +157,8 @@ def delete_strategy_schedules(user_id: str, strategy_id: str, table) -> dict:
 
         # Use batch writer for efficient deletion
         with table.batch_writer() as batch:
+            # Positional strategies also keep a POSITIONAL# horizon item
+            batch.delete_item(Key={'user_id': user_id, 'sort_key': f"{POSITIONAL_PREFIX}{strategy_id}"})
             for schedule in schedules_to_delete:
                 try:
                     batch.delete_item(
@@ -136,6 +177,9 @@ def delete_strategy_schedules(user_id: str, strategy_id: str, table) -> dict:
                     errors.append(error_msg)
                     logger.warning(error_msg)
 
+        if deleted_count:
+            invalidate_user_schedule_plan(user_id, table)
+
         logger.info(
             "Schedule cleanup completed",
             extra={
@@ -313,6 +357,7 @@ def handle_create_strategy(event, user_id, basket_id, table):
         # Extract strategy-level risk management fields (Phase 3: Target Profit & Stop Loss)
         target_profit = body.get("target_profit")  # {enabled: bool, type: str, value: number}
         mtm_stop_loss = body.get("mtm_stop_loss")  # {enabled: bool, type: str, value: number}
+        lock_and_trail = body.get("lock_and_trail")  # {lock_at, lock_profit, trail_every, trail_by} in ₹ MTM
 
         # Extract POSITIONAL trading fields (Phase 4: Complete field support)
         entry_trading_days_before_expiry = body.get("entry_trading_days_before_expiry")
@@ -439,6 +484,7 @@ def handle_create_strategy(event, user_id, basket_id, table):
             # Strategy-level risk management (Phase 3: TP/SL Storage)
             "target_profit": target_profit,
             "mtm_stop_loss": mtm_stop_loss,
+            "lock_and_trail": lock_and_trail,
             # POSITIONAL trading fields (Phase 4: Complete field support)
             "entry_trading_days_before_expiry": entry_trading_days_before_expiry,
             "exit_trading_days_before_expiry": exit_trading_days_before_expiry,
@@ -449,6 +495,12 @@ def handle_create_strategy(event, user_id, basket_id, table):
 
         # ✅ REMOVED: No longer populating broker allocation in schedule entries (clean separation)
 
+        # 📅 POSITIONAL: expiry-relative strategies get dated schedules instead of weekday ones
+        positional_schedules = 0
+        if is_positional(strategy_item):
+            positional_schedules = materialise_positional_schedules(table, user_id, strategy_item, ist_today())
+            entry_days, exit_days = [], []
+
         # 🚀 REVOLUTIONARY: Create weekday-specific execution schedule entries
         # This prevents weekend/holiday executions and enables precise weekday filtering
         weekday_abbr_map = {
@@ -529,9 +581,12 @@ def handle_create_strategy(event, user_id, basket_id, table):
                 f"✅ Created EXIT schedule: EXIT#{weekday_abbr}#{exit_time}#{strategy_id}"
             )
 
-        total_schedules = len(entry_days) + len(exit_days)
+        invalidate_user_schedule_plan(user_id, table)
+
+        total_schedules = len(entry_days) + len(exit_days) + positional_schedules
         logger.info(
-            f"🎯 Created strategy with {len(entry_days)} entry + {len(exit_days)} exit weekday schedules = {total_schedules} total"
+            f"🎯 Created strategy with {len(entry_days)} entry + {len(exit_days)} exit weekday schedules "
+            f"+ {positional_schedules} dated schedules = {total_schedules} total"
         )
 
         log_user_action(
@@ -710,6 +765,24 @@ def handle_get_strategy(event, user_id, strategy_id, table):
         }
 
 
+def delete_warm_strategy_snapshot(user_id: str, strategy_id: str, table) -> None:
+    """
+    Drop the pre-market warm-up snapshot of a strategy so the executor reloads it.
+
+    Snapshots (WARM_STRATEGY#<strategy_id>) are written by premarket_warmup_handler
+    and would otherwise be executed as-is until the end of the opening window.
+    """
+    try:
+        table.delete_item(
+            Key={"user_id": user_id, "sort_key": f"WARM_STRATEGY#{strategy_id}"}
+        )
+    except Exception as e:
+        logger.warning(
+            "Failed to delete warm strategy snapshot",
+            extra={"error": str(e), "user_id": user_id, "strategy_id": strategy_id}
+        )
+
+
 def handle_update_strategy(event, user_id, strategy_id, table):
     """Update an existing strategy using single table structure"""
 
@@ -765,6 +838,7 @@ def handle_update_strategy(event, user_id, strategy_id, table):
             "exit_trading_days_before_expiry",   # POSITIONAL trading exit days
             "target_profit",     # Strategy-level target profit {type, value}
             "mtm_stop_loss",     # Strategy-level stop loss {type, value}
+            "lock_and_trail",    # Strategy-level lock profit and trail {lock_at, lock_profit, trail_every, trail_by}
         ]
 
         for field in updatable_fields:
@@ -800,6 +874,15 @@ def handle_update_strategy(event, user_id, strategy_id, table):
                 update_params["ExpressionAttributeNames"] = expression_attribute_names
 
             table.update_item(**update_params)
+            delete_warm_strategy_snapshot(user_id, strategy_id, table)
+            invalidate_user_execution_bundles(user_id, table)
+
+            if any(field in body for field in POSITIONAL_FIELDS):
+                refresh_positional_schedules(user_id, strategy_id, table)
+
+            # Plan entries carry the range breakout settings
+            if any(field in body for field in ('range_breakout',) + BREAKOUT_FIELDS):
+                invalidate_user_schedule_plan(user_id, table)
 
         log_user_action(
             logger, user_id, "strategy_updated", {"strategy_id": strategy_id}
@@ -836,6 +919,29 @@ def handle_update_strategy(event, user_id, strategy_id, table):
         }
 
 
+def refresh_positional_schedules(user_id: str, strategy_id: str, table) -> None:
+    """
+    Re-resolve the dated schedules of a strategy after its expiry-relative fields change.
+    """
+    try:
+        remove_positional_schedules(table, user_id, strategy_id)
+        strategy = table.get_item(
+            Key={"user_id": user_id, "sort_key": f"STRATEGY#{strategy_id}"}, ConsistentRead=True
+        ).get("Item")
+
+        if strategy and is_positional(strategy):
+            materialise_positional_schedules(table, user_id, strategy, ist_today())
+        else:
+            table.delete_item(Key={"user_id": user_id, "sort_key": f"{POSITIONAL_PREFIX}{strategy_id}"})
+
+        invalidate_user_schedule_plan(user_id, table)
+    except Exception as e:
+        logger.warning(
+            "Failed to refresh positional schedules",
+            extra={"error": str(e), "user_id": user_id, "strategy_id": strategy_id}
+        )
+
+
 def handle_delete_strategy(event, user_id, strategy_id, table):
     """Delete a strategy using single table structure"""
 
@@ -880,6 +986,8 @@ def handle_delete_strategy(event, user_id, strategy_id, table):
         table.delete_item(
             Key={"user_id": user_id, "sort_key": f"STRATEGY#{strategy_id}"}
         )
+        delete_warm_strategy_snapshot(user_id, strategy_id, table)
+        invalidate_user_execution_bundles(user_id, table)
 
         log_user_action(
             logger, user_id, "strategy_deleted", {"strategy_id": strategy_id}
@@ -1018,13 +1126,19 @@ def handle_bulk_delete_strategies(event, user_id, basket_id, table):
                     try:
                         strategy_id = strategy['sort_key'].replace('STRATEGY#', '')
 
-                        # Delete the strategy
+                        # Delete the strategy and its warm-up snapshot
                         batch_writer.delete_item(
                             Key={
                                 'user_id': user_id,
                                 'sort_key': strategy['sort_key']
                             }
                         )
+                        batch_writer.delete_item(
+                            Key={
+                                'user_id': user_id,
+                                'sort_key': f'WARM_STRATEGY#{strategy_id}'
+                            }
+                        )
 
                         deleted_count += 1
 
@@ -1051,6 +1165,9 @@ def handle_bulk_delete_strategies(event, user_id, basket_id, table):
                             }
                         )
 
+        if deleted_count > 0:
+            invalidate_user_execution_bundles(user_id, table)
+
         # Log the bulk operation completion
         log_user_action(
             logger, user_id, "bulk_strategies_deleted",
@@ -0,0 +1,208 @@
+"""
+Strategy MTM
+Strategy- and basket-level mark-to-market aggregation of open positions
+
+Strategies carry MTM limits across all of their legs (mtm_stop_loss and
+target_profit, each {type, value}); baskets may carry the same fields. The risk
+handlers evaluate per position row, so these limits need the legs summed first.
+One risk tick folds every open position row of a user into running MTM per
+strategy and per basket, and checks each against its limits:
+
+- TOTAL_MTM (or POINTS): combined P&L of the legs in rupees
+- COMBINED_PREMIUM_PERCENT: combined P&L as a percentage of the combined entry
+  premium of the legs
+
+A breach produces one trigger per strategy, so all legs exit together.
+"""
+
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+TOTAL_MTM = 'TOTAL_MTM'
+COMBINED_PREMIUM_PERCENT = 'COMBINED_PREMIUM_PERCENT'
+
+MTM_STOP_LOSS_EXIT = 'MTM_STOP_LOSS_EXIT'
+MTM_TARGET_EXIT = 'MTM_TARGET_EXIT'
+
+# Attributes of strategy / basket items the limits are read from
+RISK_LIMIT_FIELDS = ('mtm_stop_loss', 'target_profit')
+
+
+def leg_mtm(position: Dict[str, Any], prices: Optional[Dict[str, float]] = None) -> float:
+    """
+    Running P&L of one position row in rupees.
+
+    The live price from prices (by symbol) wins over the row's current_price;
+    realized_pnl of partially closed rows is included.
+    """
+    entry_price = float(position.get('entry_price', 0))
+    current_price = float(position.get('current_price', entry_price))
+    if prices and position.get('symbol') in prices:
+        current_price = float(prices[position['symbol']])
+
+    direction = -1 if position.get('position_type') == 'SHORT' else 1
+    quantity = abs(int(position.get('quantity', 0)))
+    return (current_price - entry_price) * quantity * direction + float(position.get('realized_pnl', 0))
+
+
+def aggregate_mtm(positions: Iterable[Dict[str, Any]],
+                  prices: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Sum open position rows into MTM per strategy and per basket in one pass.
+
+    Returns:
+        {'strategies': {strategy_id: book}, 'baskets': {basket_id: book}} where a
+        book has mtm, combined_premium, legs, position_ids (and basket_id /
+        strategy_ids to link the two levels)
+    """
+    strategies: Dict[str, Dict[str, Any]] = {}
+    baskets: Dict[str, Dict[str, Any]] = {}
+
+    for position in positions:
+        strategy_id = position.get('strategy_id')
+        if not strategy_id:
+            continue
+
+        mtm = leg_mtm(position, prices)
+        premium = float(position.get('entry_price', 0)) * abs(int(position.get('quantity', 0)))
+        basket_id = position.get('basket_id')
+
+        book = strategies.setdefault(strategy_id, _empty_book(basket_id=basket_id))
+        _add_leg(book, position, mtm, premium)
+
+        if basket_id:
+            basket = baskets.setdefault(basket_id, _empty_book(strategy_ids=[]))
+            _add_leg(basket, position, mtm, premium)
+            if strategy_id not in basket['strategy_ids']:
+                basket['strategy_ids'].append(strategy_id)
+
+    for book in list(strategies.values()) + list(baskets.values()):
+        book['mtm'] = round(book['mtm'], 2)
+        book['combined_premium'] = round(book['combined_premium'], 2)
+
+    return {'strategies': strategies, 'baskets': baskets}
+
+
+def mtm_limit_breached(book: Dict[str, Any], limit: Optional[Dict[str, Any]], is_stop_loss: bool) -> Optional[str]:
+    """
+    Reason text when a book crosses an MTM limit, else None.
+
+    Limits without a positive value, or switched off with enabled=False, never trigger.
+    """
+    if not limit or limit.get('enabled') is False:
+        return None
+    value = float(limit.get('value') or 0)
+    if value <= 0:
+        return None
+
+    limit_type = str(limit.get('type') or TOTAL_MTM).upper()
+    if limit_type == COMBINED_PREMIUM_PERCENT:
+        if book['combined_premium'] <= 0:
+            return None
+        measure = book['mtm'] / book['combined_premium'] * 100
+        unit, shown = '% of premium', f"{measure:.2f}"
+    else:
+        measure = book['mtm']
+        unit, shown = '', f"₹{measure:.2f}"
+
+    if is_stop_loss and measure <= -value:
+        return f"MTM {shown}{unit} breached stop loss {value:g}{unit or ' (₹)'}"
+    if not is_stop_loss and measure >= value:
+        return f"MTM {shown}{unit} reached target {value:g}{unit or ' (₹)'}"
+    return None
+
+
+def evaluate_mtm_limits(aggregate: Dict[str, Dict[str, Dict[str, Any]]],
+                        strategy_limits: Dict[str, Dict[str, Any]],
+                        basket_limits: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    One exit trigger per strategy whose own or whose basket's MTM limit is crossed.
+
+    Stop loss is checked before target; a strategy's own limits before its basket's.
+
+    Returns:
+        Triggers with strategy_id, basket_id, execution_type (MTM_STOP_LOSS_EXIT /
+        MTM_TARGET_EXIT), scope (STRATEGY / BASKET), reason, mtm and position_ids
+    """
+    triggers: Dict[str, Dict[str, Any]] = {}
+
+    def trigger(strategy_id: str, scope: str, book: Dict[str, Any], limits: Dict[str, Any]) -> None:
+        if strategy_id in triggers:
+            return
+        for field, is_stop_loss, execution_type in (('mtm_stop_loss', True, MTM_STOP_LOSS_EXIT),
+                                                    ('target_profit', False, MTM_TARGET_EXIT)):
+            reason = mtm_limit_breached(book, limits.get(field), is_stop_loss)
+            if reason:
+                strategy_book = aggregate['strategies'][strategy_id]
+                triggers[strategy_id] = {
+                    'strategy_id': strategy_id,
+                    'basket_id': strategy_book.get('basket_id'),
+                    'execution_type': execution_type,
+                    'scope': scope,
+                    'reason': reason,
+                    'mtm': book['mtm'],
+                    'strategy_mtm': strategy_book['mtm'],
+                    'position_ids': strategy_book['position_ids'],
+                }
+                return
+
+    for strategy_id, book in aggregate['strategies'].items():
+        trigger(strategy_id, 'STRATEGY', book, strategy_limits.get(strategy_id, {}))
+
+    for basket_id, basket in aggregate['baskets'].items():
+        limits = (basket_limits or {}).get(basket_id, {})
+        for strategy_id in basket['strategy_ids']:
+            trigger(strategy_id, 'BASKET', basket, limits)
+
+    return list(triggers.values())
+
+
+def load_risk_limits(table, user_id: str, sort_keys: List[str],
+                     fields: Tuple[str, ...] = RISK_LIMIT_FIELDS) -> Dict[str, Dict[str, Any]]:
+    """
+    MTM limits of strategy / basket items in one batch read.
+
+    Args:
+        sort_keys: STRATEGY#<id> and BASKET#<id> keys of the trading table
+        fields: Attributes to read (defaults to the MTM limits)
+
+    Returns:
+        {sort_key: {'mtm_stop_loss': ..., 'target_profit': ...}} for items that exist
+    """
+    limits: Dict[str, Dict[str, Any]] = {}
+    table_name = table.name
+    client = table.meta.client
+
+    for start in range(0, len(sort_keys), 100):
+        request = {table_name: {
+            'Keys': [{'user_id': user_id, 'sort_key': key} for key in sort_keys[start:start + 100]],
+            'ProjectionExpression': 'sort_key, ' + ', '.join(fields),
+        }}
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                limits[item['sort_key']] = {field: item.get(field) for field in fields}
+            request = response.get('UnprocessedKeys') or None
+
+    return limits
+
+
+def _empty_book(**extra) -> Dict[str, Any]:
+    return dict({'mtm': 0.0, 'combined_premium': 0.0, 'legs': 0, 'position_ids': []}, **extra)
+
+
+def _add_leg(book: Dict[str, Any], position: Dict[str, Any], mtm: float, premium: float) -> None:
+    book['mtm'] += mtm
+    book['combined_premium'] += premium
+    book['legs'] += 1
+    position_id = position.get('position_id') or position.get('execution_key')
+    if position_id:
+        book['position_ids'].append(position_id)
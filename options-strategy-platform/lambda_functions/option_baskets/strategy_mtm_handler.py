@@ -0,0 +1,248 @@
+"""
+🚀 STRATEGY MTM HANDLER
+
+Handles Strategy MTM Check sub-events from Active User Event Handler.
+Evaluates strategy- and basket-level MTM stop loss / target across all legs of
+every open strategy of the user in one risk tick.
+
+Responsibilities:
+- Query active positions for the user once
+- Aggregate running MTM per strategy and per basket (see strategy_mtm.py),
+  using live prices from the event when present
+- Read the MTM limits of the open strategies and their baskets in one batch
+- Queue a single coordinated exit of all legs of each strategy whose limit is hit,
+  claimed once per strategy per day (MTM_EXIT#<strategy_id>#<date>) so later
+  ticks do not queue it again while the exit is in flight
+- Record the MTM snapshot in execution history for dashboards
+"""
+
+import json
+import os
+import sys
+import boto3
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import send_to_lane
+from positional_schedule import open_positions
+from strategy_mtm import aggregate_mtm, evaluate_mtm_limits, load_risk_limits
+
+logger = setup_logger(__name__)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# MTM exit claims expire after this many seconds (one claim per strategy per day)
+MTM_EXIT_CLAIM_TTL_SECONDS = 2 * 24 * 60 * 60
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Handle Strategy MTM Check events.
+
+    Optional detail field: prices ({symbol: last_price}) overriding the
+    current_price of position rows.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', {})
+        user_id = detail.get('user_id')
+        sub_event_id = detail.get('sub_event_id')
+
+        if not user_id:
+            logger.error("Missing user_id in Strategy MTM Check event")
+            return create_error_response("Missing user_id")
+
+        current_ist = datetime.now(timezone.utc).astimezone(IST)
+
+        positions = query_active_positions(user_id)
+        if not positions:
+            logger.info(f"No active positions for user {user_id}")
+            return create_success_response(user_id, sub_event_id, {'strategies': {}, 'baskets': {}}, [])
+
+        aggregate = aggregate_mtm(positions, detail.get('prices'))
+        strategy_limits, basket_limits = get_mtm_limits(user_id, aggregate)
+        triggers = evaluate_mtm_limits(aggregate, strategy_limits, basket_limits)
+
+        for trigger in triggers:
+            queue_strategy_mtm_exit(user_id, trigger, current_ist)
+
+        write_mtm_record(user_id, aggregate, triggers, current_ist, sub_event_id)
+
+        logger.info(f"MTM of {len(aggregate['strategies'])} strategies / {len(aggregate['baskets'])} baskets "
+                    f"from {len(positions)} positions, {len(triggers)} exits triggered")
+
+        return create_success_response(user_id, sub_event_id, aggregate, triggers)
+
+    except Exception as e:
+        logger.error(f"Error in Strategy MTM Handler: {str(e)}")
+        return create_error_response(str(e))
+
+
+def query_active_positions(user_id: str) -> List[Dict]:
+    """Query today's (IST) open positions for the user from execution history."""
+    try:
+        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        return open_positions(table, user_id, datetime.now(timezone.utc).astimezone(IST).date())
+
+    except Exception as e:
+        logger.error(f"Error querying active positions: {str(e)}")
+        return []
+
+
+def get_mtm_limits(user_id: str, aggregate: Dict) -> tuple:
+    """MTM limits of the open strategies and their baskets, keyed by id."""
+    strategy_keys = [f"STRATEGY#{strategy_id}" for strategy_id in aggregate['strategies']]
+    basket_keys = [f"BASKET#{basket_id}" for basket_id in aggregate['baskets']]
+
+    try:
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        limits = load_risk_limits(table, user_id, strategy_keys + basket_keys)
+    except Exception as e:
+        logger.error(f"Error loading MTM limits: {str(e)}")
+        return {}, {}
+
+    strategy_limits = {key.split('#', 1)[1]: limits[key] for key in strategy_keys if key in limits}
+    basket_limits = {key.split('#', 1)[1]: limits[key] for key in basket_keys if key in limits}
+    return strategy_limits, basket_limits
+
+
+def mtm_exit_claim_key(user_id: str, strategy_id: str, current_ist: datetime) -> Dict[str, str]:
+    return {'user_id': user_id, 'sort_key': f"MTM_EXIT#{strategy_id}#{current_ist.strftime('%Y-%m-%d')}"}
+
+
+def claim_mtm_exit(table, user_id: str, strategy_id: str, current_ist: datetime) -> bool:
+    """
+    Claim today's MTM exit of a strategy.
+
+    Returns:
+        True if this tick owns the exit
+    """
+    try:
+        table.put_item(
+            Item={
+                **mtm_exit_claim_key(user_id, strategy_id, current_ist),
+                'entity_type': 'MTM_EXIT_CLAIM',
+                'claimed_at': datetime.now(timezone.utc).isoformat(),
+                'ttl': int(datetime.now(timezone.utc).timestamp()) + MTM_EXIT_CLAIM_TTL_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(sort_key)'
+        )
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def queue_strategy_mtm_exit(user_id: str, trigger: Dict, current_ist: datetime) -> None:
+    """Queue one exit of every leg of the strategy on the high priority lane, once a day."""
+    table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+    try:
+        if not claim_mtm_exit(table, user_id, trigger['strategy_id'], current_ist):
+            logger.info(f"MTM exit of strategy {trigger['strategy_id']} already queued today")
+            return
+    except Exception as e:
+        logger.error(f"Error claiming MTM exit: {str(e)}")
+        return
+
+    try:
+        message = {
+            'user_id': user_id,
+            'strategy_id': trigger['strategy_id'],
+            'basket_id': trigger.get('basket_id'),
+            'execution_type': trigger['execution_type'],
+            'exit_scope': trigger['scope'],
+            'trigger_reason': trigger['reason'],
+            'trigger_time': current_ist.isoformat(),
+            'pnl_at_exit': trigger['strategy_mtm'],
+            'position_ids': trigger['position_ids'],
+            'source': 'strategy_mtm_handler',
+            'priority': 'CRITICAL'
+        }
+
+        send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"MTM_{trigger['strategy_id']}_{current_ist.strftime('%Y%m%d%H%M')}",
+            encoder=DecimalEncoder
+        )
+
+        logger.info(f"Queued {trigger['execution_type']} for strategy {trigger['strategy_id']}: {trigger['reason']}")
+
+    except Exception as e:
+        logger.error(f"Error queuing MTM exit: {str(e)}")
+        # Release the claim so the next tick retries the exit
+        try:
+            table.delete_item(Key=mtm_exit_claim_key(user_id, trigger['strategy_id'], current_ist))
+        except Exception as release_error:
+            logger.error(f"❌ Could not release MTM exit claim of strategy {trigger['strategy_id']}: {release_error}")
+
+
+def write_mtm_record(user_id: str, aggregate: Dict, triggers: List[Dict],
+                     current_ist: datetime, sub_event_id: str = None) -> None:
+    """Record the MTM snapshot in execution history (ExecutionsByDate serves the dashboards)."""
+    try:
+        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+        record = json.loads(json.dumps({
+            'user_id': user_id,
+            'execution_key': f"RISK#MTM#{current_ist.isoformat()}",
+            'record_type': 'STRATEGY_MTM',
+            'execution_timestamp': current_ist.isoformat(),
+            'execution_date': current_ist.strftime('%Y-%m-%d'),
+            'sub_event_id': sub_event_id,
+            'strategy_mtm': {sid: book['mtm'] for sid, book in aggregate['strategies'].items()},
+            'basket_mtm': {bid: book['mtm'] for bid, book in aggregate['baskets'].items()},
+            'exits_triggered': [trigger['strategy_id'] for trigger in triggers]
+        }, cls=DecimalEncoder), parse_float=Decimal)
+
+        table.put_item(Item=record)
+
+    except Exception as e:
+        logger.error(f"Error writing MTM record: {str(e)}")
+
+
+def create_success_response(user_id: str, sub_event_id: str, aggregate: Dict, triggers: List[Dict]) -> Dict:
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'success': True,
+            'user_id': user_id,
+            'sub_event_id': sub_event_id,
+            'strategies_checked': len(aggregate['strategies']),
+            'baskets_checked': len(aggregate['baskets']),
+            'exits_triggered': len(triggers),
+            'strategy_mtm': {sid: book['mtm'] for sid, book in aggregate['strategies'].items()},
+            'basket_mtm': {bid: book['mtm'] for bid, book in aggregate['baskets'].items()},
+            'triggered_details': triggers
+        }, cls=DecimalEncoder)
+    }
+
+
+def create_error_response(error: str) -> Dict:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'success': False,
+            'error': error
+        })
+    }
@@ -9,8 +9,12 @@ ARCHITECTURE FLOW:
 1. Consumes SQS messages from schedule_strategy_trigger (immediate processing)
 2. Parses execution_time from message (e.g., "12:01") 
 3. Calculates precise wait seconds until execution time
-4. Launches Express Step Function with Wait + Invoke pattern
-5. Step Function waits until execution_time, then invokes single_strategy_executor
+4. Launches Express Step Function with Wait + Invoke pattern - or, when
+   BATCH_STRATEGY_STEP_FUNCTION_ARN is set, one batch execution per execution
+   minute whose distributed Map state invokes the executor per strategy
+5. Hydrates a version-stamped execution bundle (strategy + allocations) for the
+   executor, inside the lookahead window rather than at the execution minute
+6. Step Function waits until execution_time, then invokes single_strategy_executor
 
 KEY FEATURES:
 - SQS-triggered Express Step Function launching
@@ -23,18 +27,42 @@ KEY FEATURES:
 
 import json
 import os
+import sys
+import uuid
 import boto3
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from botocore.exceptions import ClientError
 import logging
 
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 stepfunctions = boto3.client('stepfunctions', region_name=os.environ.get('REGION', 'ap-south-1'))
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+# Execution bundles prefetched for the executor (falls back to just-in-time loading)
+try:
+    from execution_bundle import current_bundle_version, put_execution_bundle
+    from single_strategy_executor import get_complete_strategy_data, query_basket_broker_allocations
+    EXECUTION_BUNDLE_AVAILABLE = True
+except ImportError:
+    logger.warning("Execution bundle not available - strategies will be loaded at execution time")
+    EXECUTION_BUNDLE_AVAILABLE = False
+
+# Batch launcher (one distributed Map execution per execution minute)
+try:
+    from step_function_launcher import launch_strategy_batches
+    BATCH_LAUNCHER_AVAILABLE = True
+except ImportError:
+    logger.warning("Batch launcher not available - launching one Step Function per strategy")
+    BATCH_LAUNCHER_AVAILABLE = False
 
 
 def lambda_handler(event, context):
@@ -57,6 +85,9 @@ def lambda_handler(event, context):
         // - strategy_data (legs, underlying, product) -> 60-80% size reduction
         // - strategy_name (available via strategy lookup)
     }
+
+    schedule_strategy_trigger sends the same fields once per execution minute with
+    strategy_id / execution_type moved into a "strategies" list (expand_strategy_messages).
     """
     try:
         logger.info("🕐 Starting STRATEGY SCHEDULER - SQS to Express Step Function Bridge")
@@ -64,62 +95,106 @@ def lambda_handler(event, context):
         
         successful_launches = 0
         failed_launches = 0
+        batch_executions = 0
+
+        # Group into Map-state batch executions when the batch state machine is configured
+        batch_launch_enabled = BATCH_LAUNCHER_AVAILABLE and bool(os.environ.get('BATCH_STRATEGY_STEP_FUNCTION_ARN'))
+        batched_strategies = []
         
         for record in event['Records']:
             try:
-                # Parse SQS message
-                sqs_message = json.loads(record['body'])
-                user_id = sqs_message.get('user_id')
-                strategy_id = sqs_message.get('strategy_id')
-                execution_time = sqs_message.get('execution_time')
-                weekday = sqs_message.get('weekday')
-                execution_type = sqs_message.get('execution_type')
-                market_phase = sqs_message.get('market_phase', 'UNKNOWN')
-                trigger_source = sqs_message.get('trigger_source', 'scheduled_execution')
-                event_id = sqs_message.get('event_id', 'unknown')
+                # Parse SQS message; grouped messages carry one execution minute's strategies
+                record_messages = expand_strategy_messages(json.loads(record['body']))
+            except Exception as e:
+                failed_launches += 1
+                logger.error(f"❌ Error parsing SQS record: {str(e)}")
+                logger.error(f"Record content: {record}")
+                continue
+
+            for sqs_message in record_messages:
+                try:
+                    user_id = sqs_message.get('user_id')
+                    strategy_id = sqs_message.get('strategy_id')
+                    execution_time = sqs_message.get('execution_time')
+                    weekday = sqs_message.get('weekday')
+                    execution_type = sqs_message.get('execution_type')
+                    market_phase = sqs_message.get('market_phase', 'UNKNOWN')
+                    trigger_source = sqs_message.get('trigger_source', 'scheduled_execution')
+                    event_id = sqs_message.get('event_id', 'unknown')
                 
-                # ❌ REMOVED: strategy_data (heavy data) - will be loaded just-in-time
-                # ❌ REMOVED: strategy_name (available via strategy lookup)
+                    # ❌ REMOVED: strategy_data (heavy data) - will be loaded just-in-time
+                    # ❌ REMOVED: strategy_name (available via strategy lookup)
                 
-                logger.info(f"🕐 Processing single strategy {strategy_id} at {execution_time} on {weekday}")
+                    logger.info(f"🕐 Processing single strategy {strategy_id} at {execution_time} on {weekday}")
                 
-                # Validate required fields
-                if not strategy_id or not execution_time or not execution_type:
-                    logger.error(f"❌ Missing required fields for strategy {strategy_id}")
-                    failed_launches += 1
-                    continue
+                    # Validate required fields
+                    if not strategy_id or not execution_time or not execution_type:
+                        logger.error(f"❌ Missing required fields for strategy {strategy_id}")
+                        failed_launches += 1
+                        continue
                 
-                # Calculate revolutionary wait time with 0-second precision
-                wait_seconds = calculate_dynamic_wait_seconds(execution_time)
+                    # Resolve strategy and allocations now instead of at the minute boundary
+                    bundle_version = hydrate_execution_bundle(user_id, strategy_id, execution_time, execution_type)
+
+                    # Batch mode: one Map-state execution per execution minute (launched below)
+                    if batch_launch_enabled:
+                        batched_strategies.append({
+                            'user_id': user_id,
+                            'strategy_id': strategy_id,
+                            'execution_time': execution_time,
+                            'weekday': weekday,
+                            'execution_type': execution_type,
+                            'market_phase': market_phase,
+                            'trigger_source': f'{trigger_source}_batch_step_function',
+                            'event_id': event_id,
+                            'bundle_version': bundle_version
+                        })
+                        continue
+
+                    # Calculate revolutionary wait time with 0-second precision
+                    wait_seconds = calculate_dynamic_wait_seconds(execution_time)
                 
-                logger.info(f"🕐 Calculated wait time: {wait_seconds} seconds for {execution_time} execution")
+                    logger.info(f"🕐 Calculated wait time: {wait_seconds} seconds for {execution_time} execution")
                 
-                # Launch Express Step Function for single strategy processing
-                step_function_result = launch_single_strategy_step_function(
-                    user_id=user_id,
-                    strategy_id=strategy_id,
-                    execution_time=execution_time,
-                    weekday=weekday,
-                    execution_type=execution_type,
-                    market_phase=market_phase,
-                    wait_seconds=wait_seconds,
-                    trigger_source=trigger_source,
-                    event_id=event_id
-                )
+                    # Launch Express Step Function for single strategy processing
+                    step_function_result = launch_single_strategy_step_function(
+                        user_id=user_id,
+                        strategy_id=strategy_id,
+                        execution_time=execution_time,
+                        weekday=weekday,
+                        execution_type=execution_type,
+                        market_phase=market_phase,
+                        wait_seconds=wait_seconds,
+                        trigger_source=trigger_source,
+                        event_id=event_id,
+                        bundle_version=bundle_version
+                    )
                 
-                if step_function_result['success']:
-                    successful_launches += 1
-                    logger.info(f"✅ Successfully launched Express Step Function for strategy {strategy_id}")
-                    logger.info(f"📊 Step Function ARN: {step_function_result.get('execution_arn', 'N/A')}")
-                else:
-                    failed_launches += 1
-                    logger.error(f"❌ Failed to launch Step Function for strategy {strategy_id}: {step_function_result.get('error')}")
+                    if step_function_result['success']:
+                        successful_launches += 1
+                        logger.info(f"✅ Successfully launched Express Step Function for strategy {strategy_id}")
+                        logger.info(f"📊 Step Function ARN: {step_function_result.get('execution_arn', 'N/A')}")
+                    else:
+                        failed_launches += 1
+                        logger.error(f"❌ Failed to launch Step Function for strategy {strategy_id}: {step_function_result.get('error')}")
                 
-            except Exception as e:
-                failed_launches += 1
-                logger.error(f"❌ Error processing SQS record: {str(e)}")
-                logger.error(f"Record content: {record}")
+                except Exception as e:
+                    failed_launches += 1
+                    logger.error(f"❌ Error processing strategy {sqs_message.get('strategy_id')}: {str(e)}")
+                    logger.error(f"Record content: {record}")
         
+        if batched_strategies:
+            first = batched_strategies[0]
+            batch_result = launch_strategy_batches(
+                batched_strategies,
+                weekday=first['weekday'],
+                market_phase=first['market_phase'],
+                batch_id_prefix=f"sched-{uuid.uuid4().hex[:8]}"
+            )
+            successful_launches += batch_result['launched']
+            failed_launches += batch_result['failed']
+            batch_executions = len(batch_result['batches'])
+
         # Log final results
         logger.info(f"🕐 STRATEGY SCHEDULER COMPLETED")
         logger.info(f"✅ Successful launches: {successful_launches}")
@@ -133,7 +208,9 @@ def lambda_handler(event, context):
                 'message': f'Processed {successful_launches + failed_launches} single strategies with Express Step Functions',
                 'successful_launches': successful_launches,
                 'failed_launches': failed_launches,
-                'launcher_type': 'SQS_TO_EXPRESS_STEP_FUNCTION_SINGLE_STRATEGY',
+                'batch_executions': batch_executions,
+                'launcher_type': 'SQS_TO_BATCH_MAP_STEP_FUNCTION' if batch_launch_enabled
+                else 'SQS_TO_EXPRESS_STEP_FUNCTION_SINGLE_STRATEGY',
                 'revolutionary_features': {
                     'individual_strategy_processing': True,
                     'express_step_functions': True,
@@ -157,6 +234,22 @@ def lambda_handler(event, context):
         }
 
 
+def expand_strategy_messages(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    📦 Single-strategy messages from one SQS message body
+
+    schedule_strategy_trigger sends one message per user and execution minute with a
+    'strategies' list, so a whole minute reaches one invocation and one Map batch;
+    re-entry and other producers still send one strategy per message.
+    """
+    strategies = message.get('strategies')
+    if strategies is None:
+        return [message]
+
+    shared = {k: v for k, v in message.items() if k != 'strategies'}
+    return [{**shared, **strategy} for strategy in strategies]
+
+
 def calculate_dynamic_wait_seconds(execution_time: str) -> int:
     """
     🚀 REVOLUTIONARY: Calculate precise wait time for 0-second boundary execution
@@ -214,12 +307,49 @@ def calculate_dynamic_wait_seconds(execution_time: str) -> int:
         return 60
 
 
+def hydrate_execution_bundle(user_id: str, strategy_id: str, execution_time: str,
+                             execution_type: str) -> Optional[int]:
+    """
+    📦 Prefetch the executor's strategy and basket allocations into an execution bundle
+
+    Runs in the lookahead window before the Express wait starts, so the executor reads
+    one bundle at the minute boundary instead of re-resolving strategy and allocations.
+
+    Returns:
+        The bundle version, or None when nothing was hydrated (executor loads just-in-time)
+    """
+    if not EXECUTION_BUNDLE_AVAILABLE or not user_id:
+        return None
+
+    try:
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+
+        # Read the version first: a change made while resolving leaves this bundle stale
+        version = current_bundle_version(table, user_id)
+
+        strategy = get_complete_strategy_data(table, user_id, strategy_id)
+        if not strategy or not strategy.get('basket_id'):
+            return None
+        allocations = query_basket_broker_allocations(table, strategy['basket_id'])
+
+        put_execution_bundle(table, user_id, strategy, allocations, execution_time, execution_type, version)
+        logger.info(f"📦 Hydrated execution bundle for strategy {strategy_id} at {execution_time} "
+                    f"({len(allocations)} allocations, version {version})")
+        return version
+
+    except Exception as e:
+        logger.warning(f"⚠️ Could not hydrate execution bundle for strategy {strategy_id}: {str(e)}")
+        return None
+
+
 def launch_single_strategy_step_function(user_id: str, strategy_id: str, execution_time: str, 
                                         weekday: str, execution_type: str, market_phase: str,
-                                        wait_seconds: int, trigger_source: str, event_id: str) -> Dict[str, Any]:
+                                        wait_seconds: int, trigger_source: str, event_id: str,
+                                        bundle_version: Optional[int] = None) -> Dict[str, Any]:
     """
     🚀 Launch Express Step Function for single strategy processing with precise timing
-    🎯 LIGHTWEIGHT: Uses just-in-time data loading - no heavy strategy_data passed
+    🎯 LIGHTWEIGHT: Only identifiers are passed - the executor reads the hydrated
+    execution bundle, or loads strategy data just-in-time when there is none
     """
     try:
         # Get Express Step Function ARN from environment variable
@@ -247,7 +377,8 @@ def launch_single_strategy_step_function(user_id: str, strategy_id: str, executi
             'launcher_source': 'SQS_TRIGGERED_STRATEGY_SCHEDULER',      # ✅ Source tracking
             'timing_precision': '0_SECOND_INSTITUTIONAL_GRADE',         # ✅ Precision flag
             'step_function_type': 'EXPRESS',           # ✅ Cost efficiency
-            'load_strategy_at_runtime': True,          # ✅ NEW: Just-in-time loading flag
+            'load_strategy_at_runtime': bundle_version is None,  # ✅ Just-in-time loading flag
+            'bundle_version': bundle_version,          # ✅ Prefetched execution bundle (None = not hydrated)
             'revolutionary_features': {
                 'individual_strategy_processing': True,
                 'express_cost_efficiency': True,
@@ -28,6 +28,15 @@ logger = setup_logger(__name__)
 # Import partner auth middleware
 from partner_auth_middleware import validate_partner_request
 
+# Import marketplace listing index (kept in step with subscriber counts)
+from marketplace_listing_index import upsert_template_listing, get_template_listing
+
+# Import sharded counters (subscriber counts and partner metrics are write-hot)
+from sharded_counters import (
+    increment_sharded_counter, compact_counter_shards,
+    template_subscriber_counter, partner_metrics_counter
+)
+
 
 # Custom JSON encoder to handle Decimal types
 class DecimalEncoder(json.JSONEncoder):
@@ -46,6 +55,15 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     log_lambda_event(logger, event, context)
 
     try:
+        # Scheduled maintenance: fold counter shards back into templates and partner keys
+        if event.get('action') == 'compact_counters':
+            dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+            trading_configurations_table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+            return {
+                'statusCode': 200,
+                'body': json.dumps(compact_subscription_counters(trading_configurations_table))
+            }
+
         # Get HTTP method and path
         http_method = event['httpMethod']
         path = event.get('path', '')
@@ -542,7 +560,18 @@ def get_template_by_id(template_id: str, table) -> Optional[Dict]:
     """Fetch marketplace template by basket_id"""
 
     try:
-        # Scan for template (can be optimized with additional GSI if needed)
+        # Resolve the owner through the listing index (direct get_item, no scan)
+        listing = get_template_listing(template_id, table)
+        if listing:
+            response = table.get_item(
+                Key={
+                    'user_id': listing['template_owner_id'],
+                    'sort_key': f'BASKET#{template_id}'
+                }
+            )
+            return response.get('Item')
+
+        # Template not indexed yet - fall back to scan
         response = table.scan(
             FilterExpression='basket_id = :basket_id AND attribute_exists(marketplace_config)',
             ExpressionAttributeValues={
@@ -783,21 +812,21 @@ def check_existing_subscription(user_id: str, template_id: str, table) -> Option
         return None
 
 
-def increment_template_subscriber_count(template_id: str, template_owner_id: str, table):
-    """Increment subscriber_count on template basket"""
+def increment_template_subscriber_count(template_id: str, template_owner_id: str, table, delta: int = 1):
+    """
+    Increment subscriber_count on template basket
+
+    Writes go to a random counter shard so subscription bursts on a popular template
+    do not throttle on a single item; compact_subscription_counters folds them back.
+    """
 
     try:
-        table.update_item(
-            Key={
-                'user_id': template_owner_id,
-                'sort_key': f'BASKET#{template_id}'
-            },
-            UpdateExpression='ADD subscriber_count :inc',
-            ExpressionAttributeValues={':inc': 1}
-        )
+        counter_id, target_key = template_subscriber_counter(template_id, template_owner_id)
+        increment_sharded_counter(table, counter_id, target_key, {'subscriber_count': delta})
 
         logger.debug("Template subscriber count incremented", extra={
-            "template_id": template_id
+            "template_id": template_id,
+            "delta": delta
         })
 
     except Exception as e:
@@ -808,18 +837,28 @@ def increment_template_subscriber_count(template_id: str, template_owner_id: str
         # Don't fail subscription if count update fails
 
 
+def refresh_template_listing(template: Dict, table):
+    """Re-rank a template in the marketplace listing index after a subscriber count change"""
+
+    try:
+        upsert_template_listing(template, table)
+    except Exception as e:
+        logger.warning("Failed to refresh marketplace listing", extra={
+            "error": str(e),
+            "template_id": template.get('basket_id')
+        })
+        # Don't fail subscription if the listing refresh fails
+
+
 def update_partner_metrics(api_key_id: str, table):
-    """Update partner API key metrics"""
+    """Update partner API key metrics (sharded, see increment_template_subscriber_count)"""
 
     try:
-        table.update_item(
-            Key={
-                'user_id': 'PARTNER',
-                'sort_key': f'PARTNER_API_KEY#{api_key_id}'
-            },
-            UpdateExpression='ADD metrics.total_subscriptions :inc, metrics.active_users :inc',
-            ExpressionAttributeValues={':inc': 1}
-        )
+        counter_id, target_key = partner_metrics_counter(api_key_id)
+        increment_sharded_counter(table, counter_id, target_key, {
+            'metrics.total_subscriptions': 1,
+            'metrics.active_users': 1
+        })
 
         logger.debug("Partner metrics updated", extra={"api_key_id": api_key_id})
 
@@ -830,6 +869,30 @@ def update_partner_metrics(api_key_id: str, table):
         })
 
 
+def compact_subscription_counters(table) -> Dict[str, Any]:
+    """
+    Fold sharded subscriber counts and partner metrics back into their items
+
+    Templates whose subscriber_count changed are re-ranked in the marketplace
+    listing index once per run rather than once per subscription.
+    """
+
+    result = compact_counter_shards(table)
+    templates_refreshed = 0
+
+    for target_key in result.pop('targets_updated'):
+        if not target_key['sort_key'].startswith('BASKET#'):
+            continue
+
+        template = table.get_item(Key=target_key).get('Item')
+        if template:
+            refresh_template_listing(template, table)
+            templates_refreshed += 1
+
+    result['templates_refreshed'] = templates_refreshed
+    return result
+
+
 def list_user_subscriptions(user_id: str, table):
     """List all user's subscriptions"""
 
@@ -975,14 +1038,7 @@ def cancel_subscription(user_id: str, subscription_id: str, table):
 
         # Decrement template subscriber count
         if template_id and template_owner_id:
-            table.update_item(
-                Key={
-                    'user_id': template_owner_id,
-                    'sort_key': f'BASKET#{template_id}'
-                },
-                UpdateExpression='ADD subscriber_count :dec',
-                ExpressionAttributeValues={':dec': -1}
-            )
+            increment_template_subscriber_count(template_id, template_owner_id, table, delta=-1)
 
         logger.info("Subscription cancelled", extra={
             "user_id": user_id,
@@ -21,14 +21,19 @@ from decimal import Decimal
 
 sys.path.append('/opt/python')
 sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
 
 from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import send_to_lane
+from positional_schedule import open_positions
 
 logger = setup_logger(__name__)
 
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+IST = timezone(timedelta(hours=5, minutes=30))
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -94,25 +99,11 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
 
 def query_active_positions(user_id: str) -> List[Dict]:
-    """Query active positions for the user from execution history."""
+    """Query today's (IST) open positions for the user from execution history."""
     try:
         table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-
-        response = table.query(
-            KeyConditionExpression='user_id = :user_id AND begins_with(sort_key, :prefix)',
-            FilterExpression='#status = :open_status',
-            ExpressionAttributeValues={
-                ':user_id': user_id,
-                ':prefix': f'{today}#',
-                ':open_status': 'OPEN'
-            },
-            ExpressionAttributeNames={
-                '#status': 'position_status'
-            }
-        )
-
-        return response.get('Items', [])
+        today = datetime.now(timezone.utc).astimezone(IST).date()
+        return open_positions(table, user_id, today)
 
     except Exception as e:
         logger.error(f"Error querying active positions: {str(e)}")
@@ -129,7 +120,7 @@ def check_target_profit_for_position(position: Dict, current_ist: datetime) -> D
     - ABSOLUTE: Target at specific profit amount
     """
     try:
-        position_id = position.get('position_id', position.get('sort_key'))
+        position_id = position.get('position_id') or position.get('execution_key')
         strategy_id = position.get('strategy_id')
 
         # Get target profit configuration
@@ -198,11 +189,6 @@ def queue_target_profit_exit(user_id: str, position: Dict, trigger_result: Dict,
                               current_ist: datetime) -> None:
     """Queue exit for target profit reached position."""
     try:
-        queue_url = os.environ.get('SINGLE_STRATEGY_QUEUE_URL')
-        if not queue_url:
-            logger.error("SINGLE_STRATEGY_QUEUE_URL not configured")
-            return
-
         message = {
             'user_id': user_id,
             'strategy_id': trigger_result.get('strategy_id'),
@@ -215,11 +201,11 @@ def queue_target_profit_exit(user_id: str, position: Dict, trigger_result: Dict,
             'priority': 'HIGH'
         }
 
-        sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message, cls=DecimalEncoder),
-            MessageGroupId=user_id,
-            MessageDeduplicationId=f"TP_{trigger_result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}"
+        send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"TP_{trigger_result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}",
+            encoder=DecimalEncoder
         )
 
         logger.info(f"Queued TARGET_PROFIT_EXIT for position {trigger_result.get('position_id')}")
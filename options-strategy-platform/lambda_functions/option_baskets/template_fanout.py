@@ -0,0 +1,195 @@
+"""
+Template Fan-out Triggers
+Emits Template.Execution.Triggered events for due marketplace template schedules
+
+Both the entry and the exit handler call emit_template_fanout_events with the
+schedules they found due, so subscribers of a template are entered and exited
+on the template's clock just like the admin's own allocation (see
+template_fanout_executor.py).
+
+Those handlers run once per admin broker each minute; a per-day claim item
+makes sure each template schedule fans out exactly once. A claim whose event
+could not be published is released, so a later minute (or broker) retries it.
+
+Claims (trading configurations table):
+- user_id: TEMPLATE_FANOUT#{basket_id}
+- sort_key: {YYYY-MM-DD}#{ENTRY|EXIT}#{HH:MM}#{strategy_id}
+"""
+
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, List
+
+from botocore.exceptions import ClientError
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+# Template fan-out claims expire after this many seconds (one claim per schedule per day)
+TEMPLATE_FANOUT_CLAIM_TTL_SECONDS = 2 * 24 * 60 * 60
+
+_WEEKDAY_ABBR = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def is_template_basket(table, user_id: str, basket_id: str, cache: Dict[str, bool]) -> bool:
+    """
+    Check whether a basket is a marketplace template.
+
+    Args:
+        cache: basket_id -> flag, owned by the caller (cleared per invocation)
+    """
+    if basket_id in cache:
+        return cache[basket_id]
+
+    try:
+        response = table.get_item(
+            Key={'user_id': user_id, 'sort_key': f'BASKET#{basket_id}'},
+            ProjectionExpression='marketplace_config'
+        )
+        marketplace_config = response.get('Item', {}).get('marketplace_config') or {}
+        is_template = bool(marketplace_config.get('is_template'))
+
+    except Exception as e:
+        logger.error(f"Error checking template flag for basket {basket_id}: {str(e)}")
+        is_template = False
+
+    cache[basket_id] = is_template
+    return is_template
+
+
+def claim_key(basket_id: str, strategy_id: str, execution_type: str,
+              execution_time: str, current_ist: datetime) -> Dict[str, str]:
+    return {
+        'user_id': f'TEMPLATE_FANOUT#{basket_id}',
+        'sort_key': f"{current_ist.strftime('%Y-%m-%d')}#{execution_type}#{execution_time}#{strategy_id}"
+    }
+
+
+def claim_template_fanout(table, basket_id: str, strategy_id: str, execution_type: str,
+                          execution_time: str, current_ist: datetime) -> bool:
+    """
+    Claim the fan-out of one template schedule for today.
+
+    Returns:
+        True if this invocation owns the fan-out
+    """
+    try:
+        table.put_item(
+            Item={
+                **claim_key(basket_id, strategy_id, execution_type, execution_time, current_ist),
+                'entity_type': 'TEMPLATE_FANOUT_CLAIM',
+                'claimed_at': datetime.now(timezone.utc).isoformat(),
+                'ttl': int(datetime.now(timezone.utc).timestamp()) + TEMPLATE_FANOUT_CLAIM_TTL_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(sort_key)'
+        )
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def release_template_fanout(table, basket_id: str, strategy_id: str, execution_type: str,
+                            execution_time: str, current_ist: datetime) -> None:
+    """Drop a claim whose event was not published, so the schedule can fan out again."""
+    try:
+        table.delete_item(Key=claim_key(basket_id, strategy_id, execution_type, execution_time, current_ist))
+    except Exception as e:
+        logger.error(f"❌ Could not release template fan-out claim of strategy {strategy_id}: {str(e)}")
+
+
+def emit_template_fanout_events(
+    table,
+    eventbridge_client,
+    user_id: str,
+    schedules: List[Dict],
+    execution_type: str,
+    current_ist: datetime,
+    source: str,
+    template_cache: Dict[str, bool]
+) -> List[Dict[str, Any]]:
+    """
+    Emit one Template.Execution.Triggered event per due template strategy.
+
+    Args:
+        user_id: Template owner (admin) user identifier
+        schedules: Due items with strategy_id, basket_id and execution_time
+        execution_type: ENTRY or EXIT
+        current_ist: Current IST datetime
+        source: Emitting handler, recorded on the event
+
+    Returns:
+        Result dict per template schedule this invocation claimed
+    """
+    results = []
+
+    for schedule in schedules:
+        basket_id = schedule.get('basket_id')
+        strategy_id = schedule.get('strategy_id')
+        execution_time = schedule.get('execution_time')
+
+        if not basket_id or not execution_time or not is_template_basket(table, user_id, basket_id, template_cache):
+            continue
+
+        try:
+            if not claim_template_fanout(table, basket_id, strategy_id, execution_type, execution_time, current_ist):
+                logger.debug(f"Template fan-out for {strategy_id} at {execution_time} already claimed")
+                continue
+        except Exception as e:
+            logger.error(f"❌ Error claiming template fan-out for strategy {strategy_id}: {str(e)}")
+            results.append({'strategy_id': strategy_id, 'basket_id': basket_id, 'status': 'ERROR', 'error': str(e)})
+            continue
+
+        try:
+            event_detail = {
+                'execution_event_id': str(uuid.uuid4()),
+                'template_owner_id': user_id,
+                'strategy_id': strategy_id,
+                'basket_id': basket_id,
+                'execution_type': execution_type,
+                'execution_time': execution_time,
+                'weekday': _WEEKDAY_ABBR[current_ist.weekday()],
+                'source': source,
+                'emitted_at': datetime.now(timezone.utc).isoformat()
+            }
+
+            response = eventbridge_client.put_events(
+                Entries=[
+                    {
+                        'Source': 'qlalgo.options.trading',
+                        'DetailType': 'Template.Execution.Triggered',
+                        'Detail': json.dumps(event_detail, cls=DecimalEncoder),
+                        'Time': datetime.now(timezone.utc)
+                    }
+                ]
+            )
+            if response.get('FailedEntryCount'):
+                raise RuntimeError(f"EventBridge rejected the event: {response.get('Entries')}")
+
+            logger.info(f"📤 Emitted template {execution_type} fan-out for strategy {strategy_id} (template {basket_id})")
+            results.append({'strategy_id': strategy_id, 'basket_id': basket_id, 'status': 'EMITTED'})
+
+        except Exception as e:
+            logger.error(f"❌ Error emitting template fan-out for strategy {strategy_id}: {str(e)}")
+            release_template_fanout(table, basket_id, strategy_id, execution_type, execution_time, current_ist)
+            results.append({'strategy_id': strategy_id, 'basket_id': basket_id, 'status': 'ERROR', 'error': str(e)})
+
+    return results
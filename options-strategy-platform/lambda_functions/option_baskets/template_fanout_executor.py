@@ -0,0 +1,424 @@
+"""
+🚀 TEMPLATE FAN-OUT EXECUTOR
+
+Executes one marketplace template strategy for all of its subscribers.
+
+Subscriber broker allocations created by subscription_manager point at the admin's
+template basket, so every subscriber runs the same strategy definition. Instead of
+discovering and loading that strategy once per subscriber, this executor:
+
+- Loads the template strategy once (legs, underlying, weekday and exchange checks)
+- Loads all subscriber allocations for the template with one paged AllocationsByBasket query
+- Enumerates ACTIVE/TRIAL subscribers through the TemplateSubscribers GSI in pages
+- Dispatches each page across a thread pool and batch-writes execution records
+- Re-emits itself with a resume cursor when the Lambda is close to its timeout
+
+Event Structure (Template.Execution.Triggered from strategy_entry_handler / strategy_exit_handler):
+{
+    "detail": {
+        "template_owner_id": "admin-001",
+        "strategy_id": "strategy456",
+        "basket_id": "template-001",
+        "execution_time": "09:30",
+        "weekday": "MON",
+        "execution_type": "ENTRY",
+        "resume": {"status": "ACTIVE", "start_key": {...}}   // optional continuation
+    }
+}
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+import concurrent.futures
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+import boto3
+
+sys.path.append('/opt/python')
+sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
+
+from shared_utils.logger import setup_logger, log_lambda_event
+
+logger = setup_logger(__name__)
+
+# Reuse the single-strategy execution primitives (strategy load, leg execution, validation)
+from single_strategy_executor import (
+    get_complete_strategy_data, get_broker_credentials, get_trading_mode_from_config,
+    get_exchange_from_underlying, is_exchange_market_open, is_execution_allowed_today,
+    execute_strategy_legs_for_broker, EXCHANGE_MARKET_HOURS
+)
+
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
+eventbridge_client = boto3.client('events', region_name=os.environ.get('REGION', 'ap-south-1'))
+
+# Subscription statuses that receive executions (TemplateSubscribers sort key prefixes)
+EXECUTABLE_SUBSCRIPTION_STATUSES = ('ACTIVE', 'TRIAL')
+
+FANOUT_PAGE_SIZE = int(os.environ.get('TEMPLATE_FANOUT_PAGE_SIZE', '250'))
+FANOUT_MAX_WORKERS = int(os.environ.get('TEMPLATE_FANOUT_MAX_WORKERS', '32'))
+
+# Stop taking new pages when less than this much Lambda time remains
+FANOUT_MIN_REMAINING_MS = int(os.environ.get('TEMPLATE_FANOUT_MIN_REMAINING_MS', '8000'))
+
+SUCCESS_ORDER_STATUSES = ('success', 'simulated_success')
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Handle Template.Execution.Triggered events.
+
+    Validates the template strategy once, then fans the execution out to every
+    executable subscriber allocation of the template basket.
+    """
+    log_lambda_event(logger, event, context)
+
+    try:
+        detail = event.get('detail', event)
+
+        template_owner_id = detail.get('template_owner_id')
+        strategy_id = detail.get('strategy_id')
+        template_id = detail.get('basket_id')
+        execution_time = detail.get('execution_time')
+        execution_type = detail.get('execution_type', 'ENTRY')
+
+        for field, value in (('template_owner_id', template_owner_id), ('strategy_id', strategy_id),
+                             ('basket_id', template_id), ('execution_time', execution_time)):
+            if not value:
+                raise ValueError(f"Missing required field: {field}")
+
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        execution_table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
+
+        # Load the template strategy ONCE for all subscribers
+        strategy = get_complete_strategy_data(table, template_owner_id, strategy_id)
+        if not strategy:
+            return create_skip_response(detail, "Template strategy not found or inactive")
+        strategy.setdefault('strategy_id', strategy_id)
+
+        ist_time = datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)
+
+        if not is_execution_allowed_today(strategy.get('weekdays', []), ist_time):
+            return create_skip_response(detail, f'Execution not allowed on {ist_time.strftime("%A")}')
+
+        exchange = get_exchange_from_underlying(strategy.get('underlying', 'UNKNOWN'), strategy)
+        if not is_exchange_market_open(exchange, ist_time):
+            hours = EXCHANGE_MARKET_HOURS.get(exchange.upper(), EXCHANGE_MARKET_HOURS['NSE'])
+            return create_skip_response(
+                detail,
+                f"Exchange {exchange} is closed. Market hours: "
+                f"{hours['start'].strftime('%H:%M')} - {hours['end'].strftime('%H:%M')} IST"
+            )
+
+        def has_time_left() -> bool:
+            if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+                return True
+            return context.get_remaining_time_in_millis() > FANOUT_MIN_REMAINING_MS
+
+        result = fan_out_template_strategy(
+            table=table,
+            execution_table=execution_table,
+            strategy=strategy,
+            template_id=template_id,
+            execution_time=execution_time,
+            execution_type=execution_type,
+            ist_time=ist_time,
+            resume=detail.get('resume'),
+            has_time_left=has_time_left
+        )
+
+        if result.get('resume'):
+            emit_continuation_event(detail, result['resume'])
+
+        logger.info("Template fan-out completed", extra={
+            "template_id": template_id,
+            "strategy_id": strategy_id,
+            **{k: v for k, v in result.items() if k != 'resume'}
+        })
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'status': 'success',
+                'template_id': template_id,
+                'strategy_id': strategy_id,
+                'execution_time': execution_time,
+                'execution_type': execution_type,
+                'fanout': result
+            }, cls=DecimalEncoder)
+        }
+
+    except Exception as e:
+        logger.error("Template fan-out failed", extra={"error": str(e)})
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'status': 'error', 'message': str(e), 'error_source': 'template_fanout_executor'})
+        }
+
+
+def load_subscriber_allocations(table, template_id: str) -> Dict[str, List[Dict]]:
+    """
+    All subscriber broker allocations for a template, grouped by subscriber user_id.
+
+    Subscriber allocations are BROKER_ALLOCATION entities whose basket_id is the
+    template basket, so one paged AllocationsByBasket query replaces a lookup per
+    subscriber. Allocations without a status are treated as active.
+    """
+    allocations: Dict[str, List[Dict]] = {}
+    query_kwargs = {
+        'IndexName': 'AllocationsByBasket',
+        'KeyConditionExpression': 'basket_id = :basket_id AND begins_with(entity_type_priority, :prefix)',
+        'ExpressionAttributeValues': {':basket_id': template_id, ':prefix': 'BROKER_ALLOCATION#'}
+    }
+
+    while True:
+        response = table.query(**query_kwargs)
+        for allocation in response.get('Items', []):
+            if str(allocation.get('status', 'ACTIVE')).upper() != 'ACTIVE':
+                continue
+            allocations.setdefault(allocation['user_id'], []).append(allocation)
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return allocations
+
+
+def iter_subscriber_pages(table, template_id: str, resume: Optional[Dict] = None,
+                          page_size: int = None) -> Iterator[Tuple[List[Dict], Optional[Dict]]]:
+    """
+    Page through executable subscribers of a template via the TemplateSubscribers GSI.
+
+    Yields (subscribers, cursor) where cursor resumes after this page, or None
+    once every status has been exhausted.
+    """
+    page_size = page_size or FANOUT_PAGE_SIZE
+    statuses = list(EXECUTABLE_SUBSCRIPTION_STATUSES)
+    start_index = statuses.index(resume['status']) if resume else 0
+    start_key = resume.get('start_key') if resume else None
+
+    for index in range(start_index, len(statuses)):
+        status = statuses[index]
+
+        while True:
+            query_kwargs = {
+                'IndexName': 'TemplateSubscribers',
+                'KeyConditionExpression': 'template_basket_id = :template_id AND begins_with(subscription_status_date, :status)',
+                'ExpressionAttributeValues': {':template_id': template_id, ':status': f'{status}#'},
+                'Limit': page_size
+            }
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+
+            response = table.query(**query_kwargs)
+            start_key = response.get('LastEvaluatedKey')
+
+            if start_key:
+                cursor = {'status': status, 'start_key': start_key}
+            elif index + 1 < len(statuses):
+                cursor = {'status': statuses[index + 1], 'start_key': None}
+            else:
+                cursor = None
+
+            yield response.get('Items', []), cursor
+
+            if not start_key:
+                break
+
+
+def execute_for_subscriber(subscriber: Dict, allocation: Dict, strategy: Dict, template_id: str,
+                           execution_type: str, execution_time: str) -> List[Dict]:
+    """
+    Execute the template legs for one subscriber allocation.
+
+    execution_time keys every order, so a redelivered fan-out event cannot
+    place the subscriber's legs twice.
+    """
+
+    trading_mode = get_trading_mode_from_config(allocation.get('broker_config'))
+    credentials = None
+
+    if trading_mode == 'LIVE':
+        credentials = get_broker_credentials(
+            subscriber['user_id'], allocation.get('client_id'), allocation.get('broker_name', '')
+        )
+        if not credentials:
+            trading_mode = 'PAPER'
+
+    return execute_strategy_legs_for_broker(
+        legs=strategy.get('legs', []),
+        broker_config=allocation,
+        underlying=strategy.get('underlying', 'UNKNOWN'),
+        strategy_id=strategy.get('strategy_id'),
+        user_id=subscriber['user_id'],
+        basket_id=template_id,
+        execution_type=execution_type,
+        trading_mode=trading_mode,
+        credentials=credentials,
+        execution_time=execution_time
+    )
+
+
+def create_subscriber_execution_record(subscriber: Dict, allocation: Dict, strategy: Dict, template_id: str,
+                                       execution_time: str, execution_type: str, ist_time: datetime,
+                                       leg_executions: List[Dict]) -> Dict:
+    """Execution history record for one subscriber allocation"""
+
+    strategy_id = strategy.get('strategy_id')
+    lot_multiplier = allocation.get('lot_multiplier', 1)
+    total_lots = sum(int(leg.get('lots', 1) * lot_multiplier) for leg in strategy.get('legs', []))
+
+    return {
+        'user_id': subscriber['user_id'],
+        'execution_key': f"EXECUTION#{strategy_id}#{execution_time}#{int(ist_time.timestamp())}#{allocation.get('allocation_id')}",
+        'strategy_id': strategy_id,
+        'strategy_name': strategy.get('strategy_name'),
+        'basket_id': template_id,
+        'subscription_id': subscriber.get('subscription_id'),
+        'execution_time': execution_time,
+        'execution_type': execution_type,
+        'underlying': strategy.get('underlying'),
+        'strategy_type': strategy.get('strategy_type'),
+        'total_lots_executed': total_lots,
+        'broker_executions': [{
+            'broker_id': allocation.get('broker_id'),
+            'broker_name': allocation.get('broker_name'),
+            'client_id': allocation.get('client_id'),
+            'lot_multiplier': lot_multiplier,
+            'total_lots': total_lots,
+            'leg_executions': leg_executions,
+            'status': 'executed' if leg_executions else 'no_legs'
+        }],
+        'execution_timestamp': ist_time.isoformat(),
+        'execution_date': ist_time.strftime('%Y-%m-%d'),
+        'execution_source': 'template_fanout_executor',
+        'status': 'completed',
+        'execution_level': 'template_subscriber'
+    }
+
+
+def fan_out_template_strategy(table, execution_table, strategy: Dict, template_id: str, execution_time: str,
+                              execution_type: str, ist_time: datetime, resume: Optional[Dict] = None,
+                              has_time_left=lambda: True, page_size: int = None,
+                              max_workers: int = None) -> Dict[str, Any]:
+    """
+    Dispatch a loaded template strategy across all subscriber allocations.
+
+    Returns fan-out statistics; 'resume' is set when the run stopped early and
+    must be continued from that cursor.
+    """
+    started = time.monotonic()
+    allocations_by_user = load_subscriber_allocations(table, template_id)
+
+    stats = {
+        'pages': 0,
+        'subscribers': 0,
+        'subscribers_without_allocation': 0,
+        'allocations_dispatched': 0,
+        'orders_placed': 0,
+        'orders_failed': 0,
+        'resume': None
+    }
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or FANOUT_MAX_WORKERS) as pool, \
+            execution_table.batch_writer() as writer:
+
+        for subscribers, cursor in iter_subscriber_pages(table, template_id, resume, page_size):
+            stats['pages'] += 1
+            futures = {}
+
+            for subscriber in subscribers:
+                stats['subscribers'] += 1
+                subscriber_allocations = allocations_by_user.get(subscriber.get('user_id'), [])
+                if not subscriber_allocations:
+                    stats['subscribers_without_allocation'] += 1
+                    continue
+
+                for allocation in subscriber_allocations:
+                    future = pool.submit(
+                        execute_for_subscriber, subscriber, allocation, strategy, template_id,
+                        execution_type, execution_time
+                    )
+                    futures[future] = (subscriber, allocation)
+
+            # Execution history is written from this thread; batch_writer is not thread-safe
+            for future in concurrent.futures.as_completed(futures):
+                subscriber, allocation = futures[future]
+                stats['allocations_dispatched'] += 1
+                try:
+                    leg_executions = future.result()
+                except Exception as e:
+                    logger.error("Subscriber execution failed", extra={
+                        "user_id": subscriber.get('user_id'), "template_id": template_id, "error": str(e)
+                    })
+                    stats['orders_failed'] += len(strategy.get('legs', []))
+                    continue
+
+                for leg in leg_executions:
+                    if leg.get('execution_status') in SUCCESS_ORDER_STATUSES:
+                        stats['orders_placed'] += 1
+                    else:
+                        stats['orders_failed'] += 1
+
+                writer.put_item(Item=create_subscriber_execution_record(
+                    subscriber, allocation, strategy, template_id,
+                    execution_time, execution_type, ist_time, leg_executions
+                ))
+
+            if cursor and not has_time_left():
+                stats['resume'] = cursor
+                break
+
+    elapsed = time.monotonic() - started
+    stats['fanout_latency_ms'] = round(elapsed * 1000, 2)
+    stats['orders_per_second'] = round(stats['orders_placed'] / elapsed, 2) if elapsed > 0 else 0.0
+    return stats
+
+
+def emit_continuation_event(detail: Dict, resume: Dict) -> None:
+    """Re-emit the template execution event so another invocation finishes the fan-out"""
+
+    continuation = dict(detail)
+    continuation['resume'] = resume
+    continuation['continuation_id'] = str(uuid.uuid4())
+
+    eventbridge_client.put_events(Entries=[{
+        'Source': 'qlalgo.options.trading',
+        'DetailType': 'Template.Execution.Triggered',
+        'Detail': json.dumps(continuation, cls=DecimalEncoder),
+        'Time': datetime.now(timezone.utc)
+    }])
+
+    logger.info("Template fan-out continuation emitted", extra={
+        "template_id": detail.get('basket_id'),
+        "resume_status": resume.get('status')
+    })
+
+
+def create_skip_response(detail: Dict, reason: str) -> Dict:
+    logger.info("Template fan-out skipped", extra={
+        "template_id": detail.get('basket_id'), "strategy_id": detail.get('strategy_id'), "reason": reason
+    })
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'status': 'skipped',
+            'message': reason,
+            'template_id': detail.get('basket_id'),
+            'strategy_id': detail.get('strategy_id'),
+            'execution_time': detail.get('execution_time')
+        })
+    }
@@ -12,7 +12,8 @@ from .broker_trading_strategy import (
     TransactionType,
     ProductType,
 )
-from .paper_trading_strategy import PaperTradingStrategy
+from .paper_trading_strategy import PaperTradingStrategy, set_default_matching_engine
+from .paper_matching_engine import MatchingEngine, TickReplayer, Tick, Fill, load_ticks
 from .zerodha_trading_strategy import ZerodhaTradingStrategy
 from .zebu_trading_strategy import ZebuTradingStrategy
 
@@ -33,6 +34,13 @@ __all__ = [
     'PaperTradingStrategy',
     'ZerodhaTradingStrategy',
     'ZebuTradingStrategy',
+    # Paper matching engine and tick replay
+    'MatchingEngine',
+    'TickReplayer',
+    'Tick',
+    'Fill',
+    'load_ticks',
+    'set_default_matching_engine',
 ]
 
 
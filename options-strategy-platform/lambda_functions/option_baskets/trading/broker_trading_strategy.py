@@ -68,6 +68,7 @@ class OrderParams:
     basket_id: Optional[str] = None
     leg_id: Optional[str] = None
     execution_type: Optional[str] = None  # ENTRY or EXIT
+    client_id: Optional[str] = None       # Broker client account
 
 
 @dataclass
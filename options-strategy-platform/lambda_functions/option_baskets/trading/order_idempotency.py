@@ -0,0 +1,388 @@
+"""
+Order Idempotency
+Reserves a deterministic key per leg execution before the broker is called
+
+SQS redelivers at least once and Step Functions retry failed states, so the same
+scheduled leg can reach the bridge more than once. Every leg execution derives a
+key from (user, strategy, leg, execution type, scheduled time, broker, client)
+and reserves it with a conditional write in the trading table. Only the
+invocation that wins the reservation places the order; repeats get the original
+result back instead of a second live order.
+
+A RESERVED key only holds for a short lease: an invocation that dies between
+reserve and complete (Lambda timeout, crash before the broker call) does not block
+the schedule for the whole TTL, and a repeat after the lease may take the key over.
+COMPLETED keys hold for the full TTL.
+
+A leg whose broker call failed without an answer (timeout, dropped connection)
+may still have been accepted by the exchange, so its key is neither completed
+nor released but held as UNKNOWN. Orders carry a tag derived from the key; the
+next attempt at the leg looks for that tag in the broker's order book and either
+adopts the orders it finds or, once the book is readable and the key has settled,
+releases the key and places the leg (see TradingExecutionBridge).
+
+A per-container sliding window of recently completed keys answers warm repeats
+without the DynamoDB round trip. The conditional write stays the source of truth
+across containers.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .order_slicer import aggregate_slice_fills
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+# Reservations outlive any retry or redelivery of the same schedule
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('ORDER_IDEMPOTENCY_TTL_SECONDS', str(2 * 24 * 60 * 60)))
+
+# How long an in-flight reservation blocks repeats; well above the executor Lambda timeouts
+RESERVATION_LEASE_SECONDS = int(os.environ.get('ORDER_IDEMPOTENCY_LEASE_SECONDS', '300'))
+
+# How long an UNKNOWN key waits before an order book without its tag may release it
+UNKNOWN_SETTLE_SECONDS = int(os.environ.get('ORDER_IDEMPOTENCY_UNKNOWN_SETTLE_SECONDS', '30'))
+
+# In-memory window of completed keys; covers SQS visibility timeouts and Step Function retries
+IDEMPOTENCY_WINDOW_SECONDS = float(os.environ.get('ORDER_IDEMPOTENCY_WINDOW_SECONDS', '900'))
+IDEMPOTENCY_WINDOW_SIZE = int(os.environ.get('ORDER_IDEMPOTENCY_WINDOW_SIZE', '10000'))
+
+RESERVED = 'RESERVED'
+COMPLETED = 'COMPLETED'
+UNKNOWN = 'UNKNOWN'
+
+# Broker order tags hold 20 characters (Kite's limit)
+ORDER_TAG_LENGTH = 20
+
+# Leg outcomes where the exchange never accepted an order, so a retry cannot duplicate one
+_RETRYABLE_STATUSES = {'REJECTED', 'CANCELLED', 'ERROR', 'THROTTLED'}
+
+# Fields of the leg result replayed to duplicate callers
+_RESULT_FIELDS = (
+    'order_id', 'broker_order_id', 'broker_order_ids', 'status', 'symbol', 'quantity',
+    'filled_quantity', 'average_price', 'slice_count', 'broker_name', 'client_id',
+)
+
+
+def derive_idempotency_key(
+    user_id: str,
+    strategy_id: str,
+    leg_id: Optional[str],
+    execution_type: str,
+    execution_time: str,
+    broker_name: str,
+    client_id: str,
+    trading_date: Optional[str] = None
+) -> str:
+    """
+    Deterministic key for one leg of one scheduled execution.
+
+    Args:
+        execution_time: Scheduled time (HH:MM); the trading date is added so the
+            same daily schedule gets a new key every session
+        trading_date: ISO date of the session (default today, UTC)
+
+    Returns:
+        32-character hex key
+    """
+    trading_date = trading_date or datetime.now(timezone.utc).date().isoformat()
+    parts = [user_id, strategy_id, leg_id or '', execution_type, trading_date,
+             execution_time, (broker_name or '').lower(), client_id or '']
+    return hashlib.sha256('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def order_tag(key: str) -> str:
+    """Broker order tag of the orders placed under an idempotency key."""
+    return key[:ORDER_TAG_LENGTH]
+
+
+class SlidingWindowIndex:
+    """
+    Keys seen in the last window_seconds, oldest first.
+
+    Entries carry the leg result so a warm repeat is answered from memory. The
+    index is exact rather than probabilistic, so a hit never needs confirming.
+    """
+
+    def __init__(self, window_seconds: float = IDEMPOTENCY_WINDOW_SECONDS,
+                 max_size: int = IDEMPOTENCY_WINDOW_SIZE):
+        self.window_seconds = window_seconds
+        self.max_size = max(1, max_size)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def add(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.window_seconds, result)
+            self._evict(now)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_size:
+                break
+            self._entries.popitem(last=False)
+
+
+# Shared across warm invocations, like the broker rate limiters
+_RECENT_KEYS = SlidingWindowIndex()
+
+
+def get_recent_key_index() -> SlidingWindowIndex:
+    """Get the container-wide sliding window of completed keys."""
+    return _RECENT_KEYS
+
+
+class OrderIdempotencyGateway:
+    """
+    Reserve-then-place guard for leg executions.
+
+    Reservations are stored in the trading table as IDEMPOTENCY#<key> items next
+    to the ORDER# records they protect. Without a table only the in-memory window
+    applies (paper backtests and tests).
+    """
+
+    def __init__(self, table=None, recent_keys: Optional[SlidingWindowIndex] = None):
+        self.table = table
+        self.recent_keys = recent_keys if recent_keys is not None else _RECENT_KEYS
+
+    def reserve(self, user_id: str, key: str, details: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Claim a key before placing the order.
+
+        Returns:
+            None if this caller owns the key and should place the order, otherwise
+            the prior result (status DUPLICATE while the first attempt is in flight,
+            UNKNOWN while its outcome awaits reconciliation)
+        """
+        cached = self.recent_keys.get(key)
+        if cached is not None:
+            logger.info(f"Idempotency key {key} answered from the recent key window")
+            return cached
+
+        if not self.table:
+            return None
+
+        now = datetime.now(timezone.utc)
+        now_epoch = int(now.timestamp())
+        try:
+            self.table.put_item(
+                Item={
+                    'user_id': user_id,
+                    'sort_key': f'IDEMPOTENCY#{key}',
+                    'entity_type': 'ORDER_IDEMPOTENCY',
+                    'idempotency_key': key,
+                    'reservation_status': RESERVED,
+                    'reserved_at': now.isoformat(),
+                    'lease_expires_at': now_epoch + RESERVATION_LEASE_SECONDS,
+                    'ttl': now_epoch + IDEMPOTENCY_TTL_SECONDS,
+                    **details,
+                },
+                # A reservation whose owner never completed it lapses after its lease
+                ConditionExpression='attribute_not_exists(sort_key) OR '
+                                    '(reservation_status = :reserved AND lease_expires_at < :now)',
+                ExpressionAttributeValues={':reserved': RESERVED, ':now': now_epoch}
+            )
+            return None
+
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        existing = self.table.get_item(
+            Key={'user_id': user_id, 'sort_key': f'IDEMPOTENCY#{key}'},
+            ConsistentRead=True
+        ).get('Item', {})
+
+        if existing.get('reservation_status') == COMPLETED and existing.get('order_result'):
+            prior = from_dynamodb(existing['order_result'])
+            self.recent_keys.add(key, prior)
+            return prior
+
+        if existing.get('reservation_status') == UNKNOWN:
+            return {
+                'order_id': existing.get('order_id'),
+                'status': UNKNOWN,
+                'message': f"Broker outcome unknown since {existing.get('unknown_since')}",
+                'unknown_since_epoch': existing.get('unknown_since_epoch'),
+            }
+
+        return {
+            'order_id': existing.get('order_id'),
+            'status': 'DUPLICATE',
+            'message': f"Leg execution already in flight since {existing.get('reserved_at')}",
+        }
+
+    def complete(self, user_id: str, key: str, result: Dict[str, Any]) -> None:
+        """
+        Record the leg outcome against its reservation.
+
+        Outcomes where nothing reached the exchange release the key so a retry can
+        place the order again. A broker call that failed without an answer leaves
+        the key UNKNOWN instead (see mark_unknown).
+        """
+        if not result.get('broker_order_ids'):
+            if result.get('status') == 'ERROR' and result.get('reached_broker', True):
+                self.mark_unknown(user_id, key, result)
+                return
+            if result.get('status') in _RETRYABLE_STATUSES:
+                self.release(user_id, key)
+                return
+
+        order_result = {field: result.get(field) for field in _RESULT_FIELDS if field in result}
+        self.recent_keys.add(key, order_result)
+
+        if not self.table:
+            return
+
+        try:
+            self.table.update_item(
+                Key={'user_id': user_id, 'sort_key': f'IDEMPOTENCY#{key}'},
+                UpdateExpression='SET reservation_status = :status, order_id = :order_id, '
+                                 'order_result = :result, completed_at = :completed_at',
+                ExpressionAttributeValues={
+                    ':status': COMPLETED,
+                    ':order_id': result.get('order_id'),
+                    ':result': json.loads(json.dumps(order_result), parse_float=Decimal),
+                    ':completed_at': datetime.now(timezone.utc).isoformat(),
+                }
+            )
+        except Exception as e:
+            # The reservation still blocks repeats; replays just report DUPLICATE
+            logger.error(f"Failed to complete idempotency key {key}: {e}")
+
+    def mark_unknown(self, user_id: str, key: str, result: Dict[str, Any]) -> None:
+        """
+        Hold a key whose orders may have reached the exchange without a reply.
+
+        The key keeps blocking repeats until reconcile_unknown finds its orders in
+        the broker's order book or shows they were never accepted.
+        """
+        self.recent_keys.discard(key)
+        if not self.table:
+            return
+
+        now = datetime.now(timezone.utc)
+        try:
+            self.table.update_item(
+                Key={'user_id': user_id, 'sort_key': f'IDEMPOTENCY#{key}'},
+                UpdateExpression='SET reservation_status = :status, order_id = :order_id, '
+                                 'unknown_since = :since, unknown_since_epoch = :since_epoch',
+                ExpressionAttributeValues={
+                    ':status': UNKNOWN,
+                    ':order_id': result.get('order_id'),
+                    ':since': now.isoformat(),
+                    ':since_epoch': int(now.timestamp()),
+                }
+            )
+            logger.warning(f"Idempotency key {key} held as UNKNOWN: {result.get('message') or result.get('error')}")
+        except Exception as e:
+            # The RESERVED lease still blocks repeats for a while
+            logger.error(f"Failed to mark idempotency key {key} unknown: {e}")
+
+    def reconcile_unknown(self, user_id: str, key: str, prior: Dict[str, Any],
+                          order_book: List[Any]) -> Optional[Dict[str, Any]]:
+        """
+        Resolve an UNKNOWN key against the broker's order book.
+
+        Args:
+            prior: The UNKNOWN result reserve returned
+            order_book: The account's OrderStatusResponse list for the day
+
+        Returns:
+            The adopted leg result when orders carrying the key's tag are in the
+            book, None when the key was released (nothing reached the exchange),
+            or prior unchanged while the outcome is still unknown
+        """
+        tag = order_tag(key)
+        placed = [order for order in order_book if broker_order_tag(order) == tag and order.broker_order_id]
+
+        if placed:
+            broker_order_ids = [order.broker_order_id for order in placed]
+            slices = [{
+                'status': order.status.value,
+                'quantity': int(order.filled_quantity or 0) + int(order.pending_quantity or 0),
+                'filled_quantity': int(order.filled_quantity or 0),
+                'fill_price': order.average_price,
+            } for order in placed]
+            fill = aggregate_slice_fills(slices)
+            result = {
+                'order_id': prior.get('order_id'),
+                'broker_order_id': broker_order_ids[0],
+                'broker_order_ids': broker_order_ids,
+                'status': fill['status'],
+                'filled_quantity': fill['filled_quantity'],
+                'average_price': fill['average_price'],
+                'slice_count': fill['slice_count'],
+            }
+            logger.warning(f"Idempotency key {key} reconciled: broker accepted {broker_order_ids}")
+            self.complete(user_id, key, result)
+            return result
+
+        # An empty book may be a failed read; a young key's orders may not be listed yet
+        settled = int(prior.get('unknown_since_epoch') or 0) + UNKNOWN_SETTLE_SECONDS <= int(time.time())
+        if not order_book or not settled:
+            return prior
+
+        logger.warning(f"Idempotency key {key} reconciled: no order tagged {tag} at the broker, releasing")
+        self.release(user_id, key)
+        return None
+
+    def release(self, user_id: str, key: str) -> None:
+        """Drop a reservation whose order never reached the exchange."""
+        self.recent_keys.discard(key)
+        if not self.table:
+            return
+
+        try:
+            self.table.delete_item(Key={'user_id': user_id, 'sort_key': f'IDEMPOTENCY#{key}'})
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key {key}: {e}")
+
+
+def broker_order_tag(order: Any) -> Optional[str]:
+    """Tag of an order book entry (Kite tag, Noren remarks, or the paper order's params)."""
+    raw = order.raw_response if isinstance(order.raw_response, dict) else {}
+    params = raw.get('params')
+    return raw.get('tag') or raw.get('remarks') or getattr(params, 'tag', None)
+
+
+def from_dynamodb(value: Any) -> Any:
+    """Turn the Decimals DynamoDB returns back into int / float."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: from_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_dynamodb(v) for v in value]
+    return value
@@ -0,0 +1,260 @@
+"""
+Order Postbacks
+Applies broker order-status postbacks to ORDER# records
+
+Brokers push order updates to a postback URL as soon as the exchange reports
+them, which replaces polling get_orders for fills and rejections. This module
+verifies a postback came from the broker, normalises the Kite and Zebu payloads
+into OrderStatusResponse, and folds the update into the slice of the ORDER#
+record it belongs to.
+
+Broker order ids are resolved through BROKER_ORDER#<broker>#<id> items written
+by the trading bridge when a live order is placed; they expire after
+BROKER_ORDER_INDEX_TTL_SECONDS, well past the last postback of a day order. Updates are applied with an
+optimistic condition on updated_at, and postbacks that arrive out of order
+(an OPEN after a COMPLETE, a smaller fill after a larger one) are ignored.
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .broker_trading_strategy import OrderStatus, OrderStatusResponse
+from .order_slicer import aggregate_slice_fills
+from .order_idempotency import from_dynamodb
+from .zerodha_trading_strategy import ZerodhaOrderStatus
+from .zebu_trading_strategy import ZebuOrderStatus
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+# Zebu webhooks carry no checksum of their own; the receiver expects an
+# HMAC-SHA256 of the raw body, keyed with the client's API secret
+ZEBU_SIGNATURE_HEADER = 'x-postback-signature'
+
+# BROKER_ORDER# pointers expire after this many seconds
+BROKER_ORDER_INDEX_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Lifecycle order used to drop stale postbacks; terminal states share the top rank
+_STATUS_RANK = {
+    OrderStatus.PENDING.value: 0,
+    OrderStatus.PLACED.value: 1,
+    OrderStatus.OPEN.value: 2,
+    OrderStatus.PARTIALLY_FILLED.value: 3,
+    OrderStatus.FILLED.value: 4,
+    OrderStatus.CANCELLED.value: 4,
+    OrderStatus.REJECTED.value: 4,
+    OrderStatus.EXPIRED.value: 4,
+    'ERROR': 4,
+}
+_TERMINAL_RANK = 4
+
+# Conflicting writers (another postback, a poll) are retried this many times
+MAX_UPDATE_ATTEMPTS = 3
+
+
+def verify_kite_checksum(payload: Dict[str, Any], api_secret: str) -> bool:
+    """Kite signs postbacks with SHA-256(order_id + order_timestamp + api_secret)."""
+    checksum = payload.get('checksum')
+    if not checksum or not api_secret:
+        return False
+    expected = hashlib.sha256(
+        f"{payload.get('order_id', '')}{payload.get('order_timestamp', '')}{api_secret}".encode('utf-8')
+    ).hexdigest()
+    return hmac.compare_digest(expected, str(checksum))
+
+
+def verify_zebu_signature(raw_body: str, signature: Optional[str], api_secret: str) -> bool:
+    """HMAC-SHA256 of the raw postback body, hex encoded."""
+    if not signature or not api_secret:
+        return False
+    expected = hmac.new(api_secret.encode('utf-8'), raw_body.encode('utf-8'), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def _progress_status(status: OrderStatus, filled_quantity: int) -> OrderStatus:
+    """Brokers report partial fills as OPEN / UPDATE with a non-zero fill."""
+    if filled_quantity > 0 and _STATUS_RANK[status.value] < _STATUS_RANK[OrderStatus.PARTIALLY_FILLED.value]:
+        return OrderStatus.PARTIALLY_FILLED
+    return status
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%H:%M:%S %d-%m-%Y'):
+        try:
+            return datetime.strptime(str(value), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def normalise_kite_postback(payload: Dict[str, Any]) -> OrderStatusResponse:
+    """Map a Kite Connect postback onto OrderStatusResponse."""
+    filled = int(payload.get('filled_quantity') or 0)
+    status = _progress_status(ZerodhaOrderStatus.to_order_status(str(payload.get('status', ''))), filled)
+    return OrderStatusResponse(
+        order_id=str(payload.get('order_id')),
+        broker_order_id=str(payload.get('order_id')),
+        status=status,
+        filled_quantity=filled,
+        pending_quantity=int(payload.get('pending_quantity') or 0),
+        average_price=float(payload.get('average_price') or 0),
+        rejection_reason=payload.get('status_message') if status == OrderStatus.REJECTED else None,
+        updated_at=_timestamp(payload.get('exchange_update_timestamp') or payload.get('order_timestamp')),
+        raw_response=payload,
+    )
+
+
+def normalise_zebu_postback(payload: Dict[str, Any]) -> OrderStatusResponse:
+    """Map a Zebu (Noren) order update onto OrderStatusResponse."""
+    filled = int(payload.get('fillshares') or 0)
+    quantity = int(payload.get('qty') or 0)
+    status = _progress_status(ZebuOrderStatus.to_order_status(str(payload.get('status', ''))), filled)
+    return OrderStatusResponse(
+        order_id=str(payload.get('norenordno')),
+        broker_order_id=str(payload.get('norenordno')),
+        status=status,
+        filled_quantity=filled,
+        pending_quantity=max(quantity - filled, 0),
+        average_price=float(payload.get('avgprc') or 0),
+        rejection_reason=payload.get('rejreason') if status == OrderStatus.REJECTED else None,
+        updated_at=_timestamp(payload.get('exch_tm') or payload.get('norentm')),
+        raw_response=payload,
+    )
+
+
+def broker_order_sort_key(broker_name: str, broker_order_id: str) -> str:
+    """Trading table sort key of the item pointing a broker order id at its ORDER#."""
+    return f'BROKER_ORDER#{broker_name.lower()}#{broker_order_id}'
+
+
+class OrderPostbackProcessor:
+    """Folds normalised broker updates (postbacks or polled order books) into ORDER# records."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def apply(self, user_id: str, broker_name: str, update: OrderStatusResponse) -> Optional[Dict[str, Any]]:
+        """
+        Apply one postback to the order it belongs to.
+
+        Returns:
+            The changed order (with previous_status), or None when the broker
+            order is unknown or the postback carries nothing new
+        """
+        pointer = self.table.get_item(
+            Key={'user_id': user_id, 'sort_key': broker_order_sort_key(broker_name, update.broker_order_id)}
+        ).get('Item')
+        if not pointer:
+            logger.info(f"Postback for unknown {broker_name} order {update.broker_order_id}; ignoring")
+            return None
+
+        return self.apply_to_order(user_id, pointer['order_id'], [update])
+
+    def apply_to_order(self, user_id: str, order_id: str,
+                       updates: List[OrderStatusResponse]) -> Optional[Dict[str, Any]]:
+        """
+        Fold broker updates for one or more slices of an order in a single write.
+
+        Returns:
+            The changed order (with previous_status), or None if nothing changed
+        """
+        order_key = {'user_id': user_id, 'sort_key': f"ORDER#{order_id}"}
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            order = self.table.get_item(Key=order_key, ConsistentRead=True).get('Item')
+            if not order:
+                logger.warning(f"Order {order_id} missing; dropping {len(updates)} broker updates")
+                return None
+
+            changed = self._fold(from_dynamodb(order), updates)
+            if changed is None:
+                return None
+
+            try:
+                self.table.update_item(
+                    Key=order_key,
+                    UpdateExpression='SET slices = :slices, #status = :status, filled_quantity = :filled, '
+                                     'fill_price = :fill_price, rejection_reason = :rejection, '
+                                     'order_status_key = :status_key, updated_at = :updated_at',
+                    ConditionExpression='updated_at = :previous_updated_at',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues=json.loads(json.dumps({
+                        ':slices': changed['slices'],
+                        ':status': changed['status'],
+                        ':filled': changed['filled_quantity'],
+                        ':fill_price': changed['fill_price'],
+                        ':rejection': changed['rejection_reason'],
+                        ':status_key': changed['order_status_key'],
+                        ':updated_at': changed['updated_at'],
+                        ':previous_updated_at': order.get('updated_at'),
+                    }), parse_float=Decimal)
+                )
+                return changed
+
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                logger.info(f"Order {order_id} changed concurrently; re-applying broker updates")
+
+        logger.warning(f"Gave up applying broker updates to order {order_id} after {MAX_UPDATE_ATTEMPTS} attempts")
+        return None
+
+    def _fold(self, order: Dict[str, Any], updates: List[OrderStatusResponse]) -> Optional[Dict[str, Any]]:
+        """The order with the updates folded into their slices, or None if nothing changes."""
+        slices = [dict(s) for s in order.get('slices') or []]
+        by_broker_order_id = {str(s.get('broker_order_id')): s for s in slices}
+        rejection = order.get('rejection_reason')
+        changed = False
+
+        for update in updates:
+            target = by_broker_order_id.get(str(update.broker_order_id))
+            if target is None:
+                continue
+
+            current_rank = _STATUS_RANK.get(target.get('status'), 0)
+            current_filled = int(target.get('filled_quantity') or 0)
+            new_rank = _STATUS_RANK[update.status.value]
+            if current_rank >= _TERMINAL_RANK:
+                continue
+            if update.filled_quantity < current_filled or new_rank < current_rank:
+                continue
+            if new_rank == current_rank and update.filled_quantity == current_filled:
+                continue
+
+            target['status'] = update.status.value
+            target['filled_quantity'] = update.filled_quantity
+            target['fill_price'] = update.average_price if update.filled_quantity else None
+            if update.rejection_reason:
+                target['message'] = update.rejection_reason
+                rejection = rejection or update.rejection_reason
+            changed = True
+
+        if not changed:
+            return None
+
+        leg_fill = aggregate_slice_fills(slices)
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            **{k: v for k, v in order.items() if k not in ('user_id', 'sort_key')},
+            'slices': slices,
+            'status': leg_fill['status'],
+            'previous_status': order.get('status'),
+            'filled_quantity': leg_fill['filled_quantity'],
+            'fill_price': leg_fill['average_price'],
+            'rejection_reason': rejection,
+            'order_status_key': f"{leg_fill['status']}#{now}",
+            'updated_at': now,
+        }
@@ -0,0 +1,247 @@
+"""
+Order Slicing
+Splits a leg quantity into exchange-compliant child orders and dispatches them
+
+A leg of N lots is split so that no child order exceeds either the allocation's
+max_lots_per_order or the exchange freeze quantity of the underlying. Slices are
+placed concurrently behind a per-broker token bucket so a large multiplier does
+not trip the broker's order-rate limit, and the child fills are aggregated back
+into a single logical leg execution.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from shared_utils.indian_market_utils import INDIAN_MARKET_CONFIG
+
+from .broker_trading_strategy import OrderStatus
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+# Exchange freeze quantity per underlying, in units.
+# Orders above the freeze quantity are rejected by the exchange outright.
+FREEZE_QUANTITY_UNITS = {
+    "NIFTY": 1800,
+    "BANKNIFTY": 900,
+    "FINNIFTY": 1800,
+    "MIDCPNIFTY": 4200,
+    "SENSEX": 1000,
+}
+
+# Freeze quantity in lots, against the lot sizes in INDIAN_MARKET_CONFIG
+FREEZE_LIMIT_LOTS = {
+    symbol: units // INDIAN_MARKET_CONFIG["indices"][symbol]["lot_size"]
+    for symbol, units in FREEZE_QUANTITY_UNITS.items()
+}
+
+# Broker order-rate limits (orders per second)
+BROKER_ORDERS_PER_SECOND = {
+    "zerodha": 10,
+    "zebu": 10,
+}
+DEFAULT_ORDERS_PER_SECOND = float(os.environ.get('BROKER_ORDERS_PER_SECOND', '10'))
+
+# Share of each broker's order rate this function may use; execution lanes split the
+# budget between protective exits and routine work (see execution_lanes.py)
+BROKER_RATE_BUDGET_SHARE = float(os.environ.get('BROKER_RATE_BUDGET_SHARE', '1'))
+ORDER_SLICE_WORKERS = int(os.environ.get('ORDER_SLICE_WORKERS', '8'))
+
+# Slice not sent because the account's order budget was used up (see order_throttler)
+THROTTLED = 'THROTTLED'
+
+# Slice states that mean the exchange never accepted the child order
+_FAILED_SLICE_STATUSES = {OrderStatus.REJECTED.value, OrderStatus.CANCELLED.value, 'ERROR', THROTTLED}
+
+
+class OrderBudgetExhausted(Exception):
+    """Raised by a limiter's acquire() when an order must not be sent now."""
+
+
+def max_lots_per_slice(underlying: Optional[str], max_lots_per_order: Optional[Any] = None) -> Optional[int]:
+    """
+    Largest child order allowed for a leg.
+
+    Args:
+        underlying: Underlying index (NIFTY, BANKNIFTY, ...)
+        max_lots_per_order: Allocation cap, if configured
+
+    Returns:
+        Lots per slice, or None when neither limit applies
+    """
+    limits = []
+    freeze_limit = FREEZE_LIMIT_LOTS.get((underlying or '').upper())
+    if freeze_limit:
+        limits.append(freeze_limit)
+    if max_lots_per_order:
+        allocation_cap = int(max_lots_per_order)
+        if allocation_cap > 0:
+            limits.append(allocation_cap)
+    return min(limits) if limits else None
+
+
+def slice_quantity(total_lots: int, slice_lots: Optional[int]) -> List[int]:
+    """
+    Split total_lots into full slices of slice_lots followed by the remainder.
+
+    slice_quantity(150, 72) -> [72, 72, 6]
+    """
+    if total_lots <= 0:
+        return []
+    if not slice_lots or total_lots <= slice_lots:
+        return [total_lots]
+
+    full_slices, remainder = divmod(total_lots, slice_lots)
+    return [slice_lots] * full_slices + ([remainder] if remainder else [])
+
+
+class BrokerRateLimiter:
+    """
+    Token bucket shared by every slice sent to one broker.
+
+    The bucket holds at most one second of tokens, so a burst of slices goes out
+    at the broker's sustained rate instead of all at once.
+    """
+
+    def __init__(self, orders_per_second: float):
+        self.orders_per_second = orders_per_second
+        self._capacity = max(orders_per_second, 1.0)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until an order may be sent; returns the seconds spent waiting."""
+        if self.orders_per_second <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self.orders_per_second)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.orders_per_second
+            time.sleep(wait)
+            waited += wait
+
+
+# Rate limiters persist across warm invocations so back-to-back legs share a bucket
+_RATE_LIMITERS: Dict[str, BrokerRateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_broker_rate_limiter(broker_name: str, client_id: Optional[str] = None) -> BrokerRateLimiter:
+    """
+    Get or create the rate limiter for a broker, or for one account of it.
+
+    Order-rate limits apply per account, so a client_id gives that account its
+    own bucket at the broker's rate.
+    """
+    broker_key = (broker_name or 'paper').lower()
+    limiter_key = f"{broker_key}#{client_id}" if client_id else broker_key
+    with _RATE_LIMITERS_LOCK:
+        if limiter_key not in _RATE_LIMITERS:
+            rate = BROKER_ORDERS_PER_SECOND.get(broker_key, DEFAULT_ORDERS_PER_SECOND) * BROKER_RATE_BUDGET_SHARE
+            _RATE_LIMITERS[limiter_key] = BrokerRateLimiter(rate)
+        return _RATE_LIMITERS[limiter_key]
+
+
+def dispatch_slices(
+    place_slice: Callable[[int, int], Dict[str, Any]],
+    slices: List[int],
+    broker_name: str,
+    max_workers: Optional[int] = None,
+    limiter: Optional[Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Place slices concurrently, respecting the broker's order-rate limit.
+
+    Args:
+        place_slice: Callable(slice_index, lots) returning a slice result with
+            status, filled_quantity and fill_price
+        slices: Lots per slice from slice_quantity
+        broker_name: Broker whose rate limiter paces the slices
+        max_workers: Concurrent placements (default ORDER_SLICE_WORKERS)
+        limiter: Anything with acquire() pacing the slices, e.g. an
+            AccountOrderThrottler (default the broker's rate limiter); a slice
+            whose acquire() raises OrderBudgetExhausted is not sent (THROTTLED)
+
+    Returns:
+        Slice results in slice order
+    """
+    limiter = limiter or get_broker_rate_limiter(broker_name)
+
+    def run(slice_index: int) -> Dict[str, Any]:
+        lots = slices[slice_index]
+        try:
+            limiter.acquire()
+            result = place_slice(slice_index, lots)
+        except OrderBudgetExhausted as e:
+            logger.warning(f"Slice {slice_index + 1}/{len(slices)} not sent: {e}")
+            result = {'status': THROTTLED, 'message': str(e), 'filled_quantity': 0, 'fill_price': None}
+        except Exception as e:
+            logger.error(f"Slice {slice_index + 1}/{len(slices)} failed: {e}")
+            result = {'status': 'ERROR', 'message': str(e), 'filled_quantity': 0, 'fill_price': None}
+        result.update({'slice_index': slice_index, 'quantity': lots})
+        return result
+
+    if len(slices) == 1:
+        return [run(0)]
+
+    workers = min(max_workers or ORDER_SLICE_WORKERS, len(slices))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, range(len(slices))))
+
+
+def aggregate_slice_fills(slice_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fold child order results into one logical leg execution.
+
+    Returns:
+        Dict with status, quantity, filled_quantity, average_price and
+        rejected_slices for the leg as a whole
+    """
+    total_lots = sum(s['quantity'] for s in slice_results)
+    filled_lots = sum(int(s.get('filled_quantity') or 0) for s in slice_results)
+    filled_value = sum(
+        int(s.get('filled_quantity') or 0) * float(s.get('fill_price') or 0)
+        for s in slice_results
+    )
+    accepted = [s for s in slice_results if s.get('status') not in _FAILED_SLICE_STATUSES]
+
+    if not accepted:
+        statuses = {s.get('status') for s in slice_results}
+        if statuses == {THROTTLED}:
+            status = THROTTLED
+        elif statuses <= {'ERROR', THROTTLED}:
+            status = 'ERROR'
+        else:
+            status = OrderStatus.REJECTED.value
+    elif filled_lots >= total_lots:
+        status = OrderStatus.FILLED.value
+    elif filled_lots > 0:
+        status = OrderStatus.PARTIALLY_FILLED.value
+    else:
+        status = accepted[0]['status']
+
+    return {
+        'status': status,
+        'quantity': total_lots,
+        'filled_quantity': filled_lots,
+        'average_price': round(filled_value / filled_lots, 4) if filled_lots else None,
+        'slice_count': len(slice_results),
+        'rejected_slices': len(slice_results) - len(accepted),
+    }
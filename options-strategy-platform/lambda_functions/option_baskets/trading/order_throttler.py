@@ -0,0 +1,217 @@
+"""
+Order Throttling
+Paces order placement per broker account across every Lambda that trades it
+
+Zerodha and Zebu reject orders above roughly 10 per second per account, and NSE
+enforces per-client limits. The per-broker token bucket in order_slicer only sees
+one container, so entry fan-out across many executors can still burst past the
+limit. The throttler adds two things on top of it:
+
+- The local bucket is keyed by broker account (broker + client id), so one
+  busy account does not slow down every other account on the same broker
+- For live orders, a per-second order count per account and execution lane in
+  the trading table (ORDER_THROTTLE#<broker>#<client> / SECOND#<epoch>#<lane>)
+  is claimed with a conditional ADD. Slots are reserved in batches and handed
+  out locally, so a burst costs one write per SHARED_BUDGET_BATCH_SIZE orders.
+  Each lane may use its BROKER_RATE_BUDGET_SHARE of the account's rate. When
+  the second is full the caller waits for the next one; an order still without
+  budget after MAX_SHARED_BUDGET_WAIT_SECONDS is not sent (OrderBudgetExhausted)
+  and its leg comes back THROTTLED for the retry scheduler to requeue
+
+Legs are also reordered so protective (long) legs go out before short legs:
+on entry hedges are bought first, on exit shorts are covered first. Whatever
+gets delayed by pacing is then never a naked short.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from .order_slicer import (
+    BrokerRateLimiter, OrderBudgetExhausted, get_broker_rate_limiter,
+    BROKER_ORDERS_PER_SECOND, BROKER_RATE_BUDGET_SHARE, DEFAULT_ORDERS_PER_SECOND,
+)
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+# Per-second counters are only needed for the second they describe
+THROTTLE_TTL_SECONDS = int(os.environ.get('ORDER_THROTTLE_TTL_SECONDS', '120'))
+
+# Upper bound on waiting for shared budget; past it the order is throttled, not sent
+MAX_SHARED_BUDGET_WAIT_SECONDS = float(os.environ.get('MAX_SHARED_BUDGET_WAIT_SECONDS', '5'))
+
+# Slots reserved per budget write; unused slots lapse with their second
+SHARED_BUDGET_BATCH_SIZE = int(os.environ.get('SHARED_BUDGET_BATCH_SIZE', '5'))
+
+# Budget pool of this function; functions outside the execution lanes count as routine work
+BUDGET_LANE = os.environ.get('EXECUTION_LANE', 'NORMAL')
+
+SHARED_ORDER_BUDGET_ENABLED = os.environ.get('SHARED_ORDER_BUDGET_ENABLED', 'true').lower() == 'true'
+
+
+def account_key(broker_name: Optional[str], client_id: Optional[str]) -> str:
+    """Throttling key of one broker account."""
+    return f"{(broker_name or 'paper').lower()}#{client_id or 'default'}"
+
+
+def order_legs_for_margin(legs: List[Dict[str, Any]], execution_type: str = 'ENTRY') -> List[Dict[str, Any]]:
+    """
+    Legs in margin-safe placement order; the original order is kept within each group.
+
+    Entry places BUY (hedge) legs before SELL legs. Exit reverses each leg, so
+    SELL legs are covered (bought back) before hedges are sold.
+    """
+    hedge_action = 'SELL' if execution_type == 'EXIT' else 'BUY'
+    return sorted(legs, key=lambda leg: 0 if leg.get('action', 'BUY') == hedge_action else 1)
+
+
+class SharedOrderBudget:
+    """
+    Cross-Lambda per-second order budget of broker accounts, kept in the trading table.
+
+    Slots of the current epoch second are claimed with a conditional ADD that
+    fails once the lane has used orders_per_second slots. A claim takes up to
+    batch_size slots; the spare ones serve this container's next orders in the
+    same second without another write.
+    """
+
+    def __init__(self, table, clock: Callable[[], float] = time.time,
+                 batch_size: int = SHARED_BUDGET_BATCH_SIZE, lane: str = BUDGET_LANE):
+        self.table = table
+        self.clock = clock
+        self.batch_size = max(batch_size, 1)
+        self.lane = lane
+        # account -> (epoch second, slots reserved but not yet used)
+        self._reserved: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def try_reserve(self, account: str, second: int, orders_per_second: int, count: int = 1) -> bool:
+        """Claim count order slots of an epoch second; False when fewer are left."""
+        try:
+            self.table.update_item(
+                Key={'user_id': f'ORDER_THROTTLE#{account}', 'sort_key': f'SECOND#{second}#{self.lane}'},
+                UpdateExpression='ADD order_count :count SET entity_type = :entity_type, #ttl = :ttl',
+                ConditionExpression='attribute_not_exists(order_count) OR order_count <= :max_before',
+                ExpressionAttributeNames={'#ttl': 'ttl'},
+                ExpressionAttributeValues={
+                    ':count': count,
+                    ':max_before': orders_per_second - count,
+                    ':entity_type': 'ORDER_THROTTLE',
+                    ':ttl': second + THROTTLE_TTL_SECONDS,
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def _take(self, account: str, second: int, orders_per_second: int) -> bool:
+        """Use a reserved slot of this second, reserving a batch (or a single slot) when none is left."""
+        with self._lock:
+            reserved_second, spare = self._reserved.get(account, (second, 0))
+            if reserved_second == second and spare > 0:
+                self._reserved[account] = (second, spare - 1)
+                return True
+
+            batch = min(self.batch_size, orders_per_second)
+            for count in dict.fromkeys((batch, 1)):
+                if self.try_reserve(account, second, orders_per_second, count):
+                    self._reserved[account] = (second, count - 1)
+                    return True
+            return False
+
+    def acquire(self, account: str, orders_per_second: int,
+                max_wait: float = MAX_SHARED_BUDGET_WAIT_SECONDS) -> float:
+        """
+        Block until the account has budget left in the current second.
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            OrderBudgetExhausted: still no budget after max_wait seconds
+        """
+        waited = 0.0
+        while True:
+            now = self.clock()
+            second = int(now)
+            try:
+                if self._take(account, second, orders_per_second):
+                    return waited
+            except Exception as e:
+                # Never block trading on the budget table; the local bucket still paces
+                logger.warning(f"Shared order budget unavailable for {account}: {e}")
+                return waited
+
+            if waited >= max_wait:
+                raise OrderBudgetExhausted(
+                    f"Order budget of {account} ({self.lane} lane) still full after {waited:.2f}s")
+
+            wait = max(second + 1 - now, 0.001)
+            time.sleep(wait)
+            waited += wait
+
+
+class AccountOrderThrottler:
+    """
+    Order pacing for one broker account: local token bucket, then shared budget.
+
+    acquire() is safe to call from the slice dispatch threads.
+    """
+
+    def __init__(self, broker_name: str, client_id: Optional[str],
+                 shared_budget: Optional[SharedOrderBudget] = None):
+        self.account = account_key(broker_name, client_id)
+        # This lane's share of the account's rate, at least one order a second
+        self.orders_per_second = max(int(BROKER_ORDERS_PER_SECOND.get(
+            (broker_name or 'paper').lower(), DEFAULT_ORDERS_PER_SECOND) * BROKER_RATE_BUDGET_SHARE), 1)
+        self.local: BrokerRateLimiter = get_broker_rate_limiter(broker_name, client_id)
+        self.shared_budget = shared_budget
+
+    def acquire(self) -> float:
+        """
+        Block until an order may be sent on this account; returns the seconds spent waiting.
+
+        Raises:
+            OrderBudgetExhausted: the shared budget stayed full; the order must not be sent
+        """
+        waited = self.local.acquire()
+        if self.shared_budget is not None:
+            waited += self.shared_budget.acquire(self.account, self.orders_per_second)
+        if waited > 0:
+            logger.debug(f"Order on {self.account} throttled for {waited:.3f}s")
+        return waited
+
+
+# Throttlers persist across warm invocations like the rate limiters they wrap
+_THROTTLERS: Dict[str, AccountOrderThrottler] = {}
+_THROTTLERS_LOCK = threading.Lock()
+
+
+def get_account_throttler(broker_name: str, client_id: Optional[str], table=None) -> AccountOrderThrottler:
+    """
+    Get or create the throttler of a broker account.
+
+    Args:
+        table: Trading table holding the shared budget; None keeps pacing local
+            (paper trading, backtests and tests)
+    """
+    use_shared = table is not None and SHARED_ORDER_BUDGET_ENABLED
+    key = f"{account_key(broker_name, client_id)}#{'shared' if use_shared else 'local'}"
+    with _THROTTLERS_LOCK:
+        if key not in _THROTTLERS:
+            _THROTTLERS[key] = AccountOrderThrottler(
+                broker_name, client_id, SharedOrderBudget(table) if use_shared else None
+            )
+        return _THROTTLERS[key]
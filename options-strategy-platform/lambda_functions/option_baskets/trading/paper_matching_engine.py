@@ -0,0 +1,444 @@
+"""
+Paper Matching Engine
+Deterministic per-instrument order books driven by a recorded tick stream
+
+Orders submitted through PaperTradingStrategy rest in an in-process book per symbol
+and are matched against the quotes of each replayed tick with price-time priority:
+- MARKET orders take the touch (ask for buys, bid for sells)
+- LIMIT orders fill when the opposite quote crosses their price
+- SL / SL-M orders arm on the last traded price and then behave as LIMIT / MARKET
+
+Tick quantities cap how much can fill per tick, so large orders fill partially over
+several ticks. Nothing is random: the same tick file and order flow always produce
+the same fills, which makes replays comparable between runs.
+"""
+
+import csv
+import heapq
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .broker_trading_strategy import OrderParams, OrderStatus, OrderType, TransactionType
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Tick:
+    """One market data update for an instrument"""
+    timestamp: datetime
+    symbol: str
+    last_price: float
+    bid: Optional[float] = None
+    ask: Optional[float] = None
+    bid_quantity: int = 0                 # Liquidity at the bid (0 = unlimited)
+    ask_quantity: int = 0                 # Liquidity at the ask (0 = unlimited)
+
+
+@dataclass
+class Fill:
+    """An execution against a tick"""
+    order_id: str
+    symbol: str
+    transaction_type: TransactionType
+    price: float
+    quantity: int
+    timestamp: datetime
+
+
+@dataclass
+class EngineOrder:
+    """Order state held by the matching engine"""
+    order_id: str
+    params: OrderParams
+    sequence: int
+    submitted_at: Optional[datetime]      # Replay clock when the order arrived
+    eligible_at: Optional[datetime]       # submitted_at + fill latency
+    status: OrderStatus = OrderStatus.OPEN
+    filled_quantity: int = 0
+    average_price: float = 0.0
+    triggered: bool = False
+    on_fill: Optional[Callable[[Fill], None]] = field(default=None, repr=False)
+
+    @property
+    def remaining(self) -> int:
+        return self.params.quantity - self.filled_quantity
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return float(value) if value not in (None, '') else None
+
+
+def _tick_from_row(row: Dict[str, Any]) -> Tick:
+    return Tick(
+        timestamp=_parse_timestamp(row['timestamp']),
+        symbol=row['symbol'],
+        last_price=float(row['last_price']),
+        bid=_optional_float(row.get('bid')),
+        ask=_optional_float(row.get('ask')),
+        bid_quantity=int(row.get('bid_quantity') or 0),
+        ask_quantity=int(row.get('ask_quantity') or 0)
+    )
+
+
+def load_ticks(paths: Iterable[str]) -> List[Tick]:
+    """
+    Load recorded ticks from local CSV or JSON-lines files.
+
+    Each row needs timestamp (ISO 8601), symbol and last_price; bid, ask,
+    bid_quantity and ask_quantity are optional. Ticks from all files are merged
+    in timestamp order, keeping file order for equal timestamps.
+    """
+    ticks: List[Tick] = []
+    for path in paths:
+        with open(path, newline='') as f:
+            if path.endswith(('.jsonl', '.json')):
+                rows = (json.loads(line) for line in f if line.strip())
+            else:
+                rows = csv.DictReader(f)
+            ticks.extend(_tick_from_row(row) for row in rows)
+
+    ticks.sort(key=lambda t: t.timestamp)
+    return ticks
+
+
+class _InstrumentBook:
+    """Resting orders for one symbol"""
+
+    def __init__(self):
+        self.bids: List[tuple] = []       # (-price, sequence, order_id); MARKET uses -inf
+        self.asks: List[tuple] = []       # (price, sequence, order_id); MARKET uses 0
+        self.stops: List[EngineOrder] = []
+        self.waiting: List[EngineOrder] = []   # Not yet past fill latency
+        self.last_tick: Optional[Tick] = None
+
+    def rest(self, order: EngineOrder):
+        params = order.params
+        is_market = params.order_type == OrderType.MARKET or (
+            params.order_type == OrderType.SL_M and order.triggered
+        )
+        if params.transaction_type == TransactionType.BUY:
+            price = float('inf') if is_market else params.price
+            heapq.heappush(self.bids, (-price, order.sequence, order.order_id))
+        else:
+            price = 0.0 if is_market else params.price
+            heapq.heappush(self.asks, (price, order.sequence, order.order_id))
+
+
+class MatchingEngine:
+    """
+    In-process order books for paper trading.
+
+    Args:
+        fill_latency_ms: Replay-clock delay before an order can match,
+            modelling the exchange round trip
+    """
+
+    def __init__(self, fill_latency_ms: float = 0):
+        self.fill_latency = timedelta(milliseconds=fill_latency_ms)
+        self._books: Dict[str, _InstrumentBook] = {}
+        self._orders: Dict[str, EngineOrder] = {}
+        self._sequence = 0
+        self._clock: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._fill_latencies_ms: List[float] = []
+        self._fill_count = 0
+
+    @property
+    def clock(self) -> Optional[datetime]:
+        """Timestamp of the latest tick processed."""
+        return self._clock
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        book = self._books.get(symbol)
+        return book.last_tick.last_price if book and book.last_tick else None
+
+    def get_order(self, order_id: str) -> Optional[EngineOrder]:
+        return self._orders.get(order_id)
+
+    def submit(
+        self,
+        order_id: str,
+        params: OrderParams,
+        on_fill: Optional[Callable[[Fill], None]] = None
+    ) -> EngineOrder:
+        """
+        Accept an order and match it against the current tick if it is eligible.
+
+        Fills are delivered through on_fill, possibly before submit returns.
+        """
+        with self._lock:
+            self._sequence += 1
+            eligible_at = self._clock + self.fill_latency if self._clock else None
+            order = EngineOrder(
+                order_id=order_id,
+                params=params,
+                sequence=self._sequence,
+                submitted_at=self._clock,
+                eligible_at=eligible_at,
+                on_fill=on_fill
+            )
+            self._orders[order_id] = order
+
+            book = self._books.setdefault(params.symbol, _InstrumentBook())
+            if self.fill_latency or book.last_tick is None:
+                book.waiting.append(order)
+                return order
+
+            self._activate(book, order)
+            fills = self._match(book, book.last_tick)
+
+        self._deliver(fills)
+        return order
+
+    def cancel(self, order_id: str) -> bool:
+        """Cancel an active order; it is dropped lazily from its book."""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if not order or not order.is_active:
+                return False
+            order.status = OrderStatus.CANCELLED
+            return True
+
+    def modify(self, order_id: str) -> bool:
+        """
+        Re-queue an order after its params were changed in place.
+
+        A modified order loses time priority, as it would on the exchange.
+        """
+        with self._lock:
+            order = self._orders.get(order_id)
+            if not order or not order.is_active:
+                return False
+
+            book = self._books[order.params.symbol]
+            book.waiting = [o for o in book.waiting if o is not order]
+            book.stops = [o for o in book.stops if o is not order]
+
+            # Heap entries still carry the old sequence and are skipped when matching
+            self._sequence += 1
+            order.sequence = self._sequence
+            order.triggered = False
+
+            if book.last_tick is None or (order.eligible_at and order.eligible_at > self._clock):
+                book.waiting.append(order)
+                return True
+
+            self._activate(book, order)
+            fills = self._match(book, book.last_tick)
+
+        self._deliver(fills)
+        return True
+
+    def on_tick(self, tick: Tick) -> List[Fill]:
+        """Advance the replay clock to tick and match its instrument's book."""
+        with self._lock:
+            self._clock = tick.timestamp
+            book = self._books.setdefault(tick.symbol, _InstrumentBook())
+            book.last_tick = tick
+
+            if book.waiting:
+                ready = [o for o in book.waiting if o.eligible_at is None or o.eligible_at <= tick.timestamp]
+                if ready:
+                    book.waiting = [o for o in book.waiting if o not in ready]
+                    for order in ready:
+                        if order.is_active:
+                            self._activate(book, order)
+
+            self._trigger_stops(book, tick)
+            fills = self._match(book, tick)
+
+        self._deliver(fills)
+        return fills
+
+    def stats(self) -> Dict[str, Any]:
+        """Fill counts and replay-clock latency from order arrival to fill."""
+        latencies = sorted(self._fill_latencies_ms)
+        return {
+            'orders': len(self._orders),
+            'fills': self._fill_count,
+            'open_orders': sum(1 for o in self._orders.values() if o.is_active),
+            'avg_fill_latency_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p95_fill_latency_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            'max_fill_latency_ms': latencies[-1] if latencies else 0.0,
+        }
+
+    # Private helper methods
+
+    def _activate(self, book: _InstrumentBook, order: EngineOrder):
+        if order.params.order_type in (OrderType.SL, OrderType.SL_M) and not order.triggered:
+            book.stops.append(order)
+        else:
+            book.rest(order)
+
+    def _trigger_stops(self, book: _InstrumentBook, tick: Tick):
+        if not book.stops:
+            return
+
+        remaining = []
+        for order in book.stops:
+            if not order.is_active:
+                continue
+            trigger = order.params.trigger_price
+            if order.params.transaction_type == TransactionType.SELL:
+                triggered = tick.last_price <= trigger
+            else:
+                triggered = tick.last_price >= trigger
+
+            if triggered:
+                order.triggered = True
+                book.rest(order)
+            else:
+                remaining.append(order)
+        book.stops = remaining
+
+    def _match(self, book: _InstrumentBook, tick: Tick) -> List[Fill]:
+        fills = []
+        ask = tick.ask if tick.ask is not None else tick.last_price
+        bid = tick.bid if tick.bid is not None else tick.last_price
+
+        # Buys take the ask in price-time priority
+        liquidity = tick.ask_quantity or None
+        while book.bids and (liquidity is None or liquidity > 0):
+            neg_price, sequence, order_id = book.bids[0]
+            order = self._orders[order_id]
+            if not order.is_active or order.sequence != sequence:
+                heapq.heappop(book.bids)
+                continue
+            if -neg_price < ask:
+                break
+            quantity = order.remaining if liquidity is None else min(order.remaining, liquidity)
+            fills.append(self._fill(order, ask, quantity, tick.timestamp))
+            if liquidity is not None:
+                liquidity -= quantity
+            if not order.is_active:
+                heapq.heappop(book.bids)
+
+        # Sells hit the bid in price-time priority
+        liquidity = tick.bid_quantity or None
+        while book.asks and (liquidity is None or liquidity > 0):
+            price, sequence, order_id = book.asks[0]
+            order = self._orders[order_id]
+            if not order.is_active or order.sequence != sequence:
+                heapq.heappop(book.asks)
+                continue
+            if price > bid:
+                break
+            quantity = order.remaining if liquidity is None else min(order.remaining, liquidity)
+            fills.append(self._fill(order, bid, quantity, tick.timestamp))
+            if liquidity is not None:
+                liquidity -= quantity
+            if not order.is_active:
+                heapq.heappop(book.asks)
+
+        return fills
+
+    def _fill(self, order: EngineOrder, price: float, quantity: int, timestamp: datetime) -> Fill:
+        filled_value = order.average_price * order.filled_quantity + price * quantity
+        order.filled_quantity += quantity
+        order.average_price = filled_value / order.filled_quantity
+        order.status = OrderStatus.FILLED if order.remaining == 0 else OrderStatus.PARTIALLY_FILLED
+
+        self._fill_count += 1
+        if order.submitted_at:
+            self._fill_latencies_ms.append((timestamp - order.submitted_at).total_seconds() * 1000)
+
+        return Fill(
+            order_id=order.order_id,
+            symbol=order.params.symbol,
+            transaction_type=order.params.transaction_type,
+            price=price,
+            quantity=quantity,
+            timestamp=timestamp
+        )
+
+    def _deliver(self, fills: List[Fill]):
+        # Callbacks run outside the engine lock so they may call back into the engine
+        for fill in fills:
+            order = self._orders[fill.order_id]
+            if order.on_fill:
+                order.on_fill(fill)
+
+
+class TickReplayer:
+    """
+    Feeds recorded ticks into a MatchingEngine on a scaled clock.
+
+    Args:
+        engine: Engine to drive
+        ticks: Ticks in timestamp order (see load_ticks)
+        speed: Replay multiplier (10 = ten times real time); None replays
+            as fast as possible
+    """
+
+    def __init__(self, engine: MatchingEngine, ticks: List[Tick], speed: Optional[float] = None):
+        self.engine = engine
+        self.ticks = ticks
+        self.speed = speed
+
+    @classmethod
+    def from_files(cls, engine: MatchingEngine, paths: Iterable[str], speed: Optional[float] = None) -> 'TickReplayer':
+        return cls(engine, load_ticks(paths), speed)
+
+    def replay(self, on_tick: Optional[Callable[[Tick, List[Fill]], None]] = None) -> Dict[str, Any]:
+        """
+        Replay every tick, calling on_tick(tick, fills) after each one.
+
+        Returns:
+            Replay stats; behind_ms measures how late ticks were delivered
+            against the scaled schedule, i.e. how far consumers lag the market
+        """
+        if not self.ticks:
+            return {'ticks': 0, 'fills': 0, 'simulated_seconds': 0, 'wall_seconds': 0,
+                    'effective_speed': 0, 'max_behind_ms': 0, 'avg_behind_ms': 0}
+
+        first_tick = self.ticks[0].timestamp
+        wall_start = time.perf_counter()
+        fills = 0
+        behind_total = 0.0
+        behind_max = 0.0
+
+        for tick in self.ticks:
+            if self.speed:
+                due = wall_start + (tick.timestamp - first_tick).total_seconds() / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    behind_total -= delay
+                    behind_max = max(behind_max, -delay)
+
+            tick_fills = self.engine.on_tick(tick)
+            fills += len(tick_fills)
+            if on_tick:
+                on_tick(tick, tick_fills)
+
+        wall_seconds = time.perf_counter() - wall_start
+        simulated_seconds = (self.ticks[-1].timestamp - first_tick).total_seconds()
+        return {
+            'ticks': len(self.ticks),
+            'fills': fills,
+            'simulated_seconds': simulated_seconds,
+            'wall_seconds': round(wall_seconds, 3),
+            'effective_speed': round(simulated_seconds / wall_seconds, 1) if wall_seconds else 0,
+            'max_behind_ms': round(behind_max * 1000, 2),
+            'avg_behind_ms': round(behind_total * 1000 / len(self.ticks), 2),
+        }
@@ -5,6 +5,7 @@ Simulates order placement and execution for testing without real money
 
 import uuid
 import random
+import threading
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 
@@ -12,6 +13,7 @@ from .broker_trading_strategy import (
     BrokerTradingStrategy, OrderParams, OrderResponse, OrderStatusResponse,
     Position, MarginInfo, OrderType, OrderStatus, TradingMode, TransactionType
 )
+from .paper_matching_engine import MatchingEngine, Fill
 
 # Import shared logger
 try:
@@ -22,6 +24,16 @@ except ImportError:
     logger = logging.getLogger(__name__)
 
 
+# Engine picked up by paper strategies created without one (tick replays, load tests)
+_default_matching_engine: Optional[MatchingEngine] = None
+
+
+def set_default_matching_engine(engine: Optional[MatchingEngine]):
+    """Route every new PaperTradingStrategy through engine (None restores random fills)."""
+    global _default_matching_engine
+    _default_matching_engine = engine
+
+
 class PaperTradingStrategy(BrokerTradingStrategy):
     """
     Paper trading implementation for simulated order execution.
@@ -32,13 +44,16 @@ class PaperTradingStrategy(BrokerTradingStrategy):
     - Limit orders fill when price crosses
     - Stop loss orders trigger at trigger_price
     - Position tracking and P&L calculation
+
+    With a MatchingEngine attached, orders are instead matched deterministically
+    against replayed ticks and fills arrive as the replay advances.
     """
 
     # Default configuration
     DEFAULT_SLIPPAGE_BPS = 5  # 0.05% slippage
     DEFAULT_INITIAL_BALANCE = 1000000.0  # 10 Lakh starting balance
 
-    def __init__(self, trading_mode: TradingMode = TradingMode.PAPER):
+    def __init__(self, trading_mode: TradingMode = TradingMode.PAPER, matching_engine: Optional[MatchingEngine] = None):
         super().__init__("PAPER", trading_mode)
 
         # Paper trading state
@@ -51,6 +66,12 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         # Market data simulation (in real impl, would fetch from market data service)
         self._simulated_prices: Dict[str, float] = {}
 
+        # Sliced legs place child orders from several threads
+        self._lock = threading.RLock()
+
+        # Tick-driven order books (replaces random fills when set)
+        self._engine = matching_engine or _default_matching_engine
+
     def connect(self, credentials: Dict[str, Any]) -> bool:
         """
         Initialize paper trading session.
@@ -103,6 +124,9 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         broker_order_id = f"P{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}{random.randint(1000, 9999)}"
         placed_at = datetime.now(timezone.utc)
 
+        if self._engine:
+            return self._place_matched_order(order_id, broker_order_id, order_params, placed_at)
+
         # Get simulated current price
         current_price = self._get_simulated_price(order_params.symbol)
 
@@ -147,11 +171,12 @@ class PaperTradingStrategy(BrokerTradingStrategy):
             "updated_at": placed_at,
             "current_price": current_price,
         }
-        self._orders[order_id] = order_data
+        with self._lock:
+            self._orders[order_id] = order_data
 
-        # Update position if filled
-        if status == OrderStatus.FILLED:
-            self._update_position(order_params, fill_price, filled_quantity)
+            # Update position if filled
+            if status == OrderStatus.FILLED:
+                self._update_position(order_params, fill_price, filled_quantity)
 
         logger.info("Paper order placed", extra={
             "order_id": order_id,
@@ -186,7 +211,7 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         order = self._orders[order_id]
 
         # Can only modify open orders
-        if order['status'] != OrderStatus.OPEN:
+        if order['status'] not in [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]:
             return OrderResponse(
                 success=False,
                 order_id=order_id,
@@ -205,6 +230,9 @@ class PaperTradingStrategy(BrokerTradingStrategy):
 
         order['updated_at'] = datetime.now(timezone.utc)
 
+        if self._engine:
+            self._engine.modify(order_id)
+
         logger.info("Paper order modified", extra={
             "order_id": order_id,
             "modifications": modifications
@@ -228,10 +256,13 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         order = self._orders[order_id]
 
         # Can only cancel open/pending orders
-        if order['status'] not in [OrderStatus.OPEN, OrderStatus.PENDING]:
+        if order['status'] not in [OrderStatus.OPEN, OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED]:
             logger.warning(f"Cannot cancel order in {order['status'].value} status")
             return False
 
+        if self._engine and not self._engine.cancel(order_id):
+            return False
+
         order['status'] = OrderStatus.CANCELLED
         order['updated_at'] = datetime.now(timezone.utc)
 
@@ -251,10 +282,15 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         order = self._orders[order_id]
         params = order['params']
 
-        # Check if open SL orders should trigger
-        if order['status'] == OrderStatus.OPEN:
+        # Check if open SL orders should trigger (the engine triggers them on ticks)
+        if order['status'] == OrderStatus.OPEN and not self._engine:
             self._check_sl_trigger(order_id)
 
+        if self._engine:
+            last_price = self._engine.last_price(params.symbol) or 0.0
+        else:
+            last_price = order.get('current_price', 0.0)
+
         return OrderStatusResponse(
             order_id=order_id,
             broker_order_id=order['broker_order_id'],
@@ -262,7 +298,7 @@ class PaperTradingStrategy(BrokerTradingStrategy):
             filled_quantity=order['filled_quantity'],
             pending_quantity=params.quantity - order['filled_quantity'],
             average_price=order['average_price'],
-            last_price=order.get('current_price', 0.0),
+            last_price=last_price,
             updated_at=order['updated_at'],
             raw_response=order
         )
@@ -288,8 +324,11 @@ class PaperTradingStrategy(BrokerTradingStrategy):
         positions = []
 
         for symbol, position in self._positions.items():
-            # Update P&L with simulated current price
-            current_price = self._get_simulated_price(symbol)
+            # Update P&L with the replayed or simulated current price
+            if self._engine:
+                current_price = self._engine.last_price(symbol) or position.last_price
+            else:
+                current_price = self._get_simulated_price(symbol)
             position.last_price = current_price
 
             if position.quantity != 0:
@@ -319,6 +358,56 @@ class PaperTradingStrategy(BrokerTradingStrategy):
 
     # Private helper methods
 
+    def _place_matched_order(
+        self,
+        order_id: str,
+        broker_order_id: str,
+        order_params: OrderParams,
+        placed_at: datetime
+    ) -> OrderResponse:
+        """Submit an order to the matching engine; fills land via _apply_fill."""
+        order_data = {
+            "order_id": order_id,
+            "broker_order_id": broker_order_id,
+            "params": order_params,
+            "status": OrderStatus.OPEN,
+            "filled_quantity": 0,
+            "average_price": 0.0,
+            "placed_at": placed_at,
+            "updated_at": placed_at,
+        }
+        with self._lock:
+            self._orders[order_id] = order_data
+
+        # Not under self._lock: the engine may deliver fills from the replay thread
+        self._engine.submit(order_id, order_params, on_fill=self._apply_fill)
+
+        status = order_data["status"]
+        return OrderResponse(
+            success=True,
+            order_id=order_id,
+            broker_order_id=broker_order_id,
+            status=status,
+            message=f"Paper order {'filled' if status == OrderStatus.FILLED else 'placed'}",
+            placed_at=placed_at,
+            raw_response=order_data
+        )
+
+    def _apply_fill(self, fill: Fill):
+        """Apply a matching engine fill to the order and position."""
+        with self._lock:
+            order = self._orders[fill.order_id]
+            params = order["params"]
+            filled_value = order["average_price"] * order["filled_quantity"] + fill.price * fill.quantity
+            order["filled_quantity"] += fill.quantity
+            order["average_price"] = filled_value / order["filled_quantity"]
+            order["status"] = (
+                OrderStatus.FILLED if order["filled_quantity"] >= params.quantity
+                else OrderStatus.PARTIALLY_FILLED
+            )
+            order["updated_at"] = datetime.now(timezone.utc)
+            self._update_position(params, fill.price, fill.quantity)
+
     def _get_simulated_price(self, symbol: str) -> float:
         """
         Get simulated price for a symbol.
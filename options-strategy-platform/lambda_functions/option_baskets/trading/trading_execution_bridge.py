@@ -13,6 +13,7 @@ import json
 import os
 import uuid
 import logging
+from dataclasses import replace
 from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Dict, Any, List, Optional, Tuple
@@ -32,6 +33,10 @@ from .broker_trading_strategy import (
     ProductType,
 )
 from . import get_trading_strategy
+from .order_slicer import max_lots_per_slice, slice_quantity, dispatch_slices, aggregate_slice_fills
+from .order_throttler import get_account_throttler, order_legs_for_margin
+from .order_idempotency import OrderIdempotencyGateway, UNKNOWN, derive_idempotency_key, order_tag
+from .order_postback import BROKER_ORDER_INDEX_TTL_SECONDS, broker_order_sort_key
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -66,6 +71,9 @@ class TradingExecutionBridge:
         # Cache for broker strategies
         self._strategy_cache: Dict[str, BrokerTradingStrategy] = {}
 
+        # Reserve-then-place guard against redelivered / retried leg executions
+        self.idempotency = OrderIdempotencyGateway(self.trading_table)
+
     def _get_broker_strategy(
         self,
         broker_name: str,
@@ -100,6 +108,192 @@ class TradingExecutionBridge:
             return [self._convert_to_decimal(v) for v in value]
         return value
 
+    def _index_broker_orders(
+        self,
+        user_id: str,
+        order_id: str,
+        broker_name: str,
+        broker_order_ids: List[str],
+        trading_mode: TradingMode
+    ) -> None:
+        """Point each live broker order id at its ORDER# record for postback lookups."""
+        if trading_mode != TradingMode.LIVE or not broker_order_ids:
+            return
+
+        expires_at = int(datetime.now(timezone.utc).timestamp()) + BROKER_ORDER_INDEX_TTL_SECONDS
+        try:
+            with self.trading_table.batch_writer() as batch:
+                for broker_order_id in broker_order_ids:
+                    batch.put_item(Item={
+                        'user_id': user_id,
+                        'sort_key': broker_order_sort_key(broker_name, broker_order_id),
+                        'entity_type': 'BROKER_ORDER',
+                        'order_id': order_id,
+                        'broker_order_id': broker_order_id,
+                        'ttl': expires_at,
+                    })
+        except Exception as e:
+            # Postbacks for these orders are ignored; polling still reconciles them
+            logger.error(f"Failed to index broker orders of {order_id}: {e}")
+
+    def _store_order_record(
+        self,
+        order_record: Dict[str, Any],
+        broker_name: str,
+        broker_order_ids: List[str],
+        trading_mode: TradingMode
+    ) -> Optional[str]:
+        """
+        Persist a placed leg's ORDER# record and broker order index.
+
+        Runs after the broker accepted the slices, so a failure is logged and
+        returned rather than raised: the leg result must keep its broker order
+        ids, or the idempotency key would be released and a retry would place
+        the order a second time.
+
+        Returns:
+            The error message if the record could not be stored, else None
+        """
+        if not self.trading_table:
+            return None
+
+        try:
+            self.trading_table.put_item(Item=self._convert_to_decimal(order_record))
+        except Exception as e:
+            logger.error(f"Failed to store order {order_record['order_id']} "
+                         f"(broker orders {broker_order_ids}): {e}")
+            return str(e)
+
+        self._index_broker_orders(
+            order_record['user_id'], order_record['order_id'], broker_name, broker_order_ids, trading_mode
+        )
+        return None
+
+    def _record_placed_leg(
+        self,
+        user_id: str,
+        order_id: str,
+        strategy_id: str,
+        basket_id: str,
+        leg_data: Dict[str, Any],
+        allocation: Dict[str, Any],
+        order_params: OrderParams,
+        trading_mode: TradingMode,
+        execution_type: str,
+        slice_results: List[Dict[str, Any]],
+        leg_fill: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Store the ORDER# record of a leg that reached the broker.
+
+        Returns:
+            Tuple of (order record, leg execution result)
+        """
+        broker_name = allocation.get('broker_name', 'paper')
+        lot_multiplier = float(allocation.get('lot_multiplier', 1.0))
+        broker_order_ids = [s['broker_order_id'] for s in slice_results if s.get('broker_order_id')]
+        rejection = next((s['message'] for s in slice_results if s['status'] in ('REJECTED', 'ERROR', 'THROTTLED')), None)
+        now = datetime.now(timezone.utc).isoformat()
+
+        order_record = {
+            'user_id': user_id,
+            'sort_key': f'ORDER#{order_id}',
+            'order_id': order_id,
+            'broker_order_id': broker_order_ids[0] if broker_order_ids else None,
+            'broker_order_ids': broker_order_ids,
+            'strategy_id': strategy_id,
+            'basket_id': basket_id,
+            'leg_id': leg_data.get('leg_id'),
+            'broker_id': broker_name,
+            'client_id': order_params.client_id,
+            'symbol': order_params.symbol,
+            'exchange': order_params.exchange,
+            'transaction_type': order_params.transaction_type.value,
+            'order_type': order_params.order_type.value,
+            'quantity': order_params.quantity,
+            'base_lots': int(leg_data.get('lots', 1)),
+            'lot_multiplier': Decimal(str(lot_multiplier)),
+            'product_type': order_params.product_type.value,
+            'status': leg_fill['status'],
+            'trading_mode': trading_mode.value,
+            'execution_type': execution_type,
+            'filled_quantity': leg_fill['filled_quantity'],
+            'fill_price': leg_fill['average_price'],
+            'slice_count': leg_fill['slice_count'],
+            'slices': slice_results,
+            'rejection_reason': rejection,
+            'idempotency_key': idempotency_key,
+            'order_status_key': f"{leg_fill['status']}#{now}",
+            'placed_at': now,
+            'updated_at': now,
+            'entity_type': 'ORDER',
+        }
+
+        persistence_error = self._store_order_record(order_record, broker_name, broker_order_ids, trading_mode)
+
+        result = {
+            'order_id': order_id,
+            'broker_order_id': order_record['broker_order_id'],
+            'broker_order_ids': broker_order_ids,
+            'status': leg_fill['status'],
+            'message': rejection or slice_results[0].get('message'),
+            'symbol': order_params.symbol,
+            'quantity': order_params.quantity,
+            'filled_quantity': leg_fill['filled_quantity'],
+            'average_price': leg_fill['average_price'],
+            'slice_count': leg_fill['slice_count'],
+            'broker_name': broker_name,
+            'client_id': order_params.client_id,
+            'execution_timestamp': now,
+            'persistence_error': persistence_error,
+        }
+        return order_record, result
+
+    def _place_sliced_order(
+        self,
+        strategy: BrokerTradingStrategy,
+        order_params: OrderParams,
+        broker_name: str,
+        leg_data: Dict[str, Any],
+        allocation: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Place a leg as one or more child orders within the freeze and allocation limits.
+
+        Returns:
+            Tuple of (slice results, aggregated leg fill)
+        """
+        underlying = leg_data.get('underlying', leg_data.get('index'))
+        slices = slice_quantity(
+            order_params.quantity,
+            max_lots_per_slice(underlying, allocation.get('max_lots_per_order'))
+        )
+        if len(slices) > 1:
+            logger.info(f"Slicing {order_params.quantity} lots of {order_params.symbol} into {len(slices)} orders")
+
+        def place_slice(slice_index: int, lots: int) -> Dict[str, Any]:
+            response = strategy.place_order(replace(order_params, quantity=lots))
+            raw = response.raw_response if isinstance(response.raw_response, dict) else {}
+            filled = raw.get('filled_quantity', lots if response.status == OrderStatus.FILLED else 0)
+            # No answer from the broker: the order may still have been accepted
+            status = 'ERROR' if raw.get('transport_error') else response.status.value
+            return {
+                'broker_order_id': response.broker_order_id,
+                'status': status,
+                'message': response.message,
+                'filled_quantity': filled,
+                'fill_price': raw.get('average_price') if filled else None,
+            }
+
+        # Live orders also claim the account's cross-Lambda per-second budget
+        throttler = get_account_throttler(
+            broker_name, order_params.client_id,
+            self.trading_table if strategy.trading_mode == TradingMode.LIVE else None
+        )
+        slice_results = dispatch_slices(place_slice, slices, broker_name, limiter=throttler)
+        return slice_results, aggregate_slice_fills(slice_results)
+
     async def execute_leg(
         self,
         user_id: str,
@@ -135,9 +329,6 @@ class TradingExecutionBridge:
 
         logger.info(f"Executing leg for user {user_id}: {final_lots} lots on {broker_name}")
 
-        # Get broker strategy
-        strategy = self._get_broker_strategy(broker_name, trading_mode, credentials)
-
         # Build order parameters
         order_id = self._generate_order_id()
 
@@ -162,61 +353,12 @@ class TradingExecutionBridge:
             client_id=client_id,
         )
 
-        # Place order via broker strategy
+        # Place order via broker strategy; failures here never reached the exchange
         try:
-            order_response = strategy.place_order(order_params)
-
-            # Build order record
-            order_record = {
-                'user_id': user_id,
-                'sort_key': f'ORDER#{order_id}',
-                'order_id': order_id,
-                'broker_order_id': order_response.broker_order_id,
-                'strategy_id': strategy_id,
-                'basket_id': basket_id,
-                'leg_id': leg_data.get('leg_id'),
-                'broker_id': broker_name,
-                'client_id': client_id,
-                'symbol': symbol,
-                'exchange': order_params.exchange,
-                'transaction_type': transaction_type.value,
-                'order_type': order_params.order_type.value,
-                'quantity': final_lots,
-                'base_lots': base_lots,
-                'lot_multiplier': Decimal(str(lot_multiplier)),
-                'product_type': order_params.product_type.value,
-                'status': order_response.status.value,
-                'trading_mode': trading_mode.value,
-                'execution_type': execution_type,
-                'filled_quantity': 0,
-                'fill_price': None,
-                'rejection_reason': order_response.message if order_response.status == OrderStatus.REJECTED else None,
-                'order_status_key': f'{order_response.status.value}#{datetime.now(timezone.utc).isoformat()}',
-                'placed_at': datetime.now(timezone.utc).isoformat(),
-                'updated_at': datetime.now(timezone.utc).isoformat(),
-                'entity_type': 'ORDER',
-            }
-
-            # Store order in DynamoDB
-            if self.trading_table:
-                order_record_decimal = self._convert_to_decimal(order_record)
-                self.trading_table.put_item(Item=order_record_decimal)
-
-            # Broadcast order update via WebSocket
-            await self._broadcast_order_update(user_id, order_record)
-
-            return {
-                'order_id': order_id,
-                'broker_order_id': order_response.broker_order_id,
-                'status': order_response.status.value,
-                'message': order_response.message,
-                'symbol': symbol,
-                'quantity': final_lots,
-                'broker_name': broker_name,
-                'client_id': client_id,
-                'execution_timestamp': datetime.now(timezone.utc).isoformat(),
-            }
-
+            strategy = self._get_broker_strategy(broker_name, trading_mode, credentials)
+            slice_results, leg_fill = self._place_sliced_order(
+                strategy, order_params, broker_name, leg_data, allocation
+            )
         except Exception as e:
             logger.error(f"Order execution failed: {e}")
             return {
@@ -230,6 +372,16 @@ class TradingExecutionBridge:
                 'execution_timestamp': datetime.now(timezone.utc).isoformat(),
             }
 
+        order_record, result = self._record_placed_leg(
+            user_id, order_id, strategy_id, basket_id, leg_data, allocation, order_params,
+            trading_mode, execution_type, slice_results, leg_fill
+        )
+
+        # Broadcast order update via WebSocket
+        await self._broadcast_order_update(user_id, order_record)
+
+        return result
+
     def execute_leg_sync(
         self,
         user_id: str,
@@ -239,11 +391,124 @@ class TradingExecutionBridge:
         allocation: Dict[str, Any],
         trading_mode: TradingMode,
         execution_type: str = 'ENTRY',
-        credentials: Optional[Dict[str, str]] = None
+        credentials: Optional[Dict[str, str]] = None,
+        execution_time: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Synchronous version of execute_leg for Lambda compatibility.
+
+        When execution_time (the scheduled HH:MM) is given, the leg is guarded by an
+        idempotency key: a redelivered or retried execution of the same schedule
+        returns the original order result, flagged duplicate, instead of placing
+        a second order.
+        """
+        if not execution_time:
+            return self._place_leg_sync(
+                user_id, strategy_id, basket_id, leg_data, allocation,
+                trading_mode, execution_type, credentials
+            )
+
+        broker_name = allocation.get('broker_name', 'paper')
+        client_id = allocation.get('client_id', 'unknown')
+        idempotency_key = derive_idempotency_key(
+            user_id, strategy_id, leg_data.get('leg_id'), execution_type,
+            execution_time, broker_name, client_id
+        )
+
+        reservation = {
+            'strategy_id': strategy_id,
+            'leg_id': leg_data.get('leg_id'),
+            'execution_type': execution_type,
+            'execution_time': execution_time,
+            'broker_id': broker_name,
+            'client_id': client_id,
+        }
+        prior = self.idempotency.reserve(user_id, idempotency_key, reservation)
+        if prior is not None and prior.get('status') == UNKNOWN:
+            prior = self._reconcile_unknown_leg(
+                user_id, idempotency_key, prior, broker_name, trading_mode, credentials
+            )
+            if prior is None:
+                prior = self.idempotency.reserve(user_id, idempotency_key, reservation)
+        if prior is not None:
+            logger.warning(f"Duplicate leg execution suppressed for user {user_id}, strategy {strategy_id}, "
+                           f"leg {leg_data.get('leg_id')} at {execution_time}")
+            return {**prior, 'duplicate': True, 'idempotency_key': idempotency_key}
+
+        try:
+            result = self._place_leg_sync(
+                user_id, strategy_id, basket_id, leg_data, allocation,
+                trading_mode, execution_type, credentials, idempotency_key
+            )
+        except Exception:
+            # Raised before the broker call (bad leg data); nothing was placed
+            self.idempotency.release(user_id, idempotency_key)
+            raise
+        self.idempotency.complete(user_id, idempotency_key, result)
+        result['idempotency_key'] = idempotency_key
+        return result
+
+    def _reconcile_unknown_leg(
+        self,
+        user_id: str,
+        idempotency_key: str,
+        prior: Dict[str, Any],
+        broker_name: str,
+        trading_mode: TradingMode,
+        credentials: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look for the orders of an UNKNOWN leg in the broker's order book.
+
+        Returns:
+            The adopted result, None when the key was released and the leg may be
+            placed, or prior while the outcome is still unknown
         """
+        try:
+            order_book = self._get_broker_strategy(broker_name, trading_mode, credentials).get_orders()
+        except Exception as e:
+            logger.error(f"Could not read the {broker_name} order book to reconcile {idempotency_key}: {e}")
+            return prior
+
+        result = self.idempotency.reconcile_unknown(user_id, idempotency_key, prior, order_book)
+        if result is None or result is prior:
+            return result
+
+        # The ORDER# record was written without broker order ids; point postbacks at it
+        if self.trading_table and result.get('order_id'):
+            try:
+                self.trading_table.update_item(
+                    Key={'user_id': user_id, 'sort_key': f"ORDER#{result['order_id']}"},
+                    UpdateExpression='SET broker_order_id = :broker_order_id, broker_order_ids = :broker_order_ids, '
+                                     '#status = :status, order_status_key = :status_key, updated_at = :now',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={
+                        ':broker_order_id': result['broker_order_id'],
+                        ':broker_order_ids': result['broker_order_ids'],
+                        ':status': result['status'],
+                        ':status_key': f"{result['status']}#{datetime.now(timezone.utc).isoformat()}",
+                        ':now': datetime.now(timezone.utc).isoformat(),
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Failed to update reconciled order {result['order_id']}: {e}")
+            self._index_broker_orders(user_id, result['order_id'], broker_name, result['broker_order_ids'], trading_mode)
+
+        return result
+
+    def _place_leg_sync(
+        self,
+        user_id: str,
+        strategy_id: str,
+        basket_id: str,
+        leg_data: Dict[str, Any],
+        allocation: Dict[str, Any],
+        trading_mode: TradingMode,
+        execution_type: str = 'ENTRY',
+        credentials: Optional[Dict[str, str]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Place a leg and store its ORDER record."""
         broker_name = allocation.get('broker_name', 'paper')
         client_id = allocation.get('client_id', 'unknown')
         lot_multiplier = float(allocation.get('lot_multiplier', 1.0))
@@ -252,9 +517,6 @@ class TradingExecutionBridge:
 
         logger.info(f"Executing leg (sync) for user {user_id}: {final_lots} lots on {broker_name}")
 
-        # Get broker strategy
-        strategy = self._get_broker_strategy(broker_name, trading_mode, credentials)
-
         # Build order parameters
         order_id = self._generate_order_id()
 
@@ -275,63 +537,24 @@ class TradingExecutionBridge:
             quantity=final_lots,
             product_type=ProductType.NRML,
             client_id=client_id,
+            tag=order_tag(idempotency_key) if idempotency_key else None,
         )
 
+        # Placement and bookkeeping fail separately: once a slice is at the broker the
+        # result must carry its broker order ids whatever happens to the ORDER# write
         try:
-            order_response = strategy.place_order(order_params)
-
-            order_record = {
-                'user_id': user_id,
-                'sort_key': f'ORDER#{order_id}',
-                'order_id': order_id,
-                'broker_order_id': order_response.broker_order_id,
-                'strategy_id': strategy_id,
-                'basket_id': basket_id,
-                'leg_id': leg_data.get('leg_id'),
-                'broker_id': broker_name,
-                'client_id': client_id,
-                'symbol': symbol,
-                'exchange': order_params.exchange,
-                'transaction_type': transaction_type.value,
-                'order_type': order_params.order_type.value,
-                'quantity': final_lots,
-                'base_lots': base_lots,
-                'lot_multiplier': Decimal(str(lot_multiplier)),
-                'product_type': order_params.product_type.value,
-                'status': order_response.status.value,
-                'trading_mode': trading_mode.value,
-                'execution_type': execution_type,
-                'filled_quantity': 0,
-                'fill_price': None,
-                'rejection_reason': order_response.message if order_response.status == OrderStatus.REJECTED else None,
-                'order_status_key': f'{order_response.status.value}#{datetime.now(timezone.utc).isoformat()}',
-                'placed_at': datetime.now(timezone.utc).isoformat(),
-                'updated_at': datetime.now(timezone.utc).isoformat(),
-                'entity_type': 'ORDER',
-            }
-
-            if self.trading_table:
-                order_record_decimal = self._convert_to_decimal(order_record)
-                self.trading_table.put_item(Item=order_record_decimal)
-
-            return {
-                'order_id': order_id,
-                'broker_order_id': order_response.broker_order_id,
-                'status': order_response.status.value,
-                'message': order_response.message,
-                'symbol': symbol,
-                'quantity': final_lots,
-                'broker_name': broker_name,
-                'client_id': client_id,
-                'execution_timestamp': datetime.now(timezone.utc).isoformat(),
-            }
-
+            strategy = self._get_broker_strategy(broker_name, trading_mode, credentials)
+            slice_results, leg_fill = self._place_sliced_order(
+                strategy, order_params, broker_name, leg_data, allocation
+            )
         except Exception as e:
             logger.error(f"Order execution failed: {e}")
+            # Slice placement errors are caught per slice, so this never reached the broker
             return {
                 'order_id': order_id,
                 'status': 'ERROR',
                 'error': str(e),
+                'reached_broker': False,
                 'symbol': symbol,
                 'quantity': final_lots,
                 'broker_name': broker_name,
@@ -339,6 +562,12 @@ class TradingExecutionBridge:
                 'execution_timestamp': datetime.now(timezone.utc).isoformat(),
             }
 
+        _, result = self._record_placed_leg(
+            user_id, order_id, strategy_id, basket_id, leg_data, allocation, order_params,
+            trading_mode, execution_type, slice_results, leg_fill, idempotency_key
+        )
+        return result
+
     def execute_strategy(
         self,
         user_id: str,
@@ -346,7 +575,8 @@ class TradingExecutionBridge:
         allocations: List[Dict[str, Any]],
         trading_mode: TradingMode,
         execution_type: str = 'ENTRY',
-        credentials_map: Optional[Dict[str, Dict[str, str]]] = None
+        credentials_map: Optional[Dict[str, Dict[str, str]]] = None,
+        execution_time: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Execute all legs of a strategy with all broker allocations.
@@ -358,6 +588,7 @@ class TradingExecutionBridge:
             trading_mode: PAPER or LIVE
             execution_type: ENTRY or EXIT
             credentials_map: Map of broker_name -> credentials
+            execution_time: Scheduled time; enables per-leg idempotency keys
 
         Returns:
             Execution results for all legs
@@ -365,7 +596,8 @@ class TradingExecutionBridge:
         strategy_id = strategy.get('strategy_id')
         basket_id = strategy.get('basket_id')
         strategy_name = strategy.get('strategy_name', 'Unknown')
-        legs = strategy.get('legs', [])
+        # Hedges before shorts, so orders held back by throttling are never naked shorts
+        legs = order_legs_for_margin(strategy.get('legs', []), execution_type)
 
         logger.info(f"Executing strategy {strategy_name} with {len(legs)} legs and {len(allocations)} allocations")
 
@@ -387,6 +619,7 @@ class TradingExecutionBridge:
                     trading_mode=trading_mode,
                     execution_type=execution_type,
                     credentials=credentials,
+                    execution_time=execution_time,
                 )
 
                 execution_results.append(result)
@@ -543,6 +776,7 @@ class TradingExecutionBridge:
                 'trading_mode': order.get('trading_mode'),
                 'strategy_id': order.get('strategy_id'),
                 'basket_id': order.get('basket_id'),
+                'leg_id': order.get('leg_id'),
                 'product_type': order.get('product_type', 'NRML'),
                 'quantity': filled_quantity if transaction_type == 'BUY' else -filled_quantity,
                 'buy_quantity': filled_quantity if transaction_type == 'BUY' else 0,
@@ -525,15 +525,16 @@ class ZebuTradingStrategy(BrokerTradingStrategy):
             response = self._session.post(url, data=data, headers=headers, timeout=30)
             return response.json()
 
+        # transport_error: no answer, so a placed order may still have been accepted
         except requests.exceptions.Timeout:
             logger.error(f"Timeout calling Zebu API: {endpoint}")
-            return {"stat": "Not_Ok", "emsg": "Request timeout"}
+            return {"stat": "Not_Ok", "emsg": "Request timeout", "transport_error": True}
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error calling Zebu API: {e}")
-            return {"stat": "Not_Ok", "emsg": str(e)}
+            return {"stat": "Not_Ok", "emsg": str(e), "transport_error": True}
         except json.JSONDecodeError:
             logger.error("Invalid JSON response from Zebu API")
-            return {"stat": "Not_Ok", "emsg": "Invalid JSON response"}
+            return {"stat": "Not_Ok", "emsg": "Invalid JSON response", "transport_error": True}
 
     def _map_exchange(self, exchange: str) -> str:
         """Map internal exchange code to Zebu exchange code."""
@@ -530,15 +530,16 @@ class ZerodhaTradingStrategy(BrokerTradingStrategy):
 
             return response.json()
 
+        # transport_error: no answer, so a placed order may still have been accepted
         except requests.exceptions.Timeout:
             logger.error(f"Timeout calling Zerodha API: {endpoint}")
-            return {"status": "error", "message": "Request timeout"}
+            return {"status": "error", "message": "Request timeout", "transport_error": True}
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error calling Zerodha API: {e}")
-            return {"status": "error", "message": str(e)}
+            return {"status": "error", "message": str(e), "transport_error": True}
         except json.JSONDecodeError:
             logger.error("Invalid JSON response from Zerodha API")
-            return {"status": "error", "message": "Invalid JSON response"}
+            return {"status": "error", "message": "Invalid JSON response", "transport_error": True}
 
     def _map_product_type(self, zerodha_product: str) -> ProductType:
         """Map Zerodha product type to internal ProductType."""
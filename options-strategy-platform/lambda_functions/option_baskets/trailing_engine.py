@@ -0,0 +1,418 @@
+"""
+Trailing Engine
+Stateful trailing stop levels of open positions and strategies
+
+Trailing modes:
+- TRAIL: the stop trails the best price by trailing_sl.value (PERCENTAGE / POINTS)
+- STEP: for every instrument_move_value the price moves in favour from entry,
+  the stop moves by stop_loss_move_value (the leg's trailing_stop_loss, in
+  points or percent of the entry price)
+- TRAIL_TO_COST: strategies with move_sl_to_cost move the stop of every
+  remaining leg to its entry price once one leg is stopped out
+- LOCK_AND_TRAIL: strategies with lock_and_trail {lock_at, lock_profit,
+  trail_every, trail_by} lock lock_profit of MTM once MTM reaches lock_at, then
+  raise the locked floor by trail_by for every further trail_every of MTM
+
+Stops only ever tighten. The high-water marks and levels are kept in memory per
+container, so a warm container neither re-reads nor re-writes them every tick.
+Only levels that changed are checkpointed; a cold container restores the day's
+checkpoints with one query.
+
+Concurrent containers of the handler each hold their own state, so a
+checkpoint write is conditional on tightening the stored level. A container
+whose write loses adopts the stored (tighter) level instead of overwriting it.
+
+Checkpoints (execution history table):
+- user_id: {user_id}
+- execution_key: TRAIL#{YYYY-MM-DD}#{POSITION|STRATEGY}#{id}
+"""
+
+import math
+import threading
+
+from botocore.exceptions import ClientError
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, Optional, Set, Tuple
+
+# Import shared logger
+try:
+    from shared_utils.logger import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+
+TRAIL = 'TRAIL'
+STEP = 'STEP'
+TRAIL_TO_COST = 'TRAIL_TO_COST'
+LOCK_AND_TRAIL = 'LOCK_AND_TRAIL'
+
+CHECKPOINT_PREFIX = 'TRAIL#'
+CHECKPOINT_TTL_SECONDS = 2 * 24 * 60 * 60
+
+POSITION_SCOPE = 'POSITION'
+STRATEGY_SCOPE = 'STRATEGY'
+
+
+def checkpoint_key(trading_date: str, scope: str, entity_id: str) -> str:
+    return f"{CHECKPOINT_PREFIX}{trading_date}#{scope}#{entity_id}"
+
+
+def trailing_mode(trailing_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """STEP, TRAIL or None (not configured) for a trailing configuration."""
+    if not trailing_config or trailing_config.get('enabled') is False:
+        return None
+    if float(trailing_config.get('instrument_move_value', 0) or 0) > 0 \
+            and float(trailing_config.get('stop_loss_move_value', 0) or 0) > 0:
+        return STEP
+    if float(trailing_config.get('value', 0) or 0) > 0:
+        return TRAIL
+    return None
+
+
+def position_trailing_config(position: Dict[str, Any]) -> Dict[str, Any]:
+    """trailing_sl of a position row, else the trailing_stop_loss of its leg."""
+    return position.get('trailing_sl') or position.get('trailing_stop_loss') or {}
+
+
+def trail_level(position_type: str, entry_price: float, peak_price: float,
+                trailing_config: Dict[str, Any], base_stop: Optional[float] = None) -> Optional[float]:
+    """
+    Stop level the trailing configuration asks for at a peak price.
+
+    Args:
+        base_stop: Stop the STEP mode moves from; one step beyond the entry price if None
+
+    Returns:
+        The level, or None when the configuration does not set one yet
+    """
+    is_long = position_type == 'LONG'
+    sign = 1 if is_long else -1
+    mode = trailing_mode(trailing_config)
+    unit = entry_price / 100 if trailing_config.get('type', 'PERCENTAGE') == 'PERCENTAGE' else 1
+
+    if mode == TRAIL:
+        value = float(trailing_config['value'])
+        if trailing_config.get('type', 'PERCENTAGE') == 'PERCENTAGE':
+            return peak_price * (1 - sign * value / 100)
+        return peak_price - sign * value
+
+    if mode == STEP:
+        instrument_move = float(trailing_config['instrument_move_value']) * unit
+        stop_loss_move = float(trailing_config['stop_loss_move_value']) * unit
+        steps = math.floor(sign * (peak_price - entry_price) / instrument_move)
+        if steps <= 0:
+            return None
+        start = base_stop if base_stop is not None else entry_price - sign * instrument_move
+        return start + sign * steps * stop_loss_move
+
+    return None
+
+
+def tighter(position_type: str, current: Optional[float], candidate: Optional[float]) -> Optional[float]:
+    """The tighter of two stop levels (None means no stop)."""
+    if candidate is None:
+        return current
+    if current is None:
+        return candidate
+    return max(current, candidate) if position_type == 'LONG' else min(current, candidate)
+
+
+def locked_floor(peak_mtm: float, config: Dict[str, Any]) -> Optional[float]:
+    """MTM floor of a lock_and_trail configuration at a peak MTM, None before the lock."""
+    lock_at = float(config.get('lock_at', 0) or 0)
+    if config.get('enabled') is False or lock_at <= 0 or peak_mtm < lock_at:
+        return None
+
+    floor = float(config.get('lock_profit', 0) or 0)
+    trail_every = float(config.get('trail_every', 0) or 0)
+    if trail_every > 0:
+        floor += math.floor((peak_mtm - lock_at) / trail_every) * float(config.get('trail_by', 0) or 0)
+    return floor
+
+
+class TrailingEngine:
+    """
+    In-memory trailing state of one container.
+
+    State is keyed by (user_id, checkpoint key). Every level change marks the
+    entry dirty; checkpoint() writes the dirty entries and clears them.
+    """
+
+    def __init__(self):
+        self._state: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._restored: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def restore(self, table, user_id: str, trading_date: str) -> int:
+        """Load a user's checkpoints of the day once per container; returns the number loaded."""
+        if (user_id, trading_date) in self._restored:
+            return 0
+
+        items = []
+        query = {
+            'KeyConditionExpression': 'user_id = :user_id AND begins_with(execution_key, :prefix)',
+            'ExpressionAttributeValues': {
+                ':user_id': user_id,
+                ':prefix': f"{CHECKPOINT_PREFIX}{trading_date}#",
+            },
+        }
+        while True:
+            response = table.query(**query)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        with self._lock:
+            for item in items:
+                key = (user_id, item['execution_key'])
+                if key not in self._state:
+                    self._state[key] = {field: _from_dynamodb(item.get(field)) for field in
+                                        ('peak', 'level', 'cost_locked', 'position_type')}
+            self._restored.add((user_id, trading_date))
+
+        return len(items)
+
+    def update_position(self, user_id: str, trading_date: str, position: Dict[str, Any],
+                        adjustment_enabled: bool = True, move_to_cost: bool = False) -> Dict[str, Any]:
+        """
+        Advance one position's high-water mark and stop level to its current price.
+
+        Args:
+            move_to_cost: Strategy is in TRAIL_TO_COST; the stop goes to the entry price
+
+        Returns:
+            Result with adjusted / exit_triggered, old_sl / new_sl and peak_price
+        """
+        position_id = position.get('position_id') or position.get('execution_key')
+        trailing_config = position_trailing_config(position)
+        position_type = position.get('position_type', 'LONG')
+        is_long = position_type == 'LONG'
+
+        entry_price = float(position.get('entry_price', 0))
+        current_price = float(position.get('current_price', entry_price))
+        key = (user_id, checkpoint_key(trading_date, POSITION_SCOPE, position_id))
+
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = {'peak': float(position.get('peak_price', entry_price)),
+                         'level': _stop_of(position), 'position_type': position_type}
+                self._state[key] = state
+
+            old_level = state['level']
+            peak = state['peak'] if state['peak'] is not None else entry_price
+            state['peak'] = max(peak, current_price) if is_long else min(peak, current_price)
+
+            adjusted = False
+            if adjustment_enabled:
+                candidate = trail_level(position_type, entry_price, state['peak'], trailing_config,
+                                        base_stop=_stop_of(position))
+                if move_to_cost:
+                    candidate = tighter(position_type, candidate, entry_price)
+                new_level = tighter(position_type, old_level, candidate)
+                if new_level != old_level:
+                    state['level'] = new_level
+                    self._dirty.add(key)
+                    adjusted = True
+
+            # Exits run against the level in force before this tick
+            exit_triggered = old_level is not None and (
+                current_price <= old_level if is_long else current_price >= old_level)
+
+        mode = TRAIL_TO_COST if move_to_cost else trailing_mode(trailing_config)
+        return {
+            'position_id': position_id,
+            'strategy_id': position.get('strategy_id'),
+            'trail_mode': mode,
+            'adjusted': adjusted,
+            'exit_triggered': exit_triggered,
+            'exit_reason': f"Price {current_price} hit trailing SL {old_level}" if exit_triggered else '',
+            'old_sl': old_level,
+            'new_sl': state['level'],
+            'peak_price': state['peak'],
+            'current_price': current_price,
+        }
+
+    def update_strategy(self, user_id: str, trading_date: str, strategy_id: str,
+                        mtm: float, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Advance a strategy's LOCK_AND_TRAIL peak MTM and locked floor.
+
+        Returns:
+            Result with adjusted / exit_triggered, floor and peak_mtm
+        """
+        key = (user_id, checkpoint_key(trading_date, STRATEGY_SCOPE, strategy_id))
+
+        with self._lock:
+            state = self._state.setdefault(key, {'peak': mtm, 'level': None, 'cost_locked': False})
+            old_floor = state['level']
+            state['peak'] = mtm if state['peak'] is None else max(state['peak'], mtm)
+
+            new_floor = locked_floor(state['peak'], config)
+            adjusted = new_floor is not None and (old_floor is None or new_floor > old_floor)
+            if adjusted:
+                state['level'] = new_floor
+                self._dirty.add(key)
+
+            exit_triggered = old_floor is not None and mtm <= old_floor
+
+        return {
+            'strategy_id': strategy_id,
+            'trail_mode': LOCK_AND_TRAIL,
+            'adjusted': adjusted,
+            'exit_triggered': exit_triggered,
+            'exit_reason': f"MTM ₹{mtm:.2f} fell to locked profit ₹{old_floor:.2f}" if exit_triggered else '',
+            'floor': state['level'],
+            'peak_mtm': state['peak'],
+            'strategy_mtm': mtm,
+        }
+
+    def is_cost_locked(self, user_id: str, trading_date: str, strategy_id: str) -> bool:
+        state = self._state.get((user_id, checkpoint_key(trading_date, STRATEGY_SCOPE, strategy_id)))
+        return bool(state and state.get('cost_locked'))
+
+    def lock_to_cost(self, user_id: str, trading_date: str, strategy_id: str) -> bool:
+        """Put a strategy in TRAIL_TO_COST; False if it already was."""
+        key = (user_id, checkpoint_key(trading_date, STRATEGY_SCOPE, strategy_id))
+        with self._lock:
+            state = self._state.setdefault(key, {'peak': None, 'level': None, 'cost_locked': False})
+            if state.get('cost_locked'):
+                return False
+            state['cost_locked'] = True
+            self._dirty.add(key)
+            return True
+
+    def pending_checkpoints(self, user_id: str) -> int:
+        return sum(1 for owner, _ in self._dirty if owner == user_id)
+
+    def checkpoint(self, table, user_id: str) -> int:
+        """
+        Write a user's changed levels; returns the number written.
+
+        Each write only tightens the stored level. When another container
+        already stored a tighter one, that level is adopted in memory instead.
+        """
+        with self._lock:
+            keys = sorted(key for key in self._dirty if key[0] == user_id)
+            states = {key: dict(self._state[key]) for key in keys}
+            self._dirty.difference_update(keys)
+
+        written = 0
+        for index, key in enumerate(keys):
+            try:
+                table.update_item(**_checkpoint_update(key, states[key]))
+                written += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    self._requeue(keys[index:])
+                    raise
+                try:
+                    self._adopt_stored(table, key)
+                except Exception as adopt_error:
+                    logger.warning(f"Could not re-read trailing checkpoint {key[1]}: {str(adopt_error)}")
+            except Exception:
+                # Keep the changes for the next invocation
+                self._requeue(keys[index:])
+                raise
+
+        return written
+
+    def _requeue(self, keys) -> None:
+        with self._lock:
+            self._dirty.update(keys)
+
+    def _adopt_stored(self, table, key: Tuple[str, str]) -> None:
+        """Merge a checkpoint another container tightened into this container's state."""
+        item = table.get_item(Key={'user_id': key[0], 'execution_key': key[1]}, ConsistentRead=True).get('Item') or {}
+        with self._lock:
+            state = self._state[key]
+            position_type = state.get('position_type') or 'LONG'
+            state['level'] = tighter(position_type, state.get('level'), _from_dynamodb(item.get('level')))
+            stored_peak = _from_dynamodb(item.get('peak'))
+            if stored_peak is not None:
+                state['peak'] = stored_peak if state.get('peak') is None else (
+                    max(state['peak'], stored_peak) if position_type == 'LONG' else min(state['peak'], stored_peak))
+            state['cost_locked'] = bool(state.get('cost_locked') or item.get('cost_locked'))
+
+        logger.info(f"Trailing checkpoint {key[1]} was tightened elsewhere; adopted level {state['level']}")
+
+
+_engine: Optional[TrailingEngine] = None
+
+
+def get_trailing_engine() -> TrailingEngine:
+    """Container-wide engine, kept across warm invocations."""
+    global _engine
+    if _engine is None:
+        _engine = TrailingEngine()
+    return _engine
+
+
+def _stop_of(position: Dict[str, Any]) -> Optional[float]:
+    """A position row's current stop; 0 / missing means none."""
+    value = position.get('current_stop_loss')
+    if value is None or float(value) == 0:
+        return None
+    return float(value)
+
+
+def _checkpoint_update(key: Tuple[str, str], state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    update_item arguments of a checkpoint that never loosens the stored level.
+
+    Higher levels are tighter for LONG positions and strategy floors, lower
+    ones for SHORT positions. Without a level only cost_locked is raised.
+    """
+    now = datetime.now(timezone.utc)
+    position_type = state.get('position_type') or 'LONG'
+    names = {'#ttl': 'ttl'}
+    values = {
+        ':record_type': 'TRAILING_CHECKPOINT',
+        ':updated_at': now.isoformat(),
+        ':ttl': int(now.timestamp()) + CHECKPOINT_TTL_SECONDS,
+        ':cost_locked': bool(state.get('cost_locked')),
+        ':position_type': position_type,
+        ':peak': _to_dynamodb(state.get('peak')),
+    }
+    sets = ['record_type = :record_type', 'updated_at = :updated_at', '#ttl = :ttl',
+            'position_type = :position_type']
+    sets.append('cost_locked = :cost_locked' if state.get('cost_locked')
+                else 'cost_locked = if_not_exists(cost_locked, :cost_locked)')
+
+    update = {'Key': {'user_id': key[0], 'execution_key': key[1]}}
+    level = _to_dynamodb(state.get('level'))
+    if level is None:
+        sets.append('peak = if_not_exists(peak, :peak)')
+    else:
+        sets += ['peak = :peak', '#level = :level']
+        names['#level'] = 'level'
+        values[':level'] = level
+        values[':null'] = 'NULL'
+        comparison = '<' if position_type == 'LONG' else '>'
+        update['ConditionExpression'] = (
+            f'attribute_not_exists(#level) OR attribute_type(#level, :null) OR #level {comparison} :level')
+
+    update.update({
+        'UpdateExpression': 'SET ' + ', '.join(sets),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+    })
+    return update
+
+
+def _to_dynamodb(value: Any) -> Any:
+    if isinstance(value, float):
+        return Decimal(str(value)) if math.isfinite(value) else None
+    return value
+
+
+def _from_dynamodb(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
@@ -5,10 +5,14 @@ Handles Trailing Stop Loss Check sub-events from Active User Event Handler.
 Monitors positions and adjusts trailing stop losses as price moves favorably.
 
 Responsibilities:
-- Query active positions with trailing SL configured
-- Check if price has moved favorably to adjust SL
-- Update stop loss levels in database
-- Trigger exit if trailing SL is hit
+- Query the user's open positions once
+- Advance trailing levels in the container's trailing engine (see
+  trailing_engine.py): TRAIL / STEP per leg, TRAIL_TO_COST and LOCK_AND_TRAIL
+  per strategy
+- Checkpoint only the levels that changed, with writes that only tighten
+- Trigger exit if a trailing level is hit; a strategy's lock-and-trail exit is
+  claimed once per day (TSL_EXIT#<strategy_id>#<date>) so later ticks do not
+  queue it again while the exit is in flight
 """
 
 import json
@@ -19,16 +23,32 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
 from decimal import Decimal
 
+from botocore.exceptions import ClientError
+
 sys.path.append('/opt/python')
 sys.path.append('/var/task')
+sys.path.append('/var/task/option_baskets')
 
 from shared_utils.logger import setup_logger, log_lambda_event
+from execution_lanes import send_to_lane
+from positional_schedule import open_positions
+from stop_loss_handler import check_stop_loss_for_position
+from strategy_mtm import aggregate_mtm, load_risk_limits
+from trailing_engine import get_trailing_engine, position_trailing_config, trail_level, trailing_mode
 
 logger = setup_logger(__name__)
 
 dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('REGION', 'ap-south-1'))
 sqs_client = boto3.client('sqs', region_name=os.environ.get('REGION', 'ap-south-1'))
 
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Strategy attributes driving strategy-scope trailing
+STRATEGY_TRAILING_FIELDS = ('move_sl_to_cost', 'lock_and_trail')
+
+# Strategy trailing exit claims expire after this many seconds (one claim per strategy per day)
+TRAILING_EXIT_CLAIM_TTL_SECONDS = 2 * 24 * 60 * 60
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -60,35 +80,75 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         logger.info(f"Market Phase: {market_phase}, Adjustment Enabled: {adjustment_enabled}")
 
         # Get current IST time
-        current_utc = datetime.now(timezone.utc)
-        ist_offset = timezone(timedelta(hours=5, minutes=30))
-        current_ist = current_utc.astimezone(ist_offset)
+        current_ist = datetime.now(timezone.utc).astimezone(IST)
+        trading_date = current_ist.strftime('%Y-%m-%d')
 
-        # Query active positions with trailing SL
+        # Query active positions (strategy-scope modes need every leg)
         positions = query_positions_with_trailing_sl(user_id)
 
         if not positions:
-            logger.info(f"No positions with trailing SL for user {user_id}")
+            logger.info(f"No open positions for user {user_id}")
             return create_success_response(user_id, sub_event_id, 0, 0, 0, [])
 
+        engine = get_trailing_engine()
+        restore_trailing_state(engine, user_id, trading_date)
+        strategy_configs = get_strategy_trailing_configs(user_id, {p.get('strategy_id') for p in positions})
+
+        # A stopped-out leg moves the remaining legs of a move_sl_to_cost strategy to cost
+        stopped_out = set()
+        for position in positions:
+            strategy_id = position.get('strategy_id')
+            if not strategy_configs.get(strategy_id, {}).get('move_sl_to_cost'):
+                continue
+            if check_stop_loss_for_position(position, current_ist).get('triggered'):
+                stopped_out.add(position.get('position_id') or position.get('execution_key'))
+                if engine.lock_to_cost(user_id, trading_date, strategy_id):
+                    logger.info(f"Strategy {strategy_id} leg stopped out, moving remaining legs to cost")
+
         # Check and adjust trailing SL for each position
         adjustments = []
         exits_triggered = []
 
         for position in positions:
-            result = process_trailing_sl(position, current_ist, adjustment_enabled)
+            position_id = position.get('position_id') or position.get('execution_key')
+            to_cost = engine.is_cost_locked(user_id, trading_date, position.get('strategy_id'))
+            if position_id in stopped_out or not (to_cost or position_trailing_config(position)):
+                continue
+
+            result = engine.update_position(user_id, trading_date, position, adjustment_enabled, move_to_cost=to_cost)
+            result['check_time'] = current_ist.isoformat()
 
             if result.get('adjusted'):
                 adjustments.append(result)
-                # Update the stop loss in database
-                update_trailing_sl_in_db(position, result)
 
             if result.get('exit_triggered'):
                 exits_triggered.append(result)
                 # Queue exit
                 queue_trailing_sl_exit(user_id, position, result, current_ist)
 
-        logger.info(f"Processed {len(positions)} positions: {len(adjustments)} adjusted, {len(exits_triggered)} exits")
+        # Lock-and-trail on strategy MTM
+        aggregate = aggregate_mtm(positions, detail.get('prices'))
+        for strategy_id, book in aggregate['strategies'].items():
+            config = strategy_configs.get(strategy_id, {}).get('lock_and_trail')
+            if not config:
+                continue
+
+            result = engine.update_strategy(user_id, trading_date, strategy_id, book['mtm'], config)
+            result['check_time'] = current_ist.isoformat()
+
+            if result.get('adjusted'):
+                adjustments.append(result)
+
+            if result.get('exit_triggered'):
+                result['position_ids'] = book['position_ids']
+                result['basket_id'] = book.get('basket_id')
+                exits_triggered.append(result)
+                queue_strategy_trailing_exit(user_id, result, current_ist)
+
+        checkpoints = write_trailing_checkpoints(engine, user_id)
+
+        logger.info(f"Processed {len(positions)} positions: {len(adjustments)} adjusted, "
+                    f"{len(exits_triggered)} exits, {checkpoints} levels checkpointed")
 
         return create_success_response(
             user_id, sub_event_id,
@@ -102,50 +162,67 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
 
 def query_positions_with_trailing_sl(user_id: str) -> List[Dict]:
-    """Query active positions with trailing stop loss configured."""
+    """Query the user's open positions of the (IST) day."""
     try:
         table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-
-        response = table.query(
-            KeyConditionExpression='user_id = :user_id AND begins_with(sort_key, :prefix)',
-            FilterExpression='#status = :open_status AND attribute_exists(trailing_sl)',
-            ExpressionAttributeValues={
-                ':user_id': user_id,
-                ':prefix': f'{today}#',
-                ':open_status': 'OPEN'
-            },
-            ExpressionAttributeNames={
-                '#status': 'position_status'
-            }
-        )
-
-        return response.get('Items', [])
+        return open_positions(table, user_id, datetime.now(timezone.utc).astimezone(IST).date())
 
     except Exception as e:
         logger.error(f"Error querying positions with trailing SL: {str(e)}")
         return []
 
 
+def restore_trailing_state(engine, user_id: str, trading_date: str) -> None:
+    """Restore the day's checkpoints into a cold engine (no-op when warm)."""
+    try:
+        restored = engine.restore(dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE']), user_id, trading_date)
+        if restored:
+            logger.info(f"Restored {restored} trailing checkpoints for user {user_id}")
+    except Exception as e:
+        logger.warning(f"Could not restore trailing checkpoints: {str(e)}")
+
+
+def get_strategy_trailing_configs(user_id: str, strategy_ids) -> Dict[str, Dict]:
+    """move_sl_to_cost / lock_and_trail of the open strategies, keyed by strategy id."""
+    strategy_keys = [f"STRATEGY#{strategy_id}" for strategy_id in strategy_ids if strategy_id]
+    if not strategy_keys:
+        return {}
+
+    try:
+        table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        configs = load_risk_limits(table, user_id, strategy_keys, STRATEGY_TRAILING_FIELDS)
+    except Exception as e:
+        logger.error(f"Error loading strategy trailing settings: {str(e)}")
+        return {}
+
+    return {key.split('#', 1)[1]: config for key, config in configs.items()}
+
+
 def process_trailing_sl(position: Dict, current_ist: datetime,
                         adjustment_enabled: bool) -> Dict:
     """
     Process trailing stop loss for a position.
 
+    Stateless: peak_price and current_stop_loss come from the position (the
+    backtest runner carries them between bars). The handler uses the trailing
+    engine instead.
+
     Trailing SL types:
     - PERCENTAGE: Trail by X% from peak
     - POINTS: Trail by X points from peak
+    - Step (instrument_move_value / stop_loss_move_value): move the SL by Y
+      for every X the price moves in favour
     """
     try:
-        position_id = position.get('position_id', position.get('sort_key'))
+        position_id = position.get('position_id') or position.get('execution_key')
         strategy_id = position.get('strategy_id')
 
         # Get trailing SL configuration
-        trailing_config = position.get('trailing_sl', {})
+        trailing_config = position_trailing_config(position)
         trail_type = trailing_config.get('type', 'PERCENTAGE')
         trail_value = float(trailing_config.get('value', 0))
 
-        if trail_value == 0:
+        if trailing_mode(trailing_config) is None:
             return {'position_id': position_id, 'adjusted': False, 'exit_triggered': False}
 
         # Get prices
@@ -163,16 +240,10 @@ def process_trailing_sl(position: Dict, current_ist: datetime,
             new_peak = current_price
 
         # Calculate new trailing SL level
-        if trail_type == 'PERCENTAGE':
-            if position_type == 'LONG':
-                new_sl = new_peak * (1 - trail_value / 100)
-            else:
-                new_sl = new_peak * (1 + trail_value / 100)
-        else:  # POINTS
-            if position_type == 'LONG':
-                new_sl = new_peak - trail_value
-            else:
-                new_sl = new_peak + trail_value
+        new_sl = trail_level(position_type, entry_price, new_peak, trailing_config,
+                             base_stop=position.get('initial_stop_loss'))
+        if new_sl is None:
+            new_sl = current_sl
 
         # Check if SL should be adjusted (only tighten, never loosen)
         adjusted = False
@@ -212,38 +283,19 @@ def process_trailing_sl(position: Dict, current_ist: datetime,
         return {'position_id': position.get('position_id'), 'adjusted': False, 'exit_triggered': False, 'error': str(e)}
 
 
-def update_trailing_sl_in_db(position: Dict, result: Dict) -> None:
-    """Update the trailing stop loss level in database."""
+def write_trailing_checkpoints(engine, user_id: str) -> int:
+    """Checkpoint the levels that changed this tick; stored levels are never loosened."""
     try:
-        table = dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE'])
-
-        table.update_item(
-            Key={
-                'user_id': position.get('user_id'),
-                'sort_key': position.get('sort_key')
-            },
-            UpdateExpression='SET current_stop_loss = :new_sl, peak_price = :peak, sl_updated_at = :time',
-            ExpressionAttributeValues={
-                ':new_sl': Decimal(str(result.get('new_sl'))),
-                ':peak': Decimal(str(result.get('peak_price'))),
-                ':time': result.get('check_time')
-            }
-        )
-
-        logger.info(f"Updated trailing SL for position {result.get('position_id')}: {result.get('new_sl')}")
-
+        return engine.checkpoint(dynamodb.Table(os.environ['EXECUTION_HISTORY_TABLE']), user_id)
     except Exception as e:
-        logger.error(f"Error updating trailing SL in DB: {str(e)}")
+        logger.error(f"Error writing trailing checkpoints: {str(e)}")
+        return 0
 
 
 def queue_trailing_sl_exit(user_id: str, position: Dict, result: Dict,
                             current_ist: datetime) -> None:
     """Queue exit for trailing SL triggered position."""
     try:
-        queue_url = os.environ.get('SINGLE_STRATEGY_QUEUE_URL')
-        if not queue_url:
-            return
-
         message = {
             'user_id': user_id,
             'strategy_id': result.get('strategy_id'),
@@ -256,11 +308,11 @@ def queue_trailing_sl_exit(user_id: str, position: Dict, result: Dict,
             'priority': 'CRITICAL'
         }
 
-        sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message, cls=DecimalEncoder),
-            MessageGroupId=user_id,
-            MessageDeduplicationId=f"TSL_{result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}"
+        send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"TSL_{result.get('position_id')}_{current_ist.strftime('%Y%m%d%H%M')}",
+            encoder=DecimalEncoder
         )
 
         logger.info(f"Queued TRAILING_SL_EXIT for position {result.get('position_id')}")
@@ -269,6 +321,79 @@ def queue_trailing_sl_exit(user_id: str, position: Dict, result: Dict,
         logger.error(f"Error queuing trailing SL exit: {str(e)}")
 
 
+def trailing_exit_claim_key(user_id: str, strategy_id: str, current_ist: datetime) -> Dict[str, str]:
+    return {'user_id': user_id, 'sort_key': f"TSL_EXIT#{strategy_id}#{current_ist.strftime('%Y-%m-%d')}"}
+
+
+def claim_strategy_trailing_exit(table, user_id: str, strategy_id: str, current_ist: datetime) -> bool:
+    """
+    Claim today's lock-and-trail exit of a strategy.
+
+    Returns:
+        True if this tick owns the exit
+    """
+    try:
+        table.put_item(
+            Item={
+                **trailing_exit_claim_key(user_id, strategy_id, current_ist),
+                'entity_type': 'TSL_EXIT_CLAIM',
+                'claimed_at': datetime.now(timezone.utc).isoformat(),
+                'ttl': int(datetime.now(timezone.utc).timestamp()) + TRAILING_EXIT_CLAIM_TTL_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(sort_key)'
+        )
+        return True
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def queue_strategy_trailing_exit(user_id: str, result: Dict, current_ist: datetime) -> None:
+    """Queue one exit of every leg of a strategy whose locked profit is hit, once a day."""
+    table = dynamodb.Table(os.environ['TRADING_CONFIGURATIONS_TABLE'])
+    try:
+        if not claim_strategy_trailing_exit(table, user_id, result['strategy_id'], current_ist):
+            logger.info(f"Lock-and-trail exit of strategy {result['strategy_id']} already queued today")
+            return
+    except Exception as e:
+        logger.error(f"Error claiming strategy trailing exit: {str(e)}")
+        return
+
+    try:
+        message = {
+            'user_id': user_id,
+            'strategy_id': result['strategy_id'],
+            'basket_id': result.get('basket_id'),
+            'execution_type': 'TRAILING_SL_EXIT',
+            'exit_scope': 'STRATEGY',
+            'trigger_reason': result.get('exit_reason'),
+            'trigger_time': current_ist.isoformat(),
+            'pnl_at_exit': result.get('strategy_mtm'),
+            'position_ids': result['position_ids'],
+            'source': 'trailing_sl_handler',
+            'priority': 'CRITICAL'
+        }
+
+        send_to_lane(
+            sqs_client, message,
+            group_id=user_id,
+            deduplication_id=f"TSL_{result['strategy_id']}_{current_ist.strftime('%Y%m%d%H%M')}",
+            encoder=DecimalEncoder
+        )
+
+        logger.info(f"Queued lock-and-trail TRAILING_SL_EXIT for strategy {result['strategy_id']}")
+
+    except Exception as e:
+        logger.error(f"Error queuing strategy trailing exit: {str(e)}")
+        # Release the claim so the next tick retries the exit
+        try:
+            table.delete_item(Key=trailing_exit_claim_key(user_id, result['strategy_id'], current_ist))
+        except Exception as release_error:
+            logger.error(f"❌ Could not release trailing exit claim of strategy {result['strategy_id']}: {release_error}")
+
+
 def create_success_response(user_id: str, sub_event_id: str,
                             positions_checked: int, adjustments: int,
                             exits_triggered: int, details: List) -> Dict:
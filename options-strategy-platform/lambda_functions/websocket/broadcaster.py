@@ -104,7 +104,7 @@ class WebSocketBroadcaster:
 
         Args:
             user_id: The user ID to broadcast to
-            channel: The channel name (orders, positions, pnl, executions)
+            channel: The channel name (orders, positions, pnl, executions, greeks)
             message_type: The message type identifier
             data: The message payload
 
@@ -168,6 +168,15 @@ class WebSocketBroadcaster:
             data=execution
         )
 
+    def broadcast_greeks_update(self, user_id: str, greeks: Dict[str, Any]) -> int:
+        """Broadcast changed portfolio Greeks (per USER / STRATEGY# / BASKET# scope)."""
+        return self.broadcast_to_user(
+            user_id=user_id,
+            channel='greeks',
+            message_type='greeks_update',
+            data=greeks
+        )
+
     def broadcast_to_all_user_connections(
         self,
         user_id: str,
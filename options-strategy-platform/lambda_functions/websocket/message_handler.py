@@ -17,9 +17,13 @@ logger.setLevel(logging.INFO)
 # Initialize DynamoDB
 dynamodb = boto3.resource('dynamodb')
 connections_table = dynamodb.Table(os.environ.get('WEBSOCKET_CONNECTIONS_TABLE', ''))
+trading_table = dynamodb.Table(os.environ.get('TRADING_CONFIGURATIONS_TABLE', ''))
 
 # Valid subscription channels
-VALID_CHANNELS = {'orders', 'positions', 'pnl', 'executions', 'all'}
+VALID_CHANNELS = {'orders', 'positions', 'pnl', 'executions', 'greeks', 'all'}
+
+# Last published portfolio Greeks; greeks_update messages are deltas against it
+GREEKS_SNAPSHOT_SORT_KEY = 'GREEKS#SNAPSHOT'
 
 
 def get_api_gateway_client(event: Dict[str, Any]) -> Any:
@@ -71,7 +75,8 @@ def handle_subscribe(connection_id: str, channels: List[str]) -> Dict[str, Any]:
     try:
         # Get current subscriptions
         response = connections_table.get_item(Key={'connection_id': connection_id})
-        current = response.get('Item', {}).get('subscriptions', [])
+        item = response.get('Item', {})
+        current = item.get('subscriptions', [])
 
         # Merge subscriptions
         if 'all' in valid_channels:
@@ -85,12 +90,18 @@ def handle_subscribe(connection_id: str, channels: List[str]) -> Dict[str, Any]:
             ExpressionAttributeValues={':subs': new_subs}
         )
 
-        return {
+        subscribed = {
             'type': 'subscribed',
             'channels': new_subs,
             'message': f'Subscribed to {len(new_subs)} channel(s)'
         }
 
+        # New Greeks subscribers start from the snapshot the deltas apply to
+        if 'greeks' in new_subs and 'greeks' not in current and item.get('user_id'):
+            subscribed['greeks_snapshot'] = get_greeks_snapshot(item['user_id'])
+
+        return subscribed
+
     except Exception as e:
         logger.error(f"Error updating subscriptions: {e}")
         return {
@@ -99,6 +110,16 @@ def handle_subscribe(connection_id: str, channels: List[str]) -> Dict[str, Any]:
         }
 
 
+def get_greeks_snapshot(user_id: str) -> Dict[str, Any]:
+    """Last published Greeks of a user per scope (USER / STRATEGY# / BASKET#)."""
+    try:
+        response = trading_table.get_item(Key={'user_id': user_id, 'sort_key': GREEKS_SNAPSHOT_SORT_KEY})
+        return json.loads(json.dumps(response.get('Item', {}).get('scopes', {}), default=float))
+    except Exception as e:
+        logger.error(f"Error reading Greeks snapshot: {e}")
+        return {}
+
+
 def handle_unsubscribe(connection_id: str, channels: List[str]) -> Dict[str, Any]:
     """Handle unsubscription request."""
     try:
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Portfolio margin latency benchmark
+
+Margins every open basket of a user (per basket plus the netted portfolio) with
+the SPAN-style MarginEngine and reports:
+1. Cold latency - first call, every scenario array priced
+2. Warm latency - repeat calls served from the scenario array cache
+3. Hedge benefit - netted margin vs the old per-leg formula
+
+Examples:
+  python run_margin_benchmark.py                          # 20 baskets x 3 strategies x 4 legs
+  python run_margin_benchmark.py --baskets 100 --strategies-per-basket 5 --repeat 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+
+AS_OF = date(2025, 10, 13)
+EXPIRIES = ['2025-10-16', '2025-10-23', '2025-10-28']
+MARKET = {
+    'NIFTY': {'spot': 25000, 'volatility': 0.13, 'strike_step': 50, 'lot_size': 75},
+    'BANKNIFTY': {'spot': 56000, 'volatility': 0.15, 'strike_step': 100, 'lot_size': 35},
+}
+
+
+def generate_baskets(count, strategies_per_basket, seed):
+    """Iron condors, strangles and calendars on random strikes and expiries"""
+    rng = random.Random(seed)
+    baskets = {}
+    for b in range(count):
+        positions = []
+        for _ in range(strategies_per_basket):
+            underlying = rng.choice(list(MARKET))
+            quote = MARKET[underlying]
+            atm = round(quote['spot'] / quote['strike_step']) * quote['strike_step']
+            width = quote['strike_step'] * rng.randint(2, 8)
+            quantity = quote['lot_size'] * rng.randint(1, 3)
+            expiry = rng.choice(EXPIRIES)
+            kind = rng.choice(['condor', 'strangle', 'calendar'])
+
+            def leg(strike, option_type, side, leg_expiry=expiry):
+                return {'underlying': underlying, 'expiry': leg_expiry, 'strike': strike,
+                        'option_type': option_type, 'transaction_type': side, 'quantity': quantity}
+
+            if kind == 'calendar':
+                positions += [leg(atm, 'CE', 'SELL'), leg(atm, 'CE', 'BUY', EXPIRIES[-1])]
+            else:
+                positions += [leg(atm + width, 'CE', 'SELL'), leg(atm - width, 'PE', 'SELL')]
+                if kind == 'condor':
+                    positions += [leg(atm + 2 * width, 'CE', 'BUY'), leg(atm - 2 * width, 'PE', 'BUY')]
+        baskets[f'basket-{b:03d}'] = positions
+    return baskets
+
+
+def per_leg_margin(positions):
+    """The previous simplified formula: 10%/12% SPAN plus 5% exposure on every short leg"""
+    total = 0.0
+    for p in positions:
+        if p['transaction_type'] == 'SELL':
+            notional = MARKET[p['underlying']]['spot'] * p['quantity']
+            total += notional * (0.10 if p['option_type'] == 'CE' else 0.12) + notional * 0.05
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Portfolio margin latency benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--baskets', type=int, default=20, help='Open baskets (default: 20)')
+    parser.add_argument('--strategies-per-basket', type=int, default=3, help='Strategies per basket (default: 3)')
+    parser.add_argument('--repeat', type=int, default=100, help='Warm repetitions (default: 100)')
+    parser.add_argument('--seed', type=int, default=7, help='Basket generator seed (default: 7)')
+    args = parser.parse_args()
+
+    from shared_utils.margin_engine import MarginEngine, ScenarioArrayCache
+
+    baskets = generate_baskets(args.baskets, args.strategies_per_basket, args.seed)
+    positions = sum(len(p) for p in baskets.values())
+    market = {u: {'spot': q['spot'], 'volatility': q['volatility']} for u, q in MARKET.items()}
+    print(f"📊 {args.baskets} baskets, {positions} legs across {', '.join(MARKET)}")
+
+    engine = MarginEngine(cache=ScenarioArrayCache())
+    started = time.perf_counter()
+    result = engine.calculate_basket_margins(baskets, market, AS_OF)
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        engine.calculate_basket_margins(baskets, market, AS_OF)
+    warm_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+    legacy = sum(per_leg_margin(p) for p in baskets.values())
+
+    print("\n" + "=" * 80)
+    print(f"⚡ Cold: {round(cold_ms, 2)}ms   Warm: {round(warm_ms, 2)}ms "
+          f"(cache hits {engine.cache.hits}, misses {engine.cache.misses})")
+    print(f"   Per-basket total:  ₹{result['total_margin']:,.0f}")
+    print(f"   Netted portfolio:  ₹{result['portfolio']['total_margin']:,.0f}")
+    print(f"   Per-leg formula:   ₹{legacy:,.0f}")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
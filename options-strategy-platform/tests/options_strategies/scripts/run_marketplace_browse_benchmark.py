@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Marketplace browse latency benchmark
+
+Builds a synthetic template catalog in a moto DynamoDB table and compares:
+1. Legacy browse - paginated table scan, Python-side filters, sort by subscribers
+2. Index browse (cold) - precomputed listing view read from DynamoDB
+3. Index browse (warm) - listing view served from the in-container cache
+
+Examples:
+  python run_marketplace_browse_benchmark.py                       # 10k templates
+  python run_marketplace_browse_benchmark.py --templates 2000 --iterations 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('REGION', 'ap-south-1')
+os.environ.setdefault('TRADING_CONFIGURATIONS_TABLE', 'benchmark-trading-configurations')
+
+import boto3
+from moto import mock_aws
+
+CATEGORIES = ['INCOME', 'HEDGING', 'DIRECTIONAL', 'VOLATILITY']
+DIFFICULTIES = ['BEGINNER', 'INTERMEDIATE', 'ADVANCED']
+
+BROWSE_QUERIES = [
+    {},
+    {'category': 'income'},
+    {'difficulty': 'advanced', 'min_performance': '12'},
+    {'category': 'hedging', 'difficulty': 'beginner', 'min_performance': '25'},
+]
+
+
+def create_table():
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+    return dynamodb.create_table(
+        TableName=os.environ['TRADING_CONFIGURATIONS_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+def populate_catalog(table, template_count):
+    """Write template_count admin templates plus a handful of private baskets"""
+    with table.batch_writer() as batch:
+        for i in range(template_count):
+            batch.put_item(Item={
+                'user_id': f'admin-{i % 25:03d}',
+                'sort_key': f'BASKET#template-{i:05d}',
+                'basket_id': f'template-{i:05d}',
+                'name': f'Template {i}',
+                'category': CATEGORIES[i % len(CATEGORIES)],
+                'subscriber_count': Decimal((i * 7919) % 5000),
+                'performance_metrics': {'total_return': Decimal(str((i * 37) % 80 - 10))},
+                'published_at': '2025-10-10T09:00:00+00:00',
+                'marketplace_config': {
+                    'is_template': True,
+                    'visibility': 'PRIVATE' if i % 10 == 0 else 'PUBLIC',
+                    'difficulty_level': DIFFICULTIES[i % len(DIFFICULTIES)],
+                    'pricing': {'type': 'FREE', 'monthly_fee': 0},
+                    'tags': []
+                }
+            })
+
+
+def legacy_browse(table, query_params):
+    """Scan-and-filter browse returning the same result set as the index"""
+    category = query_params.get('category')
+    difficulty = query_params.get('difficulty')
+    min_performance = query_params.get('min_performance')
+
+    scan_kwargs = {
+        'FilterExpression': 'attribute_exists(marketplace_config) AND marketplace_config.visibility = :visibility',
+        'ExpressionAttributeValues': {':visibility': 'PUBLIC'}
+    }
+    templates = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        templates.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    if category:
+        templates = [t for t in templates if t.get('category') == category.upper()]
+    if difficulty:
+        templates = [t for t in templates
+                     if t.get('marketplace_config', {}).get('difficulty_level') == difficulty.upper()]
+    if min_performance:
+        templates = [t for t in templates
+                     if t.get('performance_metrics', {}).get('total_return', 0) >= float(min_performance)]
+
+    templates.sort(key=lambda t: t.get('subscriber_count', 0), reverse=True)
+    return templates[:50]
+
+
+def time_call(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'avg_ms': round(statistics.mean(samples), 2),
+        'p50_ms': round(statistics.median(samples), 2),
+        'max_ms': round(max(samples), 2)
+    }
+
+
+def run_benchmark(template_count, iterations):
+    import marketplace_listing_index
+    from marketplace_listing_index import rebuild_marketplace_index
+    from marketplace_manager import browse_marketplace_templates
+
+    with mock_aws():
+        table = create_table()
+
+        print(f"📦 Populating {template_count} synthetic templates...")
+        populate_catalog(table, template_count)
+
+        start = time.perf_counter()
+        rebuild = rebuild_marketplace_index(table)
+        print(f"🏗️  Index rebuild: {round((time.perf_counter() - start) * 1000, 2)}ms "
+              f"({rebuild['view_count']} views)")
+
+        def index_cold(params):
+            marketplace_listing_index._VIEW_CACHE.clear()
+            return browse_marketplace_templates(params, table)
+
+        def index_warm(params):
+            return browse_marketplace_templates(params, table)
+
+        print("\n" + "=" * 80)
+        print(f"{'query':<56}{'legacy':>10}{'cold':>10}{'warm':>10}")
+        print("=" * 80)
+        for params in BROWSE_QUERIES:
+            legacy = time_call(lambda: legacy_browse(table, params), iterations)
+            cold = time_call(lambda: index_cold(params), iterations)
+            index_warm(params)
+            warm = time_call(lambda: index_warm(params), iterations)
+            label = ', '.join(f'{k}={v}' for k, v in params.items()) or '(all templates)'
+            print(f"{label:<56}{legacy['avg_ms']:>8}ms{cold['avg_ms']:>8}ms{warm['avg_ms']:>8}ms")
+        print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Marketplace browse latency benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--templates', type=int, default=10000,
+                        help='Number of synthetic templates in the catalog (default: 10000)')
+    parser.add_argument('--iterations', type=int, default=10,
+                        help='Number of iterations per query (default: 10)')
+    args = parser.parse_args()
+
+    run_benchmark(args.templates, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Order slicing throughput benchmark
+
+Executes large legs through TradingExecutionBridge against the paper broker and reports:
+1. Sequential slices - every child order placed one after another
+2. Concurrent slices - slices dispatched in parallel behind the per-broker rate limiter
+
+The paper broker fills instantly, so a fixed per-order latency is injected to model the
+broker round trip. The ORDER records land in a moto DynamoDB table.
+
+Examples:
+  python run_order_slicing_benchmark.py                                   # 20 legs x 300 lots
+  python run_order_slicing_benchmark.py --legs 50 --lots 600 --rate 20 --broker-latency-ms 80
+"""
+
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('REGION', 'ap-south-1')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ.setdefault('TRADING_CONFIGURATIONS_TABLE', 'benchmark-trading-configurations')
+
+import boto3
+from moto import mock_aws
+
+
+def create_table():
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+    return dynamodb.create_table(
+        TableName=os.environ['TRADING_CONFIGURATIONS_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+def run_legs(bridge, legs, lots, max_lots_per_order):
+    from trading import TradingMode
+
+    start = time.perf_counter()
+    results = [
+        bridge.execute_leg_sync(
+            user_id='user-001',
+            strategy_id='strategy-001',
+            basket_id='basket-001',
+            leg_data={
+                'leg_id': f'leg-{i}', 'underlying': 'NIFTY', 'option_type': 'CE', 'action': 'SELL',
+                'strike': 25000 + 50 * i, 'expiry_date': '2025-10-16', 'lots': lots
+            },
+            allocation={
+                'broker_name': 'paper', 'client_id': 'PAPER001',
+                'lot_multiplier': 1, 'max_lots_per_order': max_lots_per_order
+            },
+            trading_mode=TradingMode.PAPER
+        )
+        for i in range(legs)
+    ]
+    elapsed = time.perf_counter() - start
+
+    orders = sum(r.get('slice_count', 0) for r in results)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'orders': orders,
+        'orders_per_second': round(orders / elapsed, 1) if elapsed else 0,
+        'filled_lots': sum(r.get('filled_quantity', 0) for r in results),
+        'legs_filled': sum(1 for r in results if r['status'] == 'FILLED')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Order slicing throughput benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--legs', type=int, default=20, help='Legs to execute (default: 20)')
+    parser.add_argument('--lots', type=int, default=300, help='Lots per leg (default: 300)')
+    parser.add_argument('--max-lots-per-order', type=int, default=50,
+                        help='Allocation cap per child order (default: 50)')
+    parser.add_argument('--rate', type=float, default=10, help='Broker orders per second (default: 10)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent slices per leg (default: 8)')
+    parser.add_argument('--broker-latency-ms', type=float, default=50,
+                        help='Injected paper broker round trip (default: 50)')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    from trading import order_slicer
+    from trading.paper_trading_strategy import PaperTradingStrategy
+    from trading.trading_execution_bridge import TradingExecutionBridge
+
+    place_order = PaperTradingStrategy.place_order
+
+    def slow_place_order(self, order_params):
+        time.sleep(args.broker_latency_ms / 1000)
+        return place_order(self, order_params)
+
+    PaperTradingStrategy.place_order = slow_place_order
+    order_slicer.BROKER_ORDERS_PER_SECOND['paper'] = args.rate
+
+    slices_per_leg = len(order_slicer.slice_quantity(
+        args.lots, order_slicer.max_lots_per_slice('NIFTY', args.max_lots_per_order)
+    ))
+    print(f"🚀 {args.legs} legs x {args.lots} lots -> {slices_per_leg} slices per leg, "
+          f"{args.rate} orders/s, {args.broker_latency_ms}ms broker latency")
+
+    results = {}
+    for name, workers in (('sequential', 1), ('concurrent', args.workers)):
+        order_slicer.ORDER_SLICE_WORKERS = workers
+        order_slicer._RATE_LIMITERS.clear()
+        with mock_aws():
+            create_table()
+            bridge = TradingExecutionBridge(trading_table_name=os.environ['TRADING_CONFIGURATIONS_TABLE'])
+            results[name] = run_legs(bridge, args.legs, args.lots, args.max_lots_per_order)
+
+    print("\n" + "=" * 80)
+    print(f"{'mode':<12}{'orders':>8}{'elapsed':>10}{'orders/s':>10}{'filled lots':>13}{'legs filled':>13}")
+    print("=" * 80)
+    for name, r in results.items():
+        print(f"{name:<12}{r['orders']:>8}{r['elapsed_s']:>9}s{r['orders_per_second']:>10}"
+              f"{r['filled_lots']:>13}{r['legs_filled']:>13}")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
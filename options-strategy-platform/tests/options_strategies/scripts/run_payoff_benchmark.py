@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Strategy payoff throughput benchmark
+
+Evaluates a batch of 6-leg strategies (expiry payoff, T+n surfaces, breakevens,
+max profit/loss) two ways and reports evaluations per second:
+1. Loop  - per-price, per-leg pure Python using RiskCalculator's scalar pricers
+2. Batch - PayoffEngine over padded NumPy leg arrays, chunked per pass
+
+Peak RSS is reported so the batch size can be sized against a 512 MB Lambda.
+
+Examples:
+  python run_payoff_benchmark.py                                    # 200 strategies, 201-point grid
+  python run_payoff_benchmark.py --strategies 2000 --horizons 0 2 5 --skip-loop
+  python run_payoff_benchmark.py --grid-points 501 --chunk-size 64
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+
+SPOT = 25000
+STRIKE_STEP = 50
+
+
+def generate_strategies(count, seed):
+    """Random 6-leg NIFTY strategies around the money"""
+    rng = random.Random(seed)
+    strategies = []
+    for i in range(count):
+        legs = []
+        for _ in range(6):
+            strike = SPOT + STRIKE_STEP * rng.randint(-10, 10)
+            option_type = rng.choice(['CE', 'PE'])
+            distance = (strike - SPOT) if option_type == 'CE' else (SPOT - strike)
+            legs.append({
+                'strike': strike,
+                'option_type': option_type,
+                'transaction_type': rng.choice(['BUY', 'SELL']),
+                'quantity': 75 * rng.randint(1, 4),
+                'entry_premium': round(max(5.0, 150 - distance * 0.3 + rng.uniform(-10, 10)), 2)
+            })
+        strategies.append({
+            'strategy_id': f'strategy-{i:04d}',
+            'legs': legs,
+            'spot_price': SPOT,
+            'days_to_expiry': rng.choice([2, 7, 14]),
+            'volatility': 0.13
+        })
+    return strategies
+
+
+def loop_evaluate(calculator, strategy, spot_prices, horizons):
+    """Pure Python evaluation of one strategy"""
+    expiry = []
+    for spot in spot_prices:
+        total = 0
+        for leg in strategy['legs']:
+            intrinsic = max(0, spot - leg['strike']) if leg['option_type'] == 'CE' else max(0, leg['strike'] - spot)
+            sign = 1 if leg['transaction_type'] == 'BUY' else -1
+            total += sign * leg['quantity'] * (intrinsic - leg['entry_premium'])
+        expiry.append(total)
+
+    surfaces = {}
+    for days_forward in horizons:
+        time_to_expiry = (strategy['days_to_expiry'] - days_forward) / 365.0
+        surface = []
+        for spot in spot_prices:
+            total = 0
+            for leg in strategy['legs']:
+                pricer = calculator.black_scholes_call if leg['option_type'] == 'CE' else calculator.black_scholes_put
+                price = pricer(spot, leg['strike'], time_to_expiry, strategy['volatility'])
+                sign = 1 if leg['transaction_type'] == 'BUY' else -1
+                total += sign * leg['quantity'] * (price - leg['entry_premium'])
+            surface.append(total)
+        surfaces[days_forward] = surface
+
+    payoffs = [{'spot_price': s, 'payoff': p} for s, p in zip(spot_prices, expiry)]
+    return {
+        'max_profit': max(expiry),
+        'max_loss': min(expiry),
+        'breakeven_points': calculator._find_breakeven_points(payoffs),
+        'payoff_surface': surfaces
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Strategy payoff throughput benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--strategies', type=int, default=200, help='Strategies per batch (default: 200)')
+    parser.add_argument('--grid-points', type=int, default=201, help='Spot grid points (default: 201)')
+    parser.add_argument('--horizons', type=int, nargs='*', default=[0, 1, 3],
+                        help='T+n horizons in days (default: 0 1 3)')
+    parser.add_argument('--chunk-size', type=int, default=128, help='Strategies per NumPy pass (default: 128)')
+    parser.add_argument('--repeat', type=int, default=5, help='Batch repetitions (default: 5)')
+    parser.add_argument('--skip-loop', action='store_true', help='Skip the pure Python baseline')
+    parser.add_argument('--seed', type=int, default=7, help='Strategy generator seed (default: 7)')
+    args = parser.parse_args()
+
+    from shared_utils.payoff_engine import PayoffEngine
+    from shared_utils.risk_calculations import RiskCalculator
+
+    strategies = generate_strategies(args.strategies, args.seed)
+    spot_prices = [round(SPOT * (0.9 + 0.2 * i / (args.grid_points - 1)), 2) for i in range(args.grid_points)]
+    print(f"📊 {len(strategies)} six-leg strategies x {args.grid_points} spots, horizons {args.horizons}")
+    print(f"   Baseline RSS: {peak_rss_mb()} MB")
+
+    loop_rate = None
+    if not args.skip_loop:
+        calculator = RiskCalculator()
+        started = time.perf_counter()
+        for strategy in strategies:
+            loop_evaluate(calculator, strategy, spot_prices, args.horizons)
+        loop_seconds = time.perf_counter() - started
+        loop_rate = len(strategies) / loop_seconds
+        print(f"🐢 Loop:  {round(loop_seconds * 1000, 1)}ms ({round(loop_rate, 1)} evaluations/sec)")
+
+    engine = PayoffEngine(chunk_size=args.chunk_size)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        engine.evaluate(strategies, spot_prices=spot_prices, days_forward=args.horizons)
+    batch_seconds = (time.perf_counter() - started) / args.repeat
+    batch_rate = len(strategies) / batch_seconds
+
+    print("\n" + "=" * 80)
+    print(f"⚡ Batch: {round(batch_seconds * 1000, 1)}ms per batch ({round(batch_rate, 1)} evaluations/sec)")
+    if loop_rate:
+        print(f"   Speedup:  {round(batch_rate / loop_rate, 1)}x")
+    print(f"   Peak RSS: {peak_rss_mb()} MB")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
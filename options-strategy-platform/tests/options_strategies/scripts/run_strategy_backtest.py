@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Historical strategy backtester
+
+Replays strategy-days offline through the production execution path:
+- get_complete_strategy_data / query_basket_broker_allocations against a moto DynamoDB table
+- TradingExecutionBridge.execute_strategy for entries, execute_leg_sync for exits
+- stop_loss_handler, target_profit_handler and trailing_sl_handler checks every bar
+- the paper matching engine fills orders at historical bar closes
+
+Each strategy-day runs in its own worker process with its own table, so thousands
+of days can run in parallel. Per-phase timings are reported alongside P&L to find
+slow paths, and --lot-multipliers sweeps allocation sizing in one run.
+
+Config (JSON):
+  {
+    "basket_id": "basket-001",
+    "allocations": [{"broker_name": "paper", "client_id": "PAPER001", "lot_multiplier": 1, "max_lots_per_order": 50}],
+    "strategies": [{
+      "strategy_id": "ic-nifty", "strategy_name": "Iron Condor", "underlying": "NIFTY",
+      "entry_time": "09:30", "exit_time": "15:15",
+      "legs": [{"leg_id": "leg-1", "option_type": "CE", "strike": 25200, "action": "SELL", "lots": 1,
+                "stop_loss": {"type": "PERCENTAGE", "value": 30},
+                "target_profit": {"type": "PERCENTAGE", "value": 50},
+                "trailing_sl": {"type": "POINTS", "value": 15}}]
+    }]
+  }
+
+Bars: one CSV per day in --bars-dir named YYYY-MM-DD.csv with columns
+timestamp,symbol,open,high,low,close (IST timestamps). A leg's symbol is its
+"symbol" field, or UNDERLYING + STRIKE + CE/PE (e.g. NIFTY25200CE).
+Without --bars-dir, --days synthetic sessions are generated from a seeded random walk.
+
+Examples:
+  python run_strategy_backtest.py --config basket.json --bars-dir bars/ --workers 8
+  python run_strategy_backtest.py --config basket.json --days 500 --lot-multipliers 1,2,5 --output results.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('REGION', 'ap-south-1')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ.setdefault('TRADING_CONFIGURATIONS_TABLE', 'backtest-trading-configurations')
+os.environ.setdefault('EXECUTION_HISTORY_TABLE', 'backtest-execution-history')
+
+import boto3
+from moto import mock_aws
+
+IST = timezone(timedelta(hours=5, minutes=30))
+BACKTEST_USER = 'backtest-user'
+SESSION_MINUTES = 375  # 09:15 - 15:30
+
+
+def create_table():
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+    return dynamodb.create_table(
+        TableName=os.environ['TRADING_CONFIGURATIONS_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+            {'AttributeName': 'basket_id', 'AttributeType': 'S'},
+            {'AttributeName': 'entity_type_priority', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'AllocationsByBasket',
+                'KeySchema': [
+                    {'AttributeName': 'basket_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'entity_type_priority', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+def to_dynamodb(value):
+    """Round-trip through JSON so floats become Decimals"""
+    from decimal import Decimal
+    return json.loads(json.dumps(value), parse_float=Decimal, parse_int=Decimal)
+
+
+def seed_strategy(table, config, strategy, lot_multiplier):
+    basket_id = config.get('basket_id', 'backtest-basket')
+    table.put_item(Item=to_dynamodb({
+        **strategy,
+        'user_id': BACKTEST_USER,
+        'sort_key': f"STRATEGY#{strategy['strategy_id']}",
+        'basket_id': basket_id,
+        'status': 'ACTIVE'
+    }))
+    allocations = config.get('allocations') or [{'broker_name': 'paper', 'client_id': 'PAPER001'}]
+    for index, allocation in enumerate(allocations, 1):
+        table.put_item(Item=to_dynamodb({
+            'broker_name': 'paper',
+            'max_lots_per_order': 100,
+            'priority': index,
+            **allocation,
+            'user_id': BACKTEST_USER,
+            'sort_key': f'BASKET_ALLOCATION#{basket_id}#alloc-{index:03d}',
+            'allocation_id': f'alloc-{index:03d}',
+            'basket_id': basket_id,
+            'entity_type_priority': f'BASKET_ALLOCATION#{index:03d}',
+            'lot_multiplier': float(allocation.get('lot_multiplier', 1)) * lot_multiplier,
+            'status': 'ACTIVE'
+        }))
+    return basket_id
+
+
+def leg_symbol(strategy, leg):
+    if leg.get('symbol'):
+        return leg['symbol']
+    option_type = 'CE' if leg.get('option_type', 'CE').upper() in ('CE', 'CALL') else 'PE'
+    return f"{leg.get('underlying', strategy.get('underlying', 'NIFTY'))}{leg.get('strike', leg.get('strike_price'))}{option_type}"
+
+
+def load_bars(path):
+    """Minute bars grouped by IST timestamp, in time order"""
+    minutes = defaultdict(dict)
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            timestamp = datetime.fromisoformat(row['timestamp'])
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=IST)
+            minutes[timestamp][row['symbol']] = float(row['close'])
+    return sorted(minutes.items())
+
+
+def generate_bars(day, symbols, seed):
+    """Deterministic synthetic session: independent random walks per symbol"""
+    rng = random.Random(f'{seed}:{day}')
+    prices = {symbol: rng.uniform(80, 250) for symbol in symbols}
+    session_open = datetime.combine(date.fromisoformat(day), datetime.min.time(), IST) + timedelta(hours=9, minutes=15)
+    bars = []
+    for minute in range(SESSION_MINUTES):
+        for symbol in symbols:
+            prices[symbol] = max(0.05, round(prices[symbol] * (1 + rng.gauss(0, 0.006)), 2))
+        bars.append((session_open + timedelta(minutes=minute), dict(prices)))
+    return bars
+
+
+def lot_size(underlying):
+    from shared_utils.indian_market_utils import INDIAN_MARKET_CONFIG
+    return INDIAN_MARKET_CONFIG['indices'].get(underlying, {}).get('lot_size', 1)
+
+
+def open_position(strategy, leg, allocation, execution):
+    """Position record in the shape the risk handlers read"""
+    position = {
+        'position_id': f"{allocation.get('allocation_id')}#{leg.get('leg_id')}",
+        'strategy_id': strategy['strategy_id'],
+        'leg': leg,
+        'allocation': allocation,
+        'entry_price': execution['average_price'],
+        'current_price': execution['average_price'],
+        'quantity': execution['filled_quantity'] * lot_size(strategy.get('underlying')),
+        'position_type': 'LONG' if leg.get('action', 'BUY') == 'BUY' else 'SHORT',
+        'stop_loss': leg.get('stop_loss', {}),
+        'target_profit': leg.get('target_profit', {}),
+    }
+    if leg.get('trailing_sl'):
+        # Start the trail from the entry price: an unbounded stop always tightens on the first check
+        position['trailing_sl'] = leg['trailing_sl']
+        position['peak_price'] = position['entry_price']
+        position['current_stop_loss'] = float('-inf') if position['position_type'] == 'LONG' else float('inf')
+    return position
+
+
+def check_exit(position, bar_time):
+    """Run the production risk checks; returns the exit reason or None"""
+    from stop_loss_handler import check_stop_loss_for_position
+    from target_profit_handler import check_target_profit_for_position
+    from trailing_sl_handler import process_trailing_sl
+
+    if check_stop_loss_for_position(position, bar_time).get('triggered'):
+        return 'STOP_LOSS'
+    if check_target_profit_for_position(position, bar_time).get('triggered'):
+        return 'TARGET_PROFIT'
+    if position.get('trailing_sl'):
+        result = process_trailing_sl(position, bar_time, adjustment_enabled=True)
+        if result.get('exit_triggered'):
+            return 'TRAILING_SL'
+        position['peak_price'] = result['peak_price']
+        position['current_stop_loss'] = result['new_sl']
+    return None
+
+
+def run_strategy_day(job):
+    """Backtest one strategy on one day; runs inside a worker process"""
+    from single_strategy_executor import get_complete_strategy_data, query_basket_broker_allocations
+    from trading import MatchingEngine, Tick, TradingMode, set_default_matching_engine
+    from trading.trading_execution_bridge import TradingExecutionBridge
+    from trading.order_throttler import order_legs_for_margin
+
+    config, strategy_config, day, lot_multiplier = job['config'], job['strategy'], job['day'], job['lot_multiplier']
+    symbols = [leg_symbol(strategy_config, leg) for leg in strategy_config['legs']]
+    bars = load_bars(job['bars_path']) if job.get('bars_path') else generate_bars(day, symbols, job.get('seed', 0))
+
+    timings = Counter()
+    exits = Counter()
+    pnl = 0.0
+    orders = 0
+    started = time.perf_counter()
+
+    with mock_aws():
+        table = create_table()
+        basket_id = seed_strategy(table, config, strategy_config, lot_multiplier)
+        timings['setup'] += time.perf_counter() - started
+
+        phase = time.perf_counter()
+        strategy = get_complete_strategy_data(table, BACKTEST_USER, strategy_config['strategy_id'])
+        allocations = query_basket_broker_allocations(table, basket_id)
+        timings['load'] += time.perf_counter() - phase
+        if not strategy or not allocations:
+            return {'day': day, 'strategy_id': strategy_config['strategy_id'], 'lot_multiplier': lot_multiplier,
+                    'error': 'strategy or allocations not found'}
+
+        legs = [{**leg, 'underlying': strategy.get('underlying'), 'symbol': leg_symbol(strategy, leg)}
+                for leg in strategy.get('legs', [])]
+        engine = MatchingEngine()
+        set_default_matching_engine(engine)
+        bridge = TradingExecutionBridge(trading_table_name=os.environ['TRADING_CONFIGURATIONS_TABLE'])
+        positions = []
+        entered = False
+
+        def close(position, reason):
+            nonlocal pnl, orders
+            phase = time.perf_counter()
+            result = bridge.execute_leg_sync(
+                user_id=BACKTEST_USER, strategy_id=strategy['strategy_id'], basket_id=basket_id,
+                leg_data=position['leg'], allocation=position['allocation'],
+                trading_mode=TradingMode.PAPER, execution_type='EXIT'
+            )
+            timings['exit'] += time.perf_counter() - phase
+            orders += result.get('slice_count', 1)
+            exit_price = result.get('average_price') or position['current_price']
+            direction = 1 if position['position_type'] == 'LONG' else -1
+            pnl += (exit_price - position['entry_price']) * position['quantity'] * direction
+            exits[reason] += 1
+
+        for bar_time, closes in bars:
+            phase = time.perf_counter()
+            for symbol, price in closes.items():
+                engine.on_tick(Tick(timestamp=bar_time, symbol=symbol, last_price=price, bid=price, ask=price))
+            timings['market_data'] += time.perf_counter() - phase
+            clock = bar_time.strftime('%H:%M')
+
+            if not entered and clock >= strategy.get('entry_time', '09:15'):
+                entered = True
+                phase = time.perf_counter()
+                entry = bridge.execute_strategy(
+                    user_id=BACKTEST_USER, strategy={**strategy, 'legs': legs},
+                    allocations=allocations, trading_mode=TradingMode.PAPER, execution_type='ENTRY'
+                )
+                timings['entry'] += time.perf_counter() - phase
+                # Leg executions come back in placement order (hedges first)
+                executions = iter(entry['leg_executions'])
+                for allocation in allocations:
+                    for leg in order_legs_for_margin(legs, 'ENTRY'):
+                        execution = next(executions)
+                        orders += execution.get('slice_count', 1)
+                        if execution.get('filled_quantity'):
+                            positions.append(open_position(strategy, leg, allocation, execution))
+                continue
+
+            if not positions:
+                if entered:
+                    break
+                continue
+
+            phase = time.perf_counter()
+            still_open = []
+            for position in positions:
+                position['current_price'] = closes.get(position['leg']['symbol'], position['current_price'])
+                reason = check_exit(position, bar_time)
+                if reason:
+                    close(position, reason)
+                else:
+                    still_open.append(position)
+            positions = still_open
+            timings['risk_checks'] += time.perf_counter() - phase
+
+            if clock >= strategy.get('exit_time', '15:20'):
+                for position in positions:
+                    close(position, 'TIME_EXIT')
+                positions = []
+                break
+
+        for position in positions:
+            close(position, 'SESSION_END')
+        set_default_matching_engine(None)
+
+    return {
+        'day': day,
+        'strategy_id': strategy_config['strategy_id'],
+        'lot_multiplier': lot_multiplier,
+        'pnl': round(pnl, 2),
+        'orders': orders,
+        'exits': dict(exits),
+        'timings_ms': {name: round(seconds * 1000, 3) for name, seconds in timings.items()},
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def init_worker(broker_rate):
+    import logging
+    logging.disable(logging.INFO)
+
+    # Offline runs are not paced by the broker's order-rate limit unless asked to
+    from trading import order_slicer
+    order_slicer.BROKER_ORDERS_PER_SECOND['paper'] = broker_rate
+
+
+def build_jobs(config, args):
+    if args.bars_dir:
+        days = sorted(name[:-4] for name in os.listdir(args.bars_dir) if name.endswith('.csv'))
+    else:
+        first = date.fromisoformat(args.start_date)
+        days = [(first + timedelta(days=offset)).isoformat() for offset in range(args.days)]
+
+    multipliers = [float(m) for m in args.lot_multipliers.split(',')]
+    return [
+        {
+            'config': config, 'strategy': strategy, 'day': day, 'lot_multiplier': multiplier, 'seed': args.seed,
+            'bars_path': os.path.join(args.bars_dir, f'{day}.csv') if args.bars_dir else None
+        }
+        for strategy in config['strategies']
+        for day in days
+        for multiplier in multipliers
+    ]
+
+
+def summarize(results):
+    summary = {}
+    for multiplier in sorted({r['lot_multiplier'] for r in results}):
+        runs = [r for r in results if r['lot_multiplier'] == multiplier and 'error' not in r]
+        pnls = [r['pnl'] for r in runs]
+        exits = Counter()
+        for r in runs:
+            exits.update(r['exits'])
+        summary[multiplier] = {
+            'strategy_days': len(runs),
+            'total_pnl': round(sum(pnls), 2),
+            'avg_pnl': round(statistics.mean(pnls), 2) if pnls else 0,
+            'win_rate_pct': round(100 * sum(1 for p in pnls if p > 0) / len(pnls), 1) if pnls else 0,
+            'worst_day': min(pnls) if pnls else 0,
+            'orders': sum(r['orders'] for r in runs),
+            'exits': dict(exits)
+        }
+    return summary
+
+
+def phase_timings(results):
+    phases = defaultdict(list)
+    for r in results:
+        for name, ms in r.get('timings_ms', {}).items():
+            phases[name].append(ms)
+        if 'duration_ms' in r:
+            phases['strategy_day'].append(r['duration_ms'])
+    return {
+        name: {
+            'avg_ms': round(statistics.mean(values), 3),
+            'p95_ms': round(sorted(values)[min(len(values) - 1, int(len(values) * 0.95))], 3),
+            'total_s': round(sum(values) / 1000, 2)
+        }
+        for name, values in phases.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Historical strategy backtester',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--config', required=True, help='Basket/strategy config JSON')
+    parser.add_argument('--bars-dir', help='Directory of YYYY-MM-DD.csv minute bar files')
+    parser.add_argument('--days', type=int, default=250, help='Synthetic days without --bars-dir (default: 250)')
+    parser.add_argument('--start-date', default='2025-01-01', help='First synthetic day (default: 2025-01-01)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic bar seed (default: 42)')
+    parser.add_argument('--lot-multipliers', default='1', help='Comma-separated multipliers to sweep (default: 1)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: CPU count)')
+    parser.add_argument('--broker-rate', type=float, default=0,
+                        help='Paper broker orders/sec per worker (default: 0 = unpaced)')
+    parser.add_argument('--output', help='Write per strategy-day results to this JSON file')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    jobs = build_jobs(config, args)
+    print(f"🚀 Backtesting {len(jobs)} strategy-days across {args.workers} workers")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.broker_rate,)) as pool:
+        results = list(pool.map(run_strategy_day, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))))
+    elapsed = time.perf_counter() - started
+
+    errors = [r for r in results if 'error' in r]
+    print("\n" + "=" * 80)
+    print(f"{'multiplier':<12}{'days':>7}{'total pnl':>14}{'avg pnl':>11}{'win %':>8}{'worst day':>12}{'orders':>9}")
+    print("=" * 80)
+    for multiplier, s in summarize(results).items():
+        print(f"{multiplier:<12}{s['strategy_days']:>7}{s['total_pnl']:>14}{s['avg_pnl']:>11}"
+              f"{s['win_rate_pct']:>8}{s['worst_day']:>12}{s['orders']:>9}   {s['exits']}")
+    print("=" * 80)
+    print(f"{'phase':<16}{'avg ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for name, t in sorted(phase_timings(results).items(), key=lambda item: -item[1]['total_s']):
+        print(f"{name:<16}{t['avg_ms']:>10}{t['p95_ms']:>10}{t['total_s']:>10}")
+    print("=" * 80)
+    print(f"⏱️  {len(results)} strategy-days in {round(elapsed, 2)}s "
+          f"({round(len(results) / elapsed, 1)} strategy-days/sec)")
+    if errors:
+        print(f"❌ {len(errors)} strategy-days failed: {errors[0]['error']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
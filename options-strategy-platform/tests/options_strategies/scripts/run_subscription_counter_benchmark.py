@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Subscription counter concurrency benchmark
+
+Replays a partner-campaign subscription burst on one popular template against a moto
+DynamoDB table from a thread pool and compares:
+1. Legacy counters - ADD on the template item and partner key item per subscription
+2. Sharded counters - ADD on a random shard per subscription (sharded_counters)
+
+moto does not throttle, so every write is recorded with its partition key and the
+burst is replayed against DynamoDB's per-partition limit of 1,000 write units per
+second to estimate the throttling rate of each scheme.
+
+Examples:
+  python run_subscription_counter_benchmark.py                          # 5k subscriptions in 2s
+  python run_subscription_counter_benchmark.py --subscriptions 20000 --burst-seconds 5 --workers 32
+"""
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('REGION', 'ap-south-1')
+os.environ.setdefault('TRADING_CONFIGURATIONS_TABLE', 'benchmark-trading-configurations')
+
+import boto3
+from moto import mock_aws
+
+# DynamoDB per-partition write ceiling (WCU per second)
+PARTITION_WRITE_LIMIT = 1000
+
+
+class RecordingTable:
+    """
+    Table proxy that records the partition key of every update_item
+
+    moto's in-memory backend is not thread-safe when concurrent writes create the
+    same item, so calls are serialised here; the partition counts are unaffected.
+    """
+
+    def __init__(self, table):
+        self._table = table
+        self._lock = threading.Lock()
+        self.partition_writes = Counter()
+
+    def update_item(self, **kwargs):
+        with self._lock:
+            self.partition_writes[kwargs['Key']['user_id']] += 1
+            return self._table.update_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+
+def create_table():
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+    table = dynamodb.create_table(
+        TableName=os.environ['TRADING_CONFIGURATIONS_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.put_item(Item={
+        'user_id': 'admin-001', 'sort_key': 'BASKET#template-hot',
+        'basket_id': 'template-hot', 'subscriber_count': Decimal(0)
+    })
+    table.put_item(Item={
+        'user_id': 'PARTNER', 'sort_key': 'PARTNER_API_KEY#key-campaign',
+        'metrics': {'total_subscriptions': 0, 'active_users': 0}
+    })
+    return table
+
+
+def legacy_subscription(table):
+    table.update_item(
+        Key={'user_id': 'admin-001', 'sort_key': 'BASKET#template-hot'},
+        UpdateExpression='ADD subscriber_count :inc',
+        ExpressionAttributeValues={':inc': 1}
+    )
+    table.update_item(
+        Key={'user_id': 'PARTNER', 'sort_key': 'PARTNER_API_KEY#key-campaign'},
+        UpdateExpression='ADD #metrics.total_subscriptions :inc, #metrics.active_users :inc',
+        ExpressionAttributeNames={'#metrics': 'metrics'},
+        ExpressionAttributeValues={':inc': 1}
+    )
+
+
+def sharded_subscription(table):
+    from subscription_manager import increment_template_subscriber_count, update_partner_metrics
+
+    increment_template_subscriber_count('template-hot', 'admin-001', table)
+    update_partner_metrics('key-campaign', table)
+
+
+def throttle_estimate(partition_writes, burst_seconds):
+    """Fraction of writes above the per-partition ceiling for a burst of burst_seconds"""
+    total = sum(partition_writes.values())
+    allowed = sum(min(count, PARTITION_WRITE_LIMIT * burst_seconds) for count in partition_writes.values())
+    return total, (total - allowed) / total if total else 0.0
+
+
+def run_scheme(name, subscribe, subscriptions, workers, burst_seconds):
+    with mock_aws():
+        table = RecordingTable(create_table())
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: subscribe(table), range(subscriptions)))
+        elapsed = time.perf_counter() - start
+
+        if subscribe is sharded_subscription:
+            from subscription_manager import compact_subscription_counters
+            compact_subscription_counters(table._table)
+
+        final_count = table._table.get_item(
+            Key={'user_id': 'admin-001', 'sort_key': 'BASKET#template-hot'}
+        )['Item']['subscriber_count']
+
+    total, throttled = throttle_estimate(table.partition_writes, burst_seconds)
+    hottest = max(table.partition_writes.values())
+    return {
+        'scheme': name,
+        'writes': total,
+        'partitions': len(table.partition_writes),
+        'hottest_partition_wps': round(hottest / burst_seconds),
+        'throttled_pct': round(throttled * 100, 2),
+        'final_subscriber_count': int(final_count),
+        'elapsed_s': round(elapsed, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Subscription counter concurrency benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--subscriptions', type=int, default=5000,
+                        help='Subscriptions in the burst (default: 5000)')
+    parser.add_argument('--burst-seconds', type=int, default=2,
+                        help='Duration of the modelled burst in seconds (default: 2)')
+    parser.add_argument('--workers', type=int, default=16,
+                        help='Concurrent writer threads (default: 16)')
+    args = parser.parse_args()
+
+    print(f"🚀 {args.subscriptions} subscriptions over {args.burst_seconds}s, {args.workers} writers")
+    results = [
+        run_scheme('legacy', legacy_subscription, args.subscriptions, args.workers, args.burst_seconds),
+        run_scheme('sharded', sharded_subscription, args.subscriptions, args.workers, args.burst_seconds)
+    ]
+
+    print("\n" + "=" * 80)
+    print(f"{'scheme':<10}{'writes':>8}{'partitions':>12}{'hot wps':>10}{'throttled':>11}{'count':>8}{'elapsed':>10}")
+    print("=" * 80)
+    for r in results:
+        print(f"{r['scheme']:<10}{r['writes']:>8}{r['partitions']:>12}{r['hottest_partition_wps']:>10}"
+              f"{r['throttled_pct']:>10}%{r['final_subscriber_count']:>8}{r['elapsed_s']:>9}s")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
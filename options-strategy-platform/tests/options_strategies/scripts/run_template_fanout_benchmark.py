@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Template fan-out benchmark
+
+Seeds one marketplace template with N subscribers in a moto DynamoDB table and reports:
+1. Per-subscriber path - strategy load + allocation lookup per subscriber (legacy shape)
+2. Template fan-out - one strategy load, paged subscribers, parallel dispatch
+
+Legs execute in simulation mode, so the numbers isolate discovery/dispatch overhead.
+
+Examples:
+  python run_template_fanout_benchmark.py                                # 2000 subscribers
+  python run_template_fanout_benchmark.py --subscribers 5000 --workers 64 --page-size 500
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('REGION', 'ap-south-1')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ.setdefault('TRADING_CONFIGURATIONS_TABLE', 'benchmark-trading-configurations')
+os.environ.setdefault('EXECUTION_HISTORY_TABLE', 'benchmark-execution-history')
+
+import boto3
+from moto import mock_aws
+
+TEMPLATE_ID = 'template-hot'
+IST_TIME = datetime(2025, 10, 10, 9, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+
+
+def create_tables():
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ['REGION'])
+    table = dynamodb.create_table(
+        TableName=os.environ['TRADING_CONFIGURATIONS_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+            {'AttributeName': 'basket_id', 'AttributeType': 'S'},
+            {'AttributeName': 'entity_type_priority', 'AttributeType': 'S'},
+            {'AttributeName': 'template_basket_id', 'AttributeType': 'S'},
+            {'AttributeName': 'subscription_status_date', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'AllocationsByBasket',
+                'KeySchema': [
+                    {'AttributeName': 'basket_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'entity_type_priority', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'TemplateSubscribers',
+                'KeySchema': [
+                    {'AttributeName': 'template_basket_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'subscription_status_date', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    execution_table = dynamodb.create_table(
+        TableName=os.environ['EXECUTION_HISTORY_TABLE'],
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'execution_key', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return table, execution_table
+
+
+def seed(table, subscribers):
+    with table.batch_writer() as batch:
+        batch.put_item(Item={
+            'user_id': 'admin-001', 'sort_key': 'STRATEGY#strategy-001', 'strategy_id': 'strategy-001',
+            'strategy_name': 'Weekly Iron Condor', 'basket_id': TEMPLATE_ID, 'underlying': 'NIFTY',
+            'strategy_type': 'IRON_CONDOR', 'status': 'ACTIVE',
+            'legs': [
+                {'leg_id': f'leg-{i}', 'option_type': 'CALL' if i % 2 else 'PUT', 'action': 'SELL',
+                 'strike': 25000 + 100 * i, 'lots': 1}
+                for i in range(4)
+            ]
+        })
+        for i in range(subscribers):
+            user_id = f'user-{i:05d}'
+            batch.put_item(Item={
+                'user_id': user_id, 'sort_key': f'SUBSCRIPTION#sub-{i:05d}', 'subscription_id': f'sub-{i:05d}',
+                'template_basket_id': TEMPLATE_ID, 'subscription_status_date': 'ACTIVE#2025-10-01', 'status': 'ACTIVE'
+            })
+            batch.put_item(Item={
+                'user_id': user_id, 'sort_key': f'BROKER_ALLOCATION#{TEMPLATE_ID}#alloc-{i:05d}',
+                'allocation_id': f'alloc-{i:05d}', 'basket_id': TEMPLATE_ID, 'client_id': f'ZEBU{i:05d}',
+                'broker_id': 'zebu', 'lot_multiplier': Decimal('1'), 'entity_type_priority': 'BROKER_ALLOCATION#001'
+            })
+
+
+def per_subscriber_path(table, subscribers):
+    """One strategy load and one allocation query per subscriber, as per-user discovery does"""
+    from single_strategy_executor import get_complete_strategy_data
+
+    start = time.perf_counter()
+    for i in range(subscribers):
+        get_complete_strategy_data(table, 'admin-001', 'strategy-001')
+        table.query(
+            KeyConditionExpression='user_id = :user_id AND begins_with(sort_key, :prefix)',
+            ExpressionAttributeValues={':user_id': f'user-{i:05d}', ':prefix': f'BROKER_ALLOCATION#{TEMPLATE_ID}#'}
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Template fan-out benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--subscribers', type=int, default=2000, help='Template subscribers (default: 2000)')
+    parser.add_argument('--page-size', type=int, default=250, help='Subscribers per page (default: 250)')
+    parser.add_argument('--workers', type=int, default=32, help='Dispatch threads (default: 32)')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    import single_strategy_executor
+    from single_strategy_executor import get_complete_strategy_data
+    from template_fanout_executor import fan_out_template_strategy
+    single_strategy_executor.TRADING_AVAILABLE = False
+
+    with mock_aws():
+        table, execution_table = create_tables()
+        print(f"📦 Seeding template with {args.subscribers} subscribers...")
+        seed(table, args.subscribers)
+
+        legacy_seconds = per_subscriber_path(table, args.subscribers)
+
+        start = time.perf_counter()
+        strategy = get_complete_strategy_data(table, 'admin-001', 'strategy-001')
+        stats = fan_out_template_strategy(
+            table=table, execution_table=execution_table, strategy=strategy, template_id=TEMPLATE_ID,
+            execution_time='09:30', execution_type='ENTRY', ist_time=IST_TIME,
+            page_size=args.page_size, max_workers=args.workers
+        )
+        fanout_seconds = time.perf_counter() - start
+
+    print("\n" + "=" * 80)
+    print(f"Per-subscriber discovery only:  {round(legacy_seconds * 1000, 2)}ms "
+          f"({args.subscribers * 2} queries, no orders placed)")
+    print(f"Template fan-out end to end:    {round(fanout_seconds * 1000, 2)}ms "
+          f"(1 strategy load, {stats['pages']} subscriber pages)")
+    print(f"   Allocations dispatched:      {stats['allocations_dispatched']}")
+    print(f"   Orders placed:               {stats['orders_placed']} ({stats['orders_failed']} failed)")
+    print(f"   Fan-out latency:             {stats['fanout_latency_ms']}ms")
+    print(f"   Orders/sec:                  {stats['orders_per_second']}")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
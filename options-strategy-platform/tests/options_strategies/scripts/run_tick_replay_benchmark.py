@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tick replay lag benchmark
+
+Replays an expiry-day tick stream through the paper matching engine at a multiple of
+real time while an executor-style consumer sends order bursts through
+TradingExecutionBridge, and reports:
+1. Replay lag - how far tick delivery fell behind the scaled schedule
+2. Fill latency - replay-clock time from order arrival to fill
+3. Throughput - orders and fills per wall-clock second
+
+Without --tick-file a deterministic NIFTY/BANKNIFTY session is generated
+(seeded random walk, one tick per instrument per second).
+
+Examples:
+  python run_tick_replay_benchmark.py                                  # 15 minutes at 100x
+  python run_tick_replay_benchmark.py --minutes 375 --speed 50 --orders-per-burst 40
+  python run_tick_replay_benchmark.py --broker-rate 0                  # engine only, no broker pacing
+  python run_tick_replay_benchmark.py --tick-file nifty_expiry.csv --tick-file banknifty_expiry.csv --speed 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', 'lambda_functions', 'option_baskets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+
+SESSION_OPEN = datetime(2025, 10, 16, 3, 45, tzinfo=timezone.utc)  # 09:15 IST
+INSTRUMENTS = {
+    # symbol: (underlying, strike, starting premium)
+    'NIFTY16OCT2525000CE': ('NIFTY', 25000, 120.0),
+    'BANKNIFTY16OCT2556000PE': ('BANKNIFTY', 56000, 240.0),
+}
+
+
+def generate_ticks(minutes, seed):
+    from trading import Tick
+
+    rng = random.Random(seed)
+    prices = {symbol: premium for symbol, (_, _, premium) in INSTRUMENTS.items()}
+    ticks = []
+    for second in range(minutes * 60):
+        timestamp = SESSION_OPEN + timedelta(seconds=second)
+        for symbol in INSTRUMENTS:
+            prices[symbol] = max(0.05, round(prices[symbol] * (1 + rng.gauss(0, 0.002)), 2))
+            spread = max(0.05, round(prices[symbol] * 0.001, 2))
+            ticks.append(Tick(
+                timestamp=timestamp, symbol=symbol, last_price=prices[symbol],
+                bid=round(prices[symbol] - spread, 2), ask=round(prices[symbol] + spread, 2),
+                bid_quantity=rng.randint(50, 500), ask_quantity=rng.randint(50, 500)
+            ))
+    return ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Tick replay lag benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--tick-file', action='append', help='Recorded CSV/JSONL tick file (repeatable)')
+    parser.add_argument('--minutes', type=int, default=15, help='Generated session length (default: 15)')
+    parser.add_argument('--speed', type=float, default=100, help='Replay multiplier (default: 100)')
+    parser.add_argument('--fill-latency-ms', type=float, default=250,
+                        help='Exchange round trip on the replay clock (default: 250)')
+    parser.add_argument('--burst-every-seconds', type=int, default=30,
+                        help='Replay seconds between order bursts (default: 30)')
+    parser.add_argument('--orders-per-burst', type=int, default=20, help='Legs per burst (default: 20)')
+    parser.add_argument('--broker-rate', type=float,
+                        help='Override the paper broker order rate limit (0 = unpaced)')
+    parser.add_argument('--seed', type=int, default=7, help='Generated session seed (default: 7)')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    from trading import MatchingEngine, TickReplayer, TradingMode, load_ticks, set_default_matching_engine
+    from trading import order_slicer
+    from trading.trading_execution_bridge import TradingExecutionBridge
+
+    ticks = load_ticks(args.tick_file) if args.tick_file else generate_ticks(args.minutes, args.seed)
+    symbols = sorted({t.symbol for t in ticks})
+    print(f"📈 {len(ticks)} ticks for {', '.join(symbols)} at {args.speed}x, "
+          f"{args.orders_per_burst} legs every {args.burst_every_seconds}s")
+
+    if args.broker_rate is not None:
+        order_slicer.BROKER_ORDERS_PER_SECOND['paper'] = args.broker_rate
+
+    engine = MatchingEngine(fill_latency_ms=args.fill_latency_ms)
+    set_default_matching_engine(engine)
+    bridge = TradingExecutionBridge(trading_table_name='')
+
+    first_tick = ticks[0].timestamp
+    next_burst = 0
+    orders = 0
+    consumer_seconds = 0.0
+
+    def on_tick(tick, fills):
+        nonlocal next_burst, orders, consumer_seconds
+        elapsed = (tick.timestamp - first_tick).total_seconds()
+        if elapsed < next_burst:
+            return
+        next_burst += args.burst_every_seconds
+
+        started = time.perf_counter()
+        for i in range(args.orders_per_burst):
+            symbol = symbols[i % len(symbols)]
+            underlying, strike, _ = INSTRUMENTS.get(symbol, (symbol, '', 0))
+            bridge.execute_leg_sync(
+                user_id=f'user-{i:03d}', strategy_id='strategy-001', basket_id='basket-001',
+                leg_data={'symbol': symbol, 'underlying': underlying, 'strike': strike,
+                          'action': 'SELL' if i % 2 else 'BUY', 'lots': 1 + i % 5},
+                allocation={'broker_name': 'paper', 'client_id': 'PAPER001', 'lot_multiplier': 1},
+                trading_mode=TradingMode.PAPER
+            )
+        orders += args.orders_per_burst
+        consumer_seconds += time.perf_counter() - started
+
+    replay = TickReplayer(engine, ticks, speed=args.speed).replay(on_tick=on_tick)
+    fills = engine.stats()
+    set_default_matching_engine(None)
+
+    print("\n" + "=" * 80)
+    print(f"Replayed {replay['simulated_seconds']:.0f}s of market in {replay['wall_seconds']}s "
+          f"({replay['effective_speed']}x effective)")
+    print(f"   Replay lag:         max {replay['max_behind_ms']}ms, avg {replay['avg_behind_ms']}ms per tick")
+    print(f"   Consumer time:      {round(consumer_seconds * 1000, 2)}ms for {orders} legs "
+          f"({round(consumer_seconds * 1000 / orders, 3) if orders else 0}ms/leg)")
+    print(f"   Fills:              {fills['fills']} ({fills['open_orders']} orders still open)")
+    print(f"   Fill latency:       avg {fills['avg_fill_latency_ms']}ms, p95 {fills['p95_fill_latency_ms']}ms, "
+          f"max {fills['max_fill_latency_ms']}ms (replay clock)")
+    print(f"   Orders/sec (wall):  {round(orders / replay['wall_seconds'], 1) if replay['wall_seconds'] else 0}")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Portfolio VaR latency benchmark
+
+Runs Monte Carlo VaR over a random option book spread across NIFTY, BANKNIFTY,
+FINNIFTY and SENSEX and reports wall time against the risk tick budget, plus
+peak RSS for sizing the Lambda.
+
+Examples:
+  python run_var_benchmark.py                                # 300 positions, 10k paths
+  python run_var_benchmark.py --positions 1000 --paths 20000 --chunk-size 1000
+  python run_var_benchmark.py --horizon-days 5 --seed 42
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..', '..', '..', '..'))
+
+MARKET = {
+    'NIFTY': {'spot': 25000, 'volatility': 0.13, 'strike_step': 50, 'lot_size': 75},
+    'BANKNIFTY': {'spot': 56000, 'volatility': 0.16, 'strike_step': 100, 'lot_size': 35},
+    'FINNIFTY': {'spot': 26500, 'volatility': 0.15, 'strike_step': 50, 'lot_size': 65},
+    'SENSEX': {'spot': 82000, 'volatility': 0.13, 'strike_step': 100, 'lot_size': 20},
+}
+
+
+def generate_positions(count, seed):
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        underlying = rng.choice(list(MARKET))
+        quote = MARKET[underlying]
+        atm = round(quote['spot'] / quote['strike_step']) * quote['strike_step']
+        positions.append({
+            'underlying': underlying,
+            'strike': atm + quote['strike_step'] * rng.randint(-20, 20),
+            'option_type': rng.choice(['CE', 'PE']),
+            'transaction_type': rng.choice(['BUY', 'SELL']),
+            'quantity': quote['lot_size'] * rng.randint(1, 4),
+            'days_to_expiry': rng.choice([1, 3, 8, 31])
+        })
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Portfolio VaR latency benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--positions', type=int, default=300, help='Open positions (default: 300)')
+    parser.add_argument('--paths', type=int, default=10000, help='Monte Carlo paths (default: 10000)')
+    parser.add_argument('--horizon-days', type=int, default=1, help='VaR horizon (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='Paths per NumPy pass (default: 2000)')
+    parser.add_argument('--tick-seconds', type=float, default=60, help='Risk tick budget (default: 60)')
+    parser.add_argument('--seed', type=int, default=7, help='Book and path seed (default: 7)')
+    args = parser.parse_args()
+
+    from shared_utils.var_engine import VaREngine
+
+    positions = generate_positions(args.positions, args.seed)
+    market = {u: {'spot': q['spot'], 'volatility': q['volatility']} for u, q in MARKET.items()}
+    print(f"📊 {len(positions)} positions across {', '.join(MARKET)}, {args.paths} paths, "
+          f"{args.horizon_days}-day horizon")
+
+    engine = VaREngine(path_chunk_size=args.chunk_size)
+    started = time.perf_counter()
+    result = engine.monte_carlo_var(positions, market, paths=args.paths,
+                                    horizon_days=args.horizon_days, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "=" * 80)
+    print(f"⚡ {round(elapsed * 1000, 1)}ms for {result['paths']} paths x {result['instruments']} instruments "
+          f"({round(100 * elapsed / args.tick_seconds, 2)}% of the {args.tick_seconds:.0f}s tick)")
+    print(f"   VaR 95%: ₹{result['var_95']:,.0f}   ES 95%: ₹{result['expected_shortfall_95']:,.0f}")
+    print(f"   VaR 99%: ₹{result['var_99']:,.0f}   ES 99%: ₹{result['expected_shortfall_99']:,.0f}")
+    # ru_maxrss is KB on Linux
+    print(f"   Peak RSS: {round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)} MB")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Test cases for the batch strategy launcher
+Covers per-minute grouping, identifier-only Map input and the scheduler's batch mode
+"""
+import unittest
+import json
+import os
+import re
+import sys
+from unittest.mock import patch, MagicMock
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+import schedule_strategy_trigger
+import step_function_launcher
+import strategy_scheduler
+
+BATCH_ARN = 'arn:aws:states:ap-south-1:123456789012:stateMachine:batch-strategy-executor'
+DEFINITION_PATH = os.path.join(os.path.dirname(__file__), '../../../../step_functions/batch_strategy_executor_definition.json')
+
+
+def strategy(strategy_id, execution_time, **extra):
+    return dict({'user_id': 'user-001', 'strategy_id': strategy_id, 'execution_time': execution_time,
+                 'weekday': 'MON', 'execution_type': 'ENTRY'}, **extra)
+
+
+class TestBatchStrategyLauncher(unittest.TestCase):
+    """One Map-state execution per execution minute instead of one per strategy"""
+
+    def setUp(self):
+        self.stepfunctions = MagicMock()
+        self.stepfunctions.start_execution.return_value = {'executionArn': 'arn:execution'}
+        patch.object(step_function_launcher, 'stepfunctions', self.stepfunctions).start()
+        patch.object(step_function_launcher, 'calculate_dynamic_wait_seconds', return_value=42).start()
+        patch.dict(os.environ, {'BATCH_STRATEGY_STEP_FUNCTION_ARN': BATCH_ARN}).start()
+        self.addCleanup(patch.stopall)
+
+    def inputs(self):
+        return [json.loads(call.kwargs['input']) for call in self.stepfunctions.start_execution.call_args_list]
+
+    def test_strategies_are_grouped_by_minute_and_chunked(self):
+        """Each minute gets its own batch; big minutes are split at MAX_STRATEGIES_PER_BATCH"""
+        strategies = [strategy(f's{i}', '09:20') for i in range(5)] + [strategy('late', '09:21')]
+
+        with patch.object(step_function_launcher, 'MAX_STRATEGIES_PER_BATCH', 2):
+            groups = step_function_launcher.group_strategies_by_execution_time(strategies)
+
+        self.assertEqual(list(groups), ['09:20', '09:21'])
+        self.assertEqual([len(chunk) for chunk in groups['09:20']], [2, 2, 1])
+
+    def test_batch_input_carries_only_identifiers(self):
+        """Heavy strategy data never reaches the execution input; weekday and concurrency do"""
+        result = step_function_launcher.launch_strategy_batches(
+            [strategy('s1', '09:20', strategy_data={'legs': ['...']}, bundle_version=3), strategy('s2', '09:20')],
+            weekday='MON', market_phase='MARKET_OPEN', batch_id_prefix='test'
+        )
+
+        self.assertEqual(result['launched'], 2)
+        self.assertEqual(self.stepfunctions.start_execution.call_count, 1)
+        step_input = self.inputs()[0]
+        self.assertEqual(step_input['weekday'], 'MON')
+        self.assertEqual(step_input['wait_seconds'], 42)
+        self.assertEqual(step_input['max_concurrency'], step_function_launcher.BATCH_MAP_MAX_CONCURRENCY)
+        self.assertEqual(step_input['strategies'][0], {
+            'user_id': 'user-001', 'strategy_id': 's1', 'execution_time': '09:20',
+            'weekday': 'MON', 'execution_type': 'ENTRY', 'bundle_version': 3
+        })
+
+        name = self.stepfunctions.start_execution.call_args.kwargs['name']
+        self.assertRegex(name, r'^[A-Za-z0-9_-]{1,80}$')
+
+    def test_failed_launch_counts_the_whole_batch(self):
+        """A rejected StartExecution fails every strategy of that batch"""
+        from botocore.exceptions import ClientError
+        self.stepfunctions.start_execution.side_effect = ClientError(
+            {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'StartExecution')
+
+        result = step_function_launcher.launch_strategy_batches(
+            [strategy('s1', '09:20'), strategy('s2', '09:20')], 'MON', 'MARKET_OPEN', 'test')
+
+        self.assertEqual((result['launched'], result['failed']), (0, 2))
+
+    def test_scheduler_launches_one_execution_per_minute(self):
+        """Three SQS records over two minutes start two batch executions"""
+        records = [{'body': json.dumps(strategy(sid, minute))}
+                   for sid, minute in (('s1', '09:20'), ('s2', '09:20'), ('s3', '09:21'))]
+
+        with patch.object(strategy_scheduler, 'hydrate_execution_bundle', return_value=None), \
+                patch.object(strategy_scheduler, 'stepfunctions') as single_launcher:
+            response = strategy_scheduler.lambda_handler({'Records': records}, None)
+
+        single_launcher.start_execution.assert_not_called()
+        self.assertEqual(response['body']['batch_executions'], 2)
+        self.assertEqual(response['body']['successful_launches'], 3)
+        self.assertEqual([[s['strategy_id'] for s in i['strategies']] for i in self.inputs()], [['s1', 's2'], ['s3']])
+
+    def test_grouped_minute_messages_are_expanded(self):
+        """A per-minute message from the trigger launches its strategies alongside single-strategy records"""
+        minute_message = {'user_id': 'user-001', 'execution_time': '09:20', 'weekday': 'MON',
+                          'strategies': [{'strategy_id': 's1', 'execution_type': 'ENTRY'},
+                                         {'strategy_id': 's2', 'execution_type': 'EXIT'}]}
+        records = [{'body': json.dumps(minute_message)}, {'body': json.dumps(strategy('s3', '09:20'))}]
+
+        with patch.object(strategy_scheduler, 'hydrate_execution_bundle', return_value=None):
+            response = strategy_scheduler.lambda_handler({'Records': records}, None)
+
+        self.assertEqual(response['body']['batch_executions'], 1)
+        launched = self.inputs()[0]['strategies']
+        self.assertEqual([(s['strategy_id'], s['execution_type']) for s in launched],
+                         [('s1', 'ENTRY'), ('s2', 'EXIT'), ('s3', 'ENTRY')])
+
+    def test_trigger_sends_one_message_per_minute(self):
+        """Discovery groups the lookahead window by minute before it reaches SQS"""
+        planned = [dict(strategy(sid, minute), scheduled_execution_time=minute)
+                   for sid, minute in (('s1', '09:20'), ('s2', '09:20'), ('s3', '09:21'))]
+        sqs = MagicMock()
+        sqs.send_message.return_value = {'MessageId': 'm-1'}
+        event = {'detail': {'user_id': 'user-001', 'weekday': 'MON', 'market_phase': 'MARKET_OPEN',
+                            'trigger_time_ist': '2025-10-13T09:19:00', 'event_id': 'e-1'}}
+
+        with patch.object(schedule_strategy_trigger, 'discover_planned_strategies', return_value=planned), \
+                patch.object(schedule_strategy_trigger, 'sqs_client', sqs), \
+                patch.object(schedule_strategy_trigger, 'dynamodb'), \
+                patch.dict(os.environ, {'SINGLE_STRATEGY_QUEUE_URL': 'https://sqs/queue'}):
+            body = json.loads(schedule_strategy_trigger.lambda_handler(event, None)['body'])
+
+        self.assertEqual(body['strategies_processed'], 3)
+        messages = [json.loads(call.kwargs['MessageBody']) for call in sqs.send_message.call_args_list]
+        self.assertEqual([(m['execution_time'], [s['strategy_id'] for s in m['strategies']]) for m in messages],
+                         [('09:20', ['s1', 's2']), ('09:21', ['s3'])])
+
+    def test_definition_fans_out_with_distributed_map(self):
+        """The state machine waits, then runs a distributed Map bounded by the input's max_concurrency"""
+        with open(DEFINITION_PATH) as f:
+            definition = json.load(f)
+
+        self.assertEqual(definition['States']['WaitForExecutionMinute']['SecondsPath'], '$.wait_seconds')
+        fan_out = definition['States']['ExecuteStrategies']
+        self.assertEqual(fan_out['ItemsPath'], '$.strategies')
+        self.assertEqual(fan_out['MaxConcurrencyPath'], '$.max_concurrency')
+        self.assertEqual(fan_out['ItemProcessor']['ProcessorConfig']['Mode'], 'DISTRIBUTED')
+        self.assertTrue(re.search(r'\$\{SingleStrategyExecutorArn\}', json.dumps(fan_out)))
+        # Executor results are discarded, so a payload without statusCode cannot fail the item
+        task = fan_out['ItemProcessor']['States']['ExecuteStrategy']
+        self.assertNotIn('ResultSelector', task)
+        self.assertIsNone(task['ResultPath'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Test cases for prefetched execution bundles
+Covers hydration by the strategy scheduler, the executor's single versioned read and invalidation on changes
+"""
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+os.environ['SINGLE_STRATEGY_STEP_FUNCTION_ARN'] = 'arn:aws:states:ap-south-1:123456789012:stateMachine:single'
+
+import strategy_scheduler
+import single_strategy_executor
+import strategy_manager_phase1
+import basket_broker_allocator_phase1
+from execution_bundle import get_execution_bundle, bundle_sort_key
+
+USER_ID = 'user-001'
+
+
+@mock_aws
+class TestExecutionBundle(unittest.TestCase):
+    """The executor reads one prefetched bundle at the minute boundary while it is current"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                {'AttributeName': 'basket_id', 'AttributeType': 'S'},
+                {'AttributeName': 'entity_type_priority', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'AllocationsByBasket',
+                'KeySchema': [
+                    {'AttributeName': 'basket_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'entity_type_priority', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        strategy_scheduler.dynamodb = dynamodb
+        single_strategy_executor.dynamodb = dynamodb
+        self.stepfunctions = MagicMock()
+        self.stepfunctions.start_execution.return_value = {'executionArn': 'arn:execution'}
+        patch.object(strategy_scheduler, 'stepfunctions', self.stepfunctions).start()
+        self.addCleanup(patch.stopall)
+
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': 'STRATEGY#strategy-001',
+            'strategy_id': 'strategy-001',
+            'strategy_name': 'Iron Condor',
+            'basket_id': 'basket-001',
+            'status': 'ACTIVE',
+            'underlying': 'NIFTY',
+            'legs': [{'leg_id': 'leg-1', 'option_type': 'CALL', 'action': 'SELL', 'lots': 1}]
+        })
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': 'BASKET_ALLOCATION#alloc-1',
+            'basket_id': 'basket-001',
+            'entity_type_priority': 'BASKET_ALLOCATION#01#alloc-1',
+            'allocation_id': 'alloc-1',
+            'broker_name': 'paper',
+            'client_id': 'PAPER01',
+            'lot_multiplier': 2,
+            'priority': 1,
+            'status': 'ACTIVE'
+        })
+
+    def schedule(self):
+        message = {'user_id': USER_ID, 'strategy_id': 'strategy-001', 'execution_time': '09:20',
+                   'weekday': 'MON', 'execution_type': 'ENTRY'}
+        strategy_scheduler.lambda_handler({'Records': [{'body': json.dumps(message)}]}, None)
+        return json.loads(self.stepfunctions.start_execution.call_args.kwargs['input'])
+
+    def bundle(self):
+        return get_execution_bundle(self.table, USER_ID, 'strategy-001', '09:20', 'ENTRY')
+
+    def test_scheduler_hydrates_bundle_before_the_wait(self):
+        """The Step Function input carries the bundle version instead of a just-in-time flag"""
+        step_input = self.schedule()
+
+        self.assertEqual(step_input['bundle_version'], 0)
+        self.assertFalse(step_input['load_strategy_at_runtime'])
+        bundle = self.bundle()
+        self.assertEqual(bundle['strategy']['strategy_name'], 'Iron Condor')
+        self.assertEqual([a['allocation_id'] for a in bundle['allocations']], ['alloc-1'])
+
+    def test_executor_uses_bundle_without_resolving(self):
+        """With a current bundle the executor skips the strategy and allocation queries"""
+        step_input = self.schedule()
+
+        with patch.object(single_strategy_executor, 'get_complete_strategy_data') as load_strategy, \
+                patch.object(single_strategy_executor, 'query_basket_broker_allocations') as load_allocations, \
+                patch.object(single_strategy_executor, 'execute_single_strategy_with_broker_allocations',
+                             return_value={'status': 'success'}) as execute:
+            single_strategy_executor.lambda_handler(step_input, None)
+
+        load_strategy.assert_not_called()
+        load_allocations.assert_not_called()
+        self.assertEqual(execute.call_args.kwargs['strategy']['strategy_name'], 'Iron Condor')
+        self.assertEqual(execute.call_args.kwargs['broker_allocations'][0]['lot_multiplier'], 2)
+
+    def test_strategy_change_makes_bundle_stale(self):
+        """Updating or deleting a strategy bumps the version; the executor reloads just in time"""
+        self.schedule()
+        strategy_manager_phase1.invalidate_user_execution_bundles(USER_ID, self.table)
+
+        self.assertIsNone(self.bundle())
+        stored = self.table.get_item(Key={'user_id': USER_ID, 'sort_key': bundle_sort_key('strategy-001', '09:20', 'ENTRY')})
+        self.assertIn('Item', stored)
+
+        # Re-hydration picks up the new version
+        self.assertEqual(self.schedule()['bundle_version'], 1)
+        self.assertIsNotNone(self.bundle())
+
+    def test_allocation_delete_makes_bundle_stale(self):
+        """Basket allocation changes also invalidate bundles"""
+        self.schedule()
+        event = {'pathParameters': {'basket_id': 'basket-001', 'allocation_id': 'alloc-1'}}
+
+        with patch.object(basket_broker_allocator_phase1, 'log_user_action'):
+            basket_broker_allocator_phase1.handle_delete_basket_allocation(
+                event, USER_ID, 'basket-001', 'alloc-1', self.table)
+
+        self.assertIsNone(self.bundle())
+
+    def test_missing_strategy_is_not_hydrated(self):
+        """Nothing to prefetch: the executor falls back to just-in-time loading"""
+        self.table.delete_item(Key={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-001'})
+
+        step_input = self.schedule()
+
+        self.assertIsNone(step_input['bundle_version'])
+        self.assertTrue(step_input['load_strategy_at_runtime'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+"""
+Test cases for execution priority lanes
+Covers lane routing of exits, the per-lane consumer and queue-age metrics
+"""
+import unittest
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+import execution_lanes
+import execution_lane_consumer
+import single_strategy_executor
+import stop_loss_handler
+import strategy_exit_handler
+
+USER_ID = 'user-001'
+IST = timezone(timedelta(hours=5, minutes=30))
+TRIGGERED_AT = datetime(2025, 10, 13, 9, 20, 12, tzinfo=IST)  # Monday
+
+
+def sqs_record(message_id, body, sent_ms):
+    return {'messageId': message_id, 'body': json.dumps(body), 'attributes': {'SentTimestamp': str(sent_ms)}}
+
+
+@mock_aws
+class TestExecutionLanes(unittest.TestCase):
+    """Protective exits travel on their own queue and consumer"""
+
+    def setUp(self):
+        self.sqs = boto3.client('sqs', region_name='ap-south-1')
+        self.queues = {
+            lane: self.sqs.create_queue(
+                QueueName=f'execution-lane-{lane.lower()}.fifo',
+                Attributes={'FifoQueue': 'true'}
+            )['QueueUrl']
+            for lane in ('HIGH', 'NORMAL')
+        }
+        patch.dict(os.environ, {
+            'HIGH_PRIORITY_EXIT_QUEUE_URL': self.queues['HIGH'],
+            'NORMAL_EXECUTION_QUEUE_URL': self.queues['NORMAL'],
+        }).start()
+        patch.object(stop_loss_handler, 'sqs_client', self.sqs).start()
+        patch.object(strategy_exit_handler, 'sqs_client', self.sqs).start()
+        self.addCleanup(patch.stopall)
+
+    def receive(self, lane):
+        messages = self.sqs.receive_message(QueueUrl=self.queues[lane], MaxNumberOfMessages=10).get('Messages', [])
+        return [json.loads(m['Body']) for m in messages]
+
+    def test_protective_exits_use_the_high_lane(self):
+        """Stop loss exits land on HIGH, scheduled exits on NORMAL"""
+        stop_loss_handler.queue_stop_loss_exit(
+            USER_ID, {}, {'strategy_id': 'strategy-001', 'position_id': 'pos-1', 'reason': 'SL hit'}, TRIGGERED_AT)
+        strategy_exit_handler.queue_strategy_for_exit(USER_ID, {'strategy_id': 'strategy-002'}, '15:20')
+
+        high, normal = self.receive('HIGH'), self.receive('NORMAL')
+        self.assertEqual([(m['execution_type'], m['lane']) for m in high], [('STOP_LOSS_EXIT', 'HIGH')])
+        self.assertEqual([(m['execution_type'], m['lane']) for m in normal], [('EXIT', 'NORMAL')])
+        self.assertIn('enqueued_at_ms', high[0])
+
+    def test_unsplit_deployment_falls_back_to_shared_queue(self):
+        """Without lane queues everything goes to SINGLE_STRATEGY_QUEUE_URL"""
+        with patch.dict(os.environ, {'HIGH_PRIORITY_EXIT_QUEUE_URL': '', 'SINGLE_STRATEGY_QUEUE_URL': self.queues['NORMAL']}):
+            self.assertEqual(execution_lanes.get_lane_queue_url('HIGH'), self.queues['NORMAL'])
+
+        with patch.dict(os.environ, {'HIGH_PRIORITY_EXIT_QUEUE_URL': '', 'NORMAL_EXECUTION_QUEUE_URL': ''}):
+            os.environ.pop('SINGLE_STRATEGY_QUEUE_URL', None)
+            result = strategy_exit_handler.queue_strategy_for_exit(USER_ID, {'strategy_id': 'strategy-002'}, '15:20')
+        self.assertEqual(result['status'], 'ERROR')
+
+
+class TestExecutionLaneConsumer(unittest.TestCase):
+    """Queued exits become executor events; failures are redelivered in order"""
+
+    def setUp(self):
+        self.execute = patch.object(execution_lane_consumer, 'execute_strategy',
+                                    return_value={'statusCode': 200}).start()
+        patch.object(execution_lane_consumer, 'EXECUTION_LANE', 'HIGH').start()
+        self.addCleanup(patch.stopall)
+
+    def test_protective_exit_runs_as_exit(self):
+        """STOP_LOSS_EXIT maps to EXIT with the trigger's minute and weekday"""
+        event = execution_lane_consumer.build_executor_event({
+            'user_id': USER_ID, 'strategy_id': 'strategy-001', 'position_id': 'pos-1',
+            'execution_type': 'STOP_LOSS_EXIT', 'trigger_time': TRIGGERED_AT.isoformat(),
+            'source': 'stop_loss_handler', 'lane': 'HIGH'
+        })
+
+        self.assertEqual(event['execution_type'], 'EXIT')
+        self.assertEqual(event['exit_reason'], 'STOP_LOSS_EXIT')
+        self.assertEqual((event['execution_time'], event['weekday']), ('09:20', 'MON'))
+        self.assertEqual(event['position_id'], 'pos-1')
+        self.assertEqual(event['exit_scope'], 'POSITION')
+
+    def test_failure_redelivers_the_rest_of_the_batch(self):
+        """On a FIFO queue everything from the first failure onwards is reported failed"""
+        self.execute.side_effect = [{'statusCode': 200}, {'statusCode': 500, 'body': {'message': 'broker down'}},
+                                    {'statusCode': 200}]
+        body = {'user_id': USER_ID, 'strategy_id': 's', 'execution_type': 'STOP_LOSS_EXIT'}
+        records = [sqs_record(f'm{i}', body, 0) for i in range(3)]
+
+        with redirect_stdout(io.StringIO()):
+            result = execution_lane_consumer.lambda_handler({'Records': records}, None)
+
+        self.assertEqual(result, {'batchItemFailures': [{'itemIdentifier': 'm1'}, {'itemIdentifier': 'm2'}]})
+        self.assertEqual(self.execute.call_count, 2)
+
+    def test_queue_age_is_reported_per_lane(self):
+        """Each consumed batch logs one EMF record with the age of every message"""
+        now_ms = 1_760_000_000_000
+        records = [sqs_record('m1', {}, now_ms - 1500), sqs_record('m2', {}, now_ms - 250)]
+
+        ages = [execution_lanes.queue_age_seconds(r, now_ms) for r in records]
+        output = io.StringIO()
+        with redirect_stdout(output):
+            execution_lanes.emit_queue_age_metrics('HIGH', ages)
+
+        record = json.loads(output.getvalue())
+        self.assertEqual(record['Lane'], 'HIGH')
+        self.assertEqual(record['QueueAgeSeconds'], [1.5, 0.25])
+        self.assertEqual(record['_aws']['CloudWatchMetrics'][0]['Dimensions'], [['Lane']])
+
+
+@mock_aws
+class TestPositionScopedExit(unittest.TestCase):
+    """A stop on one position exits that leg on its own account, not the whole strategy"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.history = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'execution_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        strategy = {'strategy_id': 'strategy-001', 'basket_id': 'basket-001', 'strategy_name': 'Short Straddle',
+                    'legs': [{'leg_id': 'leg-1', 'option_type': 'CE'}, {'leg_id': 'leg-2', 'option_type': 'PE'}]}
+        allocations = [{'client_id': 'C1', 'broker_name': 'zerodha'}, {'client_id': 'C2', 'broker_name': 'zebu'}]
+
+        patch.object(single_strategy_executor, 'dynamodb', dynamodb).start()
+        patch.object(single_strategy_executor, 'get_warm_strategy_snapshot', return_value=None).start()
+        patch.object(single_strategy_executor, 'get_complete_strategy_data', return_value=strategy).start()
+        patch.object(single_strategy_executor, 'query_basket_broker_allocations', return_value=allocations).start()
+        self.execute = patch.object(single_strategy_executor, 'execute_single_strategy_with_broker_allocations',
+                                    return_value={'status': 'success'}).start()
+        self.addCleanup(patch.stopall)
+
+    def run_exit(self, position_id='pos-1'):
+        event = execution_lane_consumer.build_executor_event({
+            'user_id': USER_ID, 'strategy_id': 'strategy-001', 'position_id': position_id,
+            'execution_type': 'STOP_LOSS_EXIT', 'trigger_time': TRIGGERED_AT.isoformat()
+        })
+        self.output = io.StringIO()
+        with redirect_stdout(self.output):
+            return single_strategy_executor.lambda_handler(event, None)
+
+    def test_only_the_position_leg_is_exited(self):
+        self.table.put_item(Item={'user_id': USER_ID, 'sort_key': 'POSITION#pos-1', 'position_id': 'pos-1',
+                                  'strategy_id': 'strategy-001', 'leg_id': 'leg-2', 'client_id': 'C2'})
+
+        self.assertEqual(self.run_exit()['statusCode'], 200)
+
+        kwargs = self.execute.call_args.kwargs
+        self.assertEqual([leg['leg_id'] for leg in kwargs['strategy']['legs']], ['leg-2'])
+        self.assertEqual(kwargs['broker_allocations'], [{'client_id': 'C2', 'broker_name': 'zebu'}])
+
+    def test_legacy_position_is_matched_by_contract(self):
+        """A POSITION row without leg_id resolves through its symbol's option type on its account"""
+        self.table.put_item(Item={'user_id': USER_ID, 'sort_key': 'POSITION#pos-1', 'position_id': 'pos-1',
+                                  'strategy_id': 'strategy-001', 'symbol': 'NIFTY25OCT25000PE',
+                                  'quantity': -75, 'client_id': 'C1'})
+
+        self.assertEqual(self.run_exit()['statusCode'], 200)
+
+        kwargs = self.execute.call_args.kwargs
+        self.assertEqual([leg['leg_id'] for leg in kwargs['strategy']['legs']], ['leg-2'])
+        self.assertEqual(kwargs['broker_allocations'], [{'client_id': 'C1', 'broker_name': 'zerodha'}])
+
+    def test_execution_history_position_ids_resolve(self):
+        """Risk handlers raise exits with the execution_key of an execution history row"""
+        position_id = '2025-10-13#strategy-001#leg-1'
+        self.history.put_item(Item={'user_id': USER_ID, 'execution_key': position_id, 'strategy_id': 'strategy-001',
+                                    'leg_id': 'leg-1', 'client_id': 'C2', 'position_status': 'OPEN'})
+
+        self.assertEqual(self.run_exit(position_id)['statusCode'], 200)
+        self.assertEqual([leg['leg_id'] for leg in self.execute.call_args.kwargs['strategy']['legs']], ['leg-1'])
+
+    def test_stop_loss_reads_history_rows_by_execution_key(self):
+        """Today's OPEN rows are found and their execution_key becomes the exit's position_id"""
+        today = datetime.now(timezone.utc).astimezone(IST).strftime('%Y-%m-%d')
+        self.history.put_item(Item={'user_id': USER_ID, 'execution_key': f'{today}#strategy-001#leg-1',
+                                    'strategy_id': 'strategy-001', 'position_status': 'OPEN',
+                                    'entry_price': 100, 'current_price': 150, 'position_type': 'SHORT',
+                                    'quantity': 75, 'stop_loss': {'type': 'PERCENTAGE', 'value': 20}})
+
+        with patch.object(stop_loss_handler, 'dynamodb', boto3.resource('dynamodb', region_name='ap-south-1')):
+            positions = stop_loss_handler.query_active_positions(USER_ID)
+
+        self.assertEqual(len(positions), 1)
+        result = stop_loss_handler.check_stop_loss_for_position(positions[0], TRIGGERED_AT)
+        self.assertEqual((result['triggered'], result['position_id']), (True, f'{today}#strategy-001#leg-1'))
+
+    def test_unresolvable_position_is_acknowledged_and_alerted(self):
+        """No leg is exited, the message is not redelivered, and an alarm metric is logged"""
+        self.table.put_item(Item={'user_id': USER_ID, 'sort_key': 'POSITION#pos-1', 'position_id': 'pos-1',
+                                  'strategy_id': 'strategy-001', 'symbol': 'NIFTY25OCT', 'client_id': 'C2'})
+
+        response = self.run_exit()
+
+        self.assertEqual((response['statusCode'], response['body']['status']), (200, 'skipped'))
+        self.execute.assert_not_called()
+        metric = json.loads(self.output.getvalue().strip().splitlines()[-1])
+        self.assertEqual((metric['ExitReason'], metric['UnresolvedPositionExits']), ('STOP_LOSS_EXIT', 1))
+
+if __name__ == '__main__':
+    unittest.main()
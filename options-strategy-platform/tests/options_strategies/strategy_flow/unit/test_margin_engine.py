@@ -0,0 +1,122 @@
+"""
+Test cases for the SPAN-style portfolio margin engine
+Covers spread offsets, naked shorts, calendar spreads, basket batching and the scenario cache
+"""
+import unittest
+import os
+import sys
+from datetime import date
+
+# Add the repository root (shared_utils) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+
+from shared_utils.margin_engine import MarginEngine, ScenarioArrayCache
+from shared_utils.risk_calculations import RiskCalculator
+
+AS_OF = date(2025, 10, 13)
+WEEKLY = '2025-10-16'
+NEXT_WEEKLY = '2025-10-23'
+MARKET = {
+    'NIFTY': {'spot': 25000, 'volatility': 0.13},
+    'BANKNIFTY': {'spot': 56000, 'volatility': 0.15}
+}
+
+
+def position(strike, option_type, transaction_type, quantity=75, underlying='NIFTY', expiry=WEEKLY):
+    return {
+        'underlying': underlying,
+        'expiry': expiry,
+        'strike': strike,
+        'option_type': option_type,
+        'transaction_type': transaction_type,
+        'quantity': quantity
+    }
+
+
+SHORT_STRANGLE = [position(25200, 'CE', 'SELL'), position(24800, 'PE', 'SELL')]
+IRON_CONDOR = SHORT_STRANGLE + [position(25400, 'CE', 'BUY'), position(24600, 'PE', 'BUY')]
+
+
+class TestMarginEngine(unittest.TestCase):
+    """Portfolio margin nets legs on a shared risk array"""
+
+    def setUp(self):
+        self.engine = MarginEngine(cache=ScenarioArrayCache())
+
+    def test_wings_cut_condor_margin_to_its_risk(self):
+        """Buying the wings bounds the scan risk by the spread width and removes exposure"""
+        strangle = self.engine.calculate_margin(SHORT_STRANGLE, MARKET, AS_OF)
+        condor = self.engine.calculate_margin(IRON_CONDOR, MARKET, AS_OF)
+
+        self.assertGreater(strangle['exposure_margin'], 0)
+        self.assertEqual(condor['exposure_margin'], 0)
+        # Never more than the 200-point wing on one side
+        self.assertLessEqual(condor['span_margin'], 200 * 75)
+        self.assertLess(condor['total_margin'], strangle['total_margin'] / 5)
+
+    def test_naked_short_charged_at_least_the_minimum(self):
+        """A far out-of-the-money short still carries the short option minimum plus exposure"""
+        result = self.engine.calculate_margin([position(27000, 'CE', 'SELL')], MARKET, AS_OF)
+        nifty = result['underlyings']['NIFTY']
+
+        self.assertEqual(nifty['short_option_minimum'], 0.03 * 25000 * 75)
+        self.assertEqual(result['span_margin'], max(nifty['scan_risk'], nifty['short_option_minimum']))
+        self.assertEqual(result['exposure_margin'], 0.02 * 25000 * 75)
+
+    def test_calendar_spread_offset(self):
+        """A long next-week call covers this week's short, leaving the calendar spread charge"""
+        naked = self.engine.calculate_margin([position(25000, 'CE', 'SELL')], MARKET, AS_OF)
+        calendar = self.engine.calculate_margin(
+            [position(25000, 'CE', 'SELL'), position(25000, 'CE', 'BUY', expiry=NEXT_WEEKLY)], MARKET, AS_OF
+        )
+        nifty = calendar['underlyings']['NIFTY']
+
+        self.assertGreater(nifty['calendar_spread_charge'], 0)
+        self.assertEqual(nifty['short_option_minimum'], 0)
+        self.assertEqual(calendar['exposure_margin'], 0)
+        self.assertLess(calendar['total_margin'], naked['total_margin'])
+
+    def test_basket_margins_match_individual_portfolios(self):
+        """Batching baskets gives each basket its own margin plus a netted portfolio figure"""
+        baskets = {
+            'condor': IRON_CONDOR,
+            'short-put': [position(55500, 'PE', 'SELL', quantity=35, underlying='BANKNIFTY')],
+            'short-call': [position(25500, 'CE', 'SELL')],
+            # Turns the other basket's naked call into a spread when netted
+            'hedge': [position(25700, 'CE', 'BUY')]
+        }
+        result = self.engine.calculate_basket_margins(baskets, MARKET, AS_OF)
+
+        for basket_id, positions in baskets.items():
+            self.assertEqual(result['baskets'][basket_id],
+                             self.engine.calculate_margin(positions, MARKET, AS_OF))
+        self.assertEqual(result['total_margin'],
+                         round(sum(r['total_margin'] for r in result['baskets'].values()), 2))
+        self.assertLess(result['portfolio']['total_margin'], result['total_margin'])
+
+    def test_scenario_arrays_cached_per_snapshot(self):
+        """Repeat calls reuse cached arrays until the market snapshot moves"""
+        cache = self.engine.cache
+        first = self.engine.calculate_margin(IRON_CONDOR, MARKET, AS_OF)
+        self.assertEqual(cache.hits, 0)
+
+        self.assertEqual(self.engine.calculate_margin(IRON_CONDOR, MARKET, AS_OF), first)
+        self.assertEqual(cache.hits, 4)
+
+        moved = dict(MARKET, NIFTY={'spot': 25100, 'volatility': 0.13})
+        self.engine.calculate_margin(IRON_CONDOR, moved, AS_OF)
+        self.assertEqual(cache.hits, 4)
+
+    def test_risk_calculator_recognises_hedges(self):
+        """calculate_margin_requirement no longer charges hedged legs as naked shorts"""
+        legs = [dict(strike=p['strike'], option_type=p['option_type'], transaction_type=p['transaction_type'],
+                     quantity=1, lot_size=75, days_to_expiry=3) for p in IRON_CONDOR]
+        condor = RiskCalculator().calculate_margin_requirement(legs, 25000)
+        strangle = RiskCalculator().calculate_margin_requirement(legs[:2], 25000)
+
+        self.assertEqual(set(condor), {'span_margin', 'exposure_margin', 'total_margin', 'margin_blocked', 'currency'})
+        self.assertLess(condor['total_margin'], strangle['total_margin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Test cases for the marketplace listing index
+Covers precomputed browse views, incremental maintenance and ETag handling
+"""
+import unittest
+import json
+import os
+import sys
+from decimal import Decimal
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+import marketplace_listing_index
+from marketplace_listing_index import upsert_template_listing, rebuild_marketplace_index
+from marketplace_manager import browse_marketplace_templates
+
+
+def make_template(index, category='INCOME', difficulty='BEGINNER', total_return=10, subscribers=0,
+                  visibility='PUBLIC'):
+    return {
+        'user_id': 'admin-001',
+        'sort_key': f'BASKET#template-{index:03d}',
+        'basket_id': f'template-{index:03d}',
+        'name': f'Template {index}',
+        'category': category,
+        'subscriber_count': Decimal(subscribers),
+        'performance_metrics': {'total_return': Decimal(str(total_return))},
+        'published_at': '2025-10-10T09:00:00+00:00',
+        'marketplace_config': {
+            'is_template': True,
+            'visibility': visibility,
+            'difficulty_level': difficulty,
+            'pricing': {'type': 'FREE', 'monthly_fee': 0},
+            'tags': []
+        }
+    }
+
+
+@mock_aws
+class TestMarketplaceListingIndex(unittest.TestCase):
+    """Browse views are correctly filtered, sized, sorted and cacheable"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        marketplace_listing_index._VIEW_CACHE.clear()
+        marketplace_listing_index._TEMPLATE_DETAIL_CACHE.clear()
+
+    def publish(self, template):
+        self.table.put_item(Item=template)
+        upsert_template_listing(template, self.table)
+
+    def browse(self, if_none_match=None, **params):
+        marketplace_listing_index._VIEW_CACHE.clear()
+        return browse_marketplace_templates(params, self.table, if_none_match)
+
+    def test_filters_are_applied_before_limit(self):
+        """Difficulty and performance filters return a full page of matches"""
+        rebuild_marketplace_index(self.table)
+        for i in range(30):
+            self.publish(make_template(i, difficulty='ADVANCED' if i % 2 else 'BEGINNER',
+                                       total_return=i, subscribers=i))
+
+        response = self.browse(difficulty='advanced', min_performance='11', limit='5')
+        templates = json.loads(response['body'])['templates']
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(len(templates), 5)
+        self.assertTrue(all(t['difficulty_level'] == 'ADVANCED' for t in templates))
+        self.assertTrue(all(t['performance_metrics']['total_return'] >= 11 for t in templates))
+        counts = [t['subscriber_count'] for t in templates]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_browse_without_category_does_not_scan(self):
+        """The ALL view replaces the full-table scan"""
+        rebuild_marketplace_index(self.table)
+        self.publish(make_template(1, category='INCOME'))
+        self.publish(make_template(2, category='HEDGING'))
+
+        original_scan = self.table.scan
+        self.table.scan = lambda **kwargs: self.fail('browse must not scan')
+        try:
+            response = self.browse()
+        finally:
+            self.table.scan = original_scan
+
+        self.assertEqual(json.loads(response['body'])['count'], 2)
+
+    def test_private_and_subscriber_changes_update_views(self):
+        """Visibility changes remove templates and subscriber counts re-rank them"""
+        rebuild_marketplace_index(self.table)
+        first = make_template(1, subscribers=5)
+        second = make_template(2, subscribers=1)
+        self.publish(first)
+        self.publish(second)
+
+        second['subscriber_count'] = Decimal(9)
+        upsert_template_listing(second, self.table)
+        ranked = [t['template_id'] for t in json.loads(self.browse(category='income')['body'])['templates']]
+        self.assertEqual(ranked, ['template-002', 'template-001'])
+
+        first['marketplace_config']['visibility'] = 'PRIVATE'
+        upsert_template_listing(first, self.table)
+        ranked = [t['template_id'] for t in json.loads(self.browse(category='income')['body'])['templates']]
+        self.assertEqual(ranked, ['template-002'])
+
+    def test_conditional_get_returns_304(self):
+        """A matching If-None-Match short-circuits the response body"""
+        rebuild_marketplace_index(self.table)
+        self.publish(make_template(1))
+
+        first = self.browse()
+        etag = first['headers']['ETag']
+        second = self.browse(if_none_match=etag)
+
+        self.assertEqual(second['statusCode'], 304)
+        self.assertEqual(second['body'], '')
+
+        self.publish(make_template(2))
+        third = self.browse(if_none_match=etag)
+        self.assertEqual(third['statusCode'], 200)
+
+    def test_truncated_view_is_rebuilt_after_removal(self):
+        """Removing a template from a full view triggers a rebuild that backfills the gap"""
+        original_size = marketplace_listing_index.MAX_VIEW_SIZE
+        marketplace_listing_index.MAX_VIEW_SIZE = 3
+        try:
+            templates = [make_template(i, subscribers=10 - i) for i in range(5)]
+            for template in templates:
+                self.table.put_item(Item=template)
+            rebuild_marketplace_index(self.table)
+
+            templates[0]['marketplace_config']['visibility'] = 'PRIVATE'
+            upsert_template_listing(templates[0], self.table)
+
+            ranked = [t['template_id'] for t in json.loads(self.browse()['body'])['templates']]
+        finally:
+            marketplace_listing_index.MAX_VIEW_SIZE = original_size
+
+        self.assertEqual(ranked, ['template-001', 'template-002', 'template-003'])
+
+    def test_legacy_templates_are_backfilled_by_the_scheduled_rebuild(self):
+        """Browse never scans; the maintenance job indexes templates published before the index"""
+        self.table.put_item(Item=make_template(1))
+
+        original_scan = self.table.scan
+        self.table.scan = lambda **kwargs: self.fail('browse must not scan')
+        try:
+            self.assertEqual(json.loads(self.browse()['body'])['count'], 0)
+        finally:
+            self.table.scan = original_scan
+
+        rebuild_marketplace_index(self.table)
+        self.assertEqual(json.loads(self.browse()['body'])['count'], 1)
+
+    def test_exact_threshold_refills_past_the_bucket_cap(self):
+        """A threshold inside a bucket still returns a full page when the bucket view is capped"""
+        original_size = marketplace_listing_index.MAX_VIEW_SIZE
+        marketplace_listing_index.MAX_VIEW_SIZE = 3
+        try:
+            # PERF_5 is capped at the three most subscribed, all below a return of 7
+            for i in range(6):
+                self.table.put_item(Item=make_template(i, total_return=5 + i, subscribers=10 - i))
+            rebuild_marketplace_index(self.table)
+
+            templates = json.loads(self.browse(min_performance='7', limit='3')['body'])['templates']
+        finally:
+            marketplace_listing_index.MAX_VIEW_SIZE = original_size
+
+        self.assertEqual([t['template_id'] for t in templates], ['template-002', 'template-003', 'template-004'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Test cases for idempotent leg execution
+Covers key derivation, the sliding window index, reserve-then-place through the trading bridge
+and order book reconciliation of legs whose broker call went unanswered
+"""
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from trading import OrderResponse, OrderStatus, TradingMode
+from trading import order_idempotency
+from trading.order_idempotency import (
+    OrderIdempotencyGateway, SlidingWindowIndex, derive_idempotency_key
+)
+from trading.trading_execution_bridge import TradingExecutionBridge
+
+NIFTY_LEG = {
+    'leg_id': 'leg-1',
+    'underlying': 'NIFTY',
+    'option_type': 'CE',
+    'action': 'SELL',
+    'strike': 25000,
+    'expiry_date': '2025-10-16',
+    'lots': 2
+}
+ALLOCATION = {'broker_name': 'paper', 'client_id': 'PAPER001', 'lot_multiplier': 1}
+
+
+class TestIdempotencyKeys(unittest.TestCase):
+    """Key derivation and the in-memory window"""
+
+    def test_key_is_deterministic_per_schedule(self):
+        """Same schedule, same key; any differing component gives a new key"""
+        args = ('user-001', 'strategy-001', 'leg-1', 'ENTRY', '09:30', 'Zerodha', 'ZD1234', '2025-10-13')
+        key = derive_idempotency_key(*args)
+
+        self.assertEqual(key, derive_idempotency_key(*args[:5], 'zerodha', *args[6:]))
+        self.assertEqual(len(key), 32)
+        self.assertNotEqual(key, derive_idempotency_key(*args[:3], 'EXIT', *args[4:]))
+        self.assertNotEqual(key, derive_idempotency_key(*args[:7], '2025-10-14'))
+
+    def test_window_expires_and_caps_entries(self):
+        """Entries drop out after the window and the oldest go first past max_size"""
+        index = SlidingWindowIndex(window_seconds=0.05, max_size=2)
+        index.add('a', {'status': 'FILLED'})
+        index.add('b', {'status': 'FILLED'})
+        index.add('c', {'status': 'FILLED'})
+
+        self.assertIsNone(index.get('a'))
+        self.assertEqual(index.get('c'), {'status': 'FILLED'})
+
+        time.sleep(0.06)
+        self.assertIsNone(index.get('c'))
+        self.assertEqual(len(index), 0)
+
+
+@mock_aws
+class TestIdempotentBridge(unittest.TestCase):
+    """Repeated deliveries of one scheduled leg place a single order"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    def new_bridge(self):
+        """A fresh bridge with its own window, as in a different Lambda container"""
+        bridge = TradingExecutionBridge(trading_table_name='test-trading-configurations')
+        bridge.idempotency = OrderIdempotencyGateway(bridge.trading_table, SlidingWindowIndex())
+        return bridge
+
+    def execute(self, bridge, execution_time='09:30', leg_data=NIFTY_LEG):
+        return bridge.execute_leg_sync(
+            user_id='user-001',
+            strategy_id='strategy-001',
+            basket_id='basket-001',
+            leg_data=leg_data,
+            allocation=ALLOCATION,
+            trading_mode=TradingMode.PAPER,
+            execution_time=execution_time
+        )
+
+    def orders(self):
+        return [i for i in self.table.scan()['Items'] if i['sort_key'].startswith('ORDER#')]
+
+    def test_redelivery_returns_original_order(self):
+        """A second container replays the stored result; a warm repeat never reaches DynamoDB"""
+        first = self.execute(self.new_bridge())
+        replay = self.execute(self.new_bridge())
+
+        self.assertEqual(first['status'], 'FILLED')
+        self.assertTrue(replay['duplicate'])
+        self.assertEqual(replay['order_id'], first['order_id'])
+        self.assertEqual(replay['status'], 'FILLED')
+        self.assertEqual(len(self.orders()), 1)
+        self.assertEqual(self.orders()[0]['idempotency_key'], first['idempotency_key'])
+
+        warm = self.new_bridge()
+        self.execute(warm)
+        with patch.object(warm.idempotency, 'table') as table:
+            self.assertTrue(self.execute(warm)['duplicate'])
+            table.put_item.assert_not_called()
+
+    def test_in_flight_reservation_blocks_concurrent_attempt(self):
+        """A reservation without a result yet reports DUPLICATE instead of placing"""
+        bridge = self.new_bridge()
+        key = derive_idempotency_key('user-001', 'strategy-001', 'leg-1', 'ENTRY', '09:30', 'paper', 'PAPER001')
+        self.assertIsNone(bridge.idempotency.reserve('user-001', key, {}))
+
+        result = self.execute(self.new_bridge())
+
+        self.assertEqual(result['status'], 'DUPLICATE')
+        self.assertEqual(self.orders(), [])
+
+    def test_failed_leg_releases_key(self):
+        """Nothing reached the exchange, so a retry may place the leg"""
+        bridge = self.new_bridge()
+        with patch.object(bridge, '_place_sliced_order', side_effect=RuntimeError('broker timeout')):
+            failed = self.execute(bridge)
+
+        retried = self.execute(self.new_bridge())
+
+        self.assertEqual(failed['status'], 'ERROR')
+        self.assertEqual(retried['status'], 'FILLED')
+        self.assertNotIn('duplicate', retried)
+
+    def test_broker_lookup_failure_releases_key(self):
+        """A broker session that cannot be created fails before any order is placed"""
+        bridge = self.new_bridge()
+        with patch.object(bridge, '_get_broker_strategy', side_effect=RuntimeError('login failed')):
+            failed = self.execute(bridge)
+
+        self.assertEqual(failed['status'], 'ERROR')
+        self.assertEqual(self.execute(self.new_bridge())['status'], 'FILLED')
+
+    def test_order_store_failure_keeps_placed_order(self):
+        """A failed ORDER# write after placement keeps the key, so a retry does not place again"""
+        bridge = self.new_bridge()
+        put_item = bridge.trading_table.put_item
+
+        def failing_order_write(**kwargs):
+            if kwargs['Item']['sort_key'].startswith('ORDER#'):
+                raise RuntimeError('throttled')
+            return put_item(**kwargs)
+
+        with patch.object(bridge.trading_table, 'put_item', side_effect=failing_order_write):
+            first = self.execute(bridge)
+
+        self.assertEqual(first['status'], 'FILLED')
+        self.assertTrue(first['broker_order_ids'])
+        self.assertEqual(first['persistence_error'], 'throttled')
+
+        retried = self.execute(self.new_bridge())
+        self.assertTrue(retried['duplicate'])
+        self.assertEqual(retried['broker_order_ids'], first['broker_order_ids'])
+
+    def test_lapsed_reservation_is_taken_over(self):
+        """A reservation left behind by a crashed invocation stops blocking after its lease"""
+        key = derive_idempotency_key('user-001', 'strategy-001', 'leg-1', 'ENTRY', '09:30', 'paper', 'PAPER001')
+        with patch.object(order_idempotency, 'RESERVATION_LEASE_SECONDS', -1):
+            self.assertIsNone(self.new_bridge().idempotency.reserve('user-001', key, {}))
+
+        result = self.execute(self.new_bridge())
+
+        self.assertEqual(result['status'], 'FILLED')
+        self.assertEqual(len(self.orders()), 1)
+
+    def unanswered_bridge(self, accepted, timed_out_call=1):
+        """A bridge whose n-th order times out, after the paper broker accepted it or not"""
+        bridge = self.new_bridge()
+        paper = bridge._get_broker_strategy('paper', TradingMode.PAPER)
+        place_order = paper.place_order
+        calls = []
+
+        def timing_out(order_params):
+            calls.append(order_params)
+            if len(calls) != timed_out_call:
+                return place_order(order_params)
+            if accepted:
+                place_order(order_params)
+            return OrderResponse(success=False, message='Request timeout', status=OrderStatus.REJECTED,
+                                 raw_response={'transport_error': True})
+
+        paper.place_order = timing_out
+        return bridge, paper, calls
+
+    def test_unanswered_order_is_adopted_from_the_order_book(self):
+        """A timed-out order the broker accepted is found by its tag, not placed again"""
+        bridge, paper, calls = self.unanswered_bridge(accepted=True)
+
+        first = self.execute(bridge)
+        self.assertEqual((first['status'], first['broker_order_ids']), ('ERROR', []))
+
+        retried = self.execute(bridge)
+
+        self.assertTrue(retried['duplicate'])
+        self.assertEqual(retried['status'], 'FILLED')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0].tag, first['idempotency_key'][:20])
+        self.assertEqual(retried['broker_order_ids'], [o.broker_order_id for o in paper.get_orders()])
+        self.assertEqual(self.orders()[0]['broker_order_ids'], retried['broker_order_ids'])
+
+    def test_unanswered_order_missing_from_the_book_is_placed_after_settling(self):
+        """The key holds while the outcome may still show up, then a retry places the leg"""
+        bridge, paper, calls = self.unanswered_bridge(accepted=False, timed_out_call=2)
+        self.execute(bridge, execution_time='09:15')  # an earlier order proves the book is readable
+
+        self.assertEqual(self.execute(bridge)['status'], 'ERROR')
+        held = self.execute(bridge)
+        self.assertEqual((held['status'], held['duplicate']), ('UNKNOWN', True))
+
+        with patch.object(order_idempotency, 'UNKNOWN_SETTLE_SECONDS', 0):
+            retried = self.execute(bridge)
+
+        self.assertEqual(retried['status'], 'FILLED')
+        self.assertNotIn('duplicate', retried)
+        self.assertEqual(len(calls), 3)
+
+    def test_unscheduled_calls_are_not_keyed(self):
+        """Without an execution_time (manual orders, backtests) every call places"""
+        bridge = self.new_bridge()
+        self.execute(bridge, execution_time=None)
+        self.execute(bridge, execution_time=None)
+
+        self.assertEqual(len(self.orders()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
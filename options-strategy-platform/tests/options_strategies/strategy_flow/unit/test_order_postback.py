@@ -0,0 +1,289 @@
+"""
+Test cases for broker order-status postbacks
+A local HTTP stub stands in for API Gateway; brokers are emulated by signing and POSTing
+Kite and Zebu postbacks to it
+"""
+import unittest
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root, lambda_functions (websocket) and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['ENVIRONMENT'] = 'dev'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from trading import OrderStatus, TradingMode
+from trading.order_postback import normalise_kite_postback, normalise_zebu_postback
+
+USER_ID = 'user-001'
+KITE_SECRET = 'kite-api-secret'
+ZEBU_SECRET = 'zebu-api-secret'
+
+
+class LocalPostbackGateway:
+    """HTTP stub that turns POSTs into API Gateway proxy events for the postback handler"""
+
+    def __init__(self, handler_module):
+        module = handler_module
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                parts = self.path.strip('/').split('/')
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                event = {
+                    'httpMethod': 'POST',
+                    'path': self.path,
+                    'pathParameters': dict(zip(('broker', 'user_id', 'client_id'), parts[2:5])),
+                    'headers': dict(self.headers.items()),
+                    'body': body,
+                    'isBase64Encoded': False,
+                }
+                response = module.lambda_handler(event, None)
+                payload = response['body'].encode('utf-8')
+                self.send_response(response['statusCode'])
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/options/postbacks'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def post(url, body, headers=None):
+    request = urllib.request.Request(url, data=body.encode('utf-8'), headers=headers or {}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def emit_kite_postback(gateway_url, client_id, secret=KITE_SECRET, **fields):
+    """Send a Kite postback the way Kite Connect signs it"""
+    payload = {'order_timestamp': '2025-10-13 09:30:01', 'user_id': client_id, **fields}
+    payload['checksum'] = hashlib.sha256(
+        f"{payload['order_id']}{payload['order_timestamp']}{secret}".encode('utf-8')
+    ).hexdigest()
+    return post(f'{gateway_url}/zerodha/{USER_ID}/{client_id}', json.dumps(payload),
+                {'Content-Type': 'application/json'})
+
+
+def emit_zebu_postback(gateway_url, client_id, secret=ZEBU_SECRET, **fields):
+    """Send a Zebu order update as a jData form body with an HMAC signature header"""
+    body = 'jData=' + urllib.parse.quote(json.dumps({'actid': client_id, **fields}))
+    signature = hmac.new(secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).hexdigest()
+    return post(f'{gateway_url}/zebu/{USER_ID}/{client_id}', body,
+                {'Content-Type': 'application/x-www-form-urlencoded', 'X-Postback-Signature': signature})
+
+
+class TestPostbackNormalisation(unittest.TestCase):
+    """Broker payloads map onto the OrderStatus lifecycle"""
+
+    def test_kite_partial_fill_and_rejection(self):
+        partial = normalise_kite_postback({'order_id': '2510130001', 'status': 'UPDATE',
+                                           'filled_quantity': 25, 'pending_quantity': 50,
+                                           'average_price': 101.5})
+        rejected = normalise_kite_postback({'order_id': '2510130002', 'status': 'REJECTED',
+                                            'status_message': 'Insufficient funds'})
+
+        self.assertEqual(partial.status, OrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(partial.pending_quantity, 50)
+        self.assertEqual(rejected.status, OrderStatus.REJECTED)
+        self.assertEqual(rejected.rejection_reason, 'Insufficient funds')
+
+    def test_zebu_fields(self):
+        update = normalise_zebu_postback({'norenordno': '25101300007', 'status': 'COMPLETE',
+                                          'fillshares': '75', 'qty': '75', 'avgprc': '98.20'})
+
+        self.assertEqual(update.broker_order_id, '25101300007')
+        self.assertEqual(update.status, OrderStatus.FILLED)
+        self.assertEqual(update.filled_quantity, 75)
+        self.assertEqual(update.average_price, 98.2)
+
+
+@mock_aws
+class TestOrderPostbackEndpoint(unittest.TestCase):
+    """Postbacks emitted over HTTP update ORDER# records and fan out changes"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        secrets = boto3.client('secretsmanager', region_name='ap-south-1')
+        secrets.create_secret(Name=f'ql-zerodha-api-credentials-dev-{USER_ID}-ZD1234',
+                              SecretString=json.dumps({'api_key': 'kite-key', 'api_secret': KITE_SECRET}))
+        secrets.create_secret(Name=f'ql-zebu-api-credentials-dev-{USER_ID}-ZB5678',
+                              SecretString=json.dumps({'api_key': 'zebu-key', 'api_secret': ZEBU_SECRET}))
+
+        import order_postback_handler
+        order_postback_handler.dynamodb = dynamodb
+        order_postback_handler.secrets_client = secrets
+        order_postback_handler.eventbridge_client = MagicMock()
+        order_postback_handler._api_secrets.clear()
+        order_postback_handler.BROADCASTER_AVAILABLE = True
+        self.broadcaster = MagicMock()
+        order_postback_handler.get_broadcaster = lambda: self.broadcaster
+        os.environ['WEBSOCKET_ENDPOINT_URL'] = 'https://ws.example.test/dev'
+        self.handler = order_postback_handler
+
+        self.seed_order('ORD_KITE', 'zerodha', 'ZD1234', [('2510130001', 75)])
+        self.seed_order('ORD_ZEBU', 'zebu', 'ZB5678', [('25101300007', 75), ('25101300008', 75)])
+
+    def tearDown(self):
+        os.environ.pop('WEBSOCKET_ENDPOINT_URL', None)
+
+    def seed_order(self, order_id, broker_name, client_id, slices):
+        """An OPEN live order as the trading bridge stores it"""
+        from trading.trading_execution_bridge import TradingExecutionBridge
+        bridge = TradingExecutionBridge(trading_table_name='test-trading-configurations')
+
+        broker_order_ids = [broker_order_id for broker_order_id, _ in slices]
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': f'ORDER#{order_id}',
+            'order_id': order_id,
+            'broker_order_id': broker_order_ids[0],
+            'broker_order_ids': broker_order_ids,
+            'strategy_id': 'strategy-001',
+            'leg_id': 'leg-1',
+            'broker_id': broker_name,
+            'client_id': client_id,
+            'status': 'OPEN',
+            'filled_quantity': 0,
+            'slices': [{'broker_order_id': b, 'status': 'OPEN', 'filled_quantity': 0, 'fill_price': None,
+                        'slice_index': i, 'quantity': q} for i, (b, q) in enumerate(slices)],
+            'updated_at': '2025-10-13T04:00:00+00:00',
+            'entity_type': 'ORDER',
+        })
+        bridge._index_broker_orders(USER_ID, order_id, broker_name, broker_order_ids, TradingMode.LIVE)
+
+    def order(self, order_id):
+        return self.table.get_item(Key={'user_id': USER_ID, 'sort_key': f'ORDER#{order_id}'})['Item']
+
+    def test_kite_fills_progress_and_stale_postbacks_are_dropped(self):
+        """Partial then complete fills apply in order; a late OPEN changes nothing"""
+        with LocalPostbackGateway(self.handler) as gateway:
+            partial = emit_kite_postback(gateway.url, 'ZD1234', order_id='2510130001', status='UPDATE',
+                                         filled_quantity=25, pending_quantity=50, average_price=101.5)
+            complete = emit_kite_postback(gateway.url, 'ZD1234', order_id='2510130001', status='COMPLETE',
+                                          filled_quantity=75, pending_quantity=0, average_price=101.75)
+            late = emit_kite_postback(gateway.url, 'ZD1234', order_id='2510130001', status='OPEN',
+                                      filled_quantity=0, pending_quantity=75)
+
+        self.assertEqual(partial, (200, {'success': True, 'applied': True,
+                                         'order_id': 'ORD_KITE', 'status': 'PARTIALLY_FILLED'}))
+        self.assertEqual(complete[1]['status'], 'FILLED')
+        self.assertEqual(late, (200, {'success': True, 'applied': False}))
+
+        order = self.order('ORD_KITE')
+        self.assertEqual(order['status'], 'FILLED')
+        self.assertEqual(order['filled_quantity'], 75)
+        self.assertEqual(float(order['fill_price']), 101.75)
+
+        self.assertEqual(self.broadcaster.broadcast_order_update.call_count, 2)
+        user_id, pushed = self.broadcaster.broadcast_order_update.call_args.args
+        self.assertEqual((user_id, pushed['previous_status'], pushed['status']),
+                         (USER_ID, 'PARTIALLY_FILLED', 'FILLED'))
+        event = self.handler.eventbridge_client.put_events.call_args.kwargs['Entries'][0]
+        self.assertEqual(event['DetailType'], 'Order.Status.Changed')
+
+    def test_bad_checksum_is_rejected(self):
+        """A postback signed with the wrong secret never touches the order"""
+        with LocalPostbackGateway(self.handler) as gateway:
+            status, body = emit_kite_postback(gateway.url, 'ZD1234', secret='forged', order_id='2510130001',
+                                              status='COMPLETE', filled_quantity=75, average_price=101.0)
+
+        self.assertEqual(status, 401)
+        self.assertEqual(self.order('ORD_KITE')['status'], 'OPEN')
+        self.broadcaster.broadcast_order_update.assert_not_called()
+
+    def test_zebu_slice_fill_updates_leg(self):
+        """One of two child orders filling leaves the leg partially filled"""
+        with LocalPostbackGateway(self.handler) as gateway:
+            status, body = emit_zebu_postback(gateway.url, 'ZB5678', norenordno='25101300008',
+                                              status='COMPLETE', fillshares='75', qty='75', avgprc='98.20')
+            forged = emit_zebu_postback(gateway.url, 'ZB5678', secret='forged', norenordno='25101300007',
+                                        status='REJECTED', rejreason='RMS')
+
+        self.assertEqual((status, body['status']), (200, 'PARTIALLY_FILLED'))
+        self.assertEqual(forged[0], 401)
+        order = self.order('ORD_ZEBU')
+        self.assertEqual(order['filled_quantity'], 75)
+        self.assertEqual([s['status'] for s in order['slices']], ['OPEN', 'FILLED'])
+
+    def test_unknown_orders_and_paper_orders_are_ignored(self):
+        """Orders placed outside the platform are acknowledged but not applied; paper orders are not indexed"""
+        with LocalPostbackGateway(self.handler) as gateway:
+            status, body = emit_kite_postback(gateway.url, 'ZD1234', order_id='9999999999',
+                                              status='COMPLETE', filled_quantity=1, average_price=1.0)
+        self.assertEqual((status, body['applied']), (200, False))
+
+        from trading.trading_execution_bridge import TradingExecutionBridge
+        bridge = TradingExecutionBridge(trading_table_name='test-trading-configurations')
+        bridge._index_broker_orders(USER_ID, 'ORD_PAPER', 'paper', ['PAPER_1'], TradingMode.PAPER)
+        pointers = [i for i in self.table.scan()['Items'] if i['sort_key'].startswith('BROKER_ORDER#')]
+        self.assertEqual(len(pointers), 3)
+        self.assertTrue(all(int(p['ttl']) > time.time() for p in pointers))
+
+    def test_missing_credentials_are_cached_briefly(self):
+        """Postbacks for a client without credentials are rejected without a Secrets Manager call each"""
+        secrets = MagicMock(wraps=self.handler.secrets_client)
+        with patch.object(self.handler, 'secrets_client', secrets):
+            for _ in range(3):
+                self.assertIsNone(self.handler.get_api_secret('zerodha', USER_ID, 'UNKNOWN1'))
+            self.assertEqual(secrets.get_secret_value.call_count, 1)
+
+            cache_key = ('zerodha', USER_ID, 'UNKNOWN1')
+            self.handler._api_secrets[cache_key] = (time.monotonic() - 1, None)
+            self.handler.get_api_secret('zerodha', USER_ID, 'UNKNOWN1')
+            self.assertEqual(secrets.get_secret_value.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
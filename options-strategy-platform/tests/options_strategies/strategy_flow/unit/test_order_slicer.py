@@ -0,0 +1,143 @@
+"""
+Test cases for leg order slicing
+Covers freeze/allocation caps, per-broker pacing and fill aggregation through the trading bridge
+"""
+import unittest
+import os
+import sys
+import time
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from trading import TradingMode
+from trading.order_slicer import (
+    BrokerRateLimiter, max_lots_per_slice, slice_quantity, aggregate_slice_fills
+)
+from trading.trading_execution_bridge import TradingExecutionBridge
+
+NIFTY_LEG = {
+    'leg_id': 'leg-1',
+    'underlying': 'NIFTY',
+    'option_type': 'CE',
+    'action': 'SELL',
+    'strike': 25000,
+    'expiry_date': '2025-10-16',
+    'lots': 30
+}
+
+
+class TestOrderSlicing(unittest.TestCase):
+    """Slice sizing and aggregation"""
+
+    def test_slices_respect_allocation_cap_and_freeze_limit(self):
+        """The tighter of max_lots_per_order and the freeze limit sizes every slice"""
+        self.assertEqual(max_lots_per_slice('NIFTY', 50), 50)
+        self.assertEqual(max_lots_per_slice('NIFTY', 100), 72)
+        self.assertEqual(max_lots_per_slice('nifty', None), 72)
+        self.assertIsNone(max_lots_per_slice('UNKNOWN', None))
+
+        self.assertEqual(slice_quantity(150, 72), [72, 72, 6])
+        self.assertEqual(slice_quantity(150, 50), [50, 50, 50])
+        self.assertEqual(slice_quantity(10, 72), [10])
+        self.assertEqual(slice_quantity(10, None), [10])
+        self.assertEqual(slice_quantity(0, 72), [])
+
+    def test_aggregate_reports_partial_execution(self):
+        """A rejected slice leaves the leg partially filled at the volume-weighted price"""
+        leg = aggregate_slice_fills([
+            {'quantity': 72, 'status': 'FILLED', 'filled_quantity': 72, 'fill_price': 100.0},
+            {'quantity': 72, 'status': 'REJECTED', 'filled_quantity': 0, 'fill_price': None},
+            {'quantity': 6, 'status': 'FILLED', 'filled_quantity': 6, 'fill_price': 113.0}
+        ])
+
+        self.assertEqual(leg['status'], 'PARTIALLY_FILLED')
+        self.assertEqual(leg['quantity'], 150)
+        self.assertEqual(leg['filled_quantity'], 78)
+        self.assertEqual(leg['average_price'], 101.0)
+        self.assertEqual(leg['rejected_slices'], 1)
+
+    def test_rate_limiter_paces_bursts(self):
+        """Orders beyond the one-second bucket wait for the broker's sustained rate"""
+        limiter = BrokerRateLimiter(orders_per_second=20)
+
+        start = time.monotonic()
+        for _ in range(30):
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+
+
+@mock_aws
+class TestBridgeOrderSlicing(unittest.TestCase):
+    """Sliced legs execute against the paper broker as one logical order"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.bridge = TradingExecutionBridge(trading_table_name='test-trading-configurations')
+
+    def execute(self, lot_multiplier, max_lots_per_order=None):
+        return self.bridge.execute_leg_sync(
+            user_id='user-001',
+            strategy_id='strategy-001',
+            basket_id='basket-001',
+            leg_data=NIFTY_LEG,
+            allocation={
+                'broker_name': 'paper',
+                'client_id': 'PAPER001',
+                'lot_multiplier': lot_multiplier,
+                'max_lots_per_order': max_lots_per_order
+            },
+            trading_mode=TradingMode.PAPER
+        )
+
+    def test_large_leg_is_sliced_and_recorded_once(self):
+        """150 lots with a 50-lot cap go out as three orders under one ORDER record"""
+        result = self.execute(lot_multiplier=5, max_lots_per_order=50)
+
+        self.assertEqual(result['status'], 'FILLED')
+        self.assertEqual(result['slice_count'], 3)
+        self.assertEqual(result['filled_quantity'], 150)
+        self.assertEqual(len(set(result['broker_order_ids'])), 3)
+
+        orders = self.table.scan()['Items']
+        self.assertEqual(len(orders), 1)
+        order = orders[0]
+        self.assertEqual(order['quantity'], 150)
+        self.assertEqual(order['filled_quantity'], 150)
+        self.assertEqual([s['quantity'] for s in order['slices']], [50, 50, 50])
+        self.assertGreater(order['fill_price'], 0)
+
+    def test_small_leg_is_a_single_order(self):
+        """Legs within both limits are placed unchanged"""
+        result = self.execute(lot_multiplier=1)
+
+        self.assertEqual(result['status'], 'FILLED')
+        self.assertEqual(result['slice_count'], 1)
+        self.assertEqual(result['quantity'], 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Test cases for the coalesced order status poller
+Covers pending-order discovery per broker account, one order book fetch per round and adaptive back-off
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root, lambda_functions (websocket) and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from trading import OrderStatus, OrderStatusResponse
+from trading.order_postback import OrderPostbackProcessor
+
+USER_ID = 'user-001'
+TODAY = datetime.now(timezone.utc).date().isoformat()
+
+
+def book_entry(broker_order_id, status, filled=0, price=0.0):
+    return OrderStatusResponse(order_id=broker_order_id, broker_order_id=broker_order_id, status=status,
+                               filled_quantity=filled, average_price=price)
+
+
+class FakeBroker:
+    """Order book that advances one scripted snapshot per get_orders call"""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.calls = 0
+
+    def get_orders(self, filters=None):
+        snapshot = self.snapshots[min(self.calls, len(self.snapshots) - 1)]
+        self.calls += 1
+        return snapshot
+
+
+@mock_aws
+class TestOrderStatusPoller(unittest.TestCase):
+    """One order book fetch per account per round, applied to every pending order"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                {'AttributeName': 'order_status_key', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'OrdersByStatus',
+                'KeySchema': [
+                    {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'order_status_key', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        import order_status_poll_handler
+        order_status_poll_handler.dynamodb = dynamodb
+        self.poller = order_status_poll_handler
+        self.fan_out = patch.object(order_status_poll_handler, 'fan_out_status_change').start()
+        self.addCleanup(patch.stopall)
+
+        self.seed_order('ORD_1', ['1001'], 'OPEN')
+        self.seed_order('ORD_2', ['1002', '1003'], 'OPEN')
+        self.seed_order('ORD_DONE', ['1004'], 'FILLED')
+        self.seed_order('ORD_OTHER_CLIENT', ['2001'], 'OPEN', client_id='ZD9999')
+        self.seed_order('ORD_PAPER', ['PAPER_1'], 'OPEN', trading_mode='PAPER')
+
+    def seed_order(self, order_id, broker_order_ids, status, client_id='ZD1234', trading_mode='LIVE'):
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': f'ORDER#{order_id}',
+            'order_id': order_id,
+            'broker_order_id': broker_order_ids[0],
+            'broker_order_ids': broker_order_ids,
+            'broker_id': 'zerodha',
+            'client_id': client_id,
+            'trading_mode': trading_mode,
+            'status': status,
+            'filled_quantity': 0,
+            'slice_count': len(broker_order_ids),
+            'slices': [{'broker_order_id': b, 'status': status, 'filled_quantity': 0, 'fill_price': None,
+                        'slice_index': i, 'quantity': 50} for i, b in enumerate(broker_order_ids)],
+            'order_status_key': f'{status}#{TODAY}T03:50:00+00:00',
+            'updated_at': f'{TODAY}T03:50:00+00:00',
+            'entity_type': 'ORDER',
+        })
+
+    def order(self, order_id):
+        return self.table.get_item(Key={'user_id': USER_ID, 'sort_key': f'ORDER#{order_id}'})['Item']
+
+    def pending(self):
+        return self.poller.get_pending_orders(self.table, USER_ID, 'zerodha', 'ZD1234')
+
+    def test_pending_orders_are_scoped_to_the_account(self):
+        """Only today's live, non-final orders of the polled client are picked up"""
+        self.assertEqual(sorted(o['order_id'] for o in self.pending()), ['ORD_1', 'ORD_2'])
+
+    def test_one_book_fetch_updates_every_pending_order(self):
+        """All slices are diffed against a single order book"""
+        broker = FakeBroker([[
+            book_entry('1001', OrderStatus.FILLED, 50, 101.0),
+            book_entry('1002', OrderStatus.FILLED, 50, 99.0),
+            book_entry('1003', OrderStatus.OPEN),
+            book_entry('2001', OrderStatus.FILLED, 50, 10.0),
+        ]])
+
+        changed, still_pending = self.poller.poll_order_book(
+            OrderPostbackProcessor(self.table), broker, USER_ID, self.pending())
+
+        self.assertEqual(broker.calls, 1)
+        self.assertEqual(changed, 2)
+        self.assertEqual([o['order_id'] for o in still_pending], ['ORD_2'])
+        self.assertEqual(self.order('ORD_1')['status'], 'FILLED')
+        self.assertEqual(self.order('ORD_2')['status'], 'PARTIALLY_FILLED')
+        self.assertEqual(self.order('ORD_OTHER_CLIENT')['status'], 'OPEN')
+        self.assertEqual(self.fan_out.call_count, 2)
+
+        # An unchanged book writes nothing
+        changed, _ = self.poller.poll_order_book(OrderPostbackProcessor(self.table), broker, USER_ID, still_pending)
+        self.assertEqual(changed, 0)
+
+    def test_poll_window_backs_off_until_orders_settle(self):
+        """Quiet rounds double the interval; a change resets it; nothing pending ends the window"""
+        open_book = [book_entry('1001', OrderStatus.OPEN), book_entry('1002', OrderStatus.OPEN),
+                     book_entry('1003', OrderStatus.OPEN)]
+        filled_one = [book_entry('1001', OrderStatus.FILLED, 50, 101.0)] + open_book[1:]
+        filled_all = [book_entry(b, OrderStatus.FILLED, 50, 100.0) for b in ('1001', '1002', '1003')]
+        broker = FakeBroker([open_book, open_book, open_book, filled_one, open_book, filled_all])
+        processor = OrderPostbackProcessor(self.table)
+
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        result = self.poller.run_poll_window(
+            self.pending(),
+            lambda orders: self.poller.poll_order_book(processor, broker, USER_ID, orders),
+            self.pending,
+            window_seconds=45, sleep=sleep, clock=lambda: now[0]
+        )
+
+        self.assertEqual(sleeps, [2, 4, 8, 2, 2])
+        self.assertEqual(result, {'rounds': 6, 'changed': 2, 'pending': 0})
+
+    def test_idle_account_makes_no_broker_calls(self):
+        """Nothing pending, or postbacks enabled: no credentials lookup and no order book fetch"""
+        self.table.delete_item(Key={'user_id': USER_ID, 'sort_key': 'ORDER#ORD_1'})
+        self.table.delete_item(Key={'user_id': USER_ID, 'sort_key': 'ORDER#ORD_2'})
+
+        with patch.object(self.poller, 'get_broker_credentials') as credentials:
+            idle = self.poller.lambda_handler({'detail': {
+                'user_id': USER_ID, 'broker_name': 'zerodha', 'client_id': 'ZD1234'}}, None)
+            skipped = self.poller.lambda_handler({'detail': {
+                'user_id': USER_ID, 'broker_name': 'zerodha', 'client_id': 'ZD9999',
+                'broker_config': {'postbacks_enabled': True}}}, None)
+
+        credentials.assert_not_called()
+        self.assertEqual(json.loads(idle['body'])['result'], {'rounds': 0, 'pending': 0})
+        self.assertEqual(json.loads(skipped['body'])['result']['skipped'], 'POSTBACKS_ENABLED')
+
+
+if __name__ == '__main__':
+    unittest.main()
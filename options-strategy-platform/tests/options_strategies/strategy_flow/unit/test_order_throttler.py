@@ -0,0 +1,183 @@
+"""
+Test cases for per-account order throttling
+Covers account-keyed buckets, the shared per-second budget and hedge-first leg ordering
+"""
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from trading import TradingMode, order_slicer, order_throttler
+from trading.order_throttler import SharedOrderBudget, get_account_throttler, order_legs_for_margin
+from trading.trading_execution_bridge import TradingExecutionBridge
+
+IRON_CONDOR = [
+    {'leg_id': 'short-ce', 'action': 'SELL', 'option_type': 'CE', 'strike': 25200},
+    {'leg_id': 'long-ce', 'action': 'BUY', 'option_type': 'CE', 'strike': 25400},
+    {'leg_id': 'short-pe', 'action': 'SELL', 'option_type': 'PE', 'strike': 24800},
+    {'leg_id': 'long-pe', 'action': 'BUY', 'option_type': 'PE', 'strike': 24600},
+]
+
+
+def create_trading_table():
+    dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+    return dynamodb.create_table(
+        TableName='test-trading-configurations',
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+class FakeClock:
+    """Epoch clock that only moves when the throttler sleeps."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestLegOrdering(unittest.TestCase):
+    """Protective legs go out before short legs"""
+
+    def test_entry_buys_hedges_first(self):
+        ordered = [leg['leg_id'] for leg in order_legs_for_margin(IRON_CONDOR, 'ENTRY')]
+        self.assertEqual(ordered, ['long-ce', 'long-pe', 'short-ce', 'short-pe'])
+
+    def test_exit_covers_shorts_first(self):
+        ordered = [leg['leg_id'] for leg in order_legs_for_margin(IRON_CONDOR, 'EXIT')]
+        self.assertEqual(ordered, ['short-ce', 'short-pe', 'long-ce', 'long-pe'])
+
+
+@mock_aws
+class TestSharedOrderBudget(unittest.TestCase):
+    """The per-second budget of an account is shared through the trading table"""
+
+    def setUp(self):
+        self.table = create_trading_table()
+        self.clock = FakeClock(1_760_000_000.25)
+        patch.object(order_throttler.time, 'sleep', self.clock.sleep).start()
+        patch.dict(order_slicer._RATE_LIMITERS, clear=True).start()
+        patch.dict(order_throttler._THROTTLERS, clear=True).start()
+        self.addCleanup(patch.stopall)
+
+    def test_full_second_defers_to_the_next(self):
+        """The eleventh order in a second waits for the next second's budget"""
+        budget = SharedOrderBudget(self.table, clock=self.clock, lane='NORMAL')
+
+        waits = [budget.acquire('zerodha#AB1234', 10) for _ in range(11)]
+
+        self.assertEqual(waits[:10], [0.0] * 10)
+        self.assertAlmostEqual(waits[10], 0.75)
+        counts = {item['sort_key']: item['order_count'] for item in self.table.scan()['Items']}
+        self.assertEqual(counts, {'SECOND#1760000000#NORMAL': 10, 'SECOND#1760000001#NORMAL': 5})
+
+    def test_slots_are_reserved_in_batches(self):
+        """Ten orders in one second cost two budget writes; a short second still yields single slots"""
+        budget = SharedOrderBudget(self.table, clock=self.clock, batch_size=5, lane='NORMAL')
+        with patch.object(budget, 'try_reserve', wraps=budget.try_reserve) as try_reserve:
+            for _ in range(10):
+                budget.acquire('zerodha#AB1234', 10)
+        self.assertEqual(try_reserve.call_count, 2)
+
+        other = SharedOrderBudget(self.table, clock=self.clock, batch_size=5, lane='NORMAL')
+        self.table.update_item(Key={'user_id': 'ORDER_THROTTLE#zebu#ZB1', 'sort_key': 'SECOND#1760000000#NORMAL'},
+                               UpdateExpression='SET order_count = :count', ExpressionAttributeValues={':count': 8})
+        self.assertEqual([other.acquire('zebu#ZB1', 10, max_wait=0) for _ in range(2)], [0.0, 0.0])
+
+    def test_exhausted_budget_throttles_instead_of_sending(self):
+        """Past the wait limit the order is not sent and the leg comes back THROTTLED"""
+        budget = SharedOrderBudget(self.table, clock=self.clock, lane='HIGH')
+        for _ in range(10):
+            budget.acquire('zerodha#AB1234', 10)
+        with self.assertRaises(order_throttler.OrderBudgetExhausted):
+            budget.acquire('zerodha#AB1234', 10, max_wait=0)
+
+        throttler = get_account_throttler('zerodha', 'AB1234')
+        throttler.shared_budget = budget
+        placed = []
+        with patch.object(budget, 'try_reserve', return_value=False):
+            results = order_slicer.dispatch_slices(lambda i, lots: placed.append(lots), [1], 'zerodha',
+                                                   limiter=throttler)
+
+        self.assertEqual((placed, results[0]['status']), ([], 'THROTTLED'))
+        self.assertEqual(order_slicer.aggregate_slice_fills(results)['status'], 'THROTTLED')
+
+    def test_lanes_use_their_share_of_the_rate(self):
+        """A lane's budget is its BROKER_RATE_BUDGET_SHARE of the account rate, counted apart"""
+        with patch.object(order_throttler, 'BROKER_RATE_BUDGET_SHARE', 0.3):
+            self.assertEqual(order_throttler.AccountOrderThrottler('zerodha', 'AB1234').orders_per_second, 3)
+
+        high = SharedOrderBudget(self.table, clock=self.clock, lane='HIGH')
+        normal = SharedOrderBudget(self.table, clock=self.clock, lane='NORMAL')
+        for _ in range(3):
+            high.acquire('zerodha#AB1234', 3)
+        with self.assertRaises(order_throttler.OrderBudgetExhausted):
+            high.acquire('zerodha#AB1234', 3, max_wait=0)
+        self.assertEqual(normal.acquire('zerodha#AB1234', 7), 0.0)
+
+    def test_accounts_have_separate_budgets(self):
+        """A full account does not hold back another account on the same broker"""
+        budget = SharedOrderBudget(self.table, clock=self.clock)
+        for _ in range(10):
+            budget.acquire('zerodha#AB1234', 10)
+
+        self.assertEqual(budget.acquire('zerodha#CD5678', 10), 0.0)
+        self.assertIsNot(get_account_throttler('zerodha', 'AB1234').local,
+                         get_account_throttler('zerodha', 'CD5678').local)
+
+    def test_unavailable_budget_does_not_block_orders(self):
+        """Table errors fall back to local pacing only"""
+        budget = SharedOrderBudget(boto3.resource('dynamodb', region_name='ap-south-1').Table('missing'))
+
+        self.assertEqual(budget.acquire('zerodha#AB1234', 10), 0.0)
+
+
+@mock_aws
+class TestBridgeLegOrdering(unittest.TestCase):
+    """Strategy execution places hedges first and keeps paper orders off the shared budget"""
+
+    def test_paper_entry_places_hedges_first(self):
+        table = create_trading_table()
+        bridge = TradingExecutionBridge(trading_table_name='test-trading-configurations')
+        legs = [dict(leg, underlying='NIFTY', expiry_date='2025-10-16', lots=1) for leg in IRON_CONDOR]
+
+        result = bridge.execute_strategy(
+            user_id='user-001',
+            strategy={'strategy_id': 'strategy-001', 'basket_id': 'basket-001', 'legs': legs},
+            allocations=[{'broker_name': 'paper', 'client_id': 'PAPER001', 'lot_multiplier': 1}],
+            trading_mode=TradingMode.PAPER
+        )
+
+        orders = sorted(table.scan()['Items'], key=lambda order: order['placed_at'])
+        self.assertEqual(result['successful_orders'], 4)
+        self.assertEqual([o['transaction_type'] for o in orders], ['BUY', 'BUY', 'SELL', 'SELL'])
+        self.assertFalse(any(o['user_id'].startswith('ORDER_THROTTLE#') for o in orders))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Test cases for the deterministic paper matching engine
+Covers price-time priority, tick liquidity, stop triggers, fill latency and tick replay
+"""
+import unittest
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone, timedelta
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+from trading import (
+    OrderParams, OrderStatus, OrderType, TransactionType, PaperTradingStrategy,
+    MatchingEngine, Tick, TickReplayer, load_ticks
+)
+
+SYMBOL = 'NIFTY16OCT2525000CE'
+OPEN = datetime(2025, 10, 16, 9, 15, tzinfo=timezone.utc)
+
+
+def tick(seconds, last_price, bid=None, ask=None, bid_quantity=0, ask_quantity=0):
+    return Tick(
+        timestamp=OPEN + timedelta(seconds=seconds),
+        symbol=SYMBOL,
+        last_price=last_price,
+        bid=bid,
+        ask=ask,
+        bid_quantity=bid_quantity,
+        ask_quantity=ask_quantity
+    )
+
+
+def order(transaction_type, quantity, order_type=OrderType.MARKET, price=None, trigger_price=None):
+    return OrderParams(
+        symbol=SYMBOL,
+        exchange='NFO',
+        transaction_type=transaction_type,
+        order_type=order_type,
+        quantity=quantity,
+        price=price,
+        trigger_price=trigger_price
+    )
+
+
+class TestMatchingEngine(unittest.TestCase):
+    """Orders match against replayed quotes with price-time priority"""
+
+    def setUp(self):
+        self.engine = MatchingEngine()
+        self.paper = PaperTradingStrategy(matching_engine=self.engine)
+        self.engine.on_tick(tick(0, 100.0, bid=99.5, ask=100.5))
+
+    def test_market_order_takes_the_touch(self):
+        """A market buy fills at the ask of the current tick"""
+        response = self.paper.place_order(order(TransactionType.BUY, 10))
+
+        self.assertEqual(response.status, OrderStatus.FILLED)
+        self.assertEqual(response.raw_response['average_price'], 100.5)
+        self.assertEqual(self.paper.get_positions()[0].quantity, 10)
+
+    def test_limit_orders_fill_in_price_time_priority(self):
+        """Better-priced then earlier limits consume limited tick liquidity first"""
+        early = self.paper.place_order(order(TransactionType.BUY, 5, OrderType.LIMIT, price=99.0))
+        better = self.paper.place_order(order(TransactionType.BUY, 5, OrderType.LIMIT, price=99.5))
+        late = self.paper.place_order(order(TransactionType.BUY, 5, OrderType.LIMIT, price=99.0))
+        self.assertEqual(early.status, OrderStatus.OPEN)
+
+        # Only 8 offered at 98.8: the 99.5 bid fills fully, the earlier 99.0 bid partially
+        self.engine.on_tick(tick(1, 98.8, bid=98.7, ask=98.8, ask_quantity=8))
+
+        status = {r.order_id: self.paper.get_order_status(r.order_id) for r in (early, better, late)}
+        self.assertEqual(status[better.order_id].status, OrderStatus.FILLED)
+        self.assertEqual(status[early.order_id].status, OrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(status[early.order_id].filled_quantity, 3)
+        self.assertEqual(status[late.order_id].filled_quantity, 0)
+        self.assertEqual(status[better.order_id].average_price, 98.8)
+
+    def test_stop_loss_arms_on_last_price(self):
+        """An SL-M sell stays resting until the last traded price reaches its trigger"""
+        stop = self.paper.place_order(order(TransactionType.SELL, 10, OrderType.SL_M, trigger_price=95.0))
+
+        self.engine.on_tick(tick(1, 97.0, bid=96.5, ask=97.5))
+        self.assertEqual(self.paper.get_order_status(stop.order_id).status, OrderStatus.OPEN)
+
+        self.engine.on_tick(tick(2, 94.5, bid=94.0, ask=95.0))
+        status = self.paper.get_order_status(stop.order_id)
+        self.assertEqual(status.status, OrderStatus.FILLED)
+        self.assertEqual(status.average_price, 94.0)
+
+    def test_fill_latency_defers_matching(self):
+        """With latency configured, a market order fills on the first tick after the delay"""
+        engine = MatchingEngine(fill_latency_ms=500)
+        paper = PaperTradingStrategy(matching_engine=engine)
+        engine.on_tick(tick(0, 100.0, bid=99.5, ask=100.5))
+
+        response = paper.place_order(order(TransactionType.BUY, 10))
+        self.assertEqual(response.status, OrderStatus.OPEN)
+
+        engine.on_tick(tick(0.2, 101.0, bid=100.5, ask=101.5))
+        self.assertEqual(paper.get_order_status(response.order_id).filled_quantity, 0)
+
+        engine.on_tick(tick(0.6, 102.0, bid=101.5, ask=102.5))
+        self.assertEqual(paper.get_order_status(response.order_id).average_price, 102.5)
+        self.assertEqual(engine.stats()['max_fill_latency_ms'], 600.0)
+
+
+class TestTickReplay(unittest.TestCase):
+    """Recorded tick files replay deterministically"""
+
+    def write_ticks(self, directory):
+        path = os.path.join(directory, 'ticks.csv')
+        with open(path, 'w') as f:
+            f.write('timestamp,symbol,last_price,bid,ask,bid_quantity,ask_quantity\n')
+            for i, price in enumerate([100.0, 99.0, 98.0, 97.0, 98.5]):
+                f.write(f'{(OPEN + timedelta(seconds=i)).isoformat()},{SYMBOL},{price},{price - 0.5},{price + 0.5},50,50\n')
+        return path
+
+    def replay_fills(self, path):
+        engine = MatchingEngine()
+        paper = PaperTradingStrategy(matching_engine=engine)
+        paper.place_order(order(TransactionType.BUY, 80, OrderType.LIMIT, price=98.0))
+        paper.place_order(order(TransactionType.SELL, 20, OrderType.SL_M, trigger_price=97.5))
+
+        fills = []
+        stats = TickReplayer.from_files(engine, [path]).replay(
+            on_tick=lambda t, tick_fills: fills.extend((f.price, f.quantity) for f in tick_fills)
+        )
+        return fills, stats
+
+    def test_replay_is_deterministic(self):
+        """The same file and order flow produce identical fills every run"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_ticks(directory)
+            self.assertEqual(len(load_ticks([path])), 5)
+
+            first, stats = self.replay_fills(path)
+            second, _ = self.replay_fills(path)
+
+        self.assertEqual(first, second)
+        # Only 50 were offered at or below the limit; the rest of the bid keeps resting
+        self.assertEqual(first, [(97.5, 50), (96.5, 20)])
+        self.assertEqual(stats['ticks'], 5)
+        self.assertEqual(stats['fills'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
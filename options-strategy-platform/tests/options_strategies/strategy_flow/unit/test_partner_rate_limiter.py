@@ -0,0 +1,200 @@
+"""
+Test cases for partner API rate limiting and API key lookup
+Load-tests the leased token bucket in PartnerAuthMiddleware against a moto DynamoDB table
+"""
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from lambda_functions.option_baskets import partner_auth_middleware
+from lambda_functions.option_baskets.partner_auth_middleware import (
+    PartnerAuthMiddleware, api_key_lookup_item, backfill_api_key_lookups
+)
+
+
+class FrozenDatetime(datetime):
+    """Pin the rate limit window so the test never straddles a minute boundary"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2025, 10, 10, 14, 30, 15, tzinfo=timezone.utc)
+
+
+@mock_aws
+class TestPartnerRateLimiter(unittest.TestCase):
+    """Rate limit equivalence and DynamoDB write volume under burst traffic"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        partner_auth_middleware._PARTNER_CACHE.clear()
+        partner_auth_middleware._LOCAL_TOKEN_BUCKETS.clear()
+        partner_auth_middleware._LAST_USED_FLUSHED_AT.clear()
+
+        self.partner_context = {
+            'api_key_id': 'key-001',
+            'partner_id': 'ZEBU',
+            'rate_limits': {'requests_per_minute': 100, 'requests_per_day': 10000}
+        }
+
+        self.datetime_patch = patch.object(partner_auth_middleware, 'datetime', FrozenDatetime)
+        self.datetime_patch.start()
+
+    def tearDown(self):
+        self.datetime_patch.stop()
+
+    def _run_burst(self, middleware, requests):
+        allowed = 0
+        for _ in range(requests):
+            within_limits, _ = middleware.check_rate_limit(self.partner_context)
+            allowed += 1 if within_limits else 0
+        return allowed
+
+    def test_single_container_burst_allows_exactly_the_limit(self):
+        """A 250-request burst against a 100/min limit admits exactly 100"""
+        middleware = PartnerAuthMiddleware()
+
+        with patch.object(middleware.table, 'update_item', wraps=middleware.table.update_item) as update_spy:
+            allowed = self._run_burst(middleware, 250)
+
+        self.assertEqual(allowed, 100)
+
+        minute_item = self.table.get_item(
+            Key={'user_id': 'RATE#key-001', 'sort_key': 'RATE_LIMIT#MINUTE#2025-10-10-14-30'}
+        )['Item']
+        self.assertGreaterEqual(int(minute_item['request_count']), 100)
+
+        # Original implementation issued one or two writes per request (350 for this burst)
+        self.assertLess(update_spy.call_count, 250)
+
+    def test_multiple_containers_share_the_limit(self):
+        """Interleaved requests from several warm containers never exceed the shared limit"""
+        containers = [{} for _ in range(4)]
+        middleware = PartnerAuthMiddleware()
+        allowed = 0
+
+        for request_number in range(400):
+            buckets = containers[request_number % len(containers)]
+            with patch.object(partner_auth_middleware, '_LOCAL_TOKEN_BUCKETS', buckets):
+                within_limits, _ = middleware.check_rate_limit(self.partner_context)
+            allowed += 1 if within_limits else 0
+
+        self.assertEqual(allowed, 100)
+
+    def test_rejection_message_matches_original(self):
+        """Requests over the minute limit report the same error as before"""
+        self.partner_context['rate_limits']['requests_per_minute'] = 5
+        middleware = PartnerAuthMiddleware()
+
+        self._run_burst(middleware, 5)
+        within_limits, error = middleware.check_rate_limit(self.partner_context)
+
+        self.assertFalse(within_limits)
+        self.assertEqual(error, 'Rate limit exceeded: 5 requests per minute')
+
+    def _put_partner(self, api_key, api_key_id='key-001', status='ACTIVE'):
+        item = {
+            'user_id': 'PARTNER',
+            'sort_key': f'PARTNER_API_KEY#{api_key_id}',
+            'api_key_id': api_key_id,
+            'api_key': api_key,
+            'partner_id': 'ZEBU',
+            'status': status
+        }
+        self.table.put_item(Item=item)
+        return item
+
+    def test_api_key_lookup_uses_hash_and_cache(self):
+        """Hashed lookup resolves the partner; warm requests only re-read its status"""
+        api_key = 'pk_zebu_live_abc123'
+        self._put_partner(api_key)
+        self.table.put_item(Item=api_key_lookup_item(api_key, 'key-001'))
+        middleware = PartnerAuthMiddleware()
+
+        with patch.object(middleware.table, 'query') as query_spy:
+            partner = middleware._get_partner_by_api_key(api_key)
+            with patch.object(middleware.table, 'get_item', wraps=middleware.table.get_item) as get_spy:
+                cached_partner = middleware._get_partner_by_api_key(api_key)
+
+        self.assertEqual(partner['api_key_id'], 'key-001')
+        self.assertEqual(cached_partner['api_key_id'], 'key-001')
+        query_spy.assert_not_called()
+        self.assertEqual(get_spy.call_count, 1)
+        self.assertEqual(get_spy.call_args.kwargs['ProjectionExpression'], '#status')
+
+    def test_revoked_key_stops_authenticating_while_cached(self):
+        """A revoke in another container is seen on the next cache hit"""
+        api_key = 'pk_zebu_live_abc123'
+        self._put_partner(api_key)
+        self.table.put_item(Item=api_key_lookup_item(api_key, 'key-001'))
+        middleware = PartnerAuthMiddleware()
+        middleware._get_partner_by_api_key(api_key)
+
+        self._put_partner(api_key, status='REVOKED')
+
+        self.assertEqual(middleware._get_partner_by_api_key(api_key)['status'], 'REVOKED')
+
+    def test_unknown_keys_are_cached_briefly_without_a_partition_query(self):
+        """A miss is one get_item, and repeated misses do not touch DynamoDB"""
+        middleware = PartnerAuthMiddleware()
+
+        with patch.object(middleware.table, 'query') as query_spy, \
+                patch.object(middleware.table, 'get_item', wraps=middleware.table.get_item) as get_spy:
+            for _ in range(20):
+                self.assertIsNone(middleware._get_partner_by_api_key('pk_junk_live_nope'))
+
+        query_spy.assert_not_called()
+        self.assertEqual(get_spy.call_count, 1)
+
+    def test_legacy_api_key_is_backfilled(self):
+        """Keys without a lookup item resolve once the admin listing backfills them"""
+        api_key = 'pk_zebu_live_legacy'
+        legacy = self._put_partner(api_key, api_key_id='key-legacy')
+
+        self.assertIsNone(PartnerAuthMiddleware()._get_partner_by_api_key(api_key))
+
+        self.assertEqual(backfill_api_key_lookups(self.table, [legacy]), 1)
+        self.assertEqual(backfill_api_key_lookups(self.table, [legacy]), 0)
+        partner_auth_middleware._PARTNER_CACHE.clear()
+
+        partner = PartnerAuthMiddleware()._get_partner_by_api_key(api_key)
+        self.assertEqual(partner['api_key_id'], 'key-legacy')
+
+    def test_last_used_writes_are_coalesced(self):
+        """Repeated authentications of one key write last_used_at once per interval"""
+        middleware = PartnerAuthMiddleware()
+
+        with patch.object(middleware.table, 'update_item') as update_spy:
+            for _ in range(50):
+                middleware._update_last_used_timestamp('key-001')
+
+        self.assertEqual(update_spy.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Test cases for the vectorized payoff engine
+Covers exact expiry metrics, unlimited risk, T+n surfaces, probability of profit and batching
+"""
+import unittest
+import math
+import os
+import sys
+
+# Add the repository root (shared_utils) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+
+from shared_utils.payoff_engine import PayoffEngine
+from shared_utils.risk_calculations import RiskCalculator
+
+
+def leg(strike, option_type, transaction_type, premium, quantity=75):
+    return {
+        'strike': strike,
+        'option_type': option_type,
+        'transaction_type': transaction_type,
+        'quantity': quantity,
+        'entry_premium': premium
+    }
+
+
+IRON_CONDOR = [
+    leg(25000, 'CE', 'SELL', 120),
+    leg(25200, 'CE', 'BUY', 50),
+    leg(24800, 'PE', 'SELL', 110),
+    leg(24600, 'PE', 'BUY', 45)
+]
+
+
+class TestPayoffEngine(unittest.TestCase):
+    """Batch payoff analysis matches the leg-by-leg definition"""
+
+    def setUp(self):
+        self.engine = PayoffEngine()
+
+    def strategy(self, legs, **overrides):
+        strategy = {'strategy_id': 'condor', 'legs': legs, 'spot_price': 24900,
+                    'days_to_expiry': 7, 'volatility': 0.13}
+        strategy.update(overrides)
+        return strategy
+
+    def test_expiry_metrics_are_exact(self):
+        """Max profit/loss and breakevens come from the kinks, not the sampled grid"""
+        result = self.engine.evaluate([self.strategy(IRON_CONDOR)], grid_points=7)[0]
+
+        # Net credit 135 x 75; wings 200 wide
+        self.assertEqual(result['max_profit'], 10125.0)
+        self.assertEqual(result['max_loss'], -4875.0)
+        self.assertEqual(result['breakeven_points'], [24665.0, 25135.0])
+        self.assertEqual(len(result['expiry_payoff']), 7)
+
+    def test_unlimited_risk(self):
+        """A naked short call has unlimited loss and a single breakeven above the strike"""
+        result = self.engine.evaluate([self.strategy([leg(25000, 'CE', 'SELL', 120)])])[0]
+
+        self.assertEqual(result['max_loss'], float('-inf'))
+        self.assertEqual(result['max_profit'], 9000.0)
+        self.assertEqual(result['breakeven_points'], [25120.0])
+
+    def test_surfaces_match_scalar_black_scholes(self):
+        """T+n marks agree with RiskCalculator's scalar pricer and converge to expiry"""
+        calculator = RiskCalculator()
+        result = self.engine.evaluate(
+            [self.strategy([leg(25000, 'CE', 'BUY', 120, quantity=1)])],
+            spot_prices=[24800, 25000, 25200], days_forward=[2, 7]
+        )[0]
+
+        expected = calculator.black_scholes_call(25000, 25000, 5 / 365, 0.13) - 120
+        self.assertAlmostEqual(result['payoff_surface'][2][1], expected, delta=0.01)
+        self.assertEqual(result['payoff_surface'][7], result['expiry_payoff'])
+
+    def test_probability_of_profit(self):
+        """Probability of profit is the lognormal mass between the condor's breakevens"""
+        calculator = RiskCalculator()
+        t = 7 / 365
+        scale = 0.13 * math.sqrt(t)
+        drift = (0.06 - 0.5 * 0.13 ** 2) * t
+
+        def terminal_cdf(price):
+            return calculator._norm_cdf((math.log(price / 24900) - drift) / scale)
+
+        result = self.engine.evaluate([self.strategy(IRON_CONDOR)])[0]
+        expected = terminal_cdf(25135) - terminal_cdf(24665)
+        self.assertAlmostEqual(result['probability_of_profit'], expected, places=3)
+
+        # Expired: profit or loss is known from the current spot
+        expired = self.engine.evaluate([
+            self.strategy(IRON_CONDOR, days_to_expiry=0),
+            self.strategy(IRON_CONDOR, days_to_expiry=0, spot_price=25500)
+        ])
+        self.assertEqual([r['probability_of_profit'] for r in expired], [1.0, 0.0])
+
+    def test_batches_mixed_leg_counts_across_chunks(self):
+        """Strategies with different leg counts evaluate identically alone or chunked together"""
+        strategies = [self.strategy(IRON_CONDOR[:n], strategy_id=f's{n}') for n in range(1, 5)] * 3
+        batched = PayoffEngine(chunk_size=5).evaluate(strategies, days_forward=[1])
+        single = [self.engine.evaluate([s], days_forward=[1])[0] for s in strategies]
+
+        self.assertEqual([r['strategy_id'] for r in batched], [s['strategy_id'] for s in strategies])
+        self.assertEqual(batched, single)
+
+    def test_risk_calculator_payoff_unchanged(self):
+        """calculate_strategy_payoff keeps its grid-based output"""
+        result = RiskCalculator().calculate_strategy_payoff(IRON_CONDOR, [24500, 24700, 24900, 25100, 25300])
+
+        self.assertEqual([p['payoff'] for p in result['payoffs']], [-4875.0, 2625.0, 10125.0, 2625.0, -4875.0])
+        # Interpolated on the sampled grid, unlike the engine's exact breakevens
+        self.assertEqual(result['breakeven_points'], [24630.0, 25170.0])
+        self.assertEqual(result['max_loss'], -4875.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
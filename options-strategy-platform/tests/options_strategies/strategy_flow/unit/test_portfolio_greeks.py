@@ -0,0 +1,210 @@
+"""
+Test cases for the portfolio Greeks stream
+Covers vectorized Greeks against the scalar RiskCalculator, scope aggregation,
+threshold diffs, publish throttling and the Portfolio Greeks Stream handler over the open position query
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+from shared_utils.greeks_engine import GreeksEngine, IST
+from shared_utils.risk_calculations import RiskCalculator
+from candle_store import CandleStore
+import greeks_publisher
+import portfolio_greeks_handler
+
+USER_ID = 'user-001'
+MARKET = {'NIFTY': {'spot': 25000, 'volatility': 0.13}, 'BANKNIFTY': {'spot': 56000, 'volatility': 0.16}}
+
+
+def leg(strike, option_type, transaction_type, strategy_id='strategy-001', basket_id='basket-001',
+        underlying='NIFTY', quantity=75, days=7):
+    return {'underlying': underlying, 'strike': strike, 'option_type': option_type, 'days_to_expiry': days,
+            'transaction_type': transaction_type, 'quantity': quantity,
+            'strategy_id': strategy_id, 'basket_id': basket_id}
+
+
+class TestGreeksEngine(unittest.TestCase):
+    """One vectorized pass matches the scalar calculator and sums per scope"""
+
+    def test_matches_risk_calculator(self):
+        reference = RiskCalculator().calculate_greeks(25000, 25200, 7 / 365, 0.13, 'call')
+        greeks = GreeksEngine().aggregate([leg(25200, 'CE', 'BUY', quantity=1)], MARKET)['user']
+
+        for name in ('delta', 'gamma', 'theta', 'vega'):
+            self.assertAlmostEqual(greeks[name], getattr(reference, name), places=2)
+
+    def test_scopes_sum_their_legs(self):
+        positions = [leg(25000, 'CE', 'SELL'), leg(25000, 'PE', 'SELL'),
+                     leg(56000, 'CE', 'BUY', strategy_id='strategy-002', underlying='BANKNIFTY', quantity=35),
+                     leg(0, 'FUT', 'BUY', strategy_id='strategy-003', basket_id='basket-002')]
+        aggregate = GreeksEngine().aggregate(positions, MARKET)
+
+        self.assertEqual(set(aggregate['strategies']), {'strategy-001', 'strategy-002', 'strategy-003'})
+        self.assertEqual(aggregate['strategies']['strategy-003'], {'delta': 75.0, 'gamma': 0.0, 'theta': 0.0, 'vega': 0.0})
+        # A short ATM straddle is close to delta neutral and earns theta
+        straddle = aggregate['strategies']['strategy-001']
+        self.assertLess(abs(straddle['delta']), 10)
+        self.assertGreater(straddle['theta'], 0)
+
+        for name in ('delta', 'theta', 'vega'):
+            strategies = sum(greeks[name] for greeks in aggregate['strategies'].values())
+            baskets = sum(greeks[name] for greeks in aggregate['baskets'].values())
+            self.assertAlmostEqual(strategies, aggregate['user'][name], places=1)
+            self.assertAlmostEqual(baskets, aggregate['user'][name], places=1)
+
+    def test_expiry_day_legs_keep_gamma(self):
+        position = dict(leg(25000, 'CE', 'BUY'), expiry='2025-10-28')
+        del position['days_to_expiry']
+
+        morning = GreeksEngine().aggregate([position], MARKET, as_of=datetime(2025, 10, 28, 10, 0, tzinfo=IST))
+        after_close = GreeksEngine().aggregate([position], MARKET, as_of=datetime(2025, 10, 28, 15, 45, tzinfo=IST))
+
+        self.assertGreater(morning['user']['gamma'], 0)
+        self.assertEqual(after_close['user']['gamma'], 0)
+
+
+class TestGreeksPublisher(unittest.TestCase):
+    """Only moves beyond the threshold are published, at most once per interval"""
+
+    def setUp(self):
+        self.publisher = greeks_publisher.GreeksPublisher(min_publish_seconds=20)
+        self.table = MagicMock()
+        self.table.get_item.return_value = {}
+        self.publisher.restore(self.table, USER_ID)
+
+    def snapshot(self, delta, theta=1000.0):
+        return {'USER': {'delta': delta, 'gamma': 0.1, 'theta': theta, 'vega': -500.0},
+                'STRATEGY#strategy-001': {'delta': delta, 'gamma': 0.1, 'theta': theta, 'vega': -500.0}}
+
+    def publish(self, snapshot, now):
+        update = self.publisher.pending_update(USER_ID, snapshot, now=now)
+        if update is not None:
+            self.publisher.mark_published(self.table, USER_ID, update, now=now)
+        return update
+
+    def test_small_drifts_accumulate_until_worth_a_message(self):
+        self.assertEqual(len(self.publish(self.snapshot(10.0), now=1000)['changed']), 2)
+
+        self.assertIsNone(self.publish(self.snapshot(13.0), now=1100))
+        # Measured against the published 10, not the unpublished 13
+        update = self.publish(self.snapshot(15.5), now=1200)
+        self.assertEqual(update['changed']['USER']['delta'], 15.5)
+
+        # theta moved 4% of the published 1000: below the relative threshold
+        self.assertIsNone(self.publish(self.snapshot(15.5, theta=1040.0), now=1300))
+
+    def test_publishes_are_throttled(self):
+        self.publish(self.snapshot(10.0), now=1000)
+        self.assertIsNone(self.publish(self.snapshot(50.0), now=1010))
+        self.assertEqual(self.publish(self.snapshot(50.0), now=1020)['changed']['USER']['delta'], 50.0)
+
+    def test_closed_strategies_are_removed(self):
+        self.publish(self.snapshot(10.0), now=1000)
+        update = self.publish({'USER': self.snapshot(10.0)['USER']}, now=1100)
+
+        self.assertEqual((update['changed'], update['removed']), ({}, ['STRATEGY#strategy-001']))
+        self.assertEqual(list(self.publisher.published(USER_ID)), ['USER'])
+
+
+@mock_aws
+class TestPortfolioGreeksHandler(unittest.TestCase):
+    """The handler pushes changed scopes and persists what clients hold"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.trading = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        self.broadcaster = MagicMock()
+        self.broadcaster.broadcast_greeks_update.return_value = 1
+        patch.object(portfolio_greeks_handler, 'dynamodb', dynamodb).start()
+        patch.object(portfolio_greeks_handler, 'get_greeks_broadcaster', return_value=self.broadcaster).start()
+        patch.object(greeks_publisher, '_publisher', greeks_publisher.GreeksPublisher(min_publish_seconds=0)).start()
+        self.addCleanup(patch.stopall)
+
+    def positions(self, spot):
+        expiry = (date.today() + timedelta(days=7)).isoformat()
+        return [{'strategy_id': 'strategy-001', 'basket_id': 'basket-001', 'underlying': 'NIFTY', 'strike': 25000,
+                 'option_type': option_type, 'expiry_date': expiry, 'transaction_type': 'SELL',
+                 'quantity': 75, 'underlying_price': spot, 'position_status': 'OPEN'}
+                for option_type in ('CE', 'PE')]
+
+    def run_tick(self, spot):
+        with patch.object(portfolio_greeks_handler, 'query_active_positions', return_value=self.positions(spot)):
+            response = portfolio_greeks_handler.lambda_handler({'detail': {'user_id': USER_ID}}, None)
+        return json.loads(response['body'])
+
+    def test_unchanged_book_sends_nothing(self):
+        body = self.run_tick(25000)
+        self.assertEqual(body['scopes_published'], 3)
+        sent = self.broadcaster.broadcast_greeks_update.call_args[0][1]
+        self.assertEqual(set(sent['changed']), {'USER', 'STRATEGY#strategy-001', 'BASKET#basket-001'})
+
+        self.broadcaster.reset_mock()
+        self.assertEqual(self.run_tick(25000)['scopes_published'], 0)
+        self.broadcaster.broadcast_greeks_update.assert_not_called()
+
+    def test_cold_container_restores_the_published_snapshot(self):
+        self.run_tick(25000)
+        snapshot = self.trading.get_item(Key={'user_id': USER_ID, 'sort_key': 'GREEKS#SNAPSHOT'})['Item']
+        self.assertIn('USER', snapshot['scopes'])
+
+        greeks_publisher._publisher = greeks_publisher.GreeksPublisher(min_publish_seconds=0)
+        self.broadcaster.reset_mock()
+        self.assertEqual(self.run_tick(25000)['scopes_published'], 0)
+
+        # A spot move swings the short straddle's delta
+        self.assertEqual(self.run_tick(26000)['scopes_published'], 3)
+
+    def test_open_positions_stream_through_the_history_query(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        history = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'execution_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        now = datetime.now(IST)
+        for leg_id, position in enumerate(self.positions(None), start=1):
+            del position['underlying_price']
+            history.put_item(Item={'user_id': USER_ID, 'execution_key': f"{now:%Y-%m-%d}#strategy-001#leg-{leg_id}",
+                                   **position})
+        store = CandleStore(self.trading)
+        store.flush(store.on_tick('NIFTY', 25000, now))
+
+        with patch('portfolio_var_handler.dynamodb', dynamodb):
+            response = portfolio_greeks_handler.lambda_handler({'detail': {'user_id': USER_ID}}, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual((body['positions_skipped'], body['greeks']['legs']), (0, 2))
+        self.assertEqual(body['scopes_published'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Test cases for positional (expiry-relative) scheduling
+Covers the trading calendar, dated schedules in the daily plan and overnight carry-forward
+"""
+import unittest
+import os
+import sys
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from shared_utils import trading_calendar
+from shared_utils.indian_market_utils import INDIAN_MARKET_CONFIG
+import positional_schedule
+import strategy_manager_phase1
+from schedule_plan import compile_schedule_plan
+
+USER_ID = 'user-001'
+
+# NIFTY weekly, enter 2 trading days before expiry, exit on expiry day
+POSITIONAL_STRATEGY = {
+    'strategy_id': 'pos-001', 'basket_id': 'basket-001', 'underlying': 'NIFTY', 'expiry_type': 'weekly',
+    'entry_time': '09:30', 'exit_time': '15:15',
+    'entry_trading_days_before_expiry': 2, 'exit_trading_days_before_expiry': 0,
+}
+
+
+class TestTradingCalendar(unittest.TestCase):
+    """Trading days skip weekends and exchange holidays"""
+
+    def test_holiday_expiry_moves_to_the_previous_trading_day(self):
+        # 2025-10-21 (Tuesday) is a trading holiday
+        self.assertEqual(trading_calendar.expiry_dates('NIFTY', 'weekly', date(2025, 10, 1), date(2025, 10, 31)),
+                         [date(2025, 10, 7), date(2025, 10, 14), date(2025, 10, 20), date(2025, 10, 28)])
+
+    def test_monthly_only_underlyings_use_the_last_expiry_of_the_month(self):
+        self.assertEqual(trading_calendar.expiry_dates('BANKNIFTY', 'weekly', date(2025, 10, 1), date(2025, 10, 31)),
+                         [date(2025, 10, 28)])
+
+    def test_trading_days_before_skips_weekends(self):
+        self.assertEqual(trading_calendar.trading_days_before(date(2025, 10, 28), 3), date(2025, 10, 23))
+        self.assertEqual(trading_calendar.trading_days_before(date(2025, 10, 28), 0), date(2025, 10, 28))
+
+    def test_dates_past_the_holiday_list_are_reported(self):
+        next_year = trading_calendar.last_listed_year() + 1
+        trading_calendar._report_unlisted_year.cache_clear()
+
+        first_monday = date(next_year, 1, 1) + timedelta(days=(7 - date(next_year, 1, 1).weekday()) % 7)
+
+        with patch.object(trading_calendar.logger, 'error') as error:
+            self.assertTrue(trading_calendar.is_trading_day(first_monday))
+            trading_calendar.is_trading_day(first_monday + timedelta(days=1))
+        self.assertEqual(error.call_count, 1)
+        self.assertIn(str(next_year), error.call_args[0][0])
+
+    def test_market_utils_share_the_expiry_weekdays(self):
+        indices = INDIAN_MARKET_CONFIG['indices']
+        self.assertEqual((indices['NIFTY']['weekly_expiry'], indices['SENSEX']['weekly_expiry']), ('TUESDAY', 'THURSDAY'))
+        self.assertEqual((indices['BANKNIFTY']['weekly_expiry'], indices['BANKNIFTY']['monthly_expiry']),
+                         (None, 'LAST_TUESDAY'))
+        self.assertIn('2025-10-21', INDIAN_MARKET_CONFIG['holidays'])
+
+    def test_cycles_resolve_entry_and_exit_dates(self):
+        cycles = positional_schedule.positional_cycles(POSITIONAL_STRATEGY, date(2025, 10, 13), date(2025, 10, 31))
+        self.assertEqual([(c['entry_date'], c['exit_date']) for c in cycles], [
+            (date(2025, 10, 16), date(2025, 10, 20)),
+            (date(2025, 10, 24), date(2025, 10, 28)),
+            (date(2025, 10, 31), date(2025, 11, 4)),
+        ])
+
+
+@mock_aws
+class TestDatedSchedules(unittest.TestCase):
+    """Dated schedules reach the daily plan through the weekday query"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                                  {'AttributeName': 'schedule_key', 'AttributeType': 'S'}],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'UserScheduleDiscovery',
+                'KeySchema': [{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                              {'AttributeName': 'schedule_key', 'KeyType': 'RANGE'}],
+                # The deployed index projects neither schedule_date nor expiry_date
+                'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': [
+                    'strategy_id', 'basket_id', 'execution_time', 'weekday', 'status', 'entity_type',
+                    'execution_type', 'created_at', 'updated_at', 'sort_key']}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.table.put_item(Item=dict(POSITIONAL_STRATEGY, user_id=USER_ID, sort_key='STRATEGY#pos-001',
+                                      status='ACTIVE'))
+        positional_schedule.materialise_positional_schedules(
+            self.table, USER_ID, POSITIONAL_STRATEGY, date(2025, 10, 13), horizon_days=18)
+
+    def planned(self, day):
+        shards = compile_schedule_plan(self.table, USER_ID, day)
+        return [(entry['execution_time'], entry['execution_type'])
+                for minutes in shards.values() for entries in minutes.values() for entry in entries]
+
+    def test_plan_holds_only_the_schedules_of_its_date(self):
+        self.assertEqual(self.planned(date(2025, 10, 16)), [('09:30', 'ENTRY')])
+        self.assertEqual(self.planned(date(2025, 10, 23)), [])
+        self.assertEqual(self.planned(date(2025, 10, 20)), [('15:15', 'EXIT')])
+
+    def test_compile_still_runs_one_discovery_query(self):
+        self.table.query = MagicMock(wraps=self.table.query)
+        compile_schedule_plan(self.table, USER_ID, date(2025, 10, 24))
+        self.assertEqual(self.table.query.call_count, 1)
+
+    def test_horizon_extends_when_running_short(self):
+        self.assertEqual(positional_schedule.extend_positional_horizons(self.table, USER_ID, date(2025, 10, 14)), 0)
+        self.assertEqual(positional_schedule.extend_positional_horizons(self.table, USER_ID, date(2025, 10, 27)), 1)
+
+        index = self.table.get_item(Key={'user_id': USER_ID, 'sort_key': 'POSITIONAL#pos-001'})['Item']
+        self.assertEqual(index['materialised_until'], '2025-12-11')
+
+    def test_strategy_delete_removes_dated_schedules(self):
+        result = strategy_manager_phase1.delete_strategy_schedules(USER_ID, 'pos-001', self.table)
+
+        self.assertEqual(result['deleted_count'], 6)
+        remaining = [item['sort_key'] for item in self.table.scan()['Items']]
+        self.assertFalse([key for key in remaining if key.startswith(('SCHEDULE#', 'POSITIONAL#'))])
+
+
+@mock_aws
+class TestOvernightCarryForward(unittest.TestCase):
+    """Open positional positions move into the next session's rows"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.history = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'execution_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        for key, strategy_id, expiry in (('2025-10-16#pos-ce', 'pos-001', '2025-10-20'),
+                                         ('2025-10-16#pos-old', 'pos-001', '2025-10-14'),
+                                         ('2025-10-16#intraday', 'intra-001', '2025-10-20')):
+            self.history.put_item(Item={'user_id': USER_ID, 'execution_key': key, 'strategy_id': strategy_id,
+                                        'expiry_date': expiry, 'position_status': 'OPEN', 'current_price': 120})
+
+    def status(self, key):
+        return self.history.get_item(Key={'user_id': USER_ID, 'execution_key': key})['Item']
+
+    def test_carry_forward_is_reconciled_once(self):
+        counts = positional_schedule.carry_forward_positions(self.history, USER_ID, date(2025, 10, 17), ['pos-001'])
+        self.assertEqual(counts, {'carried': 1, 'expired': 1, 'unreconciled': 1})
+
+        carried = self.status('2025-10-17#pos-ce')
+        self.assertEqual((carried['position_status'], carried['carried_from'], carried['carry_count']),
+                         ('OPEN', '2025-10-16', 1))
+        self.assertEqual(carried['previous_close'], 120)
+        self.assertEqual(self.status('2025-10-16#pos-ce')['position_status'], 'CARRIED_FORWARD')
+        self.assertEqual(self.status('2025-10-16#pos-old')['position_status'], 'EXPIRED')
+
+        again = positional_schedule.carry_forward_positions(self.history, USER_ID, date(2025, 10, 17), ['pos-001'])
+        self.assertEqual(again, {'carried': 0, 'expired': 0, 'unreconciled': 1})
+
+    def test_weekend_carries_from_friday(self):
+        self.history.put_item(Item={'user_id': USER_ID, 'execution_key': '2025-10-17#pos-pe', 'strategy_id': 'pos-001',
+                                    'expiry_date': '2025-10-20', 'position_status': 'OPEN'})
+        positional_schedule.carry_forward_positions(self.history, USER_ID, date(2025, 10, 20), ['pos-001'])
+        self.assertEqual(self.status('2025-10-20#pos-pe')['carried_from'], '2025-10-17')
+
+
+if __name__ == '__main__':
+    unittest.main()
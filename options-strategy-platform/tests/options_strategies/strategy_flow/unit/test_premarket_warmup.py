@@ -0,0 +1,234 @@
+"""
+Test cases for the pre-market warm-up
+Covers opening-window snapshots, broker session checks and the executor's warm read path
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch, MagicMock
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+os.environ['ENVIRONMENT'] = 'dev'
+
+import event_emitter
+import single_strategy_executor
+import strategy_entry_handler
+import strategy_manager_phase1
+import premarket_warmup_handler
+
+USER_ID = 'user-001'
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = datetime(2025, 10, 13, 9, 15, tzinfo=IST)  # Monday
+
+
+@mock_aws
+class TestPremarketWarmup(unittest.TestCase):
+    """Opening-window strategies are snapshotted once and broker sessions checked before the open"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                {'AttributeName': 'schedule_key', 'AttributeType': 'S'},
+                {'AttributeName': 'basket_id', 'AttributeType': 'S'},
+                {'AttributeName': 'entity_type_priority', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'UserScheduleDiscovery',
+                    'KeySchema': [
+                        {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                        {'AttributeName': 'schedule_key', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                },
+                {
+                    'IndexName': 'AllocationsByBasket',
+                    'KeySchema': [
+                        {'AttributeName': 'basket_id', 'KeyType': 'HASH'},
+                        {'AttributeName': 'entity_type_priority', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        secrets_client = boto3.client('secretsmanager', region_name='ap-south-1')
+        secrets_client.create_secret(
+            Name=f'ql-zerodha-oauth-tokens-dev-{USER_ID}-ZD1234',
+            SecretString=json.dumps({'api_key': 'key', 'access_token': 'token'})
+        )
+
+        single_strategy_executor.dynamodb = dynamodb
+        single_strategy_executor.secrets_client = secrets_client
+        single_strategy_executor._credentials_cache.clear()
+        strategy_entry_handler.dynamodb = dynamodb
+        premarket_warmup_handler.dynamodb = dynamodb
+
+        self.broker = MagicMock()
+        self.broker.connect.return_value = True
+        patch.object(premarket_warmup_handler, 'get_trading_strategy', return_value=self.broker).start()
+        self.addCleanup(patch.stopall)
+
+        self.seed_strategy('strategy-open', 'basket-001', '09:20')
+        self.seed_strategy('strategy-late', 'basket-001', '10:00')
+        self.seed_allocation('basket-001', 'alloc-1', 'zerodha', 'ZD1234')
+        self.seed_allocation('basket-001', 'alloc-2', 'zebu', 'ZB5678')
+        self.seed_allocation('basket-001', 'alloc-3', 'paper', 'PAPER01')
+
+    def seed_strategy(self, strategy_id, basket_id, entry_time):
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': f'STRATEGY#{strategy_id}',
+            'strategy_id': strategy_id,
+            'strategy_name': strategy_id,
+            'basket_id': basket_id,
+            'status': 'ACTIVE',
+            'underlying': 'NIFTY',
+            'legs': [{'leg_id': 'leg-1', 'option_type': 'CALL', 'action': 'SELL', 'lots': 1}]
+        })
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': f'SCHEDULE#MON#{entry_time}#ENTRY#{strategy_id}',
+            'schedule_key': f'SCHEDULE#MON#{entry_time}#ENTRY#{strategy_id}',
+            'strategy_id': strategy_id,
+            'basket_id': basket_id,
+            'execution_time': entry_time,
+            'execution_type': 'ENTRY',
+            'weekday': 'MON',
+            'status': 'ACTIVE'
+        })
+
+    def seed_allocation(self, basket_id, allocation_id, broker_name, client_id):
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': f'BASKET_ALLOCATION#{allocation_id}',
+            'basket_id': basket_id,
+            'entity_type_priority': f'BASKET_ALLOCATION#001#{allocation_id}',
+            'allocation_id': allocation_id,
+            'broker_name': broker_name,
+            'client_id': client_id,
+            'lot_multiplier': 1,
+            'priority': 1,
+            'status': 'ACTIVE'
+        })
+
+    def item(self, sort_key):
+        return self.table.get_item(Key={'user_id': USER_ID, 'sort_key': sort_key}).get('Item')
+
+    def test_opening_window_strategies_are_snapshotted(self):
+        """Only entries between 09:15 and 09:30 are prefetched, with their basket allocations"""
+        result = premarket_warmup_handler.warm_up_user(self.table, USER_ID, MARKET_OPEN, 15)
+
+        self.assertEqual(result['strategies_warmed'], 1)
+        snapshot = self.item('WARM_STRATEGY#strategy-open')
+        self.assertEqual(snapshot['strategy']['strategy_name'], 'strategy-open')
+        self.assertEqual(sorted(a['allocation_id'] for a in snapshot['allocations']),
+                         ['alloc-1', 'alloc-2', 'alloc-3'])
+        self.assertEqual(snapshot['valid_until'], (MARKET_OPEN + timedelta(minutes=15)).astimezone(timezone.utc).isoformat())
+        self.assertIsNone(self.item('WARM_STRATEGY#strategy-late'))
+
+    def test_broker_sessions_are_validated_once_per_account(self):
+        """Live accounts are connected once; missing credentials are recorded, paper is skipped"""
+        result = premarket_warmup_handler.warm_up_user(self.table, USER_ID, MARKET_OPEN, 15)
+
+        self.assertEqual(result['sessions'], {'zebu#ZB5678': 'MISSING', 'zerodha#ZD1234': 'VALID'})
+        self.broker.connect.assert_called_once_with({'api_key': 'key', 'access_token': 'token', 'user_id': 'ZD1234'})
+        self.assertEqual(self.item('BROKER_SESSION#zerodha#ZD1234')['session_status'], 'VALID')
+        self.assertIsNone(self.item('BROKER_SESSION#paper#PAPER01'))
+
+        self.broker.connect.return_value = False
+        single_strategy_executor._credentials_cache.clear()
+        result = premarket_warmup_handler.warm_up_user(self.table, USER_ID, MARKET_OPEN, 15)
+        self.assertEqual(result['sessions']['zerodha#ZD1234'], 'INVALID')
+
+    def test_executor_reads_snapshot_until_window_closes(self):
+        """The snapshot is served before valid_until, ignored after, and dropped on strategy update"""
+        premarket_warmup_handler.warm_up_user(self.table, USER_ID, MARKET_OPEN, 15)
+
+        during = single_strategy_executor.get_warm_strategy_snapshot(
+            self.table, USER_ID, 'strategy-open', now=MARKET_OPEN + timedelta(minutes=1))
+        after = single_strategy_executor.get_warm_strategy_snapshot(
+            self.table, USER_ID, 'strategy-open', now=MARKET_OPEN + timedelta(minutes=15))
+
+        self.assertEqual(during['basket_id'], 'basket-001')
+        self.assertIsNone(after)
+
+        strategy_manager_phase1.delete_warm_strategy_snapshot(USER_ID, 'strategy-open', self.table)
+        self.assertIsNone(self.item('WARM_STRATEGY#strategy-open'))
+
+    def test_credentials_are_cached_between_executions(self):
+        """A warm container skips Secrets Manager for repeat executions on the same account"""
+        first = single_strategy_executor.get_broker_credentials(USER_ID, 'ZD1234', 'zerodha')
+        single_strategy_executor.secrets_client.delete_secret(
+            SecretId=f'ql-zerodha-oauth-tokens-dev-{USER_ID}-ZD1234', ForceDeleteWithoutRecovery=True)
+
+        self.assertEqual(single_strategy_executor.get_broker_credentials(USER_ID, 'ZD1234', 'zerodha'), first)
+
+    def test_warmup_fans_out_one_event_per_user(self):
+        """The global event emits per-user events in batches; users whose event failed are warmed inline"""
+        user_ids = [f'user-{i:03d}' for i in range(12)]
+        events = MagicMock()
+        events.put_events.side_effect = [
+            {'FailedEntryCount': 0, 'Entries': [{'EventId': 'e'}] * 10},
+            {'FailedEntryCount': 1, 'Entries': [{'EventId': 'e'}, {'ErrorCode': 'ThrottlingException'}]},
+        ]
+
+        with patch.object(premarket_warmup_handler, 'eventbridge_client', events), \
+                patch.object(premarket_warmup_handler, 'warm_up_user') as warm_up_user:
+            summary = premarket_warmup_handler.emit_user_warmup_events(
+                self.table, user_ids, MARKET_OPEN, '09:15', 15)
+
+        self.assertEqual(summary, {'users': 12, 'events_emitted': 11, 'warmed_inline': 1})
+        self.assertEqual([len(c.kwargs['Entries']) for c in events.put_events.call_args_list], [10, 2])
+        detail = json.loads(events.put_events.call_args_list[0].kwargs['Entries'][0]['Detail'])
+        self.assertEqual(detail, {'user_id': 'user-000', 'market_open_time': '09:15', 'warm_window_minutes': 15})
+        warm_up_user.assert_called_once_with(self.table, 'user-011', MARKET_OPEN, 15)
+
+    def test_user_event_warms_that_user(self):
+        """A Warmup.User.Triggered event runs the warm-up for its user only"""
+        event = {'detail-type': 'Warmup.User.Triggered',
+                 'detail': {'user_id': USER_ID, 'market_open_time': '09:15', 'warm_window_minutes': 15}}
+
+        with patch.object(premarket_warmup_handler, 'warm_up_user',
+                          return_value={'strategies_warmed': 1, 'sessions': {}}) as warm_up_user:
+            response = premarket_warmup_handler.lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(warm_up_user.call_args.args[1], USER_ID)
+
+    def test_warmup_runs_in_the_pre_market_phase(self):
+        """09:00-09:15 is PRE_MARKET and the warm-up event is emitted once at 09:05"""
+        self.assertEqual(event_emitter.get_market_phase(MARKET_OPEN.replace(hour=9, minute=5)), 'PRE_MARKET')
+        self.assertEqual(event_emitter.get_market_phase(MARKET_OPEN), 'MARKET_OPEN')
+        self.assertEqual(event_emitter.get_market_phase(MARKET_OPEN.replace(hour=8, minute=58)), 'AFTER_HOURS')
+
+        event = event_emitter.create_premarket_warmup_event(MARKET_OPEN.replace(hour=9, minute=5), 'PRE_MARKET')
+        self.assertEqual(event['detail_type'], 'Warmup.PreMarket.Triggered')
+        self.assertEqual(event['detail']['market_open_time'], '09:15')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Test cases for intraday candles and range breakout entries
+Covers candle aggregation, breakout registration by the entry handler and firing on ticks
+"""
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+import candle_store
+import breakout_evaluator
+import market_data_refresher
+import strategy_entry_handler
+
+USER_ID = 'user-001'
+IST = timezone(timedelta(hours=5, minutes=30))
+BROKER_CONTEXT = {'broker_id': 'b-1', 'client_id': 'AB1234', 'broker_name': 'zerodha', 'broker_config': {}}
+
+
+def at(hour, minute, second=0):
+    return datetime(2025, 10, 16, hour, minute, second, tzinfo=IST)
+
+
+def create_trading_table():
+    dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+    return dynamodb, dynamodb.create_table(
+        TableName='test-trading-configurations',
+        KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                   {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                              {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+class TestCandleAggregation(unittest.TestCase):
+    """Ticks fold into session-aligned candles of every interval"""
+
+    def test_buckets_align_to_the_session_open(self):
+        self.assertEqual(candle_store.candle_start(at(9, 20, 40), 3), at(9, 18))
+        self.assertEqual(candle_store.candle_start(at(9, 29, 59), 15), at(9, 15))
+        self.assertEqual(candle_store.candle_start(at(9, 30), 15), at(9, 30))
+
+    def test_ticks_build_ohlc(self):
+        store = candle_store.CandleStore()
+        for second, price in ((5, 100), (20, 104), (40, 98), (55, 101)):
+            candles = store.on_tick('nifty', price, at(9, 16, second))
+
+        one_minute = next(c for c in candles if c['interval'] == 1)
+        self.assertEqual((one_minute['open'], one_minute['high'], one_minute['low'], one_minute['close']),
+                         (100, 104, 98, 101))
+        self.assertEqual(sorted(c['interval'] for c in candles), [1, 3, 5, 15])
+
+
+@mock_aws
+class TestRangeBreakoutEntry(unittest.TestCase):
+    """Breakout strategies register at entry time and enter once the range breaks"""
+
+    def setUp(self):
+        self.dynamodb, self.table = create_trading_table()
+        self.emit = MagicMock(return_value={'strategy_id': 'orb', 'status': 'EMITTED'})
+
+        patch.object(strategy_entry_handler, 'dynamodb', self.dynamodb).start()
+        patch.object(strategy_entry_handler, 'RANGE_BREAKOUT_ENTRIES_ENABLED', True).start()
+        patch.object(market_data_refresher, 'dynamodb', self.dynamodb).start()
+        patch.object(market_data_refresher, '_candle_store', None).start()
+        patch.object(market_data_refresher, 'emit_strategy_execution_event', self.emit).start()
+        self.addCleanup(patch.stopall)
+
+    def refresh(self, ticks):
+        return market_data_refresher.refresh_market_data({'ticks': [
+            {'underlying': 'NIFTY', 'last_price': price, 'timestamp': moment.isoformat()} for moment, price in ticks
+        ]})
+
+    # Due ENTRY schedules as the schedule plan carries them
+    SCHEDULES = [{'strategy_id': 'orb', 'basket_id': 'basket-001', 'execution_time': '09:16',
+                  'underlying': 'NIFTY', 'range_breakout_time': '09:20'},
+                 {'strategy_id': 'clock', 'basket_id': 'basket-001', 'execution_time': '09:16'}]
+
+    def register(self):
+        configs = strategy_entry_handler.get_range_breakout_configs(self.SCHEDULES)
+        self.assertEqual(list(configs), ['orb'])
+        return strategy_entry_handler.register_breakout_entry(
+            USER_ID, self.SCHEDULES[0], configs['orb'], 'THU', BROKER_CONTEXT, {'lot_multiplier': 1.5}, at(9, 16))
+
+    def test_clock_time_entry_without_a_tick_feed(self):
+        """Until a feed populates Refresh Market Data, breakout strategies enter at the clock time"""
+        with patch.object(strategy_entry_handler, 'RANGE_BREAKOUT_ENTRIES_ENABLED', False):
+            self.assertEqual(strategy_entry_handler.get_range_breakout_configs(self.SCHEDULES), {})
+
+    def test_entry_fires_once_after_the_range_breaks(self):
+        self.assertEqual(self.register()['status'], 'BREAKOUT_REGISTERED')
+        self.assertEqual(self.register()['status'], 'BREAKOUT_ALREADY_REGISTERED')
+
+        # Range 09:16-09:20 is 24950-25050; a new high inside the range window does not fire
+        self.refresh([(at(9, 16, 10), 25000), (at(9, 17, 30), 25050), (at(9, 19, 0), 24950)])
+        result = self.refresh([(at(9, 20, 5), 25040), (at(9, 21, 0), 25049)])
+        self.assertEqual(result['breakout_entries'], 0)
+        self.emit.assert_not_called()
+
+        result = self.refresh([(at(9, 22, 0), 25060), (at(9, 22, 30), 25080)])
+        self.assertEqual(result['breakout_entries'], 1)
+        self.assertEqual(result['candles_written'], 4)
+        kwargs = self.emit.call_args.kwargs
+        self.assertEqual((kwargs['user_id'], kwargs['execution_type'], kwargs['weekday']), (USER_ID, 'ENTRY', 'THU'))
+        self.assertEqual(kwargs['broker_context']['client_id'], 'AB1234')
+
+        condition = self.table.get_item(Key={'user_id': 'BREAKOUT#NIFTY#2025-10-16',
+                                             'sort_key': f'{USER_ID}#orb#AB1234'})['Item']
+        self.assertEqual(condition['condition_status'], 'TRIGGERED')
+        self.assertEqual(condition['breakout']['direction'], 'UP')
+        self.assertEqual((condition['range_high'], condition['range_low']), (25050, 24950))
+
+        self.refresh([(at(9, 23, 0), 24000)])
+        self.assertEqual(self.emit.call_count, 1)
+
+    def test_other_instruments_are_not_evaluated(self):
+        """A BANKNIFTY tick never reads NIFTY conditions"""
+        self.register()
+        evaluator = breakout_evaluator.BreakoutEvaluator(self.table, candle_store.CandleStore(self.table), self.emit)
+
+        self.assertEqual(evaluator.pending_conditions('BANKNIFTY', '2025-10-16'), [])
+        self.assertEqual(len(evaluator.pending_conditions('NIFTY', '2025-10-16')), 1)
+
+    def test_no_entry_after_cutoff(self):
+        self.register()
+        self.refresh([(at(9, 17), 25000), (at(9, 18), 25010)])
+
+        with patch.object(breakout_evaluator, 'BREAKOUT_ENTRY_CUTOFF', '09:30'):
+            self.refresh([(at(9, 31), 26000)])
+
+        self.emit.assert_not_called()
+        condition = self.table.get_item(Key={'user_id': 'BREAKOUT#NIFTY#2025-10-16',
+                                             'sort_key': f'{USER_ID}#orb#AB1234'})['Item']
+        self.assertEqual(condition['condition_status'], 'EXPIRED')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Test cases for the delayed retry scheduler and the re-execute handler
+Covers backoff routing, the time-bucketed retry index, per-broker dispatch limits, retry eligibility
+and the executor running only the retried legs
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+NOW = datetime(2025, 10, 13, 4, 3, 20, tzinfo=timezone.utc)
+
+EXECUTION_DETAIL = {
+    'user_id': 'user-001',
+    'strategy_id': 'strategy-001',
+    'basket_id': 'basket-001',
+    'execution_type': 'ENTRY',
+    'execution_time': '09:30',
+    'weekday': 'MON',
+    'broker_name': 'zerodha',
+    'client_id': 'ZD1234'
+}
+
+
+@mock_aws
+class TestRetryScheduler(unittest.TestCase):
+    """Failed legs are parked until due, then released within broker limits"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'execution_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.sqs = boto3.client('sqs', region_name='ap-south-1')
+        self.queue_url = self.sqs.create_queue(QueueName='test-strategy-retry')['QueueUrl']
+        os.environ['RETRY_QUEUE_URL'] = self.queue_url
+
+        import retry_scheduler
+        retry_scheduler.dynamodb = dynamodb
+        retry_scheduler.sqs_client = self.sqs
+        retry_scheduler.eventbridge_client = MagicMock()
+        self.scheduler = retry_scheduler
+
+    def queued(self):
+        attributes = self.sqs.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesDelayed']
+        )['Attributes']
+        return int(attributes['ApproximateNumberOfMessages']) + int(attributes['ApproximateNumberOfMessagesDelayed'])
+
+    def index_items(self):
+        return self.table.scan()['Items']
+
+    def test_backoff_routes_short_delays_to_queue_and_long_to_index(self):
+        """Up to 15 minutes rides SQS DelaySeconds; beyond that lands in a time bucket"""
+        self.assertEqual([self.scheduler.retry_delay_seconds(n) for n in (1, 2, 3)], [60, 120, 240])
+
+        short = self.scheduler.schedule_retry({**EXECUTION_DETAIL, 'retry_number': 1}, NOW)
+        long = self.scheduler.schedule_retry({**EXECUTION_DETAIL, 'retry_number': 1}, NOW, delay_seconds=1800)
+
+        self.assertEqual(short['mechanism'], 'SQS_DELAY')
+        self.assertEqual(long['mechanism'], 'RETRY_INDEX')
+        self.assertEqual(self.queued(), 1)
+
+        items = self.index_items()
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]['user_id'], 'RETRY_INDEX#2025-10-13T04:30')
+
+    def test_sweep_releases_only_entries_coming_due(self):
+        """The sweep leaves far-off entries alone and releases each due entry once"""
+        self.scheduler.schedule_retry({**EXECUTION_DETAIL, 'retry_number': 1}, NOW, delay_seconds=1800)
+
+        self.assertEqual(self.scheduler.release_due_retries(NOW), 0)
+        self.assertEqual(len(self.index_items()), 1)
+
+        later = NOW + timedelta(minutes=20)
+        self.assertEqual(self.scheduler.release_due_retries(later), 1)
+        self.assertEqual(self.scheduler.release_due_retries(later), 0)
+        self.assertEqual(self.index_items(), [])
+        self.assertEqual(self.queued(), 1)
+
+    def test_sweep_reads_every_page_of_a_bucket(self):
+        """A bucket larger than one query page is released in full"""
+        for _ in range(3):
+            self.scheduler.schedule_retry({**EXECUTION_DETAIL, 'retry_number': 1}, NOW, delay_seconds=1800)
+
+        table = self.scheduler.dynamodb.Table('test-execution-history')
+        query = table.query
+        paged = MagicMock(wraps=table)
+        paged.query.side_effect = lambda **kwargs: query(**kwargs, Limit=1)
+        with patch.object(self.scheduler.dynamodb, 'Table', return_value=paged):
+            released = self.scheduler.release_due_retries(NOW + timedelta(minutes=20))
+
+        self.assertEqual(released, 3)
+        self.assertGreaterEqual(paged.query.call_count, 3)
+        self.assertEqual(self.index_items(), [])
+
+    def test_dispatch_is_bounded_per_broker(self):
+        """Retries past a broker's limit are deferred; other brokers are unaffected"""
+        retries = [{**EXECUTION_DETAIL, 'retry_number': 1} for _ in range(7)]
+        retries.append({**EXECUTION_DETAIL, 'broker_name': 'paper', 'retry_number': 1})
+
+        result = self.scheduler.dispatch_due_retries(retries, NOW)
+
+        self.assertEqual(result, {'dispatched': 6, 'deferred': 2})
+        self.assertEqual(self.queued(), 2)
+        entries = [e for call in self.scheduler.eventbridge_client.put_events.call_args_list
+                   for e in call.kwargs['Entries']]
+        self.assertEqual(len(entries), 6)
+        self.assertEqual(entries[0]['DetailType'], 'Strategy.Execution.Triggered')
+        self.assertEqual(json.loads(entries[0]['Detail'])['execution_time'], '09:30')
+
+    def test_failed_execution_retry_eligibility(self):
+        """Retry numbers advance until exhausted and non-retryable failures are dropped"""
+        failed = [{'leg_id': 'leg-1', 'message': 'Broker timeout'},
+                  {'leg_id': 'leg-2', 'message': 'INSUFFICIENT_FUNDS'}]
+
+        with patch.object(self.scheduler, 'send_to_retry_queue') as send:
+            scheduled = self.scheduler.schedule_failed_execution_retry(EXECUTION_DETAIL, failed, NOW)
+        self.assertEqual(scheduled['mechanism'], 'SQS_DELAY')
+        self.assertEqual(scheduled['delay_seconds'], 60)
+        self.assertEqual(send.call_args[0][0]['failed_leg_ids'], ['leg-1'])
+
+        self.assertIsNone(self.scheduler.schedule_failed_execution_retry(
+            EXECUTION_DETAIL, [{'leg_id': 'leg-2', 'message': 'INSUFFICIENT_FUNDS'}], NOW))
+
+        self.assertIsNone(self.scheduler.schedule_failed_execution_retry(
+            {**EXECUTION_DETAIL, 'retry_number': 3}, failed, NOW))
+
+    def test_handler_dispatches_records_and_sweeps_on_events(self):
+        """SQS batches are dispatched; EventBridge invocations sweep the index"""
+        import re_execute_handler
+
+        body = json.dumps({**EXECUTION_DETAIL, 'retry_number': 2})
+        response = re_execute_handler.lambda_handler(
+            {'Records': [{'messageId': 'm1', 'body': body}, {'messageId': 'm2', 'body': 'not json'}]}, None
+        )
+        self.assertEqual(json.loads(response['body'])['result'], {'dispatched': 1, 'deferred': 0})
+
+        with patch.object(re_execute_handler, 'release_due_retries', return_value=3) as sweep:
+            response = re_execute_handler.lambda_handler({'detail-type': 'Retry.Index.Sweep', 'detail': {}}, None)
+        sweep.assert_called_once()
+        self.assertEqual(json.loads(response['body'])['mode'], 'SWEEP')
+
+
+class TestRetriedLegs(unittest.TestCase):
+    """A retry places only the legs that failed retryably"""
+
+    def test_executor_runs_only_failed_legs(self):
+        import single_strategy_executor
+
+        strategy = {'strategy_id': 'strategy-001', 'basket_id': 'basket-001', 'strategy_name': 'Short Straddle',
+                    'legs': [{'leg_id': 'leg-1'}, {'leg_id': 'leg-2'}, {'leg_id': 'leg-3'}]}
+        event = {**EXECUTION_DETAIL, 'retry_number': 1, 'failed_leg_ids': ['leg-1'],
+                 'allocation': {'client_id': 'ZD1234', 'broker_name': 'zerodha'}, 'allocation_preloaded': True}
+
+        with patch.object(single_strategy_executor, 'dynamodb', MagicMock()), \
+                patch.object(single_strategy_executor, 'get_warm_strategy_snapshot', return_value=None), \
+                patch.object(single_strategy_executor, 'get_complete_strategy_data', return_value=strategy), \
+                patch.object(single_strategy_executor, 'execute_single_strategy_with_broker_allocations',
+                             return_value={'status': 'success'}) as execute:
+            response = single_strategy_executor.lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual([leg['leg_id'] for leg in execute.call_args.kwargs['strategy']['legs']], ['leg-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
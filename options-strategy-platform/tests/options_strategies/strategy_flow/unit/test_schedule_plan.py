@@ -0,0 +1,165 @@
+"""
+Test cases for the precompiled schedule plan
+Covers daily compilation into hour shards, keyed minute reads and generation-based invalidation
+"""
+import unittest
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+import schedule_strategy_trigger
+import strategy_entry_handler
+from schedule_plan import compile_schedule_plan, get_planned_schedules, invalidate_schedule_plan, plan_sort_key
+
+USER_ID = 'user-001'
+IST = timezone(timedelta(hours=5, minutes=30))
+MONDAY = datetime(2025, 10, 13, 9, 0, tzinfo=IST)
+
+
+def at(hour, minute):
+    return MONDAY.replace(hour=hour, minute=minute)
+
+
+@mock_aws
+class TestSchedulePlan(unittest.TestCase):
+    """Minute discovery reads a compiled plan instead of querying the schedule GSI"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                {'AttributeName': 'schedule_key', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'UserScheduleDiscovery',
+                'KeySchema': [
+                    {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'schedule_key', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        strategy_entry_handler.dynamodb = dynamodb
+
+        self.seed_schedule('strategy-a', 'MON', '09:20', 'ENTRY')
+        self.seed_schedule('strategy-b', 'MON', '09:59', 'ENTRY')
+        self.seed_schedule('strategy-c', 'MON', '10:01', 'ENTRY')
+        self.seed_schedule('strategy-a', 'MON', '15:20', 'EXIT')
+        self.seed_schedule('strategy-d', 'TUE', '09:20', 'ENTRY')
+        self.seed_schedule('strategy-e', 'MON', '09:21', 'ENTRY', status='PAUSED')
+
+    def seed_schedule(self, strategy_id, weekday, execution_time, execution_type, status='ACTIVE'):
+        key = f'SCHEDULE#{weekday}#{execution_time}#{execution_type}#{strategy_id}'
+        self.table.put_item(Item={
+            'user_id': USER_ID,
+            'sort_key': key,
+            'schedule_key': key,
+            'strategy_id': strategy_id,
+            'basket_id': 'basket-001',
+            'execution_time': execution_time,
+            'execution_type': execution_type,
+            'weekday': weekday,
+            'status': status,
+            'entity_type': 'SCHEDULE'
+        })
+
+    def count_queries(self):
+        self.table.query = MagicMock(wraps=self.table.query)
+        return self.table.query
+
+    def test_compile_writes_every_hour_shard(self):
+        """Today's ACTIVE schedules land in their hour shard; quiet hours get an empty shard"""
+        shards = compile_schedule_plan(self.table, USER_ID, MONDAY.date())
+
+        self.assertEqual(len(shards), 24)
+        self.assertEqual(sorted(shards['09']), ['09:20', '09:59'])
+        self.assertEqual(shards['15']['15:20'][0]['execution_type'], 'EXIT')
+        stored = self.table.get_item(Key={'user_id': USER_ID, 'sort_key': plan_sort_key(MONDAY.date(), '12')})['Item']
+        self.assertEqual(stored['minutes'], {})
+        self.assertEqual(stored['entry_count'], 0)
+
+    def test_minute_path_is_a_keyed_read_once_compiled(self):
+        """The first read compiles; later reads never touch the GSI"""
+        queries = self.count_queries()
+
+        first = get_planned_schedules(self.table, USER_ID, at(9, 18), at(9, 21), execution_type='ENTRY')
+        second = get_planned_schedules(self.table, USER_ID, at(9, 19), at(9, 22), execution_type='ENTRY')
+
+        self.assertEqual([s['strategy_id'] for s in first], ['strategy-a'])
+        self.assertEqual(second, first)
+        self.assertEqual(queries.call_count, 1)
+
+    def test_window_across_an_hour_boundary_reads_both_shards(self):
+        """09:58-10:01 spans the 09 and 10 shards"""
+        schedules = get_planned_schedules(self.table, USER_ID, at(9, 58), at(10, 1))
+        self.assertEqual([s['strategy_id'] for s in schedules], ['strategy-b', 'strategy-c'])
+
+    def test_invalidation_recompiles_on_next_read(self):
+        """A schedule change bumps the generation, so the next read sees it"""
+        compile_schedule_plan(self.table, USER_ID, MONDAY.date())
+        self.seed_schedule('strategy-f', 'MON', '09:20', 'ENTRY')
+
+        stale = get_planned_schedules(self.table, USER_ID, at(9, 20), at(9, 20))
+        self.assertEqual([s['strategy_id'] for s in stale], ['strategy-a'])
+
+        invalidate_schedule_plan(self.table, USER_ID, MONDAY.date())
+        queries = self.count_queries()
+        fresh = get_planned_schedules(self.table, USER_ID, at(9, 20), at(9, 20))
+
+        self.assertEqual([s['strategy_id'] for s in fresh], ['strategy-a', 'strategy-f'])
+        self.assertEqual(queries.call_count, 1)
+        shard = self.table.get_item(Key={'user_id': USER_ID, 'sort_key': plan_sort_key(MONDAY.date(), '09')})['Item']
+        self.assertEqual(shard['generation'], 1)
+
+    def test_plan_carries_range_breakout_settings(self):
+        """ENTRY entries of breakout strategies carry the range end, read once at compile time"""
+        self.table.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-a', 'strategy_id': 'strategy-a',
+                                  'underlying': 'NIFTY', 'range_breakout': True, 'range_breakout_time': '09:25'})
+        self.table.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-b', 'strategy_id': 'strategy-b',
+                                  'underlying': 'NIFTY', 'range_breakout': False})
+
+        shards = compile_schedule_plan(self.table, USER_ID, MONDAY.date())
+
+        entry = shards['09']['09:20'][0]
+        self.assertEqual((entry['underlying'], entry['range_breakout_time']), ('NIFTY', '09:25'))
+        self.assertNotIn('range_breakout_time', shards['09']['09:59'][0])
+        self.assertNotIn('range_breakout_time', shards['15']['15:20'][0])
+
+    def test_handlers_read_the_plan(self):
+        """Entry discovery keeps ENTRY schedules; the lookahead trigger starts one minute ahead"""
+        entries = strategy_entry_handler.query_due_entry_schedules(USER_ID, at(15, 18), 3)
+        self.assertEqual(entries, [])
+
+        entries = strategy_entry_handler.query_due_entry_schedules(USER_ID, at(9, 19), 3)
+        self.assertEqual([s['strategy_id'] for s in entries], ['strategy-a'])
+
+        planned = schedule_strategy_trigger.discover_planned_strategies(self.table, USER_ID, at(9, 19), 3)
+        self.assertEqual([(s['strategy_id'], s['scheduled_execution_time']) for s in planned],
+                         [('strategy-a', '09:20')])
+        self.assertEqual(schedule_strategy_trigger.discover_planned_strategies(self.table, USER_ID, at(9, 20), 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
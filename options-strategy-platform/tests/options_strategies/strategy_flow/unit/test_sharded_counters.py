@@ -0,0 +1,167 @@
+"""
+Test cases for sharded subscriber-count and partner-metrics counters
+Covers write spreading, aggregation on read and periodic compaction
+"""
+import unittest
+import os
+import sys
+from decimal import Decimal
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+import marketplace_listing_index
+import sharded_counters
+from sharded_counters import (
+    read_counter_total, get_pending_counts, template_subscriber_counter,
+    partner_metrics_counter, shard_key, dirty_key, _fold_shard
+)
+from subscription_manager import (
+    increment_template_subscriber_count, update_partner_metrics, compact_subscription_counters
+)
+
+
+@mock_aws
+class TestShardedCounters(unittest.TestCase):
+    """Counter increments spread across shards and fold back losslessly"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        sharded_counters._COUNTER_CACHE.clear()
+        marketplace_listing_index._VIEW_CACHE.clear()
+
+        self.table.put_item(Item={
+            'user_id': 'admin-001',
+            'sort_key': 'BASKET#template-001',
+            'basket_id': 'template-001',
+            'name': 'Iron Condor Weekly',
+            'category': 'INCOME',
+            'subscriber_count': Decimal(3),
+            'marketplace_config': {'is_template': True, 'visibility': 'PUBLIC', 'difficulty_level': 'BEGINNER'}
+        })
+        self.table.put_item(Item={
+            'user_id': 'PARTNER',
+            'sort_key': 'PARTNER_API_KEY#key-001',
+            'api_key_id': 'key-001',
+            'metrics': {'total_subscriptions': 0, 'active_users': 0, 'total_revenue': 0}
+        })
+        self.counter_id = template_subscriber_counter('template-001', 'admin-001')[0]
+
+    def template_item(self):
+        return self.table.get_item(Key={'user_id': 'admin-001', 'sort_key': 'BASKET#template-001'})['Item']
+
+    def test_increments_spread_across_shards_and_aggregate_on_read(self):
+        """A burst lands on several shard partitions and reads see the full total"""
+        for _ in range(40):
+            increment_template_subscriber_count('template-001', 'admin-001', self.table)
+        increment_template_subscriber_count('template-001', 'admin-001', self.table, delta=-1)
+
+        shards_written = [
+            shard for shard in range(sharded_counters.COUNTER_SHARD_COUNT)
+            if 'Item' in self.table.get_item(Key=shard_key(self.counter_id, shard))
+        ]
+        self.assertGreater(len(shards_written), 1)
+
+        # The hot template item itself is not written per subscription
+        self.assertEqual(self.template_item()['subscriber_count'], 3)
+        self.assertEqual(
+            read_counter_total(self.table, self.counter_id, 'subscriber_count', self.template_item()['subscriber_count']),
+            42
+        )
+
+    def test_compaction_folds_shards_and_refreshes_listing(self):
+        """Compaction moves shard totals onto the template and partner items"""
+        for _ in range(25):
+            increment_template_subscriber_count('template-001', 'admin-001', self.table)
+            update_partner_metrics('key-001', self.table)
+
+        result = compact_subscription_counters(self.table)
+
+        self.assertEqual(result['shards_skipped'], 0)
+        self.assertEqual(result['templates_refreshed'], 1)
+        self.assertEqual(self.template_item()['subscriber_count'], 28)
+
+        partner = self.table.get_item(Key={'user_id': 'PARTNER', 'sort_key': 'PARTNER_API_KEY#key-001'})['Item']
+        self.assertEqual(partner['metrics']['total_subscriptions'], 25)
+        self.assertEqual(partner['metrics']['active_users'], 25)
+
+        sharded_counters._COUNTER_CACHE.clear()
+        self.assertEqual(get_pending_counts(self.table, self.counter_id, ['subscriber_count'])['subscriber_count'], 0)
+        partner_counter = partner_metrics_counter('key-001')[0]
+        self.assertEqual(
+            get_pending_counts(self.table, partner_counter, ['metrics.total_subscriptions'])['metrics.total_subscriptions'],
+            0
+        )
+
+        listing = marketplace_listing_index.get_template_listing('template-001', self.table)
+        self.assertEqual(listing['summary']['subscriber_count'], 28)
+
+        # A second run has nothing left to fold
+        self.assertEqual(compact_subscription_counters(self.table)['shards_folded'], 0)
+
+    def test_compaction_reads_dirty_markers_without_scanning(self):
+        """Only shards with a dirty marker are read, and their markers are cleared once folded"""
+        for _ in range(10):
+            increment_template_subscriber_count('template-001', 'admin-001', self.table)
+
+        dirty_shards = [
+            shard for shard in range(sharded_counters.COUNTER_SHARD_COUNT)
+            if 'Item' in self.table.get_item(Key=dirty_key(self.counter_id, shard))
+        ]
+        self.assertTrue(dirty_shards)
+
+        with patch.object(self.table, 'scan', side_effect=AssertionError('compaction must not scan')):
+            result = sharded_counters.compact_counter_shards(self.table)
+
+        self.assertEqual(result['shards_folded'], len(dirty_shards))
+        self.assertEqual(self.template_item()['subscriber_count'], 13)
+        for shard in dirty_shards:
+            self.assertNotIn('Item', self.table.get_item(Key=dirty_key(self.counter_id, shard)))
+
+    def test_increment_during_compaction_is_not_lost(self):
+        """A shard changed after it was read is skipped and folded on the next run"""
+        increment_template_subscriber_count('template-001', 'admin-001', self.table)
+        shard_item = next(
+            self.table.get_item(Key=shard_key(self.counter_id, shard))['Item']
+            for shard in range(sharded_counters.COUNTER_SHARD_COUNT)
+            if 'Item' in self.table.get_item(Key=shard_key(self.counter_id, shard))
+        )
+
+        # Another subscription lands on the same shard after compaction read it
+        self.table.update_item(
+            Key={'user_id': shard_item['user_id'], 'sort_key': shard_item['sort_key']},
+            UpdateExpression='ADD subscriber_count :inc',
+            ExpressionAttributeValues={':inc': 1}
+        )
+
+        self.assertFalse(_fold_shard(self.table, shard_item, {'subscriber_count': 1}))
+        self.assertEqual(self.template_item()['subscriber_count'], 3)
+
+        compact_subscription_counters(self.table)
+        self.assertEqual(self.template_item()['subscriber_count'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
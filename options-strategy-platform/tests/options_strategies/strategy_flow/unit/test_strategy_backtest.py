@@ -0,0 +1,103 @@
+"""
+Test cases for the offline strategy backtester
+Covers a strategy-day through entry, risk-handler exits and time exit on historical bars
+"""
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add the project root, option_baskets (flat Lambda imports) and the scripts directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../scripts'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+
+import run_strategy_backtest
+from trading import order_slicer
+
+CONFIG = {
+    'basket_id': 'basket-001',
+    'allocations': [{'broker_name': 'paper', 'client_id': 'PAPER001', 'lot_multiplier': 1}],
+    'strategies': []
+}
+
+STRATEGY = {
+    'strategy_id': 'spread-001',
+    'strategy_name': 'Call Spread',
+    'underlying': 'NIFTY',
+    'entry_time': '09:20',
+    'exit_time': '09:35',
+    'legs': [
+        {'leg_id': 'leg-1', 'option_type': 'CE', 'strike': 25200, 'action': 'SELL', 'lots': 1,
+         'stop_loss': {'type': 'PERCENTAGE', 'value': 30}},
+        {'leg_id': 'leg-2', 'option_type': 'CE', 'strike': 25400, 'action': 'BUY', 'lots': 1}
+    ]
+}
+
+# (minute, short leg close, long leg close)
+BARS = [
+    ('09:15', 98.0, 49.0),
+    ('09:20', 100.0, 50.0),
+    ('09:25', 135.0, 55.0),
+    ('09:30', 120.0, 58.0),
+    ('09:35', 110.0, 60.0),
+    ('09:40', 105.0, 61.0)
+]
+
+
+class TestStrategyBacktest(unittest.TestCase):
+    """A strategy-day runs through the production entry, risk and exit code"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.bars_path = os.path.join(self.directory.name, '2025-10-16.csv')
+        with open(self.bars_path, 'w') as f:
+            f.write('timestamp,symbol,open,high,low,close\n')
+            for minute, short_close, long_close in BARS:
+                timestamp = f'2025-10-16T{minute}:00+05:30'
+                f.write(f'{timestamp},NIFTY25200CE,{short_close},{short_close},{short_close},{short_close}\n')
+                f.write(f'{timestamp},NIFTY25400CE,{long_close},{long_close},{long_close},{long_close}\n')
+
+        # Offline runs are unpaced
+        self.rate_patches = [
+            patch.dict(order_slicer.BROKER_ORDERS_PER_SECOND, {'paper': 0}),
+            patch.dict(order_slicer._RATE_LIMITERS, clear=True)
+        ]
+        for p in self.rate_patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.rate_patches:
+            p.stop()
+        self.directory.cleanup()
+
+    def run_day(self, lot_multiplier=1):
+        return run_strategy_backtest.run_strategy_day({
+            'config': CONFIG,
+            'strategy': STRATEGY,
+            'day': '2025-10-16',
+            'lot_multiplier': lot_multiplier,
+            'bars_path': self.bars_path
+        })
+
+    def test_stop_loss_and_time_exit(self):
+        """The short leg stops out at 09:25 and the long leg exits at exit_time"""
+        result = self.run_day()
+
+        self.assertNotIn('error', result)
+        self.assertEqual(result['exits'], {'STOP_LOSS': 1, 'TIME_EXIT': 1})
+        # Short: (100 - 135) x 25, long: (60 - 50) x 25
+        self.assertEqual(result['pnl'], -625.0)
+        self.assertEqual(result['orders'], 4)
+        self.assertIn('risk_checks', result['timings_ms'])
+
+    def test_lot_multiplier_scales_pnl(self):
+        """A multiplier sweep reuses the same fills at a larger size"""
+        self.assertEqual(self.run_day(lot_multiplier=3)['pnl'], -1875.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Test cases for strategy-level MTM limits
+Covers per-strategy / per-basket aggregation, limit types and the coordinated exit
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+import strategy_mtm
+import strategy_mtm_handler
+
+USER_ID = 'user-001'
+
+
+def position(position_id, strategy_id, position_type, entry_price, current_price, quantity=75,
+             basket_id='basket-001', symbol=None):
+    return {'position_id': position_id, 'strategy_id': strategy_id, 'basket_id': basket_id,
+            'position_type': position_type, 'entry_price': entry_price, 'current_price': current_price,
+            'quantity': quantity, 'symbol': symbol or position_id, 'position_status': 'OPEN'}
+
+
+# Short straddle hedged with wings: -₹3,000 on the shorts, +₹750 on the wings
+IRON_FLY = [
+    position('sce', 'strategy-001', 'SHORT', 100, 120),
+    position('spe', 'strategy-001', 'SHORT', 100, 120),
+    position('lce', 'strategy-001', 'LONG', 20, 25),
+    position('lpe', 'strategy-001', 'LONG', 20, 25),
+]
+
+
+class TestMtmAggregation(unittest.TestCase):
+    """Open position rows fold into running MTM per strategy and per basket"""
+
+    def test_legs_sum_per_strategy_and_basket(self):
+        rows = IRON_FLY + [position('x', 'strategy-002', 'LONG', 50, 60, quantity=15)]
+
+        aggregate = strategy_mtm.aggregate_mtm(rows)
+
+        book = aggregate['strategies']['strategy-001']
+        self.assertEqual((book['mtm'], book['legs'], book['combined_premium']), (-2250.0, 4, 18000.0))
+        self.assertEqual(aggregate['baskets']['basket-001']['mtm'], -2100.0)
+        self.assertEqual(aggregate['baskets']['basket-001']['strategy_ids'], ['strategy-001', 'strategy-002'])
+
+    def test_live_prices_override_position_rows(self):
+        aggregate = strategy_mtm.aggregate_mtm(IRON_FLY, prices={'sce': 100, 'spe': 100})
+        self.assertEqual(aggregate['strategies']['strategy-001']['mtm'], 750.0)
+
+    def test_limit_types(self):
+        """TOTAL_MTM compares rupees, COMBINED_PREMIUM_PERCENT the share of entry premium"""
+        book = strategy_mtm.aggregate_mtm(IRON_FLY)['strategies']['strategy-001']
+
+        self.assertIsNotNone(strategy_mtm.mtm_limit_breached(book, {'type': 'TOTAL_MTM', 'value': 2000}, True))
+        self.assertIsNone(strategy_mtm.mtm_limit_breached(book, {'type': 'TOTAL_MTM', 'value': 2500}, True))
+        self.assertIsNotNone(strategy_mtm.mtm_limit_breached(
+            book, {'type': 'COMBINED_PREMIUM_PERCENT', 'value': 12}, True))  # -12.5%
+        self.assertIsNone(strategy_mtm.mtm_limit_breached(
+            book, {'type': 'TOTAL_MTM', 'value': 2000, 'enabled': False}, True))
+        self.assertIsNone(strategy_mtm.mtm_limit_breached(book, {'type': 'TOTAL_MTM', 'value': 100}, False))
+
+    def test_basket_limit_exits_each_strategy_once(self):
+        rows = IRON_FLY + [position('x', 'strategy-002', 'SHORT', 50, 60, quantity=15)]
+        aggregate = strategy_mtm.aggregate_mtm(rows)
+
+        triggers = strategy_mtm.evaluate_mtm_limits(
+            aggregate,
+            strategy_limits={'strategy-001': {'mtm_stop_loss': {'type': 'TOTAL_MTM', 'value': 2000}}},
+            basket_limits={'basket-001': {'mtm_stop_loss': {'type': 'TOTAL_MTM', 'value': 2300}}}
+        )
+
+        scopes = {t['strategy_id']: (t['scope'], t['execution_type']) for t in triggers}
+        self.assertEqual(scopes, {'strategy-001': ('STRATEGY', 'MTM_STOP_LOSS_EXIT'),
+                                  'strategy-002': ('BASKET', 'MTM_STOP_LOSS_EXIT')})
+
+
+@mock_aws
+class TestStrategyMtmHandler(unittest.TestCase):
+    """One risk tick reads positions and limits once and exits a breached strategy as a whole"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        trading = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.trading = trading
+        self.history = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'execution_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        trading.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-001',
+                               'mtm_stop_loss': {'type': 'TOTAL_MTM', 'value': 2000}})
+
+        self.sqs = boto3.client('sqs', region_name='ap-south-1')
+        self.queue_url = self.sqs.create_queue(QueueName='execution-lane-high.fifo',
+                                               Attributes={'FifoQueue': 'true'})['QueueUrl']
+        patch.dict(os.environ, {'HIGH_PRIORITY_EXIT_QUEUE_URL': self.queue_url}).start()
+        patch.object(strategy_mtm_handler, 'dynamodb', dynamodb).start()
+        patch.object(strategy_mtm_handler, 'sqs_client', self.sqs).start()
+        self.addCleanup(patch.stopall)
+
+    def test_breach_queues_one_exit_for_all_legs(self):
+        with patch.object(strategy_mtm_handler, 'query_active_positions', return_value=IRON_FLY) as query:
+            response = strategy_mtm_handler.lambda_handler({'detail': {'user_id': USER_ID, 'sub_event_id': 's1'}}, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual((body['strategies_checked'], body['exits_triggered']), (1, 1))
+        query.assert_called_once_with(USER_ID)
+
+        messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 1)
+        exit_message = json.loads(messages[0]['Body'])
+        self.assertEqual(exit_message['execution_type'], 'MTM_STOP_LOSS_EXIT')
+        self.assertEqual(exit_message['lane'], 'HIGH')
+        self.assertEqual(sorted(exit_message['position_ids']), ['lce', 'lpe', 'sce', 'spe'])
+
+        record = self.history.scan()['Items'][0]
+        self.assertEqual(record['record_type'], 'STRATEGY_MTM')
+        self.assertEqual(float(record['strategy_mtm']['strategy-001']), -2250.0)
+
+
+    def test_history_rows_breach_once_per_day(self):
+        """Today's OPEN rows are read by execution_key; a second tick does not queue the exit again"""
+        today = datetime.now(timezone.utc).astimezone(timezone(timedelta(hours=5, minutes=30)))
+        for row in IRON_FLY:
+            leg = {k: v for k, v in row.items() if k != 'position_id'}
+            execution_key = f"{today:%Y-%m-%d}#strategy-001#{row['position_id']}"
+            self.history.put_item(Item={'user_id': USER_ID, 'execution_key': execution_key, **leg})
+        self.history.put_item(Item={'user_id': USER_ID, 'execution_key': '2000-01-03#strategy-001#old',
+                                    **dict(IRON_FLY[0], position_id='old')})
+
+        for _ in range(2):
+            body = json.loads(strategy_mtm_handler.lambda_handler(
+                {'detail': {'user_id': USER_ID}}, None)['body'])
+            self.assertEqual((body['strategy_mtm']['strategy-001'], body['exits_triggered']), (-2250.0, 1))
+
+        messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(len(json.loads(messages[0]['Body'])['position_ids']), 4)
+        claim = self.trading.get_item(Key={'user_id': USER_ID, 'sort_key': f"MTM_EXIT#strategy-001#{today:%Y-%m-%d}"})
+        self.assertIn('Item', claim)
+
+    def test_failed_send_releases_the_claim(self):
+        """An exit that could not be queued is retried on the next tick"""
+        trigger = {'strategy_id': 'strategy-001', 'execution_type': 'MTM_STOP_LOSS_EXIT', 'scope': 'STRATEGY',
+                   'reason': 'MTM', 'strategy_mtm': -2250.0, 'position_ids': ['sce']}
+        now = datetime(2025, 10, 13, 10, 0, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+
+        with patch.object(strategy_mtm_handler, 'send_to_lane', side_effect=RuntimeError('throttled')):
+            strategy_mtm_handler.queue_strategy_mtm_exit(USER_ID, trigger, now)
+        strategy_mtm_handler.queue_strategy_mtm_exit(USER_ID, trigger, now)
+
+        messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Test cases for template fan-out triggers
+Covers the per-day claim, its release on failed publishes, exit fan-out and per-subscriber idempotency keys
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+import strategy_exit_handler
+import template_fanout
+import template_fanout_executor
+
+ADMIN_ID = 'admin-001'
+IST = timezone(timedelta(hours=5, minutes=30))
+NOW = datetime(2025, 10, 13, 15, 19, tzinfo=IST)  # Monday
+SCHEDULE = {'strategy_id': 'strategy-001', 'basket_id': 'template-001', 'execution_time': '15:20'}
+
+
+@mock_aws
+class TestTemplateFanoutTriggers(unittest.TestCase):
+    """Each template schedule fans out once a day, for entries and exits"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.table.put_item(Item={'user_id': ADMIN_ID, 'sort_key': 'BASKET#template-001',
+                                  'marketplace_config': {'is_template': True}})
+        self.events = MagicMock()
+        self.events.put_events.return_value = {'FailedEntryCount': 0}
+
+    def emit(self, execution_type='ENTRY'):
+        return template_fanout.emit_template_fanout_events(
+            self.table, self.events, ADMIN_ID, [SCHEDULE], execution_type, NOW, 'test', {})
+
+    def test_schedule_fans_out_once_per_day(self):
+        self.assertEqual([r['status'] for r in self.emit()], ['EMITTED'])
+        self.assertEqual(self.emit(), [])
+        self.assertEqual(self.events.put_events.call_count, 1)
+
+    def test_failed_publish_releases_the_claim(self):
+        self.events.put_events.side_effect = RuntimeError('throttled')
+        self.assertEqual([r['status'] for r in self.emit()], ['ERROR'])
+
+        self.events.put_events.side_effect = None
+        self.assertEqual([r['status'] for r in self.emit()], ['EMITTED'])
+
+    def test_rejected_entry_releases_the_claim(self):
+        self.events.put_events.return_value = {'FailedEntryCount': 1, 'Entries': [{'ErrorCode': 'InternalFailure'}]}
+        self.assertEqual([r['status'] for r in self.emit()], ['ERROR'])
+
+        self.events.put_events.return_value = {'FailedEntryCount': 0}
+        self.assertEqual([r['status'] for r in self.emit()], ['EMITTED'])
+
+    def test_exit_handler_fans_out_template_exits(self):
+        strategy = {'strategy_id': 'strategy-001', 'basket_id': 'template-001', 'exit_time': '15:20'}
+
+        with patch.object(strategy_exit_handler, 'dynamodb', boto3.resource('dynamodb', region_name='ap-south-1')), \
+                patch.object(strategy_exit_handler, 'eventbridge_client', self.events), \
+                patch.object(strategy_exit_handler, 'query_strategies_for_exit', return_value=[strategy]), \
+                patch.object(strategy_exit_handler, 'queue_strategy_for_exit', return_value={'status': 'QUEUED'}):
+            strategy_exit_handler.lambda_handler({'detail': {'user_id': ADMIN_ID}}, None)
+
+        detail = json.loads(self.events.put_events.call_args.kwargs['Entries'][0]['Detail'])
+        self.assertEqual((detail['execution_type'], detail['execution_time'], detail['source']),
+                         ('EXIT', '15:20', 'strategy_exit_handler'))
+
+
+class TestSubscriberExecution(unittest.TestCase):
+    """Subscriber orders are keyed by the trigger's execution time"""
+
+    def test_execution_time_reaches_the_leg_executor(self):
+        allocation = {'client_id': 'AB1234', 'broker_name': 'paper', 'broker_config': {}}
+        with patch.object(template_fanout_executor, 'execute_strategy_legs_for_broker', return_value=[]) as execute:
+            template_fanout_executor.execute_for_subscriber(
+                {'user_id': 'sub-001'}, allocation, {'strategy_id': 'strategy-001', 'legs': []},
+                'template-001', 'ENTRY', '09:30')
+
+        self.assertEqual(execute.call_args.kwargs['execution_time'], '09:30')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+"""
+Test cases for marketplace template fan-out execution
+Covers subscriber paging, allocation joins, continuation and once-per-schedule emission
+"""
+import unittest
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')  # single_strategy_executor creates a region-less resource
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+import single_strategy_executor
+import strategy_entry_handler
+from template_fanout_executor import fan_out_template_strategy
+
+TEMPLATE_ID = 'template-001'
+IST_TIME = datetime(2025, 10, 10, 9, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+
+TEMPLATE_STRATEGY = {
+    'user_id': 'admin-001',
+    'sort_key': 'STRATEGY#strategy-001',
+    'strategy_id': 'strategy-001',
+    'strategy_name': 'Weekly Iron Condor',
+    'basket_id': TEMPLATE_ID,
+    'underlying': 'NIFTY',
+    'strategy_type': 'IRON_CONDOR',
+    'status': 'ACTIVE',
+    'legs': [
+        {'leg_id': 'leg-1', 'option_type': 'CALL', 'action': 'SELL', 'strike': 25000, 'lots': 1},
+        {'leg_id': 'leg-2', 'option_type': 'PUT', 'action': 'SELL', 'strike': 24500, 'lots': 1}
+    ]
+}
+
+
+@mock_aws
+class TestTemplateFanoutExecutor(unittest.TestCase):
+    """One strategy load serves every executable subscriber allocation"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'sort_key', 'AttributeType': 'S'},
+                {'AttributeName': 'basket_id', 'AttributeType': 'S'},
+                {'AttributeName': 'entity_type_priority', 'AttributeType': 'S'},
+                {'AttributeName': 'template_basket_id', 'AttributeType': 'S'},
+                {'AttributeName': 'subscription_status_date', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'AllocationsByBasket',
+                    'KeySchema': [
+                        {'AttributeName': 'basket_id', 'KeyType': 'HASH'},
+                        {'AttributeName': 'entity_type_priority', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                },
+                {
+                    'IndexName': 'TemplateSubscribers',
+                    'KeySchema': [
+                        {'AttributeName': 'template_basket_id', 'KeyType': 'HASH'},
+                        {'AttributeName': 'subscription_status_date', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.execution_table = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'execution_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        # Execute legs in simulation mode
+        self.trading_patch = patch.object(single_strategy_executor, 'TRADING_AVAILABLE', False)
+        self.trading_patch.start()
+
+    def tearDown(self):
+        self.trading_patch.stop()
+
+    def add_subscriber(self, index, status='ACTIVE', with_allocation=True):
+        user_id = f'user-{index:03d}'
+        self.table.put_item(Item={
+            'user_id': user_id,
+            'sort_key': f'SUBSCRIPTION#sub-{index:03d}',
+            'subscription_id': f'sub-{index:03d}',
+            'template_basket_id': TEMPLATE_ID,
+            'template_owner_id': 'admin-001',
+            'subscription_status_date': f'{status}#2025-10-01',
+            'status': status
+        })
+        if with_allocation:
+            self.table.put_item(Item={
+                'user_id': user_id,
+                'sort_key': f'BROKER_ALLOCATION#{TEMPLATE_ID}#alloc-{index:03d}',
+                'entity_type': 'BROKER_ALLOCATION',
+                'allocation_id': f'alloc-{index:03d}',
+                'basket_id': TEMPLATE_ID,
+                'client_id': f'ZEBU{index:03d}',
+                'broker_id': 'zebu',
+                'lot_multiplier': Decimal('2'),
+                'entity_type_priority': 'BROKER_ALLOCATION#001'
+            })
+        return user_id
+
+    def fan_out(self, **kwargs):
+        return fan_out_template_strategy(
+            table=self.table,
+            execution_table=self.execution_table,
+            strategy=TEMPLATE_STRATEGY,
+            template_id=TEMPLATE_ID,
+            execution_time='09:30',
+            execution_type='ENTRY',
+            ist_time=IST_TIME,
+            **kwargs
+        )
+
+    def executed_users(self):
+        return sorted(item['user_id'] for item in self.execution_table.scan()['Items'])
+
+    def test_fan_out_reaches_every_executable_subscriber(self):
+        """ACTIVE and TRIAL subscribers with allocations execute; others are skipped"""
+        expected = [self.add_subscriber(i) for i in range(20)]
+        expected += [self.add_subscriber(i, status='TRIAL') for i in range(20, 25)]
+        self.add_subscriber(30, status='CANCELLED')
+        self.add_subscriber(31, with_allocation=False)
+
+        result = self.fan_out(page_size=7)
+
+        self.assertEqual(self.executed_users(), sorted(expected))
+        self.assertEqual(result['subscribers'], 26)
+        self.assertEqual(result['subscribers_without_allocation'], 1)
+        self.assertEqual(result['allocations_dispatched'], 25)
+        self.assertEqual(result['orders_placed'], 50)
+        self.assertEqual(result['orders_failed'], 0)
+        self.assertIsNone(result['resume'])
+        self.assertGreater(result['pages'], 3)
+
+        record = self.execution_table.scan()['Items'][0]
+        self.assertEqual(record['total_lots_executed'], 4)
+        self.assertEqual(record['execution_source'], 'template_fanout_executor')
+
+    def test_fan_out_resumes_without_duplicates(self):
+        """A run stopped for time continues from its cursor and covers the rest exactly once"""
+        expected = [self.add_subscriber(i) for i in range(12)]
+        expected += [self.add_subscriber(i, status='TRIAL') for i in range(12, 15)]
+
+        first = self.fan_out(page_size=5, has_time_left=lambda: False)
+        self.assertIsNotNone(first['resume'])
+        self.assertEqual(first['allocations_dispatched'], 5)
+
+        second = self.fan_out(page_size=5, resume=first['resume'])
+        self.assertIsNone(second['resume'])
+        self.assertEqual(first['allocations_dispatched'] + second['allocations_dispatched'], 15)
+        self.assertEqual(self.executed_users(), sorted(expected))
+
+    def test_template_fanout_is_emitted_once_per_schedule(self):
+        """Several admin brokers processing the same schedule emit a single fan-out event"""
+        self.table.put_item(Item={
+            'user_id': 'admin-001', 'sort_key': f'BASKET#{TEMPLATE_ID}',
+            'marketplace_config': {'is_template': True, 'visibility': 'PUBLIC'}
+        })
+        self.table.put_item(Item={'user_id': 'admin-001', 'sort_key': 'BASKET#private-001'})
+        schedules = [
+            {'strategy_id': 'strategy-001', 'basket_id': TEMPLATE_ID, 'execution_time': '09:30'},
+            {'strategy_id': 'strategy-002', 'basket_id': 'private-001', 'execution_time': '09:30'}
+        ]
+
+        eventbridge = MagicMock()
+        eventbridge.put_events.return_value = {'FailedEntryCount': 0}
+        for _ in range(3):
+            strategy_entry_handler.emit_template_fanout_events(
+                self.table, eventbridge, 'admin-001', schedules, 'ENTRY', IST_TIME, 'strategy_entry_handler', {})
+
+        self.assertEqual(eventbridge.put_events.call_count, 1)
+        entry = eventbridge.put_events.call_args.kwargs['Entries'][0]
+        self.assertEqual(entry['DetailType'], 'Template.Execution.Triggered')
+        self.assertIn('"strategy_id": "strategy-001"', entry['Detail'])
+
+
+if __name__ == '__main__':
+    unittest.main()
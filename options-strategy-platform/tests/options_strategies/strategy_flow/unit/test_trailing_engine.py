@@ -0,0 +1,231 @@
+"""
+Test cases for the trailing engine
+Covers the trailing modes, in-memory state across ticks and delta-only checkpoints
+"""
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+
+import trailing_engine
+import trailing_sl_handler
+
+USER_ID = 'user-001'
+DAY = '2025-10-16'
+
+
+def position(position_id, position_type, entry_price, current_price, strategy_id='strategy-001', **extra):
+    return dict({'position_id': position_id, 'strategy_id': strategy_id, 'basket_id': 'basket-001',
+                 'position_type': position_type, 'entry_price': entry_price, 'current_price': current_price,
+                 'quantity': 75, 'position_status': 'OPEN'}, **extra)
+
+
+class TestTrailingLevels(unittest.TestCase):
+    """Level math of the trailing modes"""
+
+    def test_trail_follows_the_peak(self):
+        config = {'type': 'POINTS', 'value': 10}
+        self.assertEqual(trailing_engine.trail_level('LONG', 100, 130, config), 120)
+        self.assertEqual(trailing_engine.trail_level('SHORT', 100, 70, config), 80)
+
+    def test_step_moves_per_full_instrument_move(self):
+        config = {'type': 'POINTS', 'instrument_move_value': 10, 'stop_loss_move_value': 5}
+        self.assertIsNone(trailing_engine.trail_level('LONG', 100, 109, config, base_stop=90))
+        self.assertEqual(trailing_engine.trail_level('LONG', 100, 125, config, base_stop=90), 100)
+        self.assertEqual(trailing_engine.trail_level('SHORT', 100, 80, config, base_stop=110), 100)
+
+    def test_lock_and_trail_floor(self):
+        config = {'lock_at': 3000, 'lock_profit': 1000, 'trail_every': 1000, 'trail_by': 500}
+        self.assertIsNone(trailing_engine.locked_floor(2999, config))
+        self.assertEqual(trailing_engine.locked_floor(3000, config), 1000)
+        self.assertEqual(trailing_engine.locked_floor(5400, config), 2000)
+
+
+class TestTrailingEngine(unittest.TestCase):
+    """State stays in memory; only level changes are marked for checkpointing"""
+
+    def setUp(self):
+        self.engine = trailing_engine.TrailingEngine()
+
+    def tick(self, price, **kwargs):
+        row = position('p1', 'LONG', 100, price, trailing_sl={'type': 'POINTS', 'value': 10})
+        return self.engine.update_position(USER_ID, DAY, row, **kwargs)
+
+    def test_only_level_changes_are_dirty(self):
+        self.assertTrue(self.tick(120)['adjusted'])
+        self.assertEqual(self.engine.pending_checkpoints(USER_ID), 1)
+        self.engine._dirty.clear()
+
+        # A pullback keeps the high-water mark and the level
+        result = self.tick(115)
+        self.assertEqual((result['adjusted'], result['peak_price'], result['new_sl']), (False, 120, 110))
+        self.assertEqual(self.engine.pending_checkpoints(USER_ID), 0)
+
+        self.assertTrue(self.tick(109)['exit_triggered'])
+
+    def test_trail_to_cost_only_tightens(self):
+        result = self.tick(130)
+        self.assertEqual(result['new_sl'], 120)
+
+        result = self.tick(125, move_to_cost=True)
+        self.assertEqual((result['new_sl'], result['trail_mode']), (120, 'TRAIL_TO_COST'))
+
+        leg = position('p2', 'SHORT', 80, 70)
+        self.assertEqual(self.engine.update_position(USER_ID, DAY, leg, move_to_cost=True)['new_sl'], 80)
+
+
+@mock_aws
+class TestTrailingSlHandler(unittest.TestCase):
+    """The handler checkpoints changed levels and drives the strategy-scope modes"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.trading = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.history = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'execution_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        self.sqs = boto3.client('sqs', region_name='ap-south-1')
+        self.queue_url = self.sqs.create_queue(QueueName='execution-lane-high.fifo',
+                                               Attributes={'FifoQueue': 'true'})['QueueUrl']
+        patch.dict(os.environ, {'HIGH_PRIORITY_EXIT_QUEUE_URL': self.queue_url}).start()
+        patch.object(trailing_sl_handler, 'dynamodb', dynamodb).start()
+        patch.object(trailing_sl_handler, 'sqs_client', self.sqs).start()
+        patch.object(trailing_engine, '_engine', None).start()
+        self.addCleanup(patch.stopall)
+
+    def run_tick(self, positions):
+        with patch.object(trailing_sl_handler, 'query_positions_with_trailing_sl', return_value=positions):
+            response = trailing_sl_handler.lambda_handler({'detail': {'user_id': USER_ID}}, None)
+        return json.loads(response['body'])
+
+    def checkpoints(self):
+        return [item for item in self.history.scan()['Items'] if item['execution_key'].startswith('TRAIL#')]
+
+    def exits(self):
+        messages = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10).get('Messages', [])
+        return [json.loads(message['Body']) for message in messages]
+
+    def test_unchanged_levels_are_not_written(self):
+        legs = [position(f'p{i}', 'LONG', 100, 120, trailing_sl={'type': 'POINTS', 'value': 10}) for i in range(30)]
+
+        self.assertEqual(self.run_tick(legs)['adjustments_made'], 30)
+        self.assertEqual(len(self.checkpoints()), 30)
+
+        with patch.object(self.history.meta.client, 'update_item') as update:
+            body = self.run_tick([dict(leg, current_price=118) for leg in legs])
+        self.assertEqual(body['adjustments_made'], 0)
+        update.assert_not_called()
+
+    def test_cold_container_restores_levels(self):
+        leg = position('p1', 'LONG', 100, 130, trailing_sl={'type': 'POINTS', 'value': 10})
+        self.run_tick([leg])
+
+        trailing_engine._engine = None
+        body = self.run_tick([dict(leg, current_price=119)])
+        self.assertEqual(body['exits_triggered'], 1)
+        self.assertEqual(self.exits()[0]['position_id'], 'p1')
+
+    def test_stale_container_never_loosens_a_checkpoint(self):
+        """Two warm containers: the one with the older peak adopts the tighter stored level"""
+        leg = position('p1', 'LONG', 100, 120, trailing_sl={'type': 'POINTS', 'value': 10})
+        stale, fresh = trailing_engine.TrailingEngine(), trailing_engine.TrailingEngine()
+        stale.update_position(USER_ID, DAY, leg)
+        fresh.update_position(USER_ID, DAY, dict(leg, current_price=140))
+
+        self.assertEqual(fresh.checkpoint(self.history, USER_ID), 1)
+        self.assertEqual(stale.checkpoint(self.history, USER_ID), 0)
+
+        self.assertEqual(self.checkpoints()[0]['level'], 130)
+        result = stale.update_position(USER_ID, DAY, dict(leg, current_price=125))
+        self.assertEqual((result['old_sl'], result['exit_triggered']), (130, True))
+
+        short = position('p2', 'SHORT', 100, 80, trailing_sl={'type': 'POINTS', 'value': 10})
+        stale.update_position(USER_ID, DAY, short)
+        fresh.update_position(USER_ID, DAY, dict(short, current_price=70))
+        fresh.checkpoint(self.history, USER_ID)
+        stale.checkpoint(self.history, USER_ID)
+        stored = self.history.get_item(Key={'user_id': USER_ID, 'execution_key': f'TRAIL#{DAY}#POSITION#p2'})['Item']
+        self.assertEqual(stored['level'], 80)
+
+    def test_stopped_leg_moves_the_rest_to_cost(self):
+        self.trading.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-001', 'move_sl_to_cost': True})
+        ce = position('ce', 'SHORT', 100, 140, stop_loss={'type': 'POINTS', 'value': 30})
+        pe = position('pe', 'SHORT', 100, 60, stop_loss={'type': 'POINTS', 'value': 30})
+
+        self.run_tick([ce, pe])
+        self.assertEqual(self.exits(), [])
+
+        # pe's stop now sits at its entry price
+        body = self.run_tick([dict(pe, current_price=101)])
+        self.assertEqual(body['exits_triggered'], 1)
+        self.assertEqual(self.exits()[0]['position_id'], 'pe')
+
+    def test_lock_and_trail_exits_the_strategy(self):
+        self.trading.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-001', 'lock_and_trail': {
+            'lock_at': 3000, 'lock_profit': 1000, 'trail_every': 1000, 'trail_by': 500}})
+        ce, pe = position('ce', 'SHORT', 100, 70), position('pe', 'SHORT', 100, 90)
+
+        self.run_tick([ce, pe])  # MTM 3000 locks 1000
+        self.assertEqual(self.run_tick([dict(ce, current_price=80), dict(pe, current_price=95)])['exits_triggered'], 0)
+        self.assertEqual(self.run_tick([dict(ce, current_price=95), dict(pe, current_price=100)])['exits_triggered'], 1)
+
+        exit_message = self.exits()[0]
+        self.assertEqual((exit_message['exit_scope'], exit_message['execution_type']), ('STRATEGY', 'TRAILING_SL_EXIT'))
+        self.assertEqual(sorted(exit_message['position_ids']), ['ce', 'pe'])
+
+
+    def test_strategy_exit_is_queued_once_from_history_rows(self):
+        """Open rows are read by execution_key; later breached ticks do not queue the exit again"""
+        self.trading.put_item(Item={'user_id': USER_ID, 'sort_key': 'STRATEGY#strategy-001', 'lock_and_trail': {
+            'lock_at': 3000, 'lock_profit': 1000, 'trail_every': 1000, 'trail_by': 500}})
+        today = datetime.now(timezone.utc).astimezone(trailing_sl_handler.IST).strftime('%Y-%m-%d')
+
+        def seed(ce_price, pe_price):
+            for leg_id, price in (('ce', ce_price), ('pe', pe_price)):
+                row = {k: v for k, v in position(leg_id, 'SHORT', 100, price).items() if k != 'position_id'}
+                self.history.put_item(Item={'user_id': USER_ID, 'execution_key': f'{today}#strategy-001#{leg_id}',
+                                            **row})
+
+        tick = {'detail': {'user_id': USER_ID}}
+        seed(70, 90)
+        trailing_sl_handler.lambda_handler(tick, None)
+        seed(95, 100)
+        with patch.object(trailing_sl_handler, 'send_to_lane', wraps=trailing_sl_handler.send_to_lane) as send:
+            for _ in range(2):
+                trailing_sl_handler.lambda_handler(tick, None)
+
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(sorted(send.call_args.args[1]['position_ids']),
+                         [f'{today}#strategy-001#ce', f'{today}#strategy-001#pe'])
+
+if __name__ == '__main__':
+    unittest.main()
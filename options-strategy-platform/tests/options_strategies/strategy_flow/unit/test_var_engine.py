@@ -0,0 +1,222 @@
+"""
+Test cases for the portfolio VaR engine and the Portfolio VaR Check handler
+Covers seeding, linear books, cross-index hedges, historical simulation, the open position query,
+the candle price source, the execution history record and the once-per-user fan-out
+"""
+import unittest
+import json
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+# Add the project root and option_baskets (flat Lambda imports) to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../../'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../../lambda_functions/option_baskets'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['REGION'] = 'ap-south-1'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ['EXECUTION_HISTORY_TABLE'] = 'test-execution-history'
+os.environ['TRADING_CONFIGURATIONS_TABLE'] = 'test-trading-configurations'
+
+from shared_utils.var_engine import VaREngine
+from candle_store import CandleStore, IST
+import active_user_event_handler
+
+MARKET = {
+    'NIFTY': {'spot': 25000, 'volatility': 0.13},
+    'SENSEX': {'spot': 82000, 'volatility': 0.13},
+    'BANKNIFTY': {'spot': 56000, 'volatility': 0.16}
+}
+
+
+def future(underlying, transaction_type, quantity):
+    return {'underlying': underlying, 'option_type': 'FUT', 'transaction_type': transaction_type,
+            'quantity': quantity, 'days_to_expiry': 30}
+
+
+def option(strike, option_type, transaction_type, quantity=75, underlying='NIFTY', days=7):
+    return {'underlying': underlying, 'strike': strike, 'option_type': option_type,
+            'transaction_type': transaction_type, 'quantity': quantity, 'days_to_expiry': days}
+
+
+class TestVaREngine(unittest.TestCase):
+    """Full revaluation VaR under correlated index shocks"""
+
+    def setUp(self):
+        self.engine = VaREngine()
+
+    def test_seeded_runs_are_reproducible(self):
+        """The same seed gives the same paths; VaR rises with confidence and ES exceeds VaR"""
+        book = [option(25000, 'CE', 'SELL'), option(25000, 'PE', 'SELL'), option(56000, 'PE', 'BUY', 35, 'BANKNIFTY')]
+        first = self.engine.monte_carlo_var(book, MARKET, paths=5000, seed=11)
+        second = self.engine.monte_carlo_var(book, MARKET, paths=5000, seed=11)
+
+        self.assertEqual(first['var_99'], second['var_99'])
+        self.assertEqual(first['paths'], 5000)
+        self.assertGreater(first['var_99'], first['var_95'])
+        self.assertGreaterEqual(first['expected_shortfall_95'], first['var_95'])
+
+    def test_linear_book_matches_parametric_var(self):
+        """A futures position's 99% VaR converges to z * sigma * sqrt(h) * notional"""
+        result = self.engine.monte_carlo_var([future('NIFTY', 'BUY', 75)], MARKET, paths=100000, seed=3)
+        expected = 2.3263 * 0.13 / math.sqrt(252) * 25000 * 75
+
+        self.assertAlmostEqual(result['var_99'], expected, delta=expected * 0.03)
+
+    def test_correlated_hedge_offsets(self):
+        """A SENSEX short against a NIFTY long cuts VaR by the 0.98 correlation"""
+        long_nifty = [future('NIFTY', 'BUY', 82)]
+        hedged = long_nifty + [future('SENSEX', 'SELL', 25)]
+
+        naked = self.engine.monte_carlo_var(long_nifty, MARKET, paths=20000, seed=5)
+        paired = self.engine.monte_carlo_var(hedged, MARKET, paths=20000, seed=5)
+
+        self.assertLess(paired['var_99'], naked['var_99'] / 3)
+
+    def test_historical_simulation(self):
+        """Historical VaR reprices the book under each recorded day's joint move"""
+        returns = {'NIFTY': [0.01, -0.02, 0.005, -0.01, 0.0], 'SENSEX': [0.01, -0.02, 0.004, -0.01, 0.001]}
+        result = self.engine.historical_var([future('NIFTY', 'BUY', 1)], MARKET, returns,
+                                            confidence_levels=(1.0,))
+
+        self.assertEqual(result['paths'], 5)
+        self.assertAlmostEqual(result['var_100'], 500.0, places=2)
+        self.assertAlmostEqual(result['worst_loss'], 500.0, places=2)
+
+        with self.assertRaises(ValueError):
+            self.engine.historical_var([future('BANKNIFTY', 'BUY', 1)], MARKET, returns)
+
+    def test_offsetting_positions_net_to_nothing(self):
+        """Positions are netted into instruments before revaluation"""
+        result = self.engine.monte_carlo_var(
+            [option(25000, 'CE', 'BUY'), option(25000, 'CE', 'SELL')], MARKET, paths=1000, seed=1
+        )
+        self.assertEqual(result['instruments'], 1)
+        self.assertEqual(result['var_99'], 0.0)
+
+
+@mock_aws
+class TestPortfolioVarHandler(unittest.TestCase):
+    """The risk tick values the open book and records it for dashboards"""
+
+    def setUp(self):
+        dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
+        self.table = dynamodb.create_table(
+            TableName='test-execution-history',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'execution_key', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'execution_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.trading = dynamodb.create_table(
+            TableName='test-trading-configurations',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'sort_key', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'sort_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        import portfolio_var_handler
+        portfolio_var_handler.dynamodb = dynamodb
+        self.handler = portfolio_var_handler
+
+    def test_var_record_written(self):
+        """Option positions are valued; records without contract details are skipped"""
+        positions = [
+            {'underlying': 'NIFTY', 'strike': 25000, 'option_type': 'CALL', 'expiry_date': '2099-01-01',
+             'quantity': -75, 'position_type': 'SHORT', 'position_status': 'OPEN'},
+            {'underlying': 'NIFTY', 'symbol': 'NIFTY25OCT', 'quantity': 75, 'position_status': 'OPEN'}
+        ]
+        event = {'detail': {'user_id': 'user-001', 'sub_event_id': 'sub-1', 'market': {'NIFTY': {'spot': 25000}},
+                            'var_paths': 2000, 'seed': 9}}
+
+        with patch.object(self.handler, 'query_active_positions', return_value=positions):
+            response = self.handler.lambda_handler(event, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(body['positions_skipped'], 1)
+        self.assertGreater(body['var_result']['var_99'], 0)
+
+        items = self.table.scan()['Items']
+        self.assertEqual(len(items), 1)
+        self.assertTrue(items[0]['execution_key'].startswith('RISK#VAR#'))
+        self.assertEqual(items[0]['record_type'], 'PORTFOLIO_VAR')
+        self.assertEqual(float(items[0]['var_result']['var_99']), body['var_result']['var_99'])
+
+    def test_open_positions_valued_at_the_latest_candle(self):
+        """Today's OPEN rows are read by execution_key and priced from the refresher's candles"""
+        now = datetime.now(IST)
+        yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+        expiry = (now + timedelta(days=7)).strftime('%Y-%m-%d')
+        contract = {'underlying': 'NIFTY', 'strike': 25000, 'option_type': 'CE', 'expiry_date': expiry,
+                    'transaction_type': 'SELL', 'quantity': 75}
+        self.table.put_item(Item={'user_id': 'user-001', 'execution_key': f"{now:%Y-%m-%d}#strategy-001#leg-1",
+                                  'position_status': 'OPEN', **contract})
+        self.table.put_item(Item={'user_id': 'user-001', 'execution_key': f"{now:%Y-%m-%d}#strategy-001#leg-2",
+                                  'position_status': 'CLOSED', **contract})
+        self.table.put_item(Item={'user_id': 'user-001', 'execution_key': f"{yesterday}#strategy-001#leg-1",
+                                  'position_status': 'OPEN', **contract})
+
+        store = CandleStore(self.trading)
+        store.on_tick('NIFTY', 24900, now)
+        store.flush(store.on_tick('NIFTY', 25100, now))
+
+        positions = self.handler.query_active_positions('user-001', now)
+        self.assertEqual([p['execution_key'] for p in positions], [f"{now:%Y-%m-%d}#strategy-001#leg-1"])
+        self.assertEqual(self.handler.load_market_snapshot(positions, {}, now), {'NIFTY': {'spot': 25100.0}})
+
+        response = self.handler.lambda_handler(
+            {'detail': {'user_id': 'user-001', 'var_paths': 2000, 'seed': 9}}, None)
+        body = json.loads(response['body'])
+        self.assertEqual((body['positions_skipped'], body['var_result']['instruments']), (0, 1))
+        self.assertGreater(body['var_result']['var_99'], 0)
+
+    def test_unpriced_underlying_is_skipped(self):
+        """Without an event quote, a candle or underlying_price the position cannot be valued"""
+        now = datetime.now(IST)
+        self.table.put_item(Item={'user_id': 'user-001', 'execution_key': f"{now:%Y-%m-%d}#strategy-001#leg-1",
+                                  'position_status': 'OPEN', 'underlying': 'BANKNIFTY', 'strike': 56000,
+                                  'option_type': 'PE', 'expiry_date': '2099-01-01', 'quantity': 35})
+
+        body = json.loads(self.handler.lambda_handler({'detail': {'user_id': 'user-001'}}, None)['body'])
+
+        self.assertEqual((body['positions_skipped'], body['var_result']), (1, None))
+
+
+class TestRiskSubEventFanout(unittest.TestCase):
+    """Book-wide risk checks run once per user, not once per broker account"""
+
+    def test_user_scoped_sub_events_emitted_once(self):
+        brokers = [{'broker_id': 'zerodha', 'client_id': 'AB1234'}, {'broker_id': 'zebu', 'client_id': 'ZB9876'}]
+        sub_events = [{'event_type': 'portfolio_var_check'}, {'event_type': 'portfolio_greeks_stream'},
+                      {'event_type': 'stop_loss_check'}]
+        events = MagicMock()
+        events.put_events.return_value = {'FailedEntryCount': 0, 'Entries': [{'EventId': 'evt-1'}]}
+
+        with patch.object(active_user_event_handler, 'get_active_brokers_for_user', return_value=brokers), \
+                patch.object(active_user_event_handler, 'eventbridge_client', events):
+            active_user_event_handler.lambda_handler(
+                {'detail': {'user_id': 'user-001', 'sub_events': sub_events}}, None)
+
+        emitted = [json.loads(call.kwargs['Entries'][0]['Detail']) for call in events.put_events.call_args_list]
+        self.assertEqual(sorted((e['event_type'], e['broker_id']) for e in emitted), [
+            ('portfolio_greeks_stream', 'zerodha'), ('portfolio_var_check', 'zerodha'),
+            ('stop_loss_check', 'zebu'), ('stop_loss_check', 'zerodha')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Portfolio Greeks Engine
+Vectorized Black-Scholes delta / gamma / theta / vega of option books,
+aggregated per strategy, basket and user in one NumPy pass
+"""
+
+import math
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from shared_utils.payoff_engine import DEFAULT_RISK_FREE_RATE, norm_cdf
+
+GREEKS = ('delta', 'gamma', 'theta', 'vega')
+
+# Annualised volatility used when neither the position nor the market snapshot has one
+DEFAULT_VOLATILITY = 0.15
+
+IST = timezone(timedelta(hours=5, minutes=30))
+EXPIRY_CLOSE = dt_time(15, 30)
+
+# Rounding of the published values; gamma is small per unit
+DECIMALS = {'delta': 4, 'gamma': 6, 'theta': 2, 'vega': 2}
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal density over an array"""
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def black_scholes_greeks(spot: np.ndarray, strike: np.ndarray, time_to_expiry: np.ndarray,
+                         volatility: np.ndarray, is_call: np.ndarray,
+                         risk_free_rate: float = DEFAULT_RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """
+    Per-unit Black-Scholes Greeks over broadcastable arrays
+
+    Conventions follow RiskCalculator.calculate_greeks: theta per calendar day,
+    vega per volatility point. Expired legs keep their intrinsic delta only.
+    """
+    live = time_to_expiry > 0
+    t = np.where(live, time_to_expiry, 1.0)
+    sigma = np.maximum(volatility, 1e-6)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(np.maximum(spot, 1e-9) / strike) + (risk_free_rate + 0.5 * sigma ** 2) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+
+    nd1 = norm_cdf(d1)
+    pdf = norm_pdf(d1)
+    discount = risk_free_rate * strike * np.exp(-risk_free_rate * t)
+
+    delta = np.where(is_call, nd1, nd1 - 1.0)
+    gamma = pdf / (np.maximum(spot, 1e-9) * sigma * sqrt_t)
+    theta = (-spot * pdf * sigma / (2 * sqrt_t) - discount * np.where(is_call, norm_cdf(d2), norm_cdf(-d2))) / 365
+    vega = spot * pdf * sqrt_t / 100
+
+    intrinsic_delta = np.where(is_call, (spot > strike).astype(float), -(spot < strike).astype(float))
+
+    return {
+        'delta': np.where(live, delta, intrinsic_delta),
+        'gamma': np.where(live, gamma, 0.0),
+        'theta': np.where(live, theta, 0.0),
+        'vega': np.where(live, vega, 0.0)
+    }
+
+
+class GreeksEngine:
+    """
+    Portfolio Greeks of open option books
+
+    Positions use the VaREngine format (underlying, strike, option_type
+    CE/PE/FUT, expiry or days_to_expiry, transaction_type BUY/SELL, quantity in
+    units) plus optional strategy_id / basket_id and implied_volatility. Market
+    data maps each underlying to {'spot': ..., 'volatility': ...}.
+
+    Every leg is valued in a single vectorized pass and the quantity-weighted
+    Greeks are summed into the user, strategy and basket totals with np.add.at,
+    so the cost does not grow with the number of strategies.
+    """
+
+    def __init__(self, risk_free_rate: float = DEFAULT_RISK_FREE_RATE):
+        self.risk_free_rate = risk_free_rate
+
+    def aggregate(self, positions: Sequence[Dict], market: Dict[str, Dict],
+                  as_of: Optional[datetime] = None) -> Dict:
+        """
+        Greeks per scope
+
+        Returns:
+            {'user': {greek: value}, 'strategies': {strategy_id: {...}},
+             'baskets': {basket_id: {...}}, 'legs': n, 'elapsed_ms': ms}
+        """
+        started = time.perf_counter()
+        as_of = as_of or datetime.now(IST)
+        count = len(positions)
+
+        spot = np.zeros(count)
+        strike = np.ones(count)
+        years = np.zeros(count)
+        volatility = np.full(count, DEFAULT_VOLATILITY)
+        is_call = np.zeros(count, dtype=bool)
+        is_future = np.zeros(count, dtype=bool)
+        signed_quantity = np.zeros(count)
+
+        strategy_ids, basket_ids = {}, {}
+        strategy_index = np.full(count, -1, dtype=int)
+        basket_index = np.full(count, -1, dtype=int)
+
+        for i, position in enumerate(positions):
+            underlying = position['underlying'].upper()
+            quote = market.get(underlying, {})
+            option_type = position.get('option_type', 'FUT').upper()
+            side = (position.get('transaction_type') or position.get('action') or 'BUY').upper()
+
+            spot[i] = float(quote['spot'])
+            strike[i] = float(position.get('strike') or spot[i])
+            years[i] = self._years_to_expiry(position, as_of)
+            volatility[i] = float(position.get('implied_volatility') or quote.get('volatility') or DEFAULT_VOLATILITY)
+            is_call[i] = option_type == 'CE'
+            is_future[i] = option_type == 'FUT'
+            signed_quantity[i] = float(position['quantity']) * (1.0 if side == 'BUY' else -1.0)
+
+            if position.get('strategy_id'):
+                strategy_index[i] = strategy_ids.setdefault(position['strategy_id'], len(strategy_ids))
+            if position.get('basket_id'):
+                basket_index[i] = basket_ids.setdefault(position['basket_id'], len(basket_ids))
+
+        per_unit = black_scholes_greeks(spot, strike, years, volatility, is_call, self.risk_free_rate)
+        # (legs x greeks); futures carry delta 1 and nothing else
+        unit = np.stack([per_unit[g] for g in GREEKS], axis=1)
+        unit[is_future] = (1.0, 0.0, 0.0, 0.0)
+        weighted = unit * signed_quantity[:, np.newaxis]
+
+        return {
+            'user': self._rounded(weighted.sum(axis=0)),
+            'strategies': self._group(weighted, strategy_index, strategy_ids),
+            'baskets': self._group(weighted, basket_index, basket_ids),
+            'legs': count,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def _group(self, weighted: np.ndarray, index: np.ndarray, ids: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+        """Sum leg Greeks into their group's row; legs without a group (-1) are left out"""
+        totals = np.zeros((len(ids), len(GREEKS)))
+        grouped = index >= 0
+        np.add.at(totals, index[grouped], weighted[grouped])
+        return {group_id: self._rounded(totals[row]) for group_id, row in ids.items()}
+
+    @staticmethod
+    def _rounded(values: np.ndarray) -> Dict[str, float]:
+        return {g: round(float(v), DECIMALS[g]) + 0.0 for g, v in zip(GREEKS, values)}
+
+    @staticmethod
+    def _years_to_expiry(position: Dict, as_of: datetime) -> float:
+        """Time to the 15:30 IST close of the expiry day, so expiry-day legs keep their gamma"""
+        if 'days_to_expiry' in position:
+            return max(float(position['days_to_expiry']), 0.0) / 365.0
+
+        expiry = date.fromisoformat(str(position['expiry'])[:10])
+        close = datetime.combine(expiry, EXPIRY_CLOSE, tzinfo=IST)
+        moment = as_of if as_of.tzinfo else as_of.replace(tzinfo=IST)
+        return max((close - moment).total_seconds(), 0.0) / (365.0 * 24 * 60 * 60)
@@ -8,6 +8,21 @@ from datetime import datetime, time, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
 
+from shared_utils.trading_calendar import (
+    EXPIRY_RULES, WEEKLY, expiry_dates, is_trading_day, market_holidays
+)
+
+_WEEKDAY_NAMES = ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY")
+
+
+def _expiry_config(symbol: str) -> Dict:
+    """Expiry weekdays of an index from trading_calendar.EXPIRY_RULES; no weekly_expiry when only monthlies list."""
+    weekday, listed = EXPIRY_RULES[symbol]
+    return {
+        "weekly_expiry": _WEEKDAY_NAMES[weekday] if WEEKLY in listed else None,
+        "monthly_expiry": f"LAST_{_WEEKDAY_NAMES[weekday]}",
+    }
+
 
 # Indian Market Configuration
 INDIAN_MARKET_CONFIG = {
@@ -19,56 +34,43 @@ INDIAN_MARKET_CONFIG = {
     },
     "indices": {
         "NIFTY": {
+            **_expiry_config("NIFTY"),
             "lot_size": 25,
-            "weekly_expiry": "THURSDAY",
-            "monthly_expiry": "LAST_THURSDAY",
             "strike_difference": 50,
             "tick_size": 0.05,
             "exchange": "NSE"
         },
         "BANKNIFTY": {
+            **_expiry_config("BANKNIFTY"),
             "lot_size": 15,
-            "weekly_expiry": "WEDNESDAY",
-            "monthly_expiry": "LAST_WEDNESDAY",
             "strike_difference": 100,
             "tick_size": 0.05,
             "exchange": "NSE"
         },
         "FINNIFTY": {
+            **_expiry_config("FINNIFTY"),
             "lot_size": 25,
-            "weekly_expiry": "TUESDAY",
-            "monthly_expiry": "LAST_TUESDAY",
             "strike_difference": 50,
             "tick_size": 0.05,
             "exchange": "NSE"
         },
         "MIDCPNIFTY": {
+            **_expiry_config("MIDCPNIFTY"),
             "lot_size": 75,
-            "weekly_expiry": "MONDAY",
-            "monthly_expiry": "LAST_MONDAY",
             "strike_difference": 25,
             "tick_size": 0.05,
             "exchange": "NSE"
         },
         "SENSEX": {
+            **_expiry_config("SENSEX"),
             "lot_size": 10,
-            "weekly_expiry": "FRIDAY",
-            "monthly_expiry": "LAST_FRIDAY",
             "strike_difference": 100,
             "tick_size": 1,
             "exchange": "BSE"
         }
     },
-    "holidays": [
-        # Major Indian market holidays (partial list - should be updated annually)
-        "2025-01-26",  # Republic Day
-        "2025-03-14",  # Holi
-        "2025-04-18",  # Good Friday
-        "2025-08-15",  # Independence Day
-        "2025-10-02",  # Gandhi Jayanti
-        "2025-11-01",  # Diwali (Laxmi Pujan)
-        "2025-11-21",  # Guru Nanak Jayanti
-    ]
+    # Exchange holidays, see trading_calendar.EXCHANGE_HOLIDAYS
+    "holidays": sorted(day.isoformat() for day in market_holidays())
 }
 
 
@@ -114,8 +116,9 @@ class IndianMarketUtils:
     
     def is_market_holiday(self, check_date) -> bool:
         """Check if given date is a market holiday"""
-        date_str = check_date.strftime("%Y-%m-%d")
-        return date_str in self.config["holidays"]
+        if isinstance(check_date, datetime):
+            check_date = check_date.date()
+        return check_date.weekday() < 5 and not is_trading_day(check_date)
     
     def get_next_trading_day(self, from_date: Optional[datetime] = None) -> datetime:
         """
@@ -209,44 +212,29 @@ class IndianMarketUtils:
     
     def get_expiry_dates(self, symbol: str, weeks: int = 4) -> List[datetime]:
         """
-        Get next N weekly expiry dates for a symbol
+        Get the next N expiry dates for a symbol
+        
+        Weekly expiries where the index lists a weekly series, else monthly
+        ones; holiday expiries move to the previous trading day.
         
         Args:
             symbol: Index symbol
-            weeks: Number of weeks to get
+            weeks: Number of expiries to get
         
         Returns:
             List of datetime objects representing expiry dates
         """
-        index_config = self.get_index_config(symbol)
-        if not index_config:
+        if not self.get_index_config(symbol):
             return []
         
-        weekly_expiry_day = index_config["weekly_expiry"]
-        day_mapping = {
-            "MONDAY": 0,
-            "TUESDAY": 1,
-            "WEDNESDAY": 2,
-            "THURSDAY": 3,
-            "FRIDAY": 4
-        }
-        
-        target_weekday = day_mapping.get(weekly_expiry_day, 3)  # Default to Thursday
-        expiry_dates = []
-        
         current_date = self.get_current_ist_time().date()
+        # Monthly-only series need about five weeks per expiry
+        expiries = expiry_dates(symbol, WEEKLY, current_date, current_date + timedelta(weeks=weeks * 5))
         
-        for i in range(weeks * 2):  # Check more days to find valid expiries
-            check_date = current_date + timedelta(days=i)
-            
-            if (check_date.weekday() == target_weekday and 
-                not self.is_market_holiday(check_date) and
-                len(expiry_dates) < weeks):
-                expiry_dates.append(
-                    datetime.combine(check_date, time(15, 30), tzinfo=self.ist)
-                )
-        
-        return expiry_dates
+        return [
+            self.ist.localize(datetime.combine(expiry, time(15, 30)))
+            for expiry in expiries[:weeks]
+        ]
     
     def is_expiry_day(self, symbol: str, check_date: Optional[datetime] = None) -> bool:
         """Check if given date is an expiry day for the symbol"""
@@ -0,0 +1,315 @@
+"""
+Portfolio Margin Engine
+SPAN-style margin over 16-scenario risk arrays with spread, calendar and hedge offsets
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared_utils.payoff_engine import DEFAULT_RISK_FREE_RATE, DEFAULT_VOLATILITY, black_scholes
+
+# Price scan range as a fraction of spot (approximate exchange parameters)
+PRICE_SCAN_RANGE = {
+    'NIFTY': 0.06,
+    'BANKNIFTY': 0.07,
+    'FINNIFTY': 0.07,
+    'MIDCPNIFTY': 0.08,
+    'SENSEX': 0.06,
+}
+DEFAULT_PRICE_SCAN_RANGE = 0.08
+
+VOLATILITY_SCAN_RANGE = 0.04     # Absolute implied volatility shift
+EXTREME_MOVE_COVERAGE = 0.35     # Fraction of the 2x price scan loss charged
+SHORT_OPTION_MINIMUM_RATE = 0.03  # Floor on unhedged short options, fraction of notional
+EXPOSURE_MARGIN_RATE = 0.02      # On unhedged short option / net futures notional
+CALENDAR_SPREAD_RATE = 0.005     # On delta offset between expiries, fraction of notional
+
+# (price move in price scan ranges, volatility direction, loss coverage)
+SCENARIOS = (
+    (0.0, 1, 1.0), (0.0, -1, 1.0),
+    (1 / 3, 1, 1.0), (1 / 3, -1, 1.0), (-1 / 3, 1, 1.0), (-1 / 3, -1, 1.0),
+    (2 / 3, 1, 1.0), (2 / 3, -1, 1.0), (-2 / 3, 1, 1.0), (-2 / 3, -1, 1.0),
+    (1.0, 1, 1.0), (1.0, -1, 1.0), (-1.0, 1, 1.0), (-1.0, -1, 1.0),
+    (2.0, 0, EXTREME_MOVE_COVERAGE), (-2.0, 0, EXTREME_MOVE_COVERAGE),
+)
+_PRICE_MOVES = np.array([s[0] for s in SCENARIOS])
+_VOLATILITY_MOVES = np.array([s[1] for s in SCENARIOS], dtype=float)
+_COVERAGE = np.array([s[2] for s in SCENARIOS])
+# Scenarios at +/- one third of the scan range, used for the calendar spread delta
+_UP_THIRD, _DOWN_THIRD = [2, 3], [4, 5]
+
+SCENARIO_CACHE_SIZE = 256  # (underlying, expiry) entries kept per container
+
+
+class ScenarioArrayCache:
+    """
+    Per-unit risk arrays keyed by underlying/expiry
+
+    An entry holds the market snapshot (spot, volatility, time to expiry) it was
+    computed for and one 16-scenario array per (strike, option_type); a different
+    snapshot replaces the entry. Entries are evicted least recently used.
+    """
+
+    def __init__(self, max_entries: int = SCENARIO_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, underlying: str, expiry: str, snapshot: Tuple, instrument: Tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get((underlying, expiry))
+            if entry is None or entry['snapshot'] != snapshot:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((underlying, expiry))
+            array = entry['arrays'].get(instrument)
+            if array is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return array
+
+    def put(self, underlying: str, expiry: str, snapshot: Tuple, instrument: Tuple, array: np.ndarray):
+        with self._lock:
+            key = (underlying, expiry)
+            entry = self._entries.get(key)
+            if entry is None or entry['snapshot'] != snapshot:
+                entry = {'snapshot': snapshot, 'arrays': {}}
+                self._entries[key] = entry
+            entry['arrays'][instrument] = array
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by every engine in the container so warm invocations reuse the arrays
+_SCENARIO_CACHE = ScenarioArrayCache()
+
+
+def get_scenario_cache() -> ScenarioArrayCache:
+    return _SCENARIO_CACHE
+
+
+class MarginEngine:
+    """
+    SPAN-style portfolio margin
+
+    Positions are dicts with underlying, expiry (ISO date) or days_to_expiry, strike,
+    option_type (CE/PE/FUT), transaction_type (or action) BUY/SELL and quantity in
+    units. Market data maps each underlying to {'spot': ..., 'volatility': ...}.
+
+    Per underlying, the scan risk is the worst loss over the 16 scenarios of the
+    netted risk array, so spreads and condors are charged their real risk rather
+    than per-leg. Expiries of one underlying are scanned together; a calendar spread
+    charge on the delta offset between expiries adds back the basis risk. Exposure
+    margin and the short option minimum apply only to short options not covered by
+    a long of the same underlying and type in any expiry (a calendar's basis risk is
+    already in the calendar spread charge).
+    """
+
+    def __init__(self, risk_free_rate: float = DEFAULT_RISK_FREE_RATE,
+                 cache: Optional[ScenarioArrayCache] = None):
+        self.risk_free_rate = risk_free_rate
+        self.cache = cache if cache is not None else get_scenario_cache()
+
+    def calculate_margin(self, positions: Sequence[Dict], market: Dict[str, Dict],
+                         as_of: Optional[date] = None) -> Dict:
+        """Margin for one portfolio"""
+        return self._margin_by_group(positions, [None] * len(positions), market, as_of).get(None, _empty_margin())
+
+    def calculate_basket_margins(self, baskets: Dict[str, Sequence[Dict]], market: Dict[str, Dict],
+                                 as_of: Optional[date] = None) -> Dict:
+        """
+        Margin every basket in one vectorized pass
+
+        Returns per-basket margins, their sum, and the margin of all baskets netted
+        as a single portfolio (what a broker blocks when they share an account).
+        """
+        positions, labels = [], []
+        for basket_id, basket_positions in baskets.items():
+            positions.extend(basket_positions)
+            labels.extend([basket_id] * len(basket_positions))
+
+        by_basket = self._margin_by_group(positions, labels, market, as_of)
+        results = {basket_id: by_basket.get(basket_id, _empty_margin()) for basket_id in baskets}
+        netted = self._margin_by_group(positions, [None] * len(positions), market, as_of).get(None, _empty_margin())
+
+        return {
+            'baskets': results,
+            'total_margin': round(sum(r['total_margin'] for r in results.values()), 2),
+            'portfolio': netted,
+            'currency': 'INR'
+        }
+
+    def _margin_by_group(self, positions: Sequence[Dict], labels: Sequence[Hashable],
+                         market: Dict[str, Dict], as_of: Optional[date]) -> Dict[Hashable, Dict]:
+        if not positions:
+            return {}
+        as_of = as_of or datetime.now().date()
+
+        parsed = [self._parse_position(p, market, as_of) for p in positions]
+        arrays = self._risk_arrays(parsed)
+        signed_quantity = np.array([p['signed_quantity'] for p in parsed])
+        position_pnl = arrays * signed_quantity[:, np.newaxis]
+
+        # Scan risk per (group, underlying) over the netted risk array
+        underlying_keys = [(label, p['underlying']) for label, p in zip(labels, parsed)]
+        underlying_index, underlying_groups = _group_index(underlying_keys)
+        underlying_pnl = np.zeros((len(underlying_groups), len(SCENARIOS)))
+        np.add.at(underlying_pnl, underlying_index, position_pnl)
+        scan_risk = np.maximum(-underlying_pnl.min(axis=1), 0.0)
+
+        # Calendar spread charge on delta offsetting across expiries
+        delta_scale = np.array([p['spot'] * p['price_scan'] * 2 / 3 for p in parsed])
+        position_delta = (
+            position_pnl[:, _UP_THIRD].mean(axis=1) - position_pnl[:, _DOWN_THIRD].mean(axis=1)
+        ) / delta_scale
+        expiry_keys = [(label, p['underlying'], p['expiry']) for label, p in zip(labels, parsed)]
+        expiry_index, expiry_groups = _group_index(expiry_keys)
+        expiry_delta = np.zeros(len(expiry_groups))
+        np.add.at(expiry_delta, expiry_index, position_delta)
+        underlying_position = {key: i for i, key in enumerate(underlying_groups)}
+        expiry_parent = np.array([underlying_position[key[:2]] for key in expiry_groups], dtype=int)
+        long_delta = np.zeros(len(underlying_groups))
+        short_delta = np.zeros(len(underlying_groups))
+        np.add.at(long_delta, expiry_parent, np.maximum(expiry_delta, 0.0))
+        np.add.at(short_delta, expiry_parent, np.maximum(-expiry_delta, 0.0))
+        spots = np.array([market[underlying]['spot'] for _, underlying in underlying_groups], dtype=float)
+        calendar_charge = CALENDAR_SPREAD_RATE * spots * np.minimum(long_delta, short_delta)
+
+        # Shorts covered by a long of the same underlying and type attract no exposure
+        leg_keys = [(label, p['underlying'], p['option_type']) for label, p in zip(labels, parsed)]
+        leg_index, leg_groups = _group_index(leg_keys)
+        net_quantity = np.zeros(len(leg_groups))
+        np.add.at(net_quantity, leg_index, signed_quantity)
+        is_future = np.array([key[2] == 'FUT' for key in leg_groups])
+        uncovered = np.where(is_future, np.abs(net_quantity), np.maximum(-net_quantity, 0.0))
+        leg_parent = np.array([underlying_position[key[:2]] for key in leg_groups], dtype=int)
+        exposed_notional = np.zeros(len(underlying_groups))
+        short_option_notional = np.zeros(len(underlying_groups))
+        np.add.at(exposed_notional, leg_parent, uncovered * spots[leg_parent])
+        np.add.at(short_option_notional, leg_parent, np.where(is_future, 0.0, uncovered) * spots[leg_parent])
+
+        span = np.maximum(scan_risk + calendar_charge, SHORT_OPTION_MINIMUM_RATE * short_option_notional)
+        exposure = EXPOSURE_MARGIN_RATE * exposed_notional
+
+        results: Dict[Hashable, Dict] = {}
+        for i, (label, underlying) in enumerate(underlying_groups):
+            result = results.setdefault(label, _empty_margin())
+            result['underlyings'][underlying] = {
+                'scan_risk': round(float(scan_risk[i]), 2),
+                'calendar_spread_charge': round(float(calendar_charge[i]), 2),
+                'short_option_minimum': round(float(SHORT_OPTION_MINIMUM_RATE * short_option_notional[i]), 2),
+                'span_margin': round(float(span[i]), 2),
+                'exposure_margin': round(float(exposure[i]), 2),
+                'worst_scenario': int(underlying_pnl[i].argmin()) + 1
+            }
+            result['span_margin'] += float(span[i])
+            result['exposure_margin'] += float(exposure[i])
+
+        for result in results.values():
+            result['span_margin'] = round(result['span_margin'], 2)
+            result['exposure_margin'] = round(result['exposure_margin'], 2)
+            result['total_margin'] = round(result['span_margin'] + result['exposure_margin'], 2)
+            result['margin_blocked'] = result['total_margin']
+        return results
+
+    def _parse_position(self, position: Dict, market: Dict[str, Dict], as_of: date) -> Dict:
+        underlying = position['underlying'].upper()
+        quote = market[underlying]
+        side = (position.get('transaction_type') or position.get('action') or 'BUY').upper()
+
+        if 'days_to_expiry' in position:
+            days = float(position['days_to_expiry'])
+            expiry = str(position.get('expiry', f"T+{position['days_to_expiry']}"))
+        else:
+            expiry = str(position['expiry'])
+            days = float((date.fromisoformat(expiry[:10]) - as_of).days)
+
+        return {
+            'underlying': underlying,
+            'expiry': expiry,
+            'strike': float(position.get('strike', 0) or 0),
+            'option_type': position.get('option_type', 'FUT').upper(),
+            'signed_quantity': float(position['quantity']) * (1.0 if side == 'BUY' else -1.0),
+            'spot': float(quote['spot']),
+            'volatility': float(quote.get('volatility', DEFAULT_VOLATILITY)),
+            'time_to_expiry': max(days, 0.0) / 365.0,
+            'price_scan': PRICE_SCAN_RANGE.get(underlying, DEFAULT_PRICE_SCAN_RANGE)
+        }
+
+    def _risk_arrays(self, parsed: List[Dict]) -> np.ndarray:
+        """Per-unit long risk arrays, one row per position; cache misses are priced in one pass"""
+        arrays = np.zeros((len(parsed), len(SCENARIOS)))
+        missing: Dict[Tuple, List[int]] = {}
+
+        for i, p in enumerate(parsed):
+            snapshot = (p['spot'], p['volatility'], p['time_to_expiry'])
+            instrument = (p['strike'], p['option_type'])
+            cached = self.cache.get(p['underlying'], p['expiry'], snapshot, instrument)
+            if cached is not None:
+                arrays[i] = cached
+            else:
+                missing.setdefault((p['underlying'], p['expiry'], snapshot, instrument), []).append(i)
+
+        if not missing:
+            return arrays
+
+        keys = list(missing)
+        first = [parsed[missing[key][0]] for key in keys]
+        spot = np.array([p['spot'] for p in first])[:, np.newaxis]
+        scan = np.array([p['price_scan'] for p in first])[:, np.newaxis]
+        volatility = np.array([p['volatility'] for p in first])[:, np.newaxis]
+        t = np.array([p['time_to_expiry'] for p in first])[:, np.newaxis]
+        strike = np.array([p['strike'] for p in first])[:, np.newaxis]
+        option_type = np.array([p['option_type'] for p in first])[:, np.newaxis]
+        is_call = option_type == 'CE'
+        is_future = option_type == 'FUT'
+
+        scenario_spot = spot * (1.0 + scan * _PRICE_MOVES)
+        scenario_volatility = np.maximum(volatility + VOLATILITY_SCAN_RANGE * _VOLATILITY_MOVES, 0.01)
+        current = np.where(is_future, spot, black_scholes(spot, strike, t, volatility, is_call, self.risk_free_rate))
+        scenario = np.where(
+            is_future, scenario_spot,
+            black_scholes(scenario_spot, strike, t, scenario_volatility, is_call, self.risk_free_rate)
+        )
+        computed = (scenario - current) * _COVERAGE
+
+        for row, key in enumerate(keys):
+            self.cache.put(key[0], key[1], key[2], key[3], computed[row])
+            arrays[missing[key]] = computed[row]
+        return arrays
+
+
+def _group_index(keys: List[Tuple]) -> Tuple[np.ndarray, List[Tuple]]:
+    """Dense group ids for keys, in first-seen order"""
+    groups: Dict[Tuple, int] = {}
+    index = np.array([groups.setdefault(key, len(groups)) for key in keys], dtype=int)
+    return index, list(groups)
+
+
+def _empty_margin() -> Dict:
+    return {
+        'span_margin': 0.0,
+        'exposure_margin': 0.0,
+        'total_margin': 0.0,
+        'margin_blocked': 0.0,
+        'underlyings': {},
+        'currency': 'INR'
+    }
+
+
+def calculate_portfolio_margin(positions: Sequence[Dict], market: Dict[str, Dict]) -> Dict:
+    """Quick portfolio margin calculation"""
+    return MarginEngine().calculate_margin(positions, market)
@@ -9,6 +9,9 @@ from decimal import Decimal, getcontext
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+from shared_utils.margin_engine import MarginEngine
+from shared_utils.payoff_engine import PayoffEngine
+
 # Set precision for decimal calculations
 getcontext().prec = 10
 
@@ -174,36 +177,12 @@ class RiskCalculator:
         Returns:
             Dict with payoff data and analysis
         """
-        payoffs = []
-        
-        for spot in spot_prices:
-            total_payoff = 0
-            
-            for leg in legs:
-                strike = leg['strike']
-                option_type = leg['option_type'].upper()
-                transaction_type = leg['transaction_type'].upper()  # BUY/SELL
-                quantity = leg['quantity']
-                entry_premium = leg.get('entry_premium', 0)
-                
-                # Calculate intrinsic value at expiry
-                if option_type == 'CE':  # Call
-                    intrinsic_value = max(0, spot - strike)
-                else:  # Put
-                    intrinsic_value = max(0, strike - spot)
-                
-                # Calculate leg P&L
-                if transaction_type == 'BUY':
-                    leg_pnl = quantity * (intrinsic_value - entry_premium)
-                else:  # SELL
-                    leg_pnl = quantity * (entry_premium - intrinsic_value)
-                
-                total_payoff += leg_pnl
-            
-            payoffs.append({
-                'spot_price': spot,
-                'payoff': round(total_payoff, 2)
-            })
+        # One NumPy pass over (spot x leg) instead of a Python loop per price and leg
+        values = PayoffEngine(self.risk_free_rate).expiry_payoff(legs, spot_prices)
+        payoffs = [
+            {'spot_price': spot, 'payoff': round(payoff, 2)}
+            for spot, payoff in zip(spot_prices, values.tolist())
+        ]
         
         # Calculate key metrics
         max_profit = max(p['payoff'] for p in payoffs)
@@ -220,6 +199,33 @@ class RiskCalculator:
             'risk_reward_ratio': abs(max_profit / max_loss) if max_loss != 0 else float('inf')
         }
     
+    def calculate_position_risk(self, legs: List[Dict], spot: float, days_to_expiry: float,
+                                volatility: float) -> PositionRisk:
+        """
+        Calculate exact expiry risk metrics for a multi-leg strategy
+        
+        Args:
+            legs: List of strategy legs with strike, option_type, transaction_type, quantity
+            spot: Current spot price
+            days_to_expiry: Days until expiry
+            volatility: Implied volatility used for probability of profit
+        
+        Returns:
+            PositionRisk with unbounded profit/loss reported as +/-infinity
+        """
+        result = PayoffEngine(self.risk_free_rate).evaluate(
+            [{'legs': legs, 'spot_price': spot, 'days_to_expiry': days_to_expiry, 'volatility': volatility}],
+            grid_points=2
+        )[0]
+        
+        return PositionRisk(
+            max_loss=Decimal(str(result['max_loss'])),
+            max_profit=Decimal(str(result['max_profit'])),
+            breakeven_points=result['breakeven_points'],
+            probability_of_profit=result['probability_of_profit'],
+            risk_reward_ratio=result['risk_reward_ratio']
+        )
+    
     def calculate_position_sizing(self, account_balance: Decimal, risk_percentage: float, 
                                 max_loss_per_trade: Decimal, strategy_max_loss: Decimal) -> Dict:
         """
@@ -257,43 +263,42 @@ class RiskCalculator:
             )
         }
     
-    def calculate_margin_requirement(self, legs: List[Dict], underlying_price: float) -> Dict:
+    def calculate_margin_requirement(self, legs: List[Dict], underlying_price: float,
+                                     volatility: float = 0.15) -> Dict:
         """
         Calculate margin requirement for option strategy (SPAN + Exposure)
-        Note: This is a simplified calculation. Actual margin requirements 
-        would need integration with broker APIs.
-        """
-        total_span_margin = Decimal('0')
-        total_exposure_margin = Decimal('0')
         
+        Legs are margined together on the 16-scenario risk array, so hedged spreads
+        are charged their portfolio risk. Legs may carry underlying (default NIFTY),
+        expiry or days_to_expiry (default one week) and lot_size (default 25).
+        Note: Exchange parameters are approximate; actual requirements come from the broker.
+        """
+        positions = []
         for leg in legs:
-            strike = leg['strike']
-            option_type = leg['option_type'].upper()
-            transaction_type = leg['transaction_type'].upper()
-            quantity = leg['quantity']
-            lot_size = leg.get('lot_size', 25)  # Default NIFTY lot size
-            
-            notional_value = Decimal(str(underlying_price * quantity * lot_size))
-            
-            if transaction_type == 'SELL':
-                # Simplified SPAN margin calculation (actual would be more complex)
-                if option_type == 'CE':
-                    span_margin = notional_value * Decimal('0.10')  # 10% for ITM calls
-                else:
-                    span_margin = notional_value * Decimal('0.12')  # 12% for puts
-                
-                exposure_margin = notional_value * Decimal('0.05')  # 5% exposure margin
-                
-                total_span_margin += span_margin
-                total_exposure_margin += exposure_margin
-        
-        total_margin = total_span_margin + total_exposure_margin
+            position = {
+                'underlying': leg.get('underlying', 'NIFTY'),
+                'strike': leg['strike'],
+                'option_type': leg['option_type'],
+                'transaction_type': leg['transaction_type'],
+                'quantity': leg['quantity'] * leg.get('lot_size', 25)  # Default NIFTY lot size
+            }
+            if 'expiry' in leg:
+                position['expiry'] = leg['expiry']
+            else:
+                position['days_to_expiry'] = leg.get('days_to_expiry', 7)
+            positions.append(position)
+        
+        market = {
+            position['underlying'].upper(): {'spot': underlying_price, 'volatility': volatility}
+            for position in positions
+        }
+        margin = MarginEngine(self.risk_free_rate).calculate_margin(positions, market)
         
         return {
-            'span_margin': float(total_span_margin),
-            'exposure_margin': float(total_exposure_margin),
-            'total_margin': float(total_margin),
-            'margin_blocked': float(total_margin),
+            'span_margin': margin['span_margin'],
+            'exposure_margin': margin['exposure_margin'],
+            'total_margin': margin['total_margin'],
+            'margin_blocked': margin['margin_blocked'],
             'currency': 'INR'
         }
     
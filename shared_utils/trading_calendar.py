@@ -0,0 +1,126 @@
+"""
+Trading Calendar
+NSE / BSE trading days and option expiries of the traded underlyings
+
+Trading days are weekdays outside the exchange holiday list. The list below
+follows the exchange holiday circulars; MARKET_HOLIDAYS (comma-separated
+YYYY-MM-DD) adds dates without a deploy, e.g. a newly announced closure.
+Dates past the last year with listed holidays are treated as plain weekdays
+and logged as errors once per year, so a missing circular shows up in the logs.
+
+Expiries follow the exchange's expiry weekday per underlying: weekly series
+expire every week, monthly series on the last such weekday of the month. An
+expiry falling on a holiday moves to the previous trading day.
+
+This module is the source of truth for holidays and expiry weekdays;
+indian_market_utils derives its index expiries and holidays from it.
+"""
+
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+
+from shared_utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+EXCHANGE_HOLIDAYS = frozenset(date.fromisoformat(day) for day in (
+    # 2025
+    '2025-02-26', '2025-03-14', '2025-03-31', '2025-04-10', '2025-04-14', '2025-04-18',
+    '2025-05-01', '2025-08-15', '2025-08-27', '2025-10-02', '2025-10-21', '2025-10-22',
+    '2025-11-05', '2025-12-25',
+    # 2026
+    '2026-01-26', '2026-03-03', '2026-03-26', '2026-03-31', '2026-04-03', '2026-04-14',
+    '2026-05-01', '2026-05-28', '2026-06-26', '2026-09-14', '2026-10-02', '2026-10-20',
+    '2026-11-10', '2026-11-24', '2026-12-25',
+))
+
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+
+TUESDAY = 1
+THURSDAY = 3
+
+# underlying -> (expiry weekday, series listed); monthly-only underlyings have no weekly series
+EXPIRY_RULES = {
+    'NIFTY': (TUESDAY, (WEEKLY, MONTHLY)),
+    'BANKNIFTY': (TUESDAY, (MONTHLY,)),
+    'FINNIFTY': (TUESDAY, (MONTHLY,)),
+    'MIDCPNIFTY': (TUESDAY, (MONTHLY,)),
+    'SENSEX': (THURSDAY, (WEEKLY, MONTHLY)),
+    'BANKEX': (THURSDAY, (MONTHLY,)),
+}
+
+
+@lru_cache(maxsize=1)
+def market_holidays() -> FrozenSet[date]:
+    extra = {
+        date.fromisoformat(day.strip())
+        for day in os.environ.get('MARKET_HOLIDAYS', '').split(',') if day.strip()
+    }
+    return EXCHANGE_HOLIDAYS | frozenset(extra)
+
+
+@lru_cache(maxsize=1)
+def last_listed_year() -> int:
+    """Last year the holiday list (including MARKET_HOLIDAYS) covers."""
+    return max(day.year for day in market_holidays())
+
+
+@lru_cache(maxsize=None)
+def _report_unlisted_year(year: int) -> None:
+    logger.error(f"Exchange holiday list ends in {last_listed_year()}; treating every weekday of {year} "
+                 f"as a trading day. Add the {year} holidays to EXCHANGE_HOLIDAYS or MARKET_HOLIDAYS")
+
+
+def is_trading_day(day: date) -> bool:
+    if day.year > last_listed_year():
+        _report_unlisted_year(day.year)
+    return day.weekday() < 5 and day not in market_holidays()
+
+
+def previous_trading_day(day: date) -> date:
+    """Last trading day strictly before day."""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def trading_days_before(day: date, count: int) -> date:
+    """The trading day count trading days before day (0 is day itself)."""
+    for _ in range(count):
+        day = previous_trading_day(day)
+    return day
+
+
+def expiry_series(underlying: str, expiry_type: Optional[str]) -> str:
+    """Series a strategy trades: its expiry_type when listed, else the underlying's monthly series."""
+    _, listed = EXPIRY_RULES.get(underlying.upper(), EXPIRY_RULES['NIFTY'])
+    series = (expiry_type or WEEKLY).lower()
+    return series if series in listed else MONTHLY
+
+
+def expiry_dates(underlying: str, expiry_type: Optional[str], start: date, end: date) -> List[date]:
+    """
+    Expiries of an underlying's series falling in [start, end], oldest first.
+
+    Holiday expiries are moved to the previous trading day before the range check.
+    """
+    weekday, _ = EXPIRY_RULES.get(underlying.upper(), EXPIRY_RULES['NIFTY'])
+    series = expiry_series(underlying, expiry_type)
+
+    # Scan a week past the range so a holiday-shifted expiry at the boundary is kept
+    day = start + timedelta(days=(weekday - start.weekday()) % 7)
+    expiries = []
+    while day <= end + timedelta(days=7):
+        last_of_month = (day + timedelta(days=7)).month != day.month
+        if series == WEEKLY or last_of_month:
+            expiry = day if is_trading_day(day) else previous_trading_day(day)
+            if start <= expiry <= end:
+                expiries.append(expiry)
+        day += timedelta(days=7)
+
+    return expiries